@@ -3,15 +3,29 @@
 Author       : Linn
 Date         : 2025-07-28 17:14:00
 LastEditors  : Linn
-LastEditTime : 2026-01-13 12:14:00
+LastEditTime : 2026-10-19 18:10:00
 FilePath     : \\usbvna\\src\\lib\\__init__.py
 Description  : Package initialization file for lib
+               导出项按需导入，导入lib的子模块时不会连带加载pyvisa和GUI
 
 Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
 """
 
-from .vna_controller import VNAController
-from .logger_config import setup_logger
-from .main_window import VNAControllerGUI
+import importlib
 
-__all__ = ['VNAController', 'setup_logger', 'VNAControllerGUI']
\ No newline at end of file
+_EXPORTS = {
+    'VNAController': '.vna_controller',
+    'setup_logger': '.logger_config',
+    'VNAControllerGUI': '.main_window',
+}
+
+__all__ = ['VNAController', 'setup_logger', 'VNAControllerGUI']
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
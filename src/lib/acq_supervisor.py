@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 19:40:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 21:20:00
+FilePath     : \\usbvna\\src\\lib\\acq_supervisor.py
+Description  : 采集监管：VNA读取失败（USB抖动、VISA超时、仪器无响应）时按退避策略重连会话、恢复仪器状态，
+               采集线程继续写入同一输出文件，道号连续，中断区间记录到{prefix}_gaps.csv
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import csv
+import os
+import random
+import time
+
+from .instrument_state import InstrumentStateManager
+from .logger_config import setup_logger
+
+logger = setup_logger("acq_supervisor", "logs/acq_supervisor.log", level=10)  # 10对应DEBUG级别
+
+
+class GapLog:
+    """采集中断记录旁路文件，每次重连成功或放弃时写一行"""
+
+    HEADER = ['gap', 'after_trace', 'host_mono_start', 'host_mono_end', 'duration_s', 'attempts', 'recovered', 'reason']
+
+    def __init__(self, path, file_prefix):
+        self.file_path = os.path.join(path, f"{file_prefix}_gaps.csv")
+        self.file = None
+        self.writer = None
+        self.count = 0
+
+    def write(self, after_trace, start, end, attempts, recovered, reason):
+        self.count += 1
+        try:
+            if self.file is None:
+                self.file = open(self.file_path, 'w', newline='', encoding='utf-8')
+                self.writer = csv.writer(self.file)
+                self.writer.writerow(self.HEADER)
+            self.writer.writerow([self.count, after_trace, f"{start:.6f}", f"{end:.6f}", f"{end - start:.3f}",
+                                  attempts, int(recovered), reason])
+            self.file.flush()
+        except OSError:
+            # 中断记录写入失败不影响采集流程
+            pass
+
+    def close(self):
+        if self.file:
+            try:
+                self.file.close()
+            except OSError:
+                pass
+            finally:
+                self.file = None
+                self.writer = None
+
+
+class AcquisitionSupervisor:
+    """
+    包装VNA读取调用的监管器
+
+    call()返回None视为失败：先原样重试一次（偶发超时），仍失败则关闭会话、按指数退避重新打开，
+    打开后执行已登记的状态恢复步骤，再重试读取。
+    """
+
+    def __init__(self, vna_controller, gap_log=None, max_attempts=8, base_delay=0.5, max_delay=10.0,
+                 should_continue=None, on_event=None):
+        """
+        Args:
+            vna_controller (VNAController): 已打开设备的控制器，重连使用其resource_name
+            gap_log (GapLog, optional): 中断记录
+            max_attempts (int): 单次中断的最大重连次数
+            base_delay (float): 首次重连前的等待(秒)，之后每次加倍
+            max_delay (float): 单次等待上限(秒)
+            should_continue (callable, optional): 返回False时放弃重连（如用户停止采集）
+            on_event (callable, optional): 以一条中文消息调用，用于在界面显示重连过程
+        """
+        self.vna_controller = vna_controller
+        self.gap_log = gap_log
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.should_continue = should_continue or (lambda: True)
+        self.on_event = on_event
+        self.restore_steps = []
+        self.outage_steps = []
+        self.resource_name = getattr(vna_controller, 'resource_name', None)
+        self.reconnects = 0
+        # 最近一次调用读取函数的开始时刻，重连后道时间戳应以此为准而不是包含中断的总耗时
+        self.attempt_start = None
+
+    def add_restore_step(self, step):
+        """登记重连后需要执行的状态恢复步骤（无参可调用对象，返回None或False表示失败）"""
+        self.restore_steps.append(step)
+
+    def add_outage_step(self, step):
+        """登记中断开始时执行的步骤（无参可调用对象），如把已写入的道提交到磁盘，避免重连期间断电丢失"""
+        self.outage_steps.append(step)
+
+    def track_state(self, path, file_prefix):
+        """
+        采集开始时把仪器配置保存为{prefix}_state.json，并登记为重连后的恢复步骤（只写入变化的设置）
+
+        Returns:
+            dict: 记录的设置，读取失败时返回None
+        """
+        state = InstrumentStateManager(self.vna_controller)
+        settings = state.snapshot(path, file_prefix)
+        if settings:
+            self.add_restore_step(lambda: state.apply(settings))
+        return settings
+
+    def call(self, func, *args, trace_index=None, **kwargs):
+        """
+        执行一次VNA读取，失败时重试/重连
+
+        Args:
+            func (callable): 读取函数，失败时返回None
+            trace_index (int, optional): 当前道号，用于中断记录
+
+        Returns:
+            读取结果，重连失败或被停止时返回None
+        """
+        result = self._attempt(func, args, kwargs)
+        if result is not None:
+            return result
+        result = self._attempt(func, args, kwargs)
+        if result is not None:
+            return result
+
+        start = time.monotonic()
+        reason = f"{getattr(func, '__name__', 'read')} failed"
+        self._event(f"VNA读取失败，第{trace_index}道，开始重连")
+        for step in self.outage_steps:
+            try:
+                step()
+            except Exception as e:
+                logger.error(f"Outage step {step} failed: {e}")
+        attempts = 0
+        while attempts < self.max_attempts and self.should_continue():
+            attempts += 1
+            if not self._sleep(min(self.max_delay, self.base_delay * (2 ** (attempts - 1))) * random.uniform(0.8, 1.2)):
+                break
+            if not self.reconnect():
+                self._event(f"第{attempts}次重连失败")
+                continue
+            result = self._attempt(func, args, kwargs)
+            if result is not None:
+                self.reconnects += 1
+                end = time.monotonic()
+                if self.gap_log is not None:
+                    self.gap_log.write(self._after(trace_index), start, end, attempts, True, reason)
+                self._event(f"重连成功（{attempts}次尝试，中断{end - start:.1f}秒），从第{trace_index}道继续采集")
+                return result
+            self._event(f"第{attempts}次重连后读取仍失败")
+
+        if self.gap_log is not None:
+            self.gap_log.write(self._after(trace_index), start, time.monotonic(), attempts, False, reason)
+        self._event(f"重连放弃（{attempts}次尝试）")
+        return None
+
+    def _attempt(self, func, args, kwargs):
+        self.attempt_start = time.monotonic()
+        return func(*args, **kwargs)
+
+    def reconnect(self):
+        """关闭并重新打开会话，执行状态恢复步骤"""
+        if not self.resource_name:
+            logger.error("No resource name to reconnect")
+            return False
+        try:
+            self.vna_controller.close_device(discard=True)
+            if not self.vna_controller.open_device(self.resource_name):
+                return False
+            for step in self.restore_steps:
+                if step() in (None, False):
+                    logger.warning("Restore step %s failed after reconnect", step)
+                    return False
+            return True
+        except Exception as e:
+            logger.error(f"Reconnect failed: {e}")
+            return False
+
+    def close(self):
+        if self.gap_log is not None:
+            self.gap_log.close()
+
+    def _sleep(self, seconds):
+        """可被should_continue打断的等待"""
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if not self.should_continue():
+                return False
+            time.sleep(min(0.1, max(0.0, deadline - time.monotonic())))
+        return self.should_continue()
+
+    @staticmethod
+    def _after(trace_index):
+        return trace_index - 1 if trace_index is not None else ''
+
+    def _event(self, message):
+        logger.warning(message)
+        if self.on_event is not None:
+            try:
+                self.on_event(message)
+            except Exception:
+                pass
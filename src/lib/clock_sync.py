@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 09:12:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 09:12:00
+FilePath     : \\usbvna\\src\\lib\\clock_sync.py
+Description  : 主机单调时钟与GNSS UTC时间同步模块，为A-Scan道和RTK定位提供统一的GNSS时间戳
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import calendar
+import math
+import threading
+import time
+from collections import deque
+
+# 一天的秒数，用于处理GGA语句跨UTC零点的日期进位
+SECONDS_PER_DAY = 86400.0
+
+
+def parse_nmea_utc(date_str, time_str):
+    """
+    将NMEA的日期(ddmmyy)和时间(hhmmss.ss)字段转换为UTC纪元秒
+
+    Args:
+        date_str (str): RMC语句中的日期字段，格式ddmmyy
+        time_str (str): GGA/RMC语句中的时间字段，格式hhmmss.ss
+
+    Returns:
+        float: UTC纪元秒，解析失败返回None
+    """
+    if not date_str or not time_str or len(date_str) != 6 or len(time_str) < 6:
+        return None
+    try:
+        day = int(date_str[0:2])
+        month = int(date_str[2:4])
+        year = 2000 + int(date_str[4:6])  # 假设都是20xx年
+        seconds_of_day = parse_nmea_time_of_day(time_str)
+        if seconds_of_day is None:
+            return None
+        return calendar.timegm((year, month, day, 0, 0, 0)) + seconds_of_day
+    except (ValueError, OverflowError):
+        return None
+
+
+def parse_nmea_time_of_day(time_str):
+    """
+    将NMEA时间字段(hhmmss.ss)转换为当天的秒数
+
+    Args:
+        time_str (str): 时间字段
+
+    Returns:
+        float: 当天UTC秒数，解析失败返回None
+    """
+    if not time_str or len(time_str) < 6:
+        return None
+    try:
+        hour = int(time_str[0:2])
+        minute = int(time_str[2:4])
+        second = float(time_str[4:])
+        return hour * 3600.0 + minute * 60.0 + second
+    except ValueError:
+        return None
+
+
+class ClockSync:
+    """
+    主机单调时钟与GNSS UTC的时钟偏差/漂移估计器
+
+    以(主机单调时间, GNSS历元时间)样本对做滑动窗口线性回归：
+        gnss = offset + (1 + drift) * (host - host_ref)
+    样本由RTK模块在NMEA语句到达时提供，A-Scan道采集完成后用to_gnss()换算为GNSS时间，
+    使道与定位处于同一时间基准，不再受解析线程调度抖动的影响。
+    """
+
+    def __init__(self, window_size=120, min_samples=5, max_residual=0.15, nmea_latency=0.0):
+        """
+        Args:
+            window_size (int): 参与回归的最近样本数，10Hz输出时120约对应12秒
+            min_samples (int): 判定为已锁定所需的最少样本数
+            max_residual (float): 锁定后单个样本允许的最大残差(秒)，超出视为串口突发延迟并剔除
+            nmea_latency (float): 接收机从定位历元到输出NMEA语句的固定延迟(秒)，查阅接收机手册获得
+        """
+        self.window_size = window_size
+        self.min_samples = min_samples
+        self.max_residual = max_residual
+        self.nmea_latency = nmea_latency
+
+        self._lock = threading.Lock()
+        self._samples = deque()
+        # 以第一个样本为参考点，避免纪元秒量级导致的浮点精度损失
+        self._host_ref = None
+        self._gnss_ref = None
+        # 滑动窗口累加量
+        self._sum_x = 0.0
+        self._sum_y = 0.0
+        self._sum_xx = 0.0
+        self._sum_xy = 0.0
+        # 当前模型参数
+        self._intercept = 0.0
+        self._slope = 1.0
+        self._residual_std = 0.0
+        self._rejected_in_row = 0
+        self._total_rejected = 0
+        self._last_gnss = None
+
+    def reset(self):
+        """清空所有样本和模型"""
+        with self._lock:
+            self._reset_locked()
+
+    def _reset_locked(self):
+        self._samples.clear()
+        self._host_ref = None
+        self._gnss_ref = None
+        self._sum_x = self._sum_y = self._sum_xx = self._sum_xy = 0.0
+        self._intercept = 0.0
+        self._slope = 1.0
+        self._residual_std = 0.0
+        self._rejected_in_row = 0
+        self._last_gnss = None
+
+    def add_sample(self, host_mono, gnss_time):
+        """
+        添加一个同步样本
+
+        Args:
+            host_mono (float): 语句到达时的time.monotonic()
+            gnss_time (float): 语句中的GNSS UTC历元(纪元秒)
+
+        Returns:
+            bool: 样本是否被采纳
+        """
+        if gnss_time is None or host_mono is None:
+            return False
+
+        with self._lock:
+            # GNSS时间回跳或大幅跳变（接收机重启、日期错误等）时重新开始估计
+            if self._last_gnss is not None and abs(gnss_time - self._last_gnss) > 3600.0:
+                self._reset_locked()
+            self._last_gnss = gnss_time
+
+            if self._host_ref is None:
+                self._host_ref = host_mono
+                self._gnss_ref = gnss_time
+
+            x = host_mono - self._host_ref
+            y = gnss_time - self._gnss_ref
+
+            # 已锁定时剔除残差过大的样本（串口缓冲突发到达时延迟偏大）
+            if len(self._samples) >= self.min_samples:
+                residual = y - (self._intercept + self._slope * x)
+                if abs(residual) > self.max_residual:
+                    self._rejected_in_row += 1
+                    self._total_rejected += 1
+                    # 连续剔除说明模型已失效，重新开始
+                    if self._rejected_in_row >= self.min_samples:
+                        self._reset_locked()
+                    return False
+            self._rejected_in_row = 0
+
+            self._samples.append((x, y))
+            self._sum_x += x
+            self._sum_y += y
+            self._sum_xx += x * x
+            self._sum_xy += x * y
+
+            if len(self._samples) > self.window_size:
+                old_x, old_y = self._samples.popleft()
+                self._sum_x -= old_x
+                self._sum_y -= old_y
+                self._sum_xx -= old_x * old_x
+                self._sum_xy -= old_x * old_y
+
+            self._update_model_locked()
+            return True
+
+    def _update_model_locked(self):
+        """根据累加量更新回归参数"""
+        n = len(self._samples)
+        if n == 1:
+            x, y = self._samples[0]
+            self._slope = 1.0
+            self._intercept = y - x
+            return
+
+        denom = n * self._sum_xx - self._sum_x * self._sum_x
+        # 样本时间跨度太短时斜率不可信，固定斜率为1只估计偏差
+        if denom <= 1e-9 * n * n:
+            self._slope = 1.0
+            self._intercept = (self._sum_y - self._sum_x) / n
+        else:
+            self._slope = (n * self._sum_xy - self._sum_x * self._sum_y) / denom
+            self._intercept = (self._sum_y - self._slope * self._sum_x) / n
+
+        # 残差标准差（窗口最多window_size个样本，直接计算）
+        sq = 0.0
+        for x, y in self._samples:
+            r = y - (self._intercept + self._slope * x)
+            sq += r * r
+        self._residual_std = math.sqrt(sq / n)
+
+    def is_locked(self):
+        """是否已有足够样本给出可信的换算结果"""
+        with self._lock:
+            return len(self._samples) >= self.min_samples
+
+    def to_gnss(self, host_mono):
+        """
+        将主机单调时间换算为GNSS UTC时间
+
+        Args:
+            host_mono (float): time.monotonic()时间
+
+        Returns:
+            float: GNSS UTC纪元秒，尚无同步样本时返回None
+        """
+        with self._lock:
+            if self._host_ref is None:
+                return None
+            x = host_mono - self._host_ref
+            return self._gnss_ref + self._intercept + self._slope * x + self.nmea_latency
+
+    def to_host(self, gnss_time):
+        """
+        将GNSS UTC时间换算为主机单调时间
+
+        Args:
+            gnss_time (float): GNSS UTC纪元秒
+
+        Returns:
+            float: time.monotonic()时间，尚无同步样本时返回None
+        """
+        with self._lock:
+            if self._host_ref is None or self._slope == 0:
+                return None
+            y = gnss_time - self.nmea_latency - self._gnss_ref
+            return self._host_ref + (y - self._intercept) / self._slope
+
+    def now(self):
+        """当前时刻的GNSS时间，未同步时退化为系统时间"""
+        gnss_time = self.to_gnss(time.monotonic())
+        return gnss_time if gnss_time is not None else time.time()
+
+    def get_status(self):
+        """
+        获取同步状态
+
+        Returns:
+            dict: 样本数、是否锁定、时钟漂移(ppm)、残差标准差(ms)和剔除样本数
+        """
+        with self._lock:
+            return {
+                'samples': len(self._samples),
+                'locked': len(self._samples) >= self.min_samples,
+                'drift_ppm': (self._slope - 1.0) * 1e6,
+                'residual_ms': self._residual_std * 1000.0,
+                'rejected': self._total_rejected,
+            }
+
+
+# 进程内共享的时钟同步实例，RTK模块写入样本，采集线程读取换算
+_clock_sync = None
+_clock_sync_lock = threading.Lock()
+
+
+def get_clock_sync():
+    """获取进程内共享的ClockSync实例"""
+    global _clock_sync
+    with _clock_sync_lock:
+        if _clock_sync is None:
+            _clock_sync = ClockSync()
+        return _clock_sync
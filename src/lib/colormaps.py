@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 18:10:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 18:10:00
+FilePath     : \\usbvna\\src\\lib\\colormaps.py
+Description  : B-Scan颜色映射查找表，不依赖matplotlib（导入耗时约0.6秒），按名称缓存
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import numpy as np
+
+# pyqtgraph自带的颜色映射
+_BUNDLED = ('viridis', 'plasma', 'inferno', 'magma', 'cividis')
+
+# matplotlib分段线性颜色映射的各通道控制点 (位置, 值)，数值取自matplotlib._cm
+_SEGMENTS = {
+    'hot': (
+        ((0.0, 0.0416), (0.365079, 1.0), (1.0, 1.0)),
+        ((0.0, 0.0), (0.365079, 0.0), (0.746032, 1.0), (1.0, 1.0)),
+        ((0.0, 0.0), (0.746032, 0.0), (1.0, 1.0)),
+    ),
+    'jet': (
+        ((0.0, 0.0), (0.35, 0.0), (0.66, 1.0), (0.89, 1.0), (1.0, 0.5)),
+        ((0.0, 0.0), (0.125, 0.0), (0.375, 1.0), (0.64, 1.0), (0.91, 0.0), (1.0, 0.0)),
+        ((0.0, 0.5), (0.11, 1.0), (0.34, 1.0), (0.65, 0.0), (1.0, 0.0)),
+    ),
+    'gray': (
+        ((0.0, 0.0), (1.0, 1.0)),
+        ((0.0, 0.0), (1.0, 1.0)),
+        ((0.0, 0.0), (1.0, 1.0)),
+    ),
+}
+
+# 等间距颜色列表定义的映射
+_LISTED = {
+    'seismic': ((0.0, 0.0, 0.3), (0.0, 0.0, 1.0), (1.0, 1.0, 1.0), (1.0, 0.0, 0.0), (0.5, 0.0, 0.0)),
+}
+
+_cache = {}
+
+
+def _build(name):
+    import pyqtgraph as pg
+
+    if name in _BUNDLED:
+        return pg.colormap.get(name)
+    if name in _LISTED:
+        colors = np.asarray(_LISTED[name], dtype=np.float64)
+        pos = np.linspace(0.0, 1.0, len(colors))
+        return pg.ColorMap(pos, (colors * 255).astype(np.uint8))
+    if name in _SEGMENTS:
+        channels = _SEGMENTS[name]
+        pos = np.unique(np.concatenate([[p for p, _ in ch] for ch in channels]))
+        colors = np.stack([np.interp(pos, [p for p, _ in ch], [v for _, v in ch]) for ch in channels], axis=1)
+        return pg.ColorMap(pos, np.round(colors * 255).astype(np.uint8))
+    # 其它名称仍交给matplotlib
+    return pg.colormap.getFromMatplotlib(name)
+
+
+def get_colormap(name):
+    """
+    按名称获取pyqtgraph颜色映射
+
+    Args:
+        name (str): 颜色映射名称，如seismic、jet、viridis
+
+    Returns:
+        pyqtgraph.ColorMap: 颜色映射
+    """
+    cmap = _cache.get(name)
+    if cmap is None:
+        cmap = _build(name)
+        _cache[name] = cmap
+    return cmap
+
+
+def get_lookup_table(name, nPts=512):
+    """获取颜色查找表，供ImageItem.setLookupTable()使用"""
+    key = (name, nPts)
+    lut = _cache.get(key)
+    if lut is None:
+        lut = get_colormap(name).getLookupTable(nPts=nPts)
+        _cache[key] = lut
+    return lut
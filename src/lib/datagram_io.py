@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 13:05:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 22:00:00
+FilePath     : \\usbvna\\src\\lib\\datagram_io.py
+Description  : 批量UDP收发：Linux下用recvmmsg/sendmmsg一次系统调用处理多个数据报，收包写入预分配缓冲池、发包直接引用调用方缓冲区，其它平台自动回退
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import select
+import socket
+import struct
+import sys
+
+import numpy as np
+
+from .logger_config import setup_logger
+
+# 创建日志记录器
+logger = setup_logger("datagram_io", "logs/datagram_io.log", level=10)  # 10对应DEBUG级别
+
+# 默认收发缓冲区：20道/秒 × 数十个分片的突发量，远大于此前写死的65535
+DEFAULT_RCVBUF = 8 << 20
+DEFAULT_SNDBUF = 4 << 20
+
+_MSG_DONTWAIT = getattr(socket, 'MSG_DONTWAIT', 0x40)
+_SOCKADDR_STORAGE = 128
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p), ('iov_len', ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ('msg_name', ctypes.c_void_p),
+        ('msg_namelen', ctypes.c_uint32),
+        ('msg_iov', ctypes.POINTER(_IOVec)),
+        ('msg_iovlen', ctypes.c_size_t),
+        ('msg_control', ctypes.c_void_p),
+        ('msg_controllen', ctypes.c_size_t),
+        ('msg_flags', ctypes.c_int),
+    ]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', _MsgHdr), ('msg_len', ctypes.c_uint)]
+
+
+def _load_mmsg():
+    """加载libc中的recvmmsg/sendmmsg，非Linux或不可用时返回(None, None)"""
+    if not sys.platform.startswith('linux'):
+        return None, None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        recvmmsg = libc.recvmmsg
+        recvmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+        recvmmsg.restype = ctypes.c_int
+        sendmmsg = libc.sendmmsg
+        sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int]
+        sendmmsg.restype = ctypes.c_int
+        return recvmmsg, sendmmsg
+    except (OSError, AttributeError) as e:
+        logger.info(f"recvmmsg/sendmmsg不可用，使用逐包收发: {e}")
+        return None, None
+
+
+_recvmmsg, _sendmmsg = _load_mmsg()
+
+
+def configure_socket_buffers(sock, rcvbuf=None, sndbuf=None):
+    """
+    设置socket收发缓冲区大小
+
+    Args:
+        sock (socket.socket): UDP socket
+        rcvbuf (int, optional): 接收缓冲区字节数
+        sndbuf (int, optional): 发送缓冲区字节数
+
+    Returns:
+        tuple: 实际生效的(接收, 发送)缓冲区大小（Linux会返回设置值的两倍，且受net.core.rmem_max限制）
+    """
+    for opt, size in ((socket.SO_RCVBUF, rcvbuf), (socket.SO_SNDBUF, sndbuf)):
+        if size is None:
+            continue
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, opt, size)
+        except OSError as e:
+            logger.warning(f"设置socket缓冲区{opt}={size}失败: {e}")
+    actual = (sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF),
+              sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF))
+    if rcvbuf and actual[0] < rcvbuf:
+        logger.warning(f"接收缓冲区仅{actual[0]}字节（请求{rcvbuf}），可调大net.core.rmem_max")
+    return actual
+
+
+def _parse_sockaddr(raw, length):
+    """解析内核返回的sockaddr"""
+    if length < 2:
+        return None
+    family = struct.unpack_from('=H', raw, 0)[0]
+    if family == socket.AF_INET:
+        port = struct.unpack_from('!H', raw, 2)[0]
+        return socket.inet_ntop(socket.AF_INET, bytes(raw[4:8])), port
+    if family == socket.AF_INET6:
+        port = struct.unpack_from('!H', raw, 2)[0]
+        return socket.inet_ntop(socket.AF_INET6, bytes(raw[8:24])), port
+    return None
+
+
+def _build_sockaddr_in(addr):
+    """构造IPv4 sockaddr_in，无法解析为IPv4时返回None"""
+    try:
+        ip = socket.inet_aton(socket.gethostbyname(addr[0]))
+    except OSError:
+        return None
+    return struct.pack('=H', socket.AF_INET) + struct.pack('!H', addr[1]) + ip + b'\x00' * 8
+
+
+class BufferPool:
+    """一块连续内存切分成的定长缓冲区，收包直接写入，不为每个数据报分配bytes对象"""
+
+    def __init__(self, count, size):
+        self.count = count
+        self.size = size
+        self.slab = bytearray(count * size)
+        self.view = memoryview(self.slab)
+        base = ctypes.addressof((ctypes.c_char * len(self.slab)).from_buffer(self.slab))
+        self.addresses = [base + i * size for i in range(count)]
+
+    def buffer(self, index, length=None):
+        start = index * self.size
+        return self.view[start:start + (self.size if length is None else length)]
+
+
+class BatchReceiver:
+    """
+    批量收包
+
+    recv_batch()返回的memoryview指向缓冲池，在下一次recv_batch()前有效，需要保留的数据由调用方复制
+    （如TelemetryReceiver会把分片写入自己的重组槽）。
+    """
+
+    def __init__(self, sock, batch_size=64, max_datagram=2048, rcvbuf=DEFAULT_RCVBUF):
+        """
+        Args:
+            sock (socket.socket): 已绑定的UDP socket
+            batch_size (int): 单次最多接收的数据报数
+            max_datagram (int): 单个数据报上限，超出部分被截断
+            rcvbuf (int, optional): 接收缓冲区字节数，None表示不修改
+        """
+        self.sock = sock
+        self.batch_size = batch_size
+        self.pool = BufferPool(batch_size, max_datagram)
+        self.truncated = 0
+        self.syscalls = 0
+        self.datagrams = 0
+        if rcvbuf:
+            configure_socket_buffers(sock, rcvbuf=rcvbuf)
+
+        family = getattr(sock, 'family', None)
+        self._use_mmsg = _recvmmsg is not None and family in (socket.AF_INET, socket.AF_INET6)
+        if self._use_mmsg:
+            self._iov = (_IOVec * batch_size)()
+            self._msgs = (_MMsgHdr * batch_size)()
+            self._names = ctypes.create_string_buffer(_SOCKADDR_STORAGE * batch_size)
+            names_base = ctypes.addressof(self._names)
+            for i in range(batch_size):
+                self._iov[i].iov_base = self.pool.addresses[i]
+                self._iov[i].iov_len = max_datagram
+                hdr = self._msgs[i].msg_hdr
+                hdr.msg_name = names_base + i * _SOCKADDR_STORAGE
+                hdr.msg_iov = ctypes.pointer(self._iov[i])
+                hdr.msg_iovlen = 1
+        self._use_recvmsg_into = hasattr(sock, 'recvmsg_into')
+
+    def _wait(self, timeout):
+        try:
+            readable, _, _ = select.select([self.sock], [], [], timeout)
+        except (OSError, ValueError):
+            return False
+        return bool(readable)
+
+    def recv_batch(self, timeout=None):
+        """
+        接收一批数据报
+
+        Args:
+            timeout (float, optional): 无数据时最长等待时间(秒)，None表示阻塞等待
+
+        Returns:
+            list: [(memoryview, addr), ...]，超时返回空列表
+        """
+        if not self._wait(timeout):
+            return []
+        if self._use_mmsg:
+            return self._recv_mmsg()
+        return self._recv_fallback()
+
+    def _recv_mmsg(self):
+        names_size = _SOCKADDR_STORAGE
+        for i in range(self.batch_size):
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_namelen = names_size
+            hdr.msg_flags = 0
+        n = _recvmmsg(self.sock.fileno(), self._msgs, self.batch_size, _MSG_DONTWAIT, None)
+        self.syscalls += 1
+        if n < 0:
+            err = ctypes.get_errno()
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return []
+            raise OSError(err, errno.errorcode.get(err, 'recvmmsg'))
+        out = []
+        names = memoryview(self._names)
+        for i in range(n):
+            msg = self._msgs[i]
+            if msg.msg_hdr.msg_flags & getattr(socket, 'MSG_TRUNC', 0x20):
+                self.truncated += 1
+            name = names[i * names_size:(i + 1) * names_size]
+            out.append((self.pool.buffer(i, msg.msg_len), _parse_sockaddr(name, msg.msg_hdr.msg_namelen)))
+        self.datagrams += n
+        return out
+
+    def _recv_fallback(self):
+        """逐包非阻塞接收，直到缓冲池用完或socket无数据"""
+        out = []
+        for i in range(self.batch_size):
+            buf = self.pool.buffer(i)
+            try:
+                if self._use_recvmsg_into:
+                    n, _, flags, addr = self.sock.recvmsg_into([buf], 0, _MSG_DONTWAIT)
+                    if flags & getattr(socket, 'MSG_TRUNC', 0x20):
+                        self.truncated += 1
+                elif i == 0:
+                    # Windows不支持MSG_DONTWAIT，第一个包已由select保证可读
+                    n, addr = self.sock.recvfrom_into(buf)
+                else:
+                    if not self._wait(0):
+                        break
+                    n, addr = self.sock.recvfrom_into(buf)
+            except (BlockingIOError, InterruptedError, socket.timeout):
+                break
+            self.syscalls += 1
+            out.append((self.pool.buffer(i, n), addr))
+        self.datagrams += len(out)
+        return out
+
+
+class BatchSender:
+    """
+    批量发包
+
+    每个数据报用一组iovec（如包头+负载切片）直接指向调用方的缓冲区，不做拷贝，一次sendmmsg交给内核；
+    不支持时退回逐包sendmsg/sendto。
+    """
+
+    def __init__(self, sock, addr, batch_size=64, max_datagram=2048, sndbuf=DEFAULT_SNDBUF, max_parts=2):
+        """
+        Args:
+            sock (socket.socket): UDP socket
+            addr (tuple): 目标(ip, port)
+            batch_size (int): 单次系统调用最多发送的数据报数
+            max_datagram (int): 单个数据报上限
+            sndbuf (int, optional): 发送缓冲区字节数，None表示不修改
+            max_parts (int): 单个数据报最多由几段缓冲区组成
+        """
+        self.sock = sock
+        self.addr = addr
+        self.batch_size = batch_size
+        self.max_datagram = max_datagram
+        self.max_parts = max_parts
+        self.syscalls = 0
+        self.datagrams = 0
+        if sndbuf:
+            configure_socket_buffers(sock, sndbuf=sndbuf)
+
+        sockaddr = _build_sockaddr_in(addr) if getattr(sock, 'family', None) == socket.AF_INET else None
+        self._use_mmsg = _sendmmsg is not None and sockaddr is not None
+        if self._use_mmsg:
+            self._sockaddr = ctypes.create_string_buffer(sockaddr, len(sockaddr))
+            self._iov = (_IOVec * (batch_size * max_parts))()
+            self._msgs = (_MMsgHdr * batch_size)()
+            for i in range(batch_size):
+                hdr = self._msgs[i].msg_hdr
+                hdr.msg_name = ctypes.addressof(self._sockaddr)
+                hdr.msg_namelen = len(sockaddr)
+                hdr.msg_iov = ctypes.cast(ctypes.byref(self._iov, i * max_parts * ctypes.sizeof(_IOVec)),
+                                          ctypes.POINTER(_IOVec))
+        self._use_sendmsg = hasattr(sock, 'sendmsg')
+
+    def send(self, datagrams):
+        """
+        发送一组数据报
+
+        Args:
+            datagrams (list): 每个元素为bytes类对象，或由多个bytes类对象组成的列表/元组（分散写，如包头+负载切片）
+
+        Returns:
+            int: 发送的总字节数
+        """
+        if self._use_mmsg:
+            return self._send_mmsg(datagrams)
+        return self._send_fallback(datagrams)
+
+    def _send_mmsg(self, datagrams):
+        total = 0
+        for start in range(0, len(datagrams), self.batch_size):
+            chunk = datagrams[start:start + self.batch_size]
+            # 各段缓冲区的uint8视图，保证sendmmsg返回前iovec所指的内存有效
+            views = []
+            lengths = []
+            for i, parts in enumerate(chunk):
+                if not isinstance(parts, (list, tuple)):
+                    parts = (parts,)
+                if len(parts) > self.max_parts:
+                    raise ValueError(f"数据报最多由{self.max_parts}段组成")
+                length = 0
+                for j, part in enumerate(parts):
+                    view = np.frombuffer(part, dtype=np.uint8)
+                    iov = self._iov[i * self.max_parts + j]
+                    iov.iov_base = view.ctypes.data
+                    iov.iov_len = view.size
+                    views.append(view)
+                    length += view.size
+                if length > self.max_datagram:
+                    raise ValueError(f"数据报超过{self.max_datagram}字节上限")
+                self._msgs[i].msg_hdr.msg_iovlen = len(parts)
+                lengths.append(length)
+            sent = 0
+            while sent < len(chunk):
+                n = _sendmmsg(self.sock.fileno(), ctypes.byref(self._msgs[sent]), len(chunk) - sent, 0)
+                self.syscalls += 1
+                if n < 0:
+                    err = ctypes.get_errno()
+                    if err == errno.EINTR:
+                        continue
+                    raise OSError(err, errno.errorcode.get(err, 'sendmmsg'))
+                total += sum(lengths[sent:sent + n])
+                sent += n
+            self.datagrams += len(chunk)
+        return total
+
+    def _send_fallback(self, datagrams):
+        total = 0
+        for parts in datagrams:
+            if isinstance(parts, (list, tuple)):
+                if self._use_sendmsg:
+                    total += self.sock.sendmsg(list(parts), [], 0, self.addr)
+                else:
+                    total += self.sock.sendto(b''.join(bytes(p) for p in parts), self.addr)
+            else:
+                total += self.sock.sendto(parts, self.addr)
+            self.syscalls += 1
+        self.datagrams += len(datagrams)
+        return total
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 13:50:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 13:50:00
+FilePath     : \\usbvna\\src\\lib\\fec.py
+Description  : A-Scan分片前向纠错：XOR奇偶校验与GF(256)上的Reed-Solomon擦除码（NumPy查表实现），收到任意k个分片即可恢复
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import math
+
+import numpy as np
+
+FEC_NONE = 0
+FEC_XOR = 1
+FEC_RS = 2
+
+# GF(256)本原多项式 x^8 + x^4 + x^3 + x^2 + 1
+_PRIM_POLY = 0x11D
+
+
+def _build_tables():
+    exp = np.zeros(512, dtype=np.uint8)
+    log = np.zeros(256, dtype=np.int32)
+    x = 1
+    for i in range(255):
+        exp[i] = x
+        log[x] = i
+        x <<= 1
+        if x & 0x100:
+            x ^= _PRIM_POLY
+    exp[255:510] = exp[:255]
+    # 乘法表：MUL[a, b] = a*b，64KB，编码时按系数取行再用数据字节索引
+    la = log[:, None] + log[None, :]
+    mul = exp[la % 255].astype(np.uint8)
+    mul[0, :] = 0
+    mul[:, 0] = 0
+    return exp, log, mul
+
+
+GF_EXP, GF_LOG, GF_MUL = _build_tables()
+
+
+def gf_inv(a):
+    """GF(256)求逆"""
+    if a == 0:
+        raise ZeroDivisionError("GF(256)中0没有逆元")
+    return int(GF_EXP[255 - GF_LOG[a]])
+
+
+def cauchy_matrix(k, m):
+    """
+    m×k的Cauchy矩阵 C[j, i] = 1 / (x_j + y_i)，x_j = k + j，y_i = i
+
+    系统码生成矩阵[I; C]的任意k行都可逆，因此收到任意k个分片都能恢复。
+    """
+    if k + m > 256:
+        raise ValueError(f"Reed-Solomon分片总数{k + m}超过256")
+    mat = np.zeros((m, k), dtype=np.uint8)
+    for j in range(m):
+        for i in range(k):
+            mat[j, i] = gf_inv((k + j) ^ i)
+    return mat
+
+
+def gf_matmul(coeffs, rows):
+    """
+    GF(256)矩阵乘法：coeffs (r, k) × rows (k, n) -> (r, n)
+
+    每个系数取乘法表的一行，再以数据字节为下标查表，最后沿k方向异或归约。
+    """
+    products = GF_MUL[coeffs[:, :, None], rows[None, :, :]]
+    return np.bitwise_xor.reduce(products, axis=1)
+
+
+def gf_invert_matrix(mat):
+    """GF(256)上的k×k矩阵求逆（Gauss-Jordan消元，行运算向量化）"""
+    k = mat.shape[0]
+    aug = np.concatenate([mat.astype(np.uint8), np.eye(k, dtype=np.uint8)], axis=1)
+    for col in range(k):
+        pivot = next((r for r in range(col, k) if aug[r, col]), None)
+        if pivot is None:
+            raise ValueError("矩阵不可逆")
+        if pivot != col:
+            aug[[col, pivot]] = aug[[pivot, col]]
+        inv = gf_inv(int(aug[col, col]))
+        aug[col] = GF_MUL[inv][aug[col]]
+        for r in range(k):
+            factor = int(aug[r, col])
+            if r != col and factor:
+                aug[r] ^= GF_MUL[factor][aug[col]]
+    return aug[:, k:]
+
+
+class FecCodec:
+    """
+    分片级擦除纠错编解码
+
+    一道负载切成k个等长数据分片（最后一片补零），追加m个校验分片；XOR方案固定m=1，
+    Reed-Solomon方案的m可配置。接收端收到任意k个分片即可恢复全部数据分片。
+    """
+
+    def __init__(self, scheme=FEC_RS, parity=2, parity_ratio=None, max_parity=32):
+        """
+        Args:
+            scheme (int): FEC_XOR或FEC_RS
+            parity (int): 每道校验分片数（RS方案）
+            parity_ratio (float, optional): 按数据分片数的比例计算校验分片数，向上取整，优先于parity
+            max_parity (int): 校验分片数上限
+        """
+        if scheme not in (FEC_XOR, FEC_RS):
+            raise ValueError(f"未知FEC方案: {scheme}")
+        self.scheme = scheme
+        self.parity = parity
+        self.parity_ratio = parity_ratio
+        self.max_parity = max_parity
+        self._matrices = {}
+
+    def parity_count(self, k):
+        """k个数据分片对应的校验分片数"""
+        if self.scheme == FEC_XOR:
+            return 1
+        m = math.ceil(k * self.parity_ratio) if self.parity_ratio is not None else self.parity
+        return max(1, min(m, self.max_parity, 256 - k))
+
+    def matrix(self, k, m):
+        """校验系数矩阵(m, k)，按(k, m)缓存"""
+        key = (k, m)
+        mat = self._matrices.get(key)
+        if mat is None:
+            mat = coding_matrix(self.scheme, k, m)
+            self._matrices[key] = mat
+        return mat
+
+    def encode(self, stripes, m=None):
+        """
+        计算校验分片
+
+        Args:
+            stripes (np.ndarray): (k, frag_size) uint8数据分片
+            m (int, optional): 校验分片数，默认parity_count(k)
+
+        Returns:
+            np.ndarray: (m, frag_size) uint8校验分片
+        """
+        k = stripes.shape[0]
+        if m is None:
+            m = self.parity_count(k)
+        if self.scheme == FEC_XOR:
+            return np.bitwise_xor.reduce(stripes, axis=0, keepdims=True)
+        return gf_matmul(self.matrix(k, m), stripes)
+
+
+def coding_matrix(scheme, k, m):
+    """校验系数矩阵：XOR为全1行，RS为Cauchy矩阵"""
+    if scheme == FEC_XOR:
+        return np.ones((1, k), dtype=np.uint8)
+    return cauchy_matrix(k, m)
+
+
+_decode_matrices = {}
+
+
+def recover(scheme, k, m, fragments):
+    """
+    由任意k个分片恢复全部数据分片
+
+    Args:
+        scheme (int): FEC_XOR或FEC_RS
+        k (int): 数据分片数
+        m (int): 校验分片数
+        fragments (dict): 分片序号 -> (frag_size,) uint8数组，序号<k为数据分片，>=k为校验分片
+
+    Returns:
+        np.ndarray: (k, frag_size) 数据分片，分片不足时返回None
+    """
+    if len(fragments) < k:
+        return None
+    data_rows = [i for i in range(k) if i in fragments]
+    if len(data_rows) == k:
+        return np.stack([fragments[i] for i in range(k)])
+
+    missing = [i for i in range(k) if i not in fragments]
+    parity_rows = sorted(i for i in fragments if i >= k)[:len(missing)]
+    if len(parity_rows) < len(missing):
+        return None
+    used = data_rows + parity_rows
+
+    # 相同的丢失组合复用逆矩阵
+    key = (scheme, k, m, tuple(used))
+    inverse = _decode_matrices.get(key)
+    if inverse is None:
+        generator = np.concatenate([np.eye(k, dtype=np.uint8), coding_matrix(scheme, k, m)])
+        inverse = gf_invert_matrix(generator[used])
+        if len(_decode_matrices) > 1024:
+            _decode_matrices.clear()
+        _decode_matrices[key] = inverse
+
+    received = np.stack([fragments[i] for i in used])
+    out = np.empty((k, received.shape[1]), dtype=np.uint8)
+    for i in data_rows:
+        out[i] = fragments[i]
+    out[missing] = gf_matmul(inverse[missing], received)
+    return out
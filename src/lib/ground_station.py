@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 15:30:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 22:00:00
+FilePath     : \\usbvna\\src\\lib\\ground_station.py
+Description  : asyncio地面站服务：单个UDP端口按会话ID接收多架无人机的遥测流，各会话独立重组、存储和统计，并通过本地流式接口推送给实时查看端
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import asyncio
+import base64
+import json
+import os
+import time
+
+import numpy as np
+
+from .datagram_io import DEFAULT_RCVBUF, configure_socket_buffers
+from .logger_config import setup_logger
+from .rate_control import FeedbackReporter
+from .telemetry import parse_datagram
+from .telemetry_receiver import TelemetryReceiver
+
+# 创建日志记录器
+logger = setup_logger("ground_station", "logs/ground_station.log", level=10)  # 10对应DEBUG级别
+
+
+class TraceCsvWriter:
+    """
+    单个会话的CSV写入器，与ground_recv_frp的单文件格式一致（Ascan_ID, Message_ID, Sample_1...）
+
+    文件在首次写入时打开并保持打开，按flush_interval定时刷新。UAV端切换抽取档位后道长变化，
+    此时关闭当前文件，改写到{name}_part{n}_{采样点数}pts.csv，保证每个文件的表头与数据列数一致。
+    """
+
+    def __init__(self, file_path, flush_interval=1.0):
+        self.base_path = file_path
+        self.file_path = file_path
+        self.files = []
+        self.flush_interval = flush_interval
+        self.count = 0
+        self.n_samples = 0
+        self._file = None
+        self._last_flush = 0.0
+
+    def _open(self, n_samples):
+        self.close()
+        if self.files:
+            root, ext = os.path.splitext(self.base_path)
+            self.file_path = f"{root}_part{len(self.files) + 1}_{n_samples}pts{ext}"
+            logger.info("Trace length changed to %d at trace %d, continuing in %s",
+                        n_samples, self.count + 1, self.file_path)
+        os.makedirs(os.path.dirname(self.file_path) or '.', exist_ok=True)
+        self._file = open(self.file_path, 'a', encoding='utf-8', newline='', buffering=1 << 20)
+        header = ["Ascan_ID", "Message_ID"] + [f"Sample_{i + 1}" for i in range(n_samples)]
+        self._file.write(",".join(header) + "\n")
+        self.files.append(self.file_path)
+        self.n_samples = n_samples
+
+    def write(self, msg_id, samples):
+        if self._file is None or samples.size != self.n_samples:
+            self._open(samples.size)
+        self.count += 1
+        self._file.write(f"{self.count},{msg_id}," + ",".join(map(str, samples.tolist())) + "\n")
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_interval:
+            self._file.flush()
+            self._last_flush = now
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class GroundSession:
+    """一个UAV会话：来源地址、存储、链路反馈和统计"""
+
+    def __init__(self, session_id, out_dir, addr):
+        self.session_id = session_id
+        self.addr = addr
+        self.started = time.time()
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(self.started))
+        self.writer = TraceCsvWriter(os.path.join(out_dir, f"session_{session_id:08x}_{stamp}.csv"))
+        self.reporter = FeedbackReporter(session_id)
+        self.traces = 0
+        self.gaps = 0
+        self.missing = 0
+        self.bytes = 0
+        self.datagrams = 0
+        self.latency_sum = 0.0
+        self.last_rx = time.monotonic()
+
+    def summary(self, receiver_stats=None):
+        data = {
+            "session": f"{self.session_id:08x}",
+            "addr": f"{self.addr[0]}:{self.addr[1]}" if self.addr else None,
+            "file": self.writer.file_path,
+            "files": self.writer.files,
+            "traces": self.traces,
+            "gaps": self.gaps,
+            "missing": self.missing,
+            "datagrams": self.datagrams,
+            "bytes": self.bytes,
+            "mean_latency_ms": round(self.latency_sum / self.traces * 1000.0, 2) if self.traces else None,
+            "idle_s": round(time.monotonic() - self.last_rx, 1),
+        }
+        if receiver_stats:
+            data["receiver"] = receiver_stats
+        return data
+
+
+class _TelemetryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+
+    def connection_made(self, transport):
+        self.server.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.server.on_datagram(data, addr)
+
+    def error_received(self, exc):
+        logger.warning(f"UDP接收错误: {exc}")
+
+
+class _Viewer:
+    """一个查看端连接，发送队列有界，慢速查看端丢弃最旧的消息而不是拖慢接收"""
+
+    def __init__(self, writer, max_queue=256):
+        self.writer = writer
+        self.queue = asyncio.Queue(max_queue)
+        self.sessions = None
+        self.decimate = 1
+        self.dropped = 0
+
+    def push(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+
+class GroundStationServer:
+    """
+    地面站服务
+
+    UDP端口上的所有数据报交给一个TelemetryReceiver，按包头session_id区分会话；每个会话首次出现时
+    建立GroundSession（独立的CSV文件、反馈统计）。查看端通过本地TCP或Unix socket连接，
+    收发按行分隔的JSON：
+        -> {"cmd": "subscribe", "sessions": ["1a2b3c4d"] | null, "decimate": 1}
+        -> {"cmd": "stats"}
+        <- {"event": "trace", "session": ..., "trace_id": ..., "timestamp": ..., "n": ..., "data": base64(float32)}
+        <- {"event": "gap" | "session" | "stats", ...}
+    """
+
+    def __init__(self, host="0.0.0.0", port=9999, out_dir="ground_data", api_host="127.0.0.1", api_port=8765,
+                 api_unix_path=None, feedback_port=None, feedback_interval=1.0, rcvbuf=DEFAULT_RCVBUF,
+                 max_latency=0.3, fragment_timeout=2.0):
+        """
+        Args:
+            host (str): UDP监听地址
+            port (int): UDP监听端口
+            out_dir (str): 各会话CSV的保存目录
+            api_host (str): 查看端TCP接口地址，None表示不开启
+            api_port (int): 查看端TCP接口端口
+            api_unix_path (str, optional): 查看端Unix socket路径（仅类Unix系统）
+            feedback_port (int, optional): 向各会话来源IP的该端口回传链路反馈，None表示不回传
+            feedback_interval (float): 反馈周期(秒)
+            rcvbuf (int): UDP接收缓冲区大小
+            max_latency (float): 抖动缓冲最大等待(秒)
+            fragment_timeout (float): 未完整道的保留时间(秒)
+        """
+        self.host = host
+        self.port = port
+        self.out_dir = out_dir
+        self.api_host = api_host
+        self.api_port = api_port
+        self.api_unix_path = api_unix_path
+        self.feedback_port = feedback_port
+        self.feedback_interval = feedback_interval
+        self.rcvbuf = rcvbuf
+
+        self.receiver = TelemetryReceiver(on_trace=self._on_trace, on_gap=self._on_gap,
+                                          max_latency=max_latency, fragment_timeout=fragment_timeout)
+        self.sessions = {}
+        self.viewers = set()
+        self.transport = None
+        self.datagrams = 0
+        self.non_telemetry = 0
+        self._servers = []
+        self._tasks = []
+        self._stopped = None
+
+    # ---------- UDP接收 ----------
+    def on_datagram(self, data, addr):
+        self.datagrams += 1
+        receive_wall = time.time()
+        now = time.monotonic()
+        header, payload = parse_datagram(data)
+        if header is None:
+            self.non_telemetry += 1
+            return
+        # 先建立会话，保证该会话的第一道数据放出时已有存储
+        session = self.sessions.get(header.session_id)
+        if session is None:
+            session = GroundSession(header.session_id, self.out_dir, addr)
+            self.sessions[header.session_id] = session
+            logger.info(f"新UAV会话 {header.session_id:08x} 来自 {addr}")
+            self._broadcast({"event": "session", **session.summary()}, header.session_id)
+        session.addr = addr
+        session.last_rx = now
+        session.datagrams += 1
+        session.bytes += len(data)
+        session.reporter.on_datagram(header, now, receive_wall, len(data))
+        self.receiver.feed_fragment(header, payload, now)
+
+    def _on_trace(self, header, samples, receive_time):
+        session = self.sessions.get(header.session_id)
+        if session is None:
+            return
+        session.traces += 1
+        latency = time.time() - header.timestamp_us / 1e6
+        if latency >= 0:
+            session.latency_sum += latency
+        try:
+            session.writer.write(f"{header.session_id:08x}-{header.trace_id}", samples)
+        except OSError as e:
+            logger.error(f"会话{header.session_id:08x}写入失败: {e}")
+        if self.viewers:
+            self._broadcast_trace(header, samples)
+
+    def _on_gap(self, session_id, first_trace_id, count):
+        session = self.sessions.get(session_id)
+        if session is not None:
+            session.gaps += 1
+            session.missing += count
+        self._broadcast({"event": "gap", "session": f"{session_id:08x}", "trace_id": first_trace_id,
+                         "count": count}, session_id)
+
+    async def _housekeeping(self):
+        """推进时间轮/抖动缓冲，并按周期回传反馈"""
+        tick = self.receiver.wheel.tick
+        last_feedback = time.monotonic()
+        while True:
+            await asyncio.sleep(tick)
+            now = time.monotonic()
+            self.receiver.poll(now)
+            if self.feedback_port and self.transport is not None and now - last_feedback >= self.feedback_interval:
+                last_feedback = now
+                stats = self.receiver.get_stats()
+                for session in self.sessions.values():
+                    report = session.reporter.make_report(stats, now)
+                    if report is not None and session.addr:
+                        self.transport.sendto(json.dumps(report).encode("utf-8"),
+                                              (session.addr[0], self.feedback_port))
+
+    # ---------- 查看端接口 ----------
+    def _broadcast(self, message, session_id):
+        if not self.viewers:
+            return
+        line = (json.dumps(message) + "\n").encode("utf-8")
+        sid = f"{session_id:08x}"
+        for viewer in self.viewers:
+            if viewer.sessions is None or sid in viewer.sessions:
+                viewer.push(line)
+
+    def _broadcast_trace(self, header, samples):
+        sid = f"{header.session_id:08x}"
+        cache = {}
+        for viewer in self.viewers:
+            if viewer.sessions is not None and sid not in viewer.sessions:
+                continue
+            # 同一抽取倍数只编码一次
+            line = cache.get(viewer.decimate)
+            if line is None:
+                data = np.ascontiguousarray(samples[::viewer.decimate], dtype='<f4')
+                line = (json.dumps({
+                    "event": "trace", "session": sid, "trace_id": header.trace_id,
+                    "timestamp": header.timestamp_us / 1e6, "n": int(data.size),
+                    "data": base64.b64encode(data.tobytes()).decode("ascii"),
+                }) + "\n").encode("utf-8")
+                cache[viewer.decimate] = line
+            viewer.push(line)
+
+    def get_stats(self):
+        receiver_stats = self.receiver.get_stats()
+        return {
+            "event": "stats",
+            "datagrams": self.datagrams,
+            "non_telemetry": self.non_telemetry,
+            "viewers": len(self.viewers),
+            "sessions": [s.summary(receiver_stats.get(sid)) for sid, s in self.sessions.items()],
+        }
+
+    async def _handle_viewer(self, reader, writer):
+        viewer = _Viewer(writer)
+        self.viewers.add(viewer)
+        peer = writer.get_extra_info("peername")
+        logger.info(f"查看端已连接: {peer}")
+        sender = asyncio.ensure_future(self._viewer_sender(viewer))
+        viewer.push((json.dumps(self.get_stats()) + "\n").encode("utf-8"))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    cmd = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                name = cmd.get("cmd")
+                if name == "subscribe":
+                    sessions = cmd.get("sessions")
+                    viewer.sessions = set(sessions) if sessions else None
+                    viewer.decimate = max(1, int(cmd.get("decimate", 1)))
+                elif name == "stats":
+                    viewer.push((json.dumps(self.get_stats()) + "\n").encode("utf-8"))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.viewers.discard(viewer)
+            sender.cancel()
+            writer.close()
+            logger.info(f"查看端已断开: {peer}，丢弃消息{viewer.dropped}条")
+
+    async def _viewer_sender(self, viewer):
+        try:
+            while True:
+                line = await viewer.queue.get()
+                viewer.writer.write(line)
+                await viewer.writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    # ---------- 生命周期 ----------
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(lambda: _TelemetryProtocol(self),
+                                                           local_addr=(self.host, self.port))
+        sock = transport.get_extra_info("socket")
+        if sock is not None and self.rcvbuf:
+            configure_socket_buffers(sock, rcvbuf=self.rcvbuf)
+        logger.info(f"地面站UDP监听 {self.host}:{self.port}，数据保存至 {os.path.abspath(self.out_dir)}")
+
+        if self.api_host:
+            server = await asyncio.start_server(self._handle_viewer, self.api_host, self.api_port)
+            self._servers.append(server)
+            logger.info(f"查看端TCP接口 {self.api_host}:{self.api_port}")
+        if self.api_unix_path and hasattr(asyncio, "start_unix_server"):
+            if os.path.exists(self.api_unix_path):
+                os.unlink(self.api_unix_path)
+            server = await asyncio.start_unix_server(self._handle_viewer, self.api_unix_path)
+            self._servers.append(server)
+            logger.info(f"查看端Unix接口 {self.api_unix_path}")
+
+        self._tasks.append(asyncio.ensure_future(self._housekeeping()))
+        self._stopped = asyncio.Event()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+        # 先断开查看端，让各连接处理协程正常退出
+        for viewer in list(self.viewers):
+            viewer.writer.close()
+        await asyncio.sleep(0)
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers.clear()
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+        self.receiver.flush()
+        for session in self.sessions.values():
+            session.writer.close()
+        if self.api_unix_path and os.path.exists(self.api_unix_path):
+            os.unlink(self.api_unix_path)
+        if self._stopped is not None:
+            self._stopped.set()
+        logger.info("地面站已停止")
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self._stopped.wait()
+        finally:
+            if self.transport is not None:
+                await self.stop()
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 20:00:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 20:20:00
+FilePath     : \\usbvna\\src\\lib\\instrument_state.py
+Description  : 仪器配置快照：用复合查询一次读出频率、点数、中频带宽、时域变换、时间门和数据格式等设置，
+               保存为JSON配置文件；重新下发时与当前状态比较，只把变化的设置拼成一条命令写入
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import json
+import math
+import os
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from .logger_config import setup_logger
+
+logger = setup_logger("instrument_state", "logs/instrument_state.log", level=10)  # 10对应DEBUG级别
+
+PROFILE_VERSION = 1
+
+# key: 配置文件中的名称；header: SCPI命令头，{ch}为通道号、{meas}为测量编号；kind: 取值类型
+StateParam = namedtuple('StateParam', ['key', 'header', 'kind'])
+
+# 下发时按此顺序写入：先扫描设置再变换和时间门，避免仪器按旧频率范围钳位时域参数
+STATE_PARAMS = (
+    StateParam('freq_start', ':SENS{ch}:FREQ:STAR', 'float'),
+    StateParam('freq_stop', ':SENS{ch}:FREQ:STOP', 'float'),
+    StateParam('points', ':SENS{ch}:SWE:POIN', 'int'),
+    StateParam('if_bandwidth', ':SENS{ch}:BWID', 'float'),
+    StateParam('source_power', ':SOUR{ch}:POW', 'float'),
+    StateParam('averaging', ':SENS{ch}:AVER', 'bool'),
+    StateParam('average_count', ':SENS{ch}:AVER:COUN', 'int'),
+    StateParam('parameter', ':CALC{ch}:MEAS{meas}:PAR', 'qstr'),
+    StateParam('display_format', ':CALC{ch}:MEAS{meas}:FORM', 'enum'),
+    StateParam('transform', ':CALC{ch}:MEAS{meas}:TRAN:TIME:STAT', 'bool'),
+    StateParam('transform_type', ':CALC{ch}:MEAS{meas}:TRAN:TIME:TYPE', 'enum'),
+    StateParam('transform_stimulus', ':CALC{ch}:MEAS{meas}:TRAN:TIME:STIM', 'enum'),
+    StateParam('transform_start', ':CALC{ch}:MEAS{meas}:TRAN:TIME:STAR', 'float'),
+    StateParam('transform_stop', ':CALC{ch}:MEAS{meas}:TRAN:TIME:STOP', 'float'),
+    StateParam('gate', ':CALC{ch}:MEAS{meas}:FILT:TIME:STAT', 'bool'),
+    StateParam('gate_start', ':CALC{ch}:MEAS{meas}:FILT:TIME:STAR', 'float'),
+    StateParam('gate_stop', ':CALC{ch}:MEAS{meas}:FILT:TIME:STOP', 'float'),
+    StateParam('data_format', ':FORM:DATA', 'enum'),
+)
+
+
+def parse_value(kind, text):
+    """把查询响应文本转换为配置值"""
+    text = text.strip()
+    if kind == 'float':
+        return float(text)
+    if kind == 'int':
+        return int(float(text))
+    if kind == 'bool':
+        return text.upper() in ('1', '+1', 'ON')
+    if kind == 'qstr':
+        return text.strip('"')
+    # 枚举去掉数字前的正号，如FORM:DATA?返回的REAL,+32
+    return text.upper().replace('+', '').replace(' ', '')
+
+
+def format_value(kind, value):
+    """把配置值转换为设置命令的参数"""
+    if kind == 'float':
+        return f"{value:.12g}"
+    if kind == 'int':
+        return str(int(value))
+    if kind == 'bool':
+        return '1' if value else '0'
+    if kind == 'qstr':
+        return f'"{value}"'
+    return str(value)
+
+
+def values_equal(kind, a, b):
+    if kind == 'float':
+        return math.isclose(float(a), float(b), rel_tol=1e-9, abs_tol=1e-18)
+    return a == b
+
+
+def save_profile(file_path, settings, **metadata):
+    """
+    保存配置文件
+
+    Args:
+        file_path (str): JSON文件路径
+        settings (dict): capture()得到的设置
+        **metadata: 附加信息（如idn、channel、measurement）
+    """
+    profile = {'version': PROFILE_VERSION, 'captured_at': datetime.now().isoformat(timespec='seconds')}
+    profile.update(metadata)
+    profile['settings'] = settings
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2, ensure_ascii=False)
+
+
+def load_profile(file_path):
+    """
+    读取配置文件
+
+    Returns:
+        dict: 设置，版本不兼容时抛出ValueError
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        profile = json.load(f)
+    if profile.get('version') != PROFILE_VERSION:
+        raise ValueError(f"不支持的配置文件版本: {profile.get('version')}")
+    return profile['settings']
+
+
+class InstrumentStateManager:
+    """
+    仪器配置的读取与下发
+
+    capture()把参数表按batch_size拼成复合查询，每批一次往返；apply()只写入与当前状态不同的设置，
+    全部变化连同*OPC?拼成一条消息。最近一次读取或下发后的状态缓存在cached中。
+    """
+
+    def __init__(self, vna_controller, channel=1, measurement=1, params=STATE_PARAMS, batch_size=12):
+        """
+        Args:
+            vna_controller (VNAController): 已打开设备的控制器
+            channel (int): 通道号
+            measurement (int): 测量编号
+            params (tuple): 参数表
+            batch_size (int): 每条复合查询包含的参数数，过长的查询部分仪器固件会拒绝
+        """
+        self.vna_controller = vna_controller
+        self.channel = channel
+        self.measurement = measurement
+        self.params = params
+        self.batch_size = batch_size
+        self.cached = None
+
+    def header(self, param):
+        return param.header.format(ch=self.channel, meas=self.measurement)
+
+    def capture(self):
+        """
+        读取当前设置
+
+        Returns:
+            dict: 参数名 -> 值，仪器不支持的参数不出现在结果中；会话不可用时返回None
+        """
+        start = time.monotonic()
+        settings = {}
+        for i in range(0, len(self.params), self.batch_size):
+            batch = self.params[i:i + self.batch_size]
+            parts = self.vna_controller.query_batch([self.header(p) + "?" for p in batch])
+            if parts is None:
+                return None
+            if len(parts) != len(batch):
+                # 某条查询不被支持时响应会缺项，逐条重读以定位
+                logger.warning("Compound state query returned %d of %d values, querying one by one",
+                               len(parts), len(batch))
+                parts = [self.vna_controller.query(self.header(p) + "?") for p in batch]
+            for param, text in zip(batch, parts):
+                if text is None:
+                    continue
+                try:
+                    settings[param.key] = parse_value(param.kind, text)
+                except ValueError:
+                    logger.warning("Unexpected response for %s: %r", param.key, text)
+        self.cached = dict(settings)
+        logger.debug("Captured %d settings in %.0f ms", len(settings), (time.monotonic() - start) * 1000.0)
+        return settings
+
+    def diff(self, current, target):
+        """
+        Returns:
+            list: target中与current不同（或current缺少）的参数，按参数表顺序
+        """
+        changed = []
+        for param in self.params:
+            if param.key not in target:
+                continue
+            if param.key in current and values_equal(param.kind, current[param.key], target[param.key]):
+                continue
+            changed.append(param)
+        return changed
+
+    def apply(self, settings, use_cache=False):
+        """
+        下发设置
+
+        Args:
+            settings (dict): 目标设置
+            use_cache (bool): 与缓存的状态比较而不重新读取，仅在确定仪器状态未被他人改动时使用
+
+        Returns:
+            list: 实际写入的参数名，写入失败时返回None
+        """
+        current = self.cached if use_cache and self.cached is not None else self.capture()
+        changed = self.diff(current or {}, settings)
+        if not changed:
+            logger.debug("Instrument state already matches profile")
+            return []
+        # 设置命令与*OPC?合并为一条消息，一次往返完成写入和同步
+        with self.vna_controller.batch() as batch:
+            for p in changed:
+                batch.write(f"{self.header(p)} {format_value(p.kind, settings[p.key])}")
+            batch.query("*OPC?")
+        if not batch.ok:
+            self.cached = None
+            return None
+        self.cached = dict(current or {})
+        self.cached.update({p.key: settings[p.key] for p in changed})
+        keys = [p.key for p in changed]
+        logger.info("Applied %d changed settings: %s", len(keys), ", ".join(keys))
+        return keys
+
+    def snapshot(self, path, file_prefix):
+        """
+        读取当前设置并保存为{prefix}_state.json，与采集数据放在一起
+
+        Returns:
+            dict: 设置，读取失败时返回None
+        """
+        settings = self.capture()
+        if settings is None:
+            return None
+        try:
+            save_profile(os.path.join(path, f"{file_prefix}_state.json"), settings,
+                         idn=(self.vna_controller.check_instrument_info() or '').strip(),
+                         channel=self.channel, measurement=self.measurement)
+        except OSError as e:
+            # 快照写入失败不影响采集流程
+            logger.error(f"Error saving state snapshot: {e}")
+        return settings
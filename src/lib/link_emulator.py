@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 16:10:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 16:10:00
+FilePath     : \\usbvna\\src\\lib\\link_emulator.py
+Description  : 本机回环链路仿真：在UAV发送端与地面接收端之间注入丢包（含突发）、乱序、重复、时延、抖动和带宽限制
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import heapq
+import random
+import select
+import socket
+import threading
+import time
+from collections import namedtuple
+
+from .logger_config import setup_logger
+
+# 创建日志记录器
+logger = setup_logger("link_emulator", "logs/link_emulator.log", level=10)  # 10对应DEBUG级别
+
+# loss: 平均丢包率；burst: 平均突发丢包长度（>1时使用Gilbert-Elliott两状态模型）
+# reorder: 乱序概率，被选中的包额外延迟reorder_delay；duplicate: 重复概率
+# delay/jitter: 单程基础时延与抖动标准差(秒)；bandwidth_kbps: 带宽上限，0为不限
+# queue_limit: 发送队列最大排队时延(秒)，超出时尾部丢弃
+LinkProfile = namedtuple('LinkProfile', [
+    'loss', 'burst', 'reorder', 'reorder_delay', 'duplicate', 'delay', 'jitter', 'bandwidth_kbps', 'queue_limit'
+], defaults=(0.0, 1.0, 0.0, 0.02, 0.0, 0.0, 0.0, 0, 1.0))
+
+# 常用链路条件
+PROFILES = {
+    'ideal': LinkProfile(),
+    'lte_good': LinkProfile(loss=0.01, burst=1.5, reorder=0.005, duplicate=0.001, delay=0.04, jitter=0.01,
+                            bandwidth_kbps=8000),
+    'lte_poor': LinkProfile(loss=0.03, burst=3.0, reorder=0.02, duplicate=0.002, delay=0.08, jitter=0.03,
+                            bandwidth_kbps=2000),
+    'radio': LinkProfile(loss=0.05, burst=4.0, reorder=0.0, duplicate=0.0, delay=0.01, jitter=0.005,
+                         bandwidth_kbps=500),
+}
+
+
+class LinkModel:
+    """
+    链路模型：对每个数据报给出投递时刻列表（空列表表示丢弃），不涉及socket，便于离线复现
+
+    同一seed下结果完全确定。
+    """
+
+    def __init__(self, profile=None, seed=None):
+        self.profile = profile or LinkProfile()
+        self.rng = random.Random(seed)
+        self._bad = False
+        self._link_free = 0.0
+        self.stats = {'in': 0, 'out': 0, 'lost': 0, 'queue_drop': 0, 'reordered': 0, 'duplicated': 0, 'bytes': 0}
+
+    def _lost(self):
+        p = self.profile
+        if p.loss <= 0:
+            return False
+        if p.burst <= 1.0:
+            return self.rng.random() < p.loss
+        # Gilbert-Elliott：坏状态全丢、好状态不丢，平均突发长度burst，平均丢包率loss
+        p_bg = 1.0 / p.burst
+        p_gb = p.loss * p_bg / max(1e-9, 1.0 - p.loss)
+        if self._bad:
+            if self.rng.random() < p_bg:
+                self._bad = False
+        elif self.rng.random() < p_gb:
+            self._bad = True
+        return self._bad
+
+    def schedule(self, size, now):
+        """
+        Args:
+            size (int): 数据报字节数
+            now (float): 到达时刻
+
+        Returns:
+            list: 投递时刻列表
+        """
+        p = self.profile
+        self.stats['in'] += 1
+        if self._lost():
+            self.stats['lost'] += 1
+            return []
+
+        # 带宽限制：按串行化时间排队，排队过长时尾部丢弃
+        depart = now
+        if p.bandwidth_kbps:
+            start = max(now, self._link_free)
+            if start - now > p.queue_limit:
+                self.stats['queue_drop'] += 1
+                return []
+            depart = start + size * 8.0 / (p.bandwidth_kbps * 1000.0)
+            self._link_free = depart
+
+        copies = 2 if p.duplicate and self.rng.random() < p.duplicate else 1
+        if copies > 1:
+            self.stats['duplicated'] += 1
+        times = []
+        for _ in range(copies):
+            t = depart + p.delay
+            if p.jitter:
+                t += abs(self.rng.gauss(0.0, p.jitter))
+            if p.reorder and self.rng.random() < p.reorder:
+                t += p.reorder_delay
+                self.stats['reordered'] += 1
+            times.append(t)
+        self.stats['out'] += len(times)
+        self.stats['bytes'] += size * len(times)
+        return times
+
+
+class LinkEmulator:
+    """
+    UDP回环链路仿真代理
+
+    发送端把数据发到listen_addr，代理按LinkModel排程后转发到forward_addr；反方向（地面端回传的
+    控制/反馈报文）原样转发回最近一次的发送端地址，不做损伤。
+    """
+
+    def __init__(self, forward_addr, profile=None, listen_addr=("127.0.0.1", 0), seed=None):
+        """
+        Args:
+            forward_addr (tuple): 地面接收端地址
+            profile (LinkProfile | str, optional): 链路条件或PROFILES中的名称
+            listen_addr (tuple): 代理监听地址，端口0表示自动分配
+            seed (int, optional): 随机种子
+        """
+        if isinstance(profile, str):
+            profile = PROFILES[profile]
+        self.model = LinkModel(profile, seed)
+        self.forward_addr = forward_addr
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(listen_addr)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 << 20)
+        self.listen_addr = self.sock.getsockname()
+        self._heap = []
+        self._seq = 0
+        self._uplink_src = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def stats(self):
+        return self.model.stats
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="LinkEmulator", daemon=True)
+        self._thread.start()
+        logger.info(f"链路仿真 {self.listen_addr} -> {self.forward_addr} {self.model.profile}")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        self.sock.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            # 投递到期的数据报
+            while self._heap and self._heap[0][0] <= now:
+                _, _, data = heapq.heappop(self._heap)
+                try:
+                    self.sock.sendto(data, self.forward_addr)
+                except OSError as e:
+                    logger.warning(f"转发失败: {e}")
+            timeout = 0.05
+            if self._heap:
+                timeout = max(0.0, min(timeout, self._heap[0][0] - time.monotonic()))
+            try:
+                readable, _, _ = select.select([self.sock], [], [], timeout)
+            except (OSError, ValueError):
+                break
+            if not readable:
+                continue
+            # 一次取完已到达的数据报
+            while True:
+                try:
+                    data, addr = self.sock.recvfrom(65535)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError:
+                    return
+                arrival = time.monotonic()
+                if addr == self.forward_addr:
+                    # 反向报文直接回送发送端
+                    if self._uplink_src is not None:
+                        self.sock.sendto(data, self._uplink_src)
+                else:
+                    self._uplink_src = addr
+                    for t in self.model.schedule(len(data), arrival):
+                        self._seq += 1
+                        heapq.heappush(self._heap, (t, self._seq, data))
+                if not select.select([self.sock], [], [], 0)[0]:
+                    break
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 19:00:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 19:00:00
+FilePath     : \\usbvna\\src\\lib\\log_view.py
+Description  : 运行状态日志视图：定长环形缓冲的列表模型+等高行QListView，定时批量追加，按级别过滤
+               每条消息的开销与会话时长无关，可在任意线程调用log()
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+from collections import deque
+from datetime import datetime
+
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, QSortFilterProxyModel, Qt, QTimer
+from PyQt6.QtGui import QColor
+from PyQt6.QtWidgets import QHBoxLayout, QListView, QVBoxLayout, QWidget
+from qfluentwidgets import CaptionLabel, ComboBox, PushButton, FluentIcon as FIF
+
+# 日志级别
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+
+LEVEL_FILTERS = [('全部', DEBUG), ('信息及以上', INFO), ('警告及以上', WARNING), ('仅错误', ERROR)]
+
+LEVEL_COLORS = {
+    WARNING: QColor(202, 128, 0),
+    ERROR: QColor(209, 52, 56),
+}
+
+# 未指定级别时按关键字推断
+_ERROR_KEYWORDS = ('失败', '错误', '出错', '异常')
+_WARNING_KEYWORDS = ('警告', '未发现', '超时', '丢弃', '重试')
+
+
+def infer_level(message):
+    """根据消息内容推断日志级别"""
+    if any(keyword in message for keyword in _ERROR_KEYWORDS):
+        return ERROR
+    if any(keyword in message for keyword in _WARNING_KEYWORDS):
+        return WARNING
+    return INFO
+
+
+class RingLogModel(QAbstractListModel):
+    """
+    定长环形缓冲的日志模型
+
+    记录保存在预分配的列表中，第row行对应下标(head + row) % capacity；
+    缓冲满时先移除最旧的若干行再追加，单次批量追加只产生一次删除和一次插入通知。
+    """
+
+    LevelRole = Qt.ItemDataRole.UserRole + 1
+
+    def __init__(self, capacity=5000, parent=None):
+        super().__init__(parent)
+        self.capacity = capacity
+        self._records = [None] * capacity
+        self._head = 0
+        self._count = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._count
+
+    def record(self, row):
+        """第row行的记录(时间戳, 级别, 消息)"""
+        return self._records[(self._head + row) % self.capacity]
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= self._count:
+            return None
+        timestamp, level, message = self.record(index.row())
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"[{timestamp}] {message}"
+        if role == Qt.ItemDataRole.ForegroundRole:
+            return LEVEL_COLORS.get(level)
+        if role == self.LevelRole:
+            return level
+        return None
+
+    def extend(self, records):
+        """
+        批量追加记录
+
+        Args:
+            records (list): (时间戳, 级别, 消息)列表
+        """
+        if not records:
+            return
+        if len(records) > self.capacity:
+            records = records[-self.capacity:]
+        overflow = self._count + len(records) - self.capacity
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for row in range(overflow):
+                self._records[(self._head + row) % self.capacity] = None
+            self._head = (self._head + overflow) % self.capacity
+            self._count -= overflow
+            self.endRemoveRows()
+        first = self._count
+        self.beginInsertRows(QModelIndex(), first, first + len(records) - 1)
+        for offset, item in enumerate(records):
+            self._records[(self._head + first + offset) % self.capacity] = item
+        self._count += len(records)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._records = [None] * self.capacity
+        self._head = 0
+        self._count = 0
+        self.endResetModel()
+
+    def to_text(self):
+        """导出全部记录为文本"""
+        lines = []
+        for row in range(self._count):
+            timestamp, _, message = self.record(row)
+            lines.append(f"[{timestamp}] {message}")
+        return "\n".join(lines)
+
+
+class LevelFilterProxy(QSortFilterProxyModel):
+    """按最低级别过滤日志"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.min_level = DEBUG
+
+    def set_min_level(self, level):
+        self.min_level = level
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if self.min_level <= DEBUG:
+            return True
+        return self.sourceModel().record(source_row)[1] >= self.min_level
+
+
+class LogView(QWidget):
+    """运行状态日志视图"""
+
+    def __init__(self, parent=None, capacity=5000, flush_interval=100):
+        """
+        Args:
+            capacity (int): 保留的最大日志条数
+            flush_interval (int): 批量刷新间隔(毫秒)
+        """
+        super().__init__(parent)
+        # 待显示的记录，log()可在任意线程调用，deque的append/popleft是线程安全的
+        self._pending = deque(maxlen=capacity)
+
+        self.model = RingLogModel(capacity, self)
+        self.proxy = LevelFilterProxy(self)
+        self.proxy.setSourceModel(self.model)
+
+        self.list_view = QListView()
+        self.list_view.setModel(self.proxy)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setEditTriggers(QListView.EditTrigger.NoEditTriggers)
+        self.list_view.setSelectionMode(QListView.SelectionMode.ExtendedSelection)
+        self.list_view.setVerticalScrollMode(QListView.ScrollMode.ScrollPerPixel)
+        self.list_view.setMinimumHeight(100)
+
+        # 级别过滤和清空
+        toolbar = QHBoxLayout()
+        toolbar.setContentsMargins(0, 0, 0, 0)
+        toolbar.addWidget(CaptionLabel('显示级别:'))
+        self.level_combo = ComboBox()
+        self.level_combo.addItems([name for name, _ in LEVEL_FILTERS])
+        self.level_combo.setCurrentIndex(1)
+        self.level_combo.currentIndexChanged.connect(self.on_level_changed)
+        toolbar.addWidget(self.level_combo)
+        toolbar.addStretch()
+        self.clear_button = PushButton('清空', icon=FIF.DELETE)
+        self.clear_button.clicked.connect(self.clear)
+        toolbar.addWidget(self.clear_button)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(5)
+        layout.addLayout(toolbar)
+        layout.addWidget(self.list_view)
+
+        self.set_dark_theme(False)
+        self.on_level_changed(self.level_combo.currentIndex())
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(flush_interval)
+        self._timer.timeout.connect(self.flush)
+        self._timer.start()
+
+    def log(self, message, level=None):
+        """
+        添加一条日志，实际显示在下一次定时刷新时进行
+
+        Args:
+            message (str): 消息
+            level (int, optional): 级别，默认按内容推断
+        """
+        if level is None:
+            level = infer_level(message)
+        self._pending.append((datetime.now().strftime("%H:%M:%S:%f"), level, message))
+
+    def flush(self):
+        """把待显示记录一次性追加到模型；视图原本停在底部时保持跟随最新记录"""
+        if not self._pending:
+            return
+        batch = []
+        try:
+            while True:
+                batch.append(self._pending.popleft())
+        except IndexError:
+            pass
+        scroll_bar = self.list_view.verticalScrollBar()
+        follow = scroll_bar.value() >= scroll_bar.maximum()
+        self.model.extend(batch)
+        if follow:
+            self.list_view.scrollToBottom()
+
+    def clear(self):
+        self._pending.clear()
+        self.model.clear()
+
+    def on_level_changed(self, index):
+        self.proxy.set_min_level(LEVEL_FILTERS[index][1])
+        self.list_view.scrollToBottom()
+
+    def set_dark_theme(self, dark):
+        """切换深色/浅色样式"""
+        if dark:
+            border, background, color = '#333', '#222', '#fff'
+        else:
+            border, background, color = '#e0e0e0', '#f8f9fa', '#000'
+        self.list_view.setStyleSheet(f"""
+            QListView {{
+                border: 1px solid {border};
+                border-radius: 6px;
+                padding: 8px;
+                background-color: {background};
+                color: {color};
+                font-family: 'Microsoft YaHei';
+                font-size: 9pt;
+            }}
+            QListView:hover {{
+                border-color: #0078d4;
+            }}
+        """)
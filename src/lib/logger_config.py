@@ -3,61 +3,230 @@
 Author       : Linn
 Date         : 2025-07-28 17:30:00
 LastEditors  : Linn
-LastEditTime : 2025-07-28 17:30:00
+LastEditTime : 2026-10-19 17:50:00
 FilePath     : \\usbvna\\src\\lib\\logger_config.py
 Description  : 日志配置模块，提供统一的日志配置功能
+               各模块的日志记录器只挂一个非阻塞的队列处理器，格式化和控制台/文件写入由后台线程完成；
+               热路径日志可按模块限速，长响应内容用truncate()延迟截断
 
 Copyright (c) 2025 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
 """
 
+import atexit
 import logging
 import colorlog
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# 后台写日志队列长度上限，写入跟不上时丢弃新记录而不阻塞调用线程
+LOG_QUEUE_SIZE = 10000
+# 单条日志消息的默认最大长度
+MAX_MESSAGE_LENGTH = 2000
+
+
+class truncate:
+    """
+    延迟截断的日志参数，只有日志级别启用、消息真正被格式化时才转换为字符串
+
+    用法: logger.debug("Response received: %s", truncate(response))
+    """
+
+    __slots__ = ('value', 'limit')
+
+    def __init__(self, value, limit=200):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self):
+        text = self.value if isinstance(self.value, str) else str(self.value)
+        if len(text) <= self.limit:
+            return text
+        return f"{text[:self.limit]}...(共{len(text)}字符)"
+
+    __repr__ = __str__
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """
+    队列处理器：在调用线程中只合并消息参数（并截断过长消息），不做时间格式化和I/O
+
+    队列满时丢弃记录并计数，不阻塞采集线程。
+    """
+
+    def __init__(self, log_queue, max_length=MAX_MESSAGE_LENGTH):
+        super().__init__(log_queue)
+        self.max_length = max_length
+        self.dropped = 0
+
+    def prepare(self, record):
+        msg = record.getMessage()
+        if self.max_length and len(msg) > self.max_length:
+            msg = f"{msg[:self.max_length]}...(共{len(msg)}字符)"
+        record.msg = msg
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _RoutingHandler(logging.Handler):
+    """后台线程中的分发处理器：所有记录输出到控制台，再按记录器名称写入各自的日志文件"""
+
+    def __init__(self, console_handler):
+        super().__init__()
+        self.console_handler = console_handler
+        self.file_handlers = {}
+
+    def handle(self, record):
+        if record.levelno >= self.console_handler.level:
+            self.console_handler.handle(record)
+        file_handler = self.file_handlers.get(record.name)
+        if file_handler is not None and record.levelno >= file_handler.level:
+            file_handler.handle(record)
+        return True
+
+    def close(self):
+        self.console_handler.close()
+        for handler in self.file_handlers.values():
+            handler.close()
+        super().close()
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    令牌桶限速过滤器，用于采集循环等热路径中的日志
+
+    超出速率的记录被丢弃，下一条放行的记录附带被抑制的条数；WARNING及以上级别不受限。
+    """
+
+    def __init__(self, rate, burst=None, min_level=logging.WARNING):
+        """
+        Args:
+            rate (float): 每秒放行的记录数
+            burst (int, optional): 突发上限，默认等于rate
+            min_level (int): 不受限速影响的最低级别
+        """
+        super().__init__()
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self.min_level = min_level
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record):
+        if record.levelno >= self.min_level:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens < 1.0:
+                self.suppressed += 1
+                return False
+            self._tokens -= 1.0
+            suppressed, self.suppressed = self.suppressed, 0
+        if suppressed:
+            record.msg = f"{record.msg} [已抑制{suppressed}条]"
+        return True
+
+
+_log_queue = queue.Queue(LOG_QUEUE_SIZE)
+_router = None
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def _get_router():
+    """首次调用时创建控制台处理器并启动后台日志线程"""
+    global _router, _listener
+    with _listener_lock:
+        if _router is None:
+            # 创建彩色控制台处理器
+            console_handler = colorlog.StreamHandler()
+            console_handler.setLevel(logging.INFO)
+
+            # 设置彩色日志格式
+            console_formatter = colorlog.ColoredFormatter(
+                "%(log_color)s%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+                log_colors={
+                    'DEBUG': 'cyan',
+                    'INFO': 'green',
+                    'WARNING': 'yellow',
+                    'ERROR': 'red',
+                    'CRITICAL': 'red,bg_white',
+                }
+            )
+            console_handler.setFormatter(console_formatter)
+
+            _router = _RoutingHandler(console_handler)
+            _listener = QueueListener(_log_queue, _router)
+            _listener.start()
+            atexit.register(shutdown_logging)
+        return _router
+
+
+def shutdown_logging():
+    """停止后台日志线程，写完队列中剩余的记录并关闭文件"""
+    global _router, _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        if _router is not None:
+            _router.close()
+            _router = None
+
+
+def set_rate_limit(name, rate, burst=None, min_level=logging.WARNING):
+    """
+    为指定模块的日志记录器设置限速
+
+    Args:
+        name (str): 日志记录器名称（setup_logger的name）
+        rate (float): 每秒放行的记录数，None表示取消限速
+        burst (int, optional): 突发上限
+        min_level (int): 不受限速影响的最低级别
+    """
+    logger = logging.getLogger(name)
+    for existing in [f for f in logger.filters if isinstance(f, RateLimitFilter)]:
+        logger.removeFilter(existing)
+    if rate is not None:
+        logger.addFilter(RateLimitFilter(rate, burst, min_level))
 
 
 def setup_logger(name, log_file=None, level=logging.INFO, max_bytes=10*1024*1024, backup_count=5):
     """
     配置并返回一个日志记录器
-    
+
     Args:
         name (str): 日志记录器名称
         log_file (str, optional): 日志文件路径，默认为None
         level (int): 日志级别，默认为INFO
         max_bytes (int): 单个日志文件的最大字节数，默认为10MB
         backup_count (int): 保留的备份日志文件数量，默认为5个
-    
+
     Returns:
         logging.Logger: 配置好的日志记录器
     """
     # 创建日志记录器
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    
+
     # 避免重复添加处理器
     if logger.handlers:
         return logger
-    
-    # 创建彩色控制台处理器
-    console_handler = colorlog.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    
-    # 设置彩色日志格式
-    console_formatter = colorlog.ColoredFormatter(
-        "%(log_color)s%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        log_colors={
-            'DEBUG': 'cyan',
-            'INFO': 'green',
-            'WARNING': 'yellow',
-            'ERROR': 'red',
-            'CRITICAL': 'red,bg_white',
-        }
-    )
-    console_handler.setFormatter(console_formatter)
-    
-    # 将控制台处理器添加到日志记录器
-    logger.addHandler(console_handler)
-    
+
+    router = _get_router()
+
     # 如果指定了日志文件，则添加文件处理器
     if log_file:
         # 确保日志文件目录存在
@@ -70,21 +239,22 @@ def setup_logger(name, log_file=None, level=logging.INFO, max_bytes=10*1024*1024
             log_file = os.path.join(log_dir, os.path.basename(log_file))
         else:
             log_dir = os.path.dirname(log_file)
-        
+
         if log_dir and not os.path.exists(log_dir):
             os.makedirs(log_dir, exist_ok=True)
-            
-        # 创建轮转文件处理器
+
+        # 创建轮转文件处理器，由后台线程写入
         file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count)
         file_handler.setLevel(logging.DEBUG)
-        
+
         # 设置日志格式
         file_formatter = logging.Formatter(
             "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
         )
         file_handler.setFormatter(file_formatter)
-        
-        # 将文件处理器添加到日志记录器
-        logger.addHandler(file_handler)
-    
-    return logger
\ No newline at end of file
+        router.file_handlers[name] = file_handler
+
+    # 记录器只挂队列处理器，调用线程不做I/O
+    logger.addHandler(_NonBlockingQueueHandler(_log_queue))
+
+    return logger
@@ -3,7 +3,7 @@
 Author       : Linn
 Date         : 2026-01-12 22:04:03
 LastEditors  : Linn
-LastEditTime : 2026-01-17 20:10:00
+LastEditTime : 2026-10-19 22:10:00
 FilePath     : \\usbvna\\src\\lib\\main_window.py
 Description  : 主窗口类，包含VNA控制器GUI界面
 
@@ -12,14 +12,15 @@ Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
 
 import os
 import sys
+import time
 # 将src目录添加到Python路径中
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from PyQt6.QtWidgets import (
-    QVBoxLayout, QHBoxLayout, QWidget, QGroupBox, QLabel, QTextEdit, QStackedWidget,
+    QApplication, QVBoxLayout, QHBoxLayout, QWidget, QGroupBox, QLabel, QStackedWidget,
     QFileDialog  # 添加文件对话框和滚动区域支持
 )
-from PyQt6.QtCore import Qt, QSize, QFileInfo, QEventLoop, QTimer, QThread, pyqtSignal, QRectF
+from PyQt6.QtCore import Qt, QSize, QFileInfo, QTimer, QThread, pyqtSignal, QRectF
 from PyQt6.QtGui import QFont, QIcon
 
 # 导入PyQt6-Fluent-Widgets组件
@@ -35,12 +36,19 @@ from datetime import datetime
 
 # 导入自定义模块
 from .logger_config import setup_logger
-from .vna_controller import VNAController
 from .rtk_module import RTKModule
 from .workers import (DataDumpWorker, ContinuousDumpWorker, PointDumpWorker, SinglePointDumpWorker)
 from .rtk_status import RTKStatusBar
-
-import pyqtgraph as pg
+from .sensor_hub import SensorHub, altimeter_from_env
+from .metrics import get_metrics
+from .metrics_panel import MetricsPanel
+from .colormaps import get_lookup_table
+from .log_view import LogView
+from .raw_capture import RAW_MODE
+from .stream_journal import DURABILITY_GROUP, DURABILITY_NONE, DURABILITY_TRACE
+from .trace_fields import FDATA, channel, channel_names, parse_measurements
+from .startup_profile import get_startup_profiler
+# NOTE: pyvisa和pyqtgraph导入耗时较长，在首次使用处导入，避免拖慢启动
 
 # NOTE: 创建日志记录器
 logger = setup_logger("vna_window", "logs/vna_window.log", level=10)  # 10对应DEBUG级别
@@ -49,6 +57,8 @@ class VNAControllerGUI(FluentWindow):
     def __init__(self):
         """初始化VNA控制器GUI界面"""
         super().__init__()
+        self.profiler = get_startup_profiler()
+        self.profiler.mark('window_base')
 
         # 初始化VNA控制器为None，稍后再初始化
         self.status_group = None
@@ -58,6 +68,8 @@ class VNAControllerGUI(FluentWindow):
         self.point_mode_page = None
         self.vna_controller = None
         self.device_connected = False
+        # 采集链路分阶段时延统计
+        self.metrics = get_metrics()
 
         # 初始化各种工作线程
         self.fixed_worker = None  # 定次采集工作线程
@@ -103,7 +115,7 @@ class VNAControllerGUI(FluentWindow):
         self.fixed_start_button = None  # 定次开始按钮
         self.continuous_start_button = None  # 连续开始按钮
         self.continuous_stop_button = None  # 连续停止按钮
-        self.status_text_edit = None  # 状态信息文本框
+        self.status_log_view = None  # 运行状态日志视图
         self.progress_bar = None  # 进度条
 
         # RTK相关组件
@@ -120,13 +132,18 @@ class VNAControllerGUI(FluentWindow):
         self.rtk_storage_frequency = 2  # 默认经纬度高程采样存储频率为2Hz
         self.rtk_data_storage_enabled = True  # 添加RTK数据存储开关，默认开启
         
-        # 存储最近的RTK数据
-        self.latest_rtk_gga_data = {}
-        self.latest_rtk_rmc_data = {}
-        self.latest_rtk_gsa_data = {}
+        # RTK状态由定时器按固定频率从模块拉取最新快照，不占用事件队列
+        self.rtk_refresh_interval = 250  # 4Hz
+        self.rtk_refresh_timer = None
+        self._rtk_state_seq = -1
         
         # 系统定时器，用于更新系统时间
         self.system_timer = None
+
+        # 多传感器协调器：RTK启用期间由其读取RTK串口，连续采集时将VNA道、RTK定位和激光测距写入同一同步会话文件
+        self.sensor_hub = None
+        self.altimeter_source = None
+        self.session_file_switch = None
         
         # 当前采集模式，默认为点测模式
         self.current_mode = "point"
@@ -146,12 +163,10 @@ class VNAControllerGUI(FluentWindow):
         # 居中显示窗口
         self.center_window()
 
-        # 在创建其他子页面前先显示主页面
+        # 在创建其他子页面前先显示主页面和启动页面，界面创建完成后立即隐藏启动页面
         self.show()
-        # 启动页面
         self.welcomeInterface()
-        # 隐藏启动界面
-        self.splashScreen.finish()
+        self.profiler.mark('splash_shown')
 
         # 创建主界面
         self.homeInterface = QWidget()
@@ -166,6 +181,11 @@ class VNAControllerGUI(FluentWindow):
         self.system_timer.timeout.connect(self.update_system_time)
         self.system_timer.start(1000)  # 每秒更新一次
 
+        # RTK状态刷新定时器，启用RTK后开始
+        self.rtk_refresh_timer = QTimer(self)
+        self.rtk_refresh_timer.setInterval(self.rtk_refresh_interval)
+        self.rtk_refresh_timer.timeout.connect(self.update_rtk_data)
+
         # 创建主水平布局
         main_h_layout = QHBoxLayout(self.homeInterface)
         main_h_layout.setSpacing(self.spacing)
@@ -310,6 +330,21 @@ class VNAControllerGUI(FluentWindow):
 
         # 初始化数据获取方式控件状态
         self.on_data_acquisition_mode_changed()
+        self.profiler.mark('ui_built')
+
+        # 隐藏启动界面
+        self.splashScreen.finish()
+
+        # 图表和串口扫描等耗时初始化在窗口显示后进行
+        QTimer.singleShot(0, self.deferred_init)
+
+    def deferred_init(self):
+        """窗口显示后的延迟初始化：创建A-Scan/B-Scan图表，后台扫描RTK串口"""
+        self.build_ascan_plot()
+        self.build_bscan_plot()
+        self.profiler.mark('plots_built')
+        self.start_rtk_port_scan(notify=False)
+        self.profiler.mark('deferred_init')
 
     def on_data_acquisition_mode_changed(self, index=None):
         """当数据获取方式改变时调用"""
@@ -319,9 +354,13 @@ class VNAControllerGUI(FluentWindow):
         else:
             mode_text = self.data_acquisition_combo.itemText(index)
         
+        # 主机端时域变换参数仅在原始复数数据方式下使用
+        if hasattr(self, 'transform_settings_widget'):
+            self.transform_settings_widget.setEnabled(mode_text == RAW_MODE)
+
         # 根据数据获取方式启用/禁用相关控件
-        if mode_text == "实时数据流方式":
-            # 实时数据流方式：只启用文件前缀和间隔控件
+        if mode_text in ("实时数据流方式", RAW_MODE):
+            # 实时数据流方式（含原始复数数据方式）：只启用文件前缀和间隔控件
             self.data_type_combo.setEnabled(False)
             self.scope_combo.setEnabled(False)
             self.format_combo.setEnabled(False)
@@ -362,6 +401,8 @@ class VNAControllerGUI(FluentWindow):
 
     def on_theme_changed(self, theme):
         """当主题改变时调用"""        
+        import pyqtgraph as pg
+
         # 更新应用程序主题
         if theme == '深色主题':
             # 设置深色主题
@@ -397,22 +438,9 @@ class VNAControllerGUI(FluentWindow):
                 if hasattr(self, 'bscan_cbar'):
                     self.bscan_cbar.setLabel('right', color='w')
             
-            # 更新状态文本框样式
-            if hasattr(self, 'status_text_edit'):
-                self.status_text_edit.setStyleSheet("""
-                    QTextEdit { 
-                        border: 1px solid #333; 
-                        border-radius: 6px; 
-                        padding: 8px; 
-                        background-color: #222;
-                        color: #fff;
-                        font-family: 'Microsoft YaHei';
-                        font-size: 9pt;
-                    }
-                    QTextEdit:hover {
-                        border-color: #0078d4;
-                    }
-                """)
+            # 更新运行状态日志样式
+            if self.status_log_view is not None:
+                self.status_log_view.set_dark_theme(True)
         else:  # 浅色主题
             # 设置浅色主题
             setTheme(Theme.LIGHT)
@@ -447,22 +475,9 @@ class VNAControllerGUI(FluentWindow):
                 if hasattr(self, 'bscan_cbar'):
                     self.bscan_cbar.setLabel('right', color='k')
             
-            # 更新状态文本框样式
-            if hasattr(self, 'status_text_edit'):
-                self.status_text_edit.setStyleSheet("""
-                    QTextEdit { 
-                        border: 1px solid #e0e0e0; 
-                        border-radius: 6px; 
-                        padding: 8px; 
-                        background-color: #f8f9fa;
-                        color: #000;
-                        font-family: 'Microsoft YaHei';
-                        font-size: 9pt;
-                    }
-                    QTextEdit:hover {
-                        border-color: #0078d4;
-                    }
-                """)
+            # 更新运行状态日志样式
+            if self.status_log_view is not None:
+                self.status_log_view.set_dark_theme(False)
         
         self.log_message(f"主题已切换到: {theme}")
         info_bar = InfoBar.warning(
@@ -478,14 +493,10 @@ class VNAControllerGUI(FluentWindow):
 
     def on_bscan_colormap_changed(self, colormap_name):
         """当B-Scan颜色映射改变时调用"""
-        import pyqtgraph as pg
-        
         if hasattr(self, 'bscan_img'):
             try:
-                # 获取新的颜色映射
-                cmap = pg.colormap.getFromMatplotlib(colormap_name)
                 # 更新颜色查找表
-                self.bscan_img.setLookupTable(cmap.getLookupTable())
+                self.bscan_img.setLookupTable(get_lookup_table(colormap_name))
                 self.log_message(f"B-Scan颜色映射已更新为: {colormap_name}")
                 
                 # 显示信息提示
@@ -515,9 +526,8 @@ class VNAControllerGUI(FluentWindow):
         self.move(x, y)
 
     def welcomeInterface(self):
-        loop = QEventLoop(self)
-        QTimer.singleShot(1000, loop.quit)
-        loop.exec()
+        # 处理一次事件循环使启动页面绘制出来，不再固定等待
+        QApplication.processEvents()
 
     def initNavigation(self):
         self.addSubInterface(self.homeInterface, FIF.HOME, '主页')
@@ -562,8 +572,8 @@ class VNAControllerGUI(FluentWindow):
         rtk_control_layout = QHBoxLayout()
         rtk_port_label = CaptionLabel('RTK串口:')
         self.rtk_port_combo = ComboBox()
-        # 获取可用的串口列表
-        self.refresh_rtk_ports()
+        # 可用串口列表在窗口显示后由后台线程扫描
+        self._rtk_port_thread = None
         
         rtk_refresh_button = PushButton('刷新', icon=FIF.SYNC)
         rtk_refresh_button.clicked.connect(self.refresh_rtk_ports)
@@ -632,11 +642,11 @@ class VNAControllerGUI(FluentWindow):
         
         # 添加标题和内容
         title_label = CaptionLabel("数据获取方式")
-        content_label = BodyLabel("选择A-Scan数据的获取和存储方式")
+        content_label = BodyLabel("选择A-Scan数据的获取和存储方式；原始复数数据方式保存SDATA并在本机做时域变换")
         
         # 添加ComboBox
         self.data_acquisition_combo = ComboBox()
-        self.data_acquisition_combo.addItems(['A-Scan分散存储', '实时数据流方式'])
+        self.data_acquisition_combo.addItems(['A-Scan分散存储', '实时数据流方式', RAW_MODE])
         self.data_acquisition_combo.setCurrentIndex(1)  # 默认使用实时数据流方式
         self.data_acquisition_combo.currentIndexChanged.connect(self.on_data_acquisition_mode_changed)
         self.data_acquisition_combo.setMinimumWidth(200)
@@ -646,6 +656,77 @@ class VNAControllerGUI(FluentWindow):
         data_acquisition_layout.addWidget(self.data_acquisition_combo)
         
         acquisition_layout.addWidget(data_acquisition_widget)
+
+        # 实时数据流方式读取的测量编号，多个测量一次往返读出
+        measurement_layout = QHBoxLayout()
+        measurement_label = CaptionLabel('实时数据流读取的测量编号(如 1 或 1,2 或 1,2:SDATA):')
+        self.measurement_line_edit = LineEdit()
+        self.measurement_line_edit.setText('1')
+        self.measurement_line_edit.setMinimumWidth(150)
+        measurement_layout.addWidget(measurement_label)
+        measurement_layout.addWidget(self.measurement_line_edit)
+        measurement_layout.addStretch()
+        acquisition_layout.addLayout(measurement_layout)
+
+        # 原始复数数据方式的主机端时域变换参数
+        self.transform_settings_widget = QWidget()
+        transform_layout = QHBoxLayout(self.transform_settings_widget)
+        transform_layout.setContentsMargins(0, 0, 0, 0)
+        self.transform_window_combo = ComboBox()
+        self.transform_window_combo.addItems(['Kaiser', 'Hann', '矩形'])
+        self.transform_pad_spin = SpinBox()
+        self.transform_pad_spin.setRange(1, 16)
+        self.transform_pad_spin.setValue(4)
+        self.transform_band_low_spin = DoubleSpinBox()
+        self.transform_band_high_spin = DoubleSpinBox()
+        for spin in (self.transform_band_low_spin, self.transform_band_high_spin):
+            spin.setRange(0.0, 50000.0)
+            spin.setDecimals(1)
+            spin.setValue(0.0)
+        transform_layout.addWidget(CaptionLabel('主机端时域变换 窗函数:'))
+        transform_layout.addWidget(self.transform_window_combo)
+        transform_layout.addWidget(CaptionLabel('补零倍数:'))
+        transform_layout.addWidget(self.transform_pad_spin)
+        transform_layout.addWidget(CaptionLabel('频带(MHz，上限为0时使用全频带):'))
+        transform_layout.addWidget(self.transform_band_low_spin)
+        transform_layout.addWidget(self.transform_band_high_spin)
+        transform_layout.addStretch()
+        acquisition_layout.addWidget(self.transform_settings_widget)
+
+        # 实时数据流CSV的落盘策略：fsync越频繁，断电时丢失的道越少，但每道的存储耗时越高
+        journal_layout = QHBoxLayout()
+        self.durability_combo = ComboBox()
+        self.durability_combo.addItems(['分组落盘', '逐道落盘', '不强制落盘'])
+        self.durability_combo.currentTextChanged.connect(
+            lambda text: self.sync_group_widget.setEnabled(text == '分组落盘'))
+        self.sync_interval_spin = SpinBox()
+        self.sync_interval_spin.setRange(10, 10000)
+        self.sync_interval_spin.setValue(200)
+        self.sync_traces_spin = SpinBox()
+        self.sync_traces_spin.setRange(1, 1000)
+        self.sync_traces_spin.setValue(50)
+        self.sync_group_widget = QWidget()
+        sync_group_layout = QHBoxLayout(self.sync_group_widget)
+        sync_group_layout.setContentsMargins(0, 0, 0, 0)
+        sync_group_layout.addWidget(CaptionLabel('每(毫秒):'))
+        sync_group_layout.addWidget(self.sync_interval_spin)
+        sync_group_layout.addWidget(CaptionLabel('或每(道):'))
+        sync_group_layout.addWidget(self.sync_traces_spin)
+        journal_layout.addWidget(CaptionLabel('实时数据流文件落盘策略:'))
+        journal_layout.addWidget(self.durability_combo)
+        journal_layout.addWidget(self.sync_group_widget)
+        journal_layout.addStretch()
+        acquisition_layout.addLayout(journal_layout)
+
+        # 同步会话文件设置
+        session_file_layout = QHBoxLayout()
+        session_file_label = CaptionLabel('连续采集时写入同步会话文件(VNA+RTK):')
+        self.session_file_switch = SwitchButton()
+        self.session_file_switch.setChecked(False)
+        session_file_layout.addWidget(session_file_label)
+        session_file_layout.addWidget(self.session_file_switch)
+        session_file_layout.addStretch()
+        acquisition_layout.addLayout(session_file_layout)
         
         setup_content_layout.addWidget(acquisition_card)
         
@@ -685,18 +766,23 @@ class VNAControllerGUI(FluentWindow):
         # 将滚动区域添加到设置界面
         setup_layout.addWidget(setup_scroll_area)
         
+        # 添加性能指标界面
+        self.metricsInterface = MetricsPanel(metrics=self.metrics)
+        self.addSubInterface(self.metricsInterface, FIF.SPEED_HIGH, '性能指标')
+
         # 添加设置界面到导航栏
         self.addSubInterface(self.setupInterface, FIF.SETTING, '设置')
 
-    def log_message(self, message):
-        """在状态文本框中添加日志消息"""
-        if hasattr(self, 'status_text_edit') and self.status_text_edit is not None:
-            timestamp = datetime.now().strftime("%H:%M:%S:%f")
-            self.status_text_edit.append(f"[{timestamp}] {message}")
-            # 滚动到底部
-            self.status_text_edit.verticalScrollBar().setValue(
-                self.status_text_edit.verticalScrollBar().maximum()
-            )
+    def log_message(self, message, level=None):
+        """
+        在运行状态日志中添加消息，可在任意线程调用
+
+        Args:
+            message (str): 消息
+            level (int, optional): 日志级别(logging级别数值)，默认按消息内容推断
+        """
+        if self.status_log_view is not None:
+            self.status_log_view.log(message, level)
 
     def create_control_section(self):
         """创建设备控制区域"""
@@ -763,26 +849,70 @@ class VNAControllerGUI(FluentWindow):
             parent=self
         )
         info_bar.show()
-        
+        self.start_rtk_port_scan(notify=True)
+
+    def start_rtk_port_scan(self, notify=True):
+        """
+        在后台线程中枚举串口，避免阻塞界面
+
+        Args:
+            notify (bool): 扫描完成后是否弹出提示
+        """
+        if self._rtk_port_thread is not None and self._rtk_port_thread.isRunning():
+            return
+
+        class PortScanThread(QThread):
+            finished_scan = pyqtSignal(list, str)  # 串口列表，错误信息
+
+            def run(self):
+                try:
+                    self.finished_scan.emit(RTKModule.list_available_ports(), "")
+                except Exception as e:
+                    self.finished_scan.emit([], str(e))
+
+        self._rtk_port_thread = PortScanThread(self)
+        self._rtk_port_thread.finished_scan.connect(
+            lambda ports, error: self.on_rtk_ports_scanned(ports, error, notify))
+        self._rtk_port_thread.start()
+
+    def on_rtk_ports_scanned(self, available_ports, error, notify=True):
+        """串口扫描完成后更新下拉框"""
         # 保存当前选择的串口（如果存在）
         current_port = self.rtk_port_combo.currentText() if self.rtk_port_combo.count() > 0 else None
         
         # 清空现有列表
         self.rtk_port_combo.clear()
         
-        try:
-            # 获取可用的串口列表
-            available_ports = RTKModule.list_available_ports()
-            if available_ports:
-                self.rtk_port_combo.addItems(available_ports)
-                # 尝试恢复之前选择的串口，如果不存在则选择第一个
-                if current_port and current_port in available_ports:
-                    self.rtk_port_combo.setCurrentText(current_port)
-                else:
-                    self.rtk_port_combo.setCurrentText(available_ports[0])
-                self.log_message(f"发现 {len(available_ports)} 个可用串口")
-                
-                # 显示成功的InfoBar
+        if error:
+            error_message = f"刷新RTK串口列表失败: {error}"
+            self.log_message(error_message)
+            # 出错时使用模拟数据
+            self.rtk_port_combo.addItems(['COM11'])
+            self.rtk_port_combo.setCurrentText('COM11')
+            
+            # 显示错误的InfoBar
+            if notify:
+                error_info_bar = InfoBar.error(
+                    title='刷新失败',
+                    content=error_message,
+                    orient='horizontal',
+                    isClosable=True,
+                    position=InfoBarPosition.TOP,
+                    duration=3000,
+                    parent=self
+                )
+                error_info_bar.show()
+        elif available_ports:
+            self.rtk_port_combo.addItems(available_ports)
+            # 尝试恢复之前选择的串口，如果不存在则选择第一个
+            if current_port and current_port in available_ports:
+                self.rtk_port_combo.setCurrentText(current_port)
+            else:
+                self.rtk_port_combo.setCurrentText(available_ports[0])
+            self.log_message(f"发现 {len(available_ports)} 个可用串口")
+            
+            # 显示成功的InfoBar
+            if notify:
                 success_info_bar = InfoBar.success(
                     title='刷新成功',
                     content=f'发现 {len(available_ports)} 个可用串口',
@@ -793,13 +923,14 @@ class VNAControllerGUI(FluentWindow):
                     parent=self
                 )
                 success_info_bar.show()
-            else:
-                # 如果没有检测到串口，则留空并提示
-                common_ports = ['No Available Serial Port']
-                self.rtk_port_combo.addItems(common_ports)
-                self.log_message("未发现可用串口，使用默认串口列表")
-                
-                # 显示警告的InfoBar
+        else:
+            # 如果没有检测到串口，则留空并提示
+            common_ports = ['No Available Serial Port']
+            self.rtk_port_combo.addItems(common_ports)
+            self.log_message("未发现可用串口，使用默认串口列表")
+            
+            # 显示警告的InfoBar
+            if notify:
                 warning_info_bar = InfoBar.warning(
                     title='未发现串口',
                     content='未发现可用串口，使用默认串口列表',
@@ -810,25 +941,6 @@ class VNAControllerGUI(FluentWindow):
                     parent=self
                 )
                 warning_info_bar.show()
-        except Exception as e:
-            error_message = f"刷新RTK串口列表失败: {str(e)}"
-            self.log_message(error_message)
-            # 出错时使用模拟数据
-            self.rtk_port_combo.clear()
-            self.rtk_port_combo.addItems(['COM11'])
-            self.rtk_port_combo.setCurrentText('COM11')
-            
-            # 显示错误的InfoBar
-            error_info_bar = InfoBar.error(
-                title='刷新失败',
-                content=error_message,
-                orient='horizontal',
-                isClosable=True,
-                position=InfoBarPosition.TOP,
-                duration=3000,
-                parent=self
-            )
-            error_info_bar.show()
 
     def create_data_config_section(self):
         """创建数据采集配置区域"""
@@ -1102,25 +1214,9 @@ class VNAControllerGUI(FluentWindow):
         self.status_title.setFont(QFont('Microsoft YaHei', 10, QFont.Weight.Bold))
         status_group_layout.addWidget(self.status_title)
 
-        # 状态文本框 - 使用更现代的样式
-        self.status_text_edit = QTextEdit()
-        self.status_text_edit.setMinimumHeight(100)
-        self.status_text_edit.setReadOnly(True)
-        # 使用更美观的样式，匹配 qfluentwidgets 风格
-        self.status_text_edit.setStyleSheet("""
-            QTextEdit { 
-                border: 1px solid #e0e0e0; 
-                border-radius: 6px; 
-                padding: 8px; 
-                background-color: #f8f9fa;
-                font-family: 'Microsoft YaHei';
-                font-size: 9pt;
-            }
-            QTextEdit:hover {
-                border-color: #0078d4;
-            }
-        """)
-        status_group_layout.addWidget(self.status_text_edit)
+        # 运行状态日志：定长环形缓冲，定时批量刷新，可按级别过滤
+        self.status_log_view = LogView(capacity=5000)
+        status_group_layout.addWidget(self.status_log_view)
 
         # 进度条
         self.progress_bar = ProgressBar()
@@ -1141,8 +1237,8 @@ class VNAControllerGUI(FluentWindow):
         # 显示/隐藏运行状态
         if hasattr(self, 'status_title'):
             self.status_title.setVisible(self.status_checkbox.isChecked())
-        if hasattr(self, 'status_text_edit'):
-            self.status_text_edit.setVisible(self.status_checkbox.isChecked())
+        if self.status_log_view is not None:
+            self.status_log_view.setVisible(self.status_checkbox.isChecked())
         if hasattr(self, 'progress_bar'):
             self.progress_bar.setVisible(self.status_checkbox.isChecked())
 
@@ -1210,14 +1306,13 @@ class VNAControllerGUI(FluentWindow):
                         # 更新RTK模块实例
                         self.parent.rtk_module = RTKModule(port=self.selected_port, baudrate=self.selected_baudrate)
                         
-                        # 先连接信号再启动模块，确保不会错过任何数据
-                        self.parent.rtk_module.rtk_data_updated.connect(self.parent.update_rtk_data)
+                        # 先连接信号再启动模块，确保不会错过任何错误信息
                         self.parent.rtk_module.rtk_error_occurred.connect(self.parent.handle_rtk_error)
                         self.parent.rtk_module.rtk_module_info_received.connect(self.parent.display_rtk_module_info)
 
                         # 启动RTK模块
                         if self.parent.rtk_module.connect():
-                            if self.parent.rtk_module.start():
+                            if self.parent.rtk_module.start(sensor_hub=self.parent.ensure_sensor_hub()):
                                 self.parent.rtk_enabled = True
                                 
                                 # 如果RTK数据存储已启用，则设置数据文件
@@ -1237,13 +1332,14 @@ class VNAControllerGUI(FluentWindow):
                                 self.success.emit(self.selected_port, str(self.selected_baudrate))
                             else:
                                 # 启动失败，清理资源
-                                self.parent.rtk_module.rtk_data_updated.disconnect()
+                                if self.parent.sensor_hub and not self.parent.sensor_hub.session_open:
+                                    self.parent.sensor_hub.stop()
+                                    self.parent.sensor_hub = None
                                 self.parent.rtk_module.rtk_error_occurred.disconnect()
                                 self.parent.rtk_module.rtk_module_info_received.disconnect()
                                 self.failure.emit("启动RTK模块失败")
                         else:
                             # 连接失败，清理资源
-                            self.parent.rtk_module.rtk_data_updated.disconnect()
                             self.parent.rtk_module.rtk_error_occurred.disconnect()
                             self.parent.rtk_module.rtk_module_info_received.disconnect()
                             self.failure.emit("连接RTK模块失败")
@@ -1289,13 +1385,17 @@ class VNAControllerGUI(FluentWindow):
                         if self.parent.rtk_module:
                             self.parent.rtk_module.disconnect()
                             try:
-                                self.parent.rtk_module.rtk_data_updated.disconnect()
                                 self.parent.rtk_module.rtk_error_occurred.disconnect()
                                 self.parent.rtk_module.rtk_module_info_received.disconnect()
                             except TypeError:
                                 # 如果信号未连接就断开，会抛出TypeError，忽略即可
                                 pass
                             self.parent.rtk_enabled = False
+                            # 没有同步会话时协调器不再需要
+                            hub = self.parent.sensor_hub
+                            if hub and not hub.session_open:
+                                hub.stop()
+                                self.parent.sensor_hub = None
                             port = self.parent.rtk_port_combo.currentText()
                             self.parent.log_message(f"RTK模块已禁用 (串口: {port})")
                             
@@ -1317,6 +1417,8 @@ class VNAControllerGUI(FluentWindow):
     def on_rtk_enable_success(self, port, baudrate):
         """RTK模块启用成功后的处理"""
         self.log_message("RTK模块已启用")
+        self._rtk_state_seq = -1
+        self.rtk_refresh_timer.start()
         InfoBar.success(
             title='RTK模块',
             content=f'RTK模块已在 {port} 上启用，波特率: {baudrate}',
@@ -1343,6 +1445,7 @@ class VNAControllerGUI(FluentWindow):
     
     def on_rtk_disable_finished(self):
         """RTK模块禁用完成后的处理"""
+        self.rtk_refresh_timer.stop()
         # 重新启用开关
         self.rtk_enable_switch.setEnabled(True)
         # 显示信息
@@ -1399,27 +1502,17 @@ class VNAControllerGUI(FluentWindow):
             self.rtk_module.set_storage_frequency(frequency)
         self.log_message(f"RTK存储频率已设置为: {frequency}Hz")
 
-    def update_rtk_data(self, data):
-        """更新RTK数据"""
-        # 根据数据类型更新不同的RTK数据
-        if 'type' in data:
-            data_type = data['type']
-            if data_type == 'GGA':
-                self.latest_rtk_gga_data = data
-            elif data_type == 'RMC':
-                self.latest_rtk_rmc_data = data
-            elif data_type == 'GSA':
-                self.latest_rtk_gsa_data = data
-        
-        # 更新RTK状态栏
-        if self.rtk_status_bar:
-            # 合并所有RTK数据
-            combined_data = {}
-            combined_data.update(self.latest_rtk_gga_data)
-            combined_data.update(self.latest_rtk_rmc_data)
-            combined_data.update(self.latest_rtk_gsa_data)
-            # 更新显示
-            self.rtk_status_bar.update_display(combined_data)
+    def update_rtk_data(self):
+        """定时拉取RTK最新状态快照并刷新状态栏，无新数据时跳过"""
+        rtk_module = self.rtk_module
+        if rtk_module is None or not self.rtk_status_bar:
+            return
+        seq, state = rtk_module.latest_state()
+        if seq == self._rtk_state_seq:
+            return
+        self._rtk_state_seq = seq
+        self.rtk_status_bar.update_display(state)
+        self.rtk_status_bar.update_history(rtk_module.history())
 
     def handle_rtk_error(self, error_message):
         """处理RTK错误"""
@@ -1443,9 +1536,7 @@ class VNAControllerGUI(FluentWindow):
         self.rtk_status_bar = RTKStatusBar()
 
     def create_ascan_display(self):
-        """创建A-Scan实时显示区域"""
-        import pyqtgraph as pg
-        
+        """创建A-Scan实时显示区域，图表在窗口显示后由build_ascan_plot()创建"""
         # 创建A-Scan显示组
         self.ascan_display_group = CardWidget()
         ascan_layout = QVBoxLayout(self.ascan_display_group)
@@ -1456,7 +1547,43 @@ class VNAControllerGUI(FluentWindow):
         ascan_title = SubtitleLabel('A-Scan实时显示')
         ascan_title.setFont(QFont('Microsoft YaHei', 10, QFont.Weight.Bold))
         ascan_layout.addWidget(ascan_title)
+        self._ascan_layout = ascan_layout
         
+        # 添加控制选项
+        control_layout = QHBoxLayout()
+        
+        # 抽样显示选项
+        self.sampling_checkbox = CheckBox('抽样显示')
+        self.sampling_checkbox.setChecked(False)
+        
+        # 抽样间隔
+        self.sampling_spinbox = SpinBox()
+        self.sampling_spinbox.setRange(1, 100)
+        self.sampling_spinbox.setValue(10)
+        self.sampling_spinbox.setMinimumWidth(80)
+        
+        control_layout.addWidget(self.sampling_checkbox)
+        control_layout.addWidget(CaptionLabel('抽样间隔:'))
+        control_layout.addWidget(self.sampling_spinbox)
+
+        # 多测量时选择B-Scan显示的通道，A-Scan叠加显示全部通道
+        self.display_channel_combo = ComboBox()
+        self.display_channel_combo.addItem('M1')
+        self.display_channel_combo.setEnabled(False)
+        self.display_channel_combo.setMinimumWidth(100)
+        self.display_channel_combo.currentTextChanged.connect(self.on_display_channel_changed)
+        self.display_channels = []
+        self.ascan_overlay_curves = []
+        control_layout.addWidget(CaptionLabel('显示通道:'))
+        control_layout.addWidget(self.display_channel_combo)
+        control_layout.addStretch()
+        
+        ascan_layout.addLayout(control_layout)
+
+    def build_ascan_plot(self):
+        """创建A-Scan的pyqtgraph图表，插入到标题和控制选项之间"""
+        import pyqtgraph as pg
+
         # 创建pyqtgraph图形布局
         self.ascan_plot_widget = pg.GraphicsLayoutWidget()
         self.ascan_plot_widget.setMinimumHeight(200)
@@ -1493,31 +1620,10 @@ class VNAControllerGUI(FluentWindow):
         self.ascan_plot.setXRange(0, 500)
         self.ascan_plot.setYRange(-1, 1)
         
-        # 添加控制选项
-        control_layout = QHBoxLayout()
-        
-        # 抽样显示选项
-        self.sampling_checkbox = CheckBox('抽样显示')
-        self.sampling_checkbox.setChecked(False)
-        
-        # 抽样间隔
-        self.sampling_spinbox = SpinBox()
-        self.sampling_spinbox.setRange(1, 100)
-        self.sampling_spinbox.setValue(10)
-        self.sampling_spinbox.setMinimumWidth(80)
-        
-        control_layout.addWidget(self.sampling_checkbox)
-        control_layout.addWidget(CaptionLabel('抽样间隔:'))
-        control_layout.addWidget(self.sampling_spinbox)
-        control_layout.addStretch()
-        
-        ascan_layout.addWidget(self.ascan_plot_widget)
-        ascan_layout.addLayout(control_layout)
+        self._ascan_layout.insertWidget(1, self.ascan_plot_widget)
 
     def create_bscan_display(self):
-        """创建B-Scan实时显示区域"""
-        import pyqtgraph as pg
-        
+        """创建B-Scan实时显示区域，图表在窗口显示后由build_bscan_plot()创建"""
         # 创建B-Scan显示组
         self.bscan_display_group = CardWidget()
         bscan_layout = QVBoxLayout(self.bscan_display_group)
@@ -1528,7 +1634,17 @@ class VNAControllerGUI(FluentWindow):
         bscan_title = SubtitleLabel('B-Scan实时显示')
         bscan_title.setFont(QFont('Microsoft YaHei', 10, QFont.Weight.Bold))
         bscan_layout.addWidget(bscan_title)
+        self._bscan_layout = bscan_layout
         
+        # 初始化B-Scan数据
+        self.bscan_data = []
+        # 移除最大道数限制，允许显示所有采集的数据
+        # self.max_bscan_traces = 500  # 最大道数
+
+    def build_bscan_plot(self):
+        """创建B-Scan的pyqtgraph图表和颜色条"""
+        import pyqtgraph as pg
+
         # 创建pyqtgraph图形布局
         self.bscan_plot_widget = pg.GraphicsLayoutWidget()
         self.bscan_plot_widget.setMinimumHeight(300)
@@ -1568,8 +1684,7 @@ class VNAControllerGUI(FluentWindow):
         
         # 使用选择的颜色映射
         colormap_name = self.bscan_colormap_combo.currentText() if hasattr(self, 'bscan_colormap_combo') else 'seismic'
-        cmap = pg.colormap.getFromMatplotlib(colormap_name)
-        self.bscan_img.setLookupTable(cmap.getLookupTable())
+        self.bscan_img.setLookupTable(get_lookup_table(colormap_name))
         
         # 添加颜色条
         self.bscan_cbar = pg.ColorBarItem(label='幅度')
@@ -1584,48 +1699,113 @@ class VNAControllerGUI(FluentWindow):
         
         self.bscan_plot_widget.addItem(self.bscan_cbar, row=0, col=1)
         
-        # 初始化B-Scan数据
-        self.bscan_data = []
-        # 移除最大道数限制，允许显示所有采集的数据
-        # self.max_bscan_traces = 500  # 最大道数
-        
-        bscan_layout.addWidget(self.bscan_plot_widget)
+        self._bscan_layout.addWidget(self.bscan_plot_widget)
 
     def update_ascan_display(self, data):
         """更新A-Scan实时显示"""
         if not hasattr(self, 'ascan_curve'):
             return
         
+        # 记录信号排队时延；界面积压时只保留数据、跳过本帧绘制，由最新一帧统一刷新
+        backlog = self.metrics.mark_received()
+        render_start = time.monotonic()
+        if backlog > 0:
+            self.metrics.add_dropped('render')
+            if hasattr(self, 'bscan_checkbox') and self.bscan_checkbox.isChecked():
+                self.update_bscan_display(data, render=False)
+            return
+
         try:
             import numpy as np
+
+            # 多测量道数据：选中通道用主曲线，其余通道叠加显示
+            names = channel_names(data)
+            if names != self.display_channels:
+                self.set_display_channels(names)
+            selected = self.display_channel_combo.currentText()
+            traces = [channel(data, selected)] + [channel(data, name) for name in names if name != selected]
             
             # 检查是否启用了抽样显示
             if self.sampling_checkbox.isChecked():
                 # 获取抽样间隔
                 sampling_interval = self.sampling_spinbox.value()
-                # 执行抽样
-                sampled_data = data[::sampling_interval]
                 x = np.arange(0, len(data), sampling_interval)
             else:
                 # 不抽样，显示所有数据
-                sampled_data = data
+                sampling_interval = 1
                 x = np.arange(len(data))
             
             # 更新曲线数据
-            self.ascan_curve.setData(x, sampled_data)
+            self.ascan_curve.setData(x, traces[0][::sampling_interval])
+            for curve, trace in zip(self.ascan_overlay_curves, traces[1:]):
+                curve.setData(x, trace[::sampling_interval])
             
             # 调整坐标轴范围
             if len(data) > 0:
                 self.ascan_plot.setXRange(0, len(data))
-                self.ascan_plot.setYRange(np.min(data) - 0.1, np.max(data) + 0.1)
+                self.ascan_plot.setYRange(min(np.min(t) for t in traces) - 0.1, max(np.max(t) for t in traces) + 0.1)
             
             # 更新B-Scan显示
             if hasattr(self, 'bscan_checkbox') and self.bscan_checkbox.isChecked():
                 self.update_bscan_display(data)
-                
+
+            self.metrics.record('render', render_start)
         except Exception as e:
             self.log_message(f"更新A-Scan显示失败: {str(e)}")
 
+    def set_display_channels(self, names):
+        """道数据的通道变化时更新通道选择和A-Scan叠加曲线"""
+        self.display_channels = names
+        self.display_channel_combo.blockSignals(True)
+        self.display_channel_combo.clear()
+        self.display_channel_combo.addItems(names or ['M1'])
+        self.display_channel_combo.blockSignals(False)
+        self.display_channel_combo.setEnabled(len(names) > 1)
+
+        for curve in self.ascan_overlay_curves:
+            self.ascan_plot.removeItem(curve)
+        pens = ['r', 'g', 'm', 'c', 'y']
+        self.ascan_overlay_curves = [self.ascan_plot.plot([], [], pen=pens[i % len(pens)])
+                                     for i in range(max(0, len(names) - 1))]
+
+    def on_display_channel_changed(self, name):
+        """切换显示通道后按已采集的数据重绘B-Scan"""
+        if getattr(self, 'bscan_data', None) and hasattr(self, 'bscan_img'):
+            self.update_bscan_display(None)
+
+    def get_transform_options(self):
+        """原始复数数据方式的主机端变换参数，见time_domain.TransformPlan"""
+        low = self.transform_band_low_spin.value() * 1e6
+        high = self.transform_band_high_spin.value() * 1e6
+        return {
+            'window': {'Kaiser': 'kaiser', 'Hann': 'hann'}.get(self.transform_window_combo.currentText(), 'rect'),
+            'pad_factor': self.transform_pad_spin.value(),
+            'band': (low, high) if high > low else None,
+        }
+
+    def get_journal_options(self):
+        """实时数据流CSV的落盘参数，见stream_journal.JournaledCSVWriter"""
+        return {
+            'durability': {'逐道落盘': DURABILITY_TRACE, '不强制落盘': DURABILITY_NONE}.get(
+                self.durability_combo.currentText(), DURABILITY_GROUP),
+            'sync_interval_ms': self.sync_interval_spin.value(),
+            'sync_traces': self.sync_traces_spin.value(),
+        }
+
+    def latest_rtk_fix(self):
+        """最近一条RTK定位，由采集线程写入会话道索引；RTK未启用时返回None"""
+        if self.rtk_enabled and self.rtk_module:
+            return self.rtk_module.latest_fix()
+        return None
+
+    def get_measurements(self):
+        """解析设置界面的测量编号，格式错误时使用测量1"""
+        try:
+            return parse_measurements(self.measurement_line_edit.text())
+        except ValueError as e:
+            self.log_message(f"测量编号设置错误，使用测量1: {e}")
+            return [(1, FDATA)]
+
     def update_system_time(self):
         """更新系统时间"""
         if not self.rtk_enabled:
@@ -1663,22 +1843,31 @@ class VNAControllerGUI(FluentWindow):
         self.point_sample_counter = 0
         self.point_group_counter = 0
 
-    def update_bscan_display(self, data):
-        """更新B-Scan实时显示"""
+    def update_bscan_display(self, data, render=True):
+        """
+        更新B-Scan实时显示
+
+        Args:
+            data (np.ndarray): 新的一道，为None时只按当前显示通道重绘
+            render (bool): 为False时只追加数据不刷新图像
+        """
         if not hasattr(self, 'bscan_img'):
             return
         
         import numpy as np
         
         # 添加新数据
-        self.bscan_data.append(data)
+        if data is not None:
+            self.bscan_data.append(data)
+        if not render:
+            return
         
         # 不再限制B-Scan数据长度，保留所有采集的数据
         # if len(self.bscan_data) > self.max_bscan_traces:
         #     self.bscan_data = self.bscan_data[-self.max_bscan_traces:]
         
-        # 转换为numpy数组并转置
-        bscan_array = np.array(self.bscan_data).T
+        # 转换为numpy数组，多测量时取显示通道，再转置
+        bscan_array = channel(np.array(self.bscan_data), self.display_channel_combo.currentText()).T
         
         # 更新图像
         self.bscan_img.setImage(bscan_array, axisOrder='row-major')
@@ -1695,29 +1884,57 @@ class VNAControllerGUI(FluentWindow):
         self.bscan_plot.setYRange(0, bscan_array.shape[0])
 
     def refresh_devices(self):
-        """刷新可用设备列表"""
+        """刷新可用设备列表：先显示缓存的设备列表，再在后台线程中重新枚举"""
         self.log_message("刷新设备列表")
         try:
-            # 创建临时VNA控制器实例来获取设备列表
-            temp_vna = VNAController()
-            devices = temp_vna.list_devices()
-            
-            # 清空并添加设备列表
-            self.device_combo.clear()
-            if devices:
-                self.device_combo.addItems(devices)
-                self.device_combo.setCurrentIndex(0)
-                self.log_message(f"发现 {len(devices)} 个设备")
-            else:
-                # 如果没有发现设备，添加一个默认设备
-                self.device_combo.addItems(['TCPIP0::DESKTOP-U2340VT::hislip_PXI0_CHASSIS1_SLOT1_INDEX0::INSTR'])
-                self.device_combo.setCurrentIndex(0)
-                self.log_message("未发现设备，使用默认设备")
+            from .visa_pool import get_discovery
+
+            discovery = get_discovery()
+            cached = discovery.cached()
+            if cached:
+                self.on_devices_listed(list(cached), "", cached=True)
         except Exception as e:
-            self.log_message(f"刷新设备列表失败: {str(e)}")
+            self.on_devices_listed([], str(e))
+            return
+
+        if getattr(self, '_device_scan_thread', None) is not None and self._device_scan_thread.isRunning():
+            return
+
+        class DeviceScanThread(QThread):
+            """在后台线程中枚举VISA设备的线程类"""
+            finished_scan = pyqtSignal(list, str)  # 设备列表，错误信息
+
+            def run(self):
+                try:
+                    self.finished_scan.emit(list(discovery.list_devices(force=True)), "")
+                except Exception as e:
+                    self.finished_scan.emit([], str(e))
+
+        self._device_scan_thread = DeviceScanThread(self)
+        self._device_scan_thread.finished_scan.connect(self.on_devices_listed)
+        self._device_scan_thread.start()
+
+    def on_devices_listed(self, devices, error, cached=False):
+        """设备枚举完成后更新设备下拉框"""
+        default_device = 'TCPIP0::DESKTOP-U2340VT::hislip_PXI0_CHASSIS1_SLOT1_INDEX0::INSTR'
+        current_device = self.device_combo.currentText()
+        if error:
+            self.log_message(f"刷新设备列表失败: {error}")
             # 出错时使用模拟数据
-            self.device_combo.clear()
-            self.device_combo.addItems(['TCPIP0::DESKTOP-U2340VT::hislip_PXI0_CHASSIS1_SLOT1_INDEX0::INSTR'])
+            devices = [default_device]
+        elif devices:
+            self.log_message(f"{'缓存中有' if cached else '发现'} {len(devices)} 个设备")
+        else:
+            # 如果没有发现设备，添加一个默认设备
+            devices = [default_device]
+            self.log_message("未发现设备，使用默认设备")
+
+        # 清空并添加设备列表，尽量保留当前选择
+        self.device_combo.clear()
+        self.device_combo.addItems(devices)
+        if current_device in devices:
+            self.device_combo.setCurrentText(current_device)
+        else:
             self.device_combo.setCurrentIndex(0)
 
     def connect_device(self):
@@ -1746,6 +1963,8 @@ class VNAControllerGUI(FluentWindow):
             def run(self):
                 """线程运行函数"""
                 try:
+                    from .vna_controller import VNAController
+
                     # 创建VNA控制器实例
                     vna_controller = VNAController()
                     
@@ -1946,6 +2165,7 @@ class VNAControllerGUI(FluentWindow):
             self.continuous_worker.stop()
             self.continuous_worker.wait()
             self.continuous_worker = None
+        self.stop_sensor_hub()
         self.is_continuous_running = False
         self.continuous_start_button.setEnabled(True)
         self.continuous_stop_button.setEnabled(False)
@@ -1983,6 +2203,10 @@ class VNAControllerGUI(FluentWindow):
                 parent=self
             )
         
+        # 连续采集异常结束时同样需要关闭会话文件
+        if not success:
+            self.stop_sensor_hub()
+
         # 恢复按钮状态
         self.fixed_start_button.setEnabled(True)
         self.continuous_start_button.setEnabled(True)
@@ -1992,11 +2216,59 @@ class VNAControllerGUI(FluentWindow):
         # 隐藏进度条
         self.progress_bar.setVisible(False)
     
+    def ensure_sensor_hub(self):
+        """获取多传感器协调器，未运行时创建并启动"""
+        if self.sensor_hub is None:
+            self.sensor_hub = SensorHub()
+            self.sensor_hub.add_external_sensor('vna')
+            self.sensor_hub.start()
+        return self.sensor_hub
+
+    def start_sensor_hub(self, path, file_prefix, data_acquisition_mode):
+        """
+        开始同步会话记录，VNA道、RTK定位和激光测距共用同一时间基准写入同步会话文件
+
+        RTK启用时其串口已由协调器读取；设置了USBVNA_ALTIMETER环境变量时同时接入激光测距
+        """
+        self.stop_sensor_hub()
+        if not (self.session_file_switch and self.session_file_switch.isChecked()):
+            return
+        if data_acquisition_mode not in ("实时数据流方式", RAW_MODE):
+            self.log_message("同步会话文件仅在实时数据流方式下可用")
+            return
+        try:
+            hub = self.ensure_sensor_hub()
+            altimeter = altimeter_from_env()
+            if altimeter is not None:
+                self.altimeter_source = hub.add_source(altimeter)
+                if self.altimeter_source is None:
+                    self.log_message(f"激光测距串口 {altimeter.port} 打开失败，本次会话不记录离地高度")
+            session_path = os.path.join(path, f"{file_prefix}_session.gss")
+            hub.open_session(session_path, {'file_prefix': file_prefix})
+            self.log_message(f"同步会话文件: {session_path}")
+        except Exception as e:
+            self.log_message(f"启动同步会话记录失败: {str(e)}")
+            self.stop_sensor_hub()
+
+    def stop_sensor_hub(self):
+        """关闭同步会话文件和激光测距，RTK未启用时同时停止协调器"""
+        if not self.sensor_hub:
+            return
+        self.sensor_hub.close_session()
+        if self.altimeter_source is not None:
+            self.sensor_hub.remove_source(self.altimeter_source)
+            self.altimeter_source = None
+        if not (self.rtk_module and self.rtk_enabled):
+            self.sensor_hub.stop()
+            self.sensor_hub = None
+
     def clear_scan_images(self):
         """清除A-Scan和B-Scan图像"""
         # 清除A-Scan图像
         if hasattr(self, 'ascan_curve'):
             self.ascan_curve.setData([], [])
+            for curve in self.ascan_overlay_curves:
+                curve.setData([], [])
         
         # 清除B-Scan图像
         if hasattr(self, 'bscan_img') and hasattr(self, 'bscan_data'):
@@ -2032,12 +2304,15 @@ class VNAControllerGUI(FluentWindow):
         
         # 创建并启动工作线程
         self.fixed_worker = DataDumpWorker(
-            self.vna_controller, count, file_prefix, path, data_type, scope, data_format, selector, interval, data_acquisition_mode
+            self.vna_controller, count, file_prefix, path, data_type, scope, data_format, selector, interval, data_acquisition_mode,
+            measurements=self.get_measurements(), transform_options=self.get_transform_options(),
+            journal_options=self.get_journal_options(), position_source=self.latest_rtk_fix
         )
         # 绑定信号
         self.fixed_worker.progress_updated.connect(self.on_worker_progress)
         self.fixed_worker.finished_signal.connect(self.on_worker_finished)
         self.fixed_worker.ascan_data_available.connect(self.update_ascan_display)
+        self.fixed_worker.status_message.connect(self.log_message)
         # 启动线程
         self.fixed_worker.start()
         
@@ -2063,14 +2338,22 @@ class VNAControllerGUI(FluentWindow):
         interval = self.interval_spin.value()
         data_acquisition_mode = self.data_acquisition_combo.currentText()
         
+        # 按需启动多传感器协调器
+        self.start_sensor_hub(path, file_prefix, data_acquisition_mode)
+
         # 创建并启动工作线程
         self.continuous_worker = ContinuousDumpWorker(
-            self.vna_controller, file_prefix, path, data_type, scope, data_format, selector, interval, data_acquisition_mode
+            self.vna_controller, file_prefix, path, data_type, scope, data_format, selector, interval, data_acquisition_mode,
+            sensor_hub=self.sensor_hub if self.sensor_hub and self.sensor_hub.session_open else None,
+            measurements=self.get_measurements(),
+            transform_options=self.get_transform_options(), journal_options=self.get_journal_options(),
+            position_source=self.latest_rtk_fix
         )
         # 绑定信号
         self.continuous_worker.progress_updated.connect(self.on_worker_progress)
         self.continuous_worker.finished_signal.connect(self.on_worker_finished)
         self.continuous_worker.ascan_data_available.connect(self.update_ascan_display)
+        self.continuous_worker.status_message.connect(self.log_message)
         # 启动线程
         self.continuous_worker.start()
     
@@ -2102,12 +2385,15 @@ class VNAControllerGUI(FluentWindow):
         
         # 创建并启动工作线程
         self.point_worker = SinglePointDumpWorker(
-            self.vna_controller, count, file_prefix, path, data_type, scope, data_format, selector, interval, start_index, data_acquisition_mode
+            self.vna_controller, count, file_prefix, path, data_type, scope, data_format, selector, interval, start_index, data_acquisition_mode,
+            measurements=self.get_measurements(), transform_options=self.get_transform_options(),
+            journal_options=self.get_journal_options(), position_source=self.latest_rtk_fix
         )
         # 绑定信号
         self.point_worker.progress_updated.connect(self.on_worker_progress)
         self.point_worker.finished_signal.connect(self.on_worker_finished)
         self.point_worker.ascan_data_available.connect(self.update_ascan_display)
+        self.point_worker.status_message.connect(self.log_message)
         # 启动线程
         self.point_worker.start()
         
@@ -2134,12 +2420,15 @@ class VNAControllerGUI(FluentWindow):
         
         # 创建并启动工作线程
         self.point_worker = PointDumpWorker(
-            self.vna_controller, count, file_prefix, path, data_type, scope, data_format, selector, interval, data_acquisition_mode
+            self.vna_controller, count, file_prefix, path, data_type, scope, data_format, selector, interval, data_acquisition_mode,
+            measurements=self.get_measurements(), transform_options=self.get_transform_options(),
+            journal_options=self.get_journal_options(), position_source=self.latest_rtk_fix
         )
         # 绑定信号
         self.point_worker.progress_updated.connect(self.on_worker_progress)
         self.point_worker.finished_signal.connect(self.on_worker_finished)
         self.point_worker.ascan_data_available.connect(self.update_ascan_display)
+        self.point_worker.status_message.connect(self.log_message)
         # 启动线程
         self.point_worker.start()
     
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 17:20:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 17:20:00
+FilePath     : \\usbvna\\src\\lib\\metrics.py
+Description  : 采集热路径分阶段时延统计：取数、解析、存储、信号投递、绘制各阶段写入预分配的对数分桶直方图，
+               供指标页面实时显示和导出JSON
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# 采集链路各阶段
+STAGES = ('fetch', 'parse', 'store', 'emit', 'render')
+
+# 每个二进制数量级内的线性子桶数（2^4=16，相对误差约6%）
+_SUB_BITS = 4
+_SUB = 1 << _SUB_BITS
+
+
+def _bucket_index(value_us):
+    """HDR式对数-线性分桶：小于32us逐微秒分桶，之后每个数量级16个子桶"""
+    shift = value_us.bit_length() - _SUB_BITS - 1
+    if shift <= 0:
+        return value_us
+    return shift * _SUB + (value_us >> shift)
+
+
+def _bucket_bounds(index):
+    """分桶下标对应的[下界, 上界)微秒"""
+    if index < 2 * _SUB:
+        return index, index + 1
+    shift = index // _SUB - 1
+    mantissa = index - shift * _SUB
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class LatencyHistogram:
+    """
+    预分配的时延直方图
+
+    record()只做一次整数分桶和列表自增，不分配内存；单写多读，读取端得到的是近似一致的快照。
+    """
+
+    def __init__(self, max_seconds=60.0):
+        """
+        Args:
+            max_seconds (float): 可记录的最大时延，超出的值计入最后一个分桶
+        """
+        self.max_us = int(max_seconds * 1e6)
+        self.counts = [0] * (_bucket_index(self.max_us) + 1)
+        self.count = 0
+        self.total_us = 0
+        self.max_seen_us = 0
+
+    def record(self, seconds):
+        value = int(seconds * 1e6)
+        if value < 0:
+            value = 0
+        elif value > self.max_us:
+            value = self.max_us
+        self.counts[_bucket_index(value)] += 1
+        self.count += 1
+        self.total_us += value
+        if value > self.max_seen_us:
+            self.max_seen_us = value
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.total_us = 0
+        self.max_seen_us = 0
+
+    def percentiles(self, qs=(50, 95, 99)):
+        """
+        Args:
+            qs (tuple): 百分位
+
+        Returns:
+            dict: 百分位 -> 毫秒（取分桶中点），无数据时为None
+        """
+        counts = np.asarray(self.counts, dtype=np.int64)
+        total = int(counts.sum())
+        if total == 0:
+            return {q: None for q in qs}
+        cumulative = np.cumsum(counts)
+        result = {}
+        for q in qs:
+            index = int(np.searchsorted(cumulative, total * q / 100.0))
+            low, high = _bucket_bounds(min(index, len(counts) - 1))
+            result[q] = min((low + high) / 2.0, self.max_seen_us) / 1000.0
+        return result
+
+    def to_dict(self):
+        p = self.percentiles((50, 90, 99))
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total_us / self.count / 1000.0, 3) if self.count else None,
+            'p50_ms': round(p[50], 3) if p[50] is not None else None,
+            'p90_ms': round(p[90], 3) if p[90] is not None else None,
+            'p99_ms': round(p[99], 3) if p[99] is not None else None,
+            'max_ms': round(self.max_seen_us / 1000.0, 3),
+        }
+
+
+class PipelineMetrics:
+    """
+    采集链路指标
+
+    - 各阶段时延写入LatencyHistogram
+    - trace_done()记录每道完成时刻，按滑动窗口计算道速率
+    - mark_emitted()/mark_received()配对记录采集线程发信号到GUI槽函数执行之间的排队时延，
+      未被处理的信号数即显示队列深度
+    - 其它队列深度和丢弃计数由各模块上报
+    """
+
+    def __init__(self, stages=STAGES, rate_window=5.0, max_pending=4096):
+        """
+        Args:
+            stages (tuple): 阶段名称
+            rate_window (float): 道速率统计窗口(秒)
+            max_pending (int): 显示队列时间戳缓存上限
+        """
+        self.stages = tuple(stages)
+        self.rate_window = rate_window
+        self.histograms = {stage: LatencyHistogram() for stage in self.stages}
+        self._completions = np.zeros(1024, dtype=np.float64)
+        self._completion_idx = 0
+        self._emit_times = deque(maxlen=max_pending)
+        self._lock = threading.Lock()
+        self.queue_depths = {}
+        self.dropped = {}
+        self.traces = 0
+        self.started = time.monotonic()
+
+    def record(self, stage, start, end=None):
+        """
+        记录一个阶段的耗时
+
+        Args:
+            stage (str): 阶段名
+            start (float): 开始时刻time.monotonic()
+            end (float, optional): 结束时刻，默认当前时间
+        """
+        if end is None:
+            end = time.monotonic()
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms.setdefault(stage, LatencyHistogram())
+        histogram.record(end - start)
+
+    def trace_done(self, now=None):
+        """一道完成采集（取数、解析、存储），用于计算道速率"""
+        if now is None:
+            now = time.monotonic()
+        self._completions[self._completion_idx % len(self._completions)] = now
+        self._completion_idx += 1
+        self.traces += 1
+
+    def mark_emitted(self, now=None):
+        """采集线程发出显示信号前调用"""
+        self._emit_times.append(time.monotonic() if now is None else now)
+
+    def mark_received(self, now=None):
+        """
+        GUI槽函数开始处理时调用，记录emit阶段时延
+
+        Returns:
+            int: 仍在排队的显示信号数
+        """
+        if now is None:
+            now = time.monotonic()
+        try:
+            emitted = self._emit_times.popleft()
+        except IndexError:
+            return 0
+        self.histograms['emit'].record(now - emitted)
+        return len(self._emit_times)
+
+    def display_backlog(self):
+        """尚未被GUI处理的显示信号数"""
+        return len(self._emit_times)
+
+    def set_queue_depth(self, name, depth):
+        self.queue_depths[name] = depth
+
+    def add_dropped(self, name, count=1):
+        with self._lock:
+            self.dropped[name] = self.dropped.get(name, 0) + count
+
+    def traces_per_second(self, now=None):
+        """滑动窗口内的道速率"""
+        if now is None:
+            now = time.monotonic()
+        n = min(self._completion_idx, len(self._completions))
+        if n == 0:
+            return 0.0
+        recent = self._completions[:n]
+        in_window = recent[recent >= now - self.rate_window]
+        if in_window.size < 2:
+            return float(in_window.size) / self.rate_window
+        span = max(now - float(in_window.min()), 1e-6)
+        return float(in_window.size) / min(span, self.rate_window)
+
+    def reset(self):
+        with self._lock:
+            for histogram in self.histograms.values():
+                histogram.reset()
+            self._completions[:] = 0.0
+            self._completion_idx = 0
+            self._emit_times.clear()
+            self.queue_depths = {}
+            self.dropped = {}
+            self.traces = 0
+            self.started = time.monotonic()
+
+    def snapshot(self):
+        """当前指标的字典快照"""
+        now = time.monotonic()
+        depths = dict(self.queue_depths)
+        depths['display'] = self.display_backlog()
+        return {
+            'uptime_s': round(now - self.started, 3),
+            'traces': self.traces,
+            'traces_per_s': round(self.traces_per_second(now), 2),
+            'stages': {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+            'queue_depths': depths,
+            'dropped': dict(self.dropped),
+        }
+
+    def export_json(self, file_path):
+        """把快照和各阶段原始分桶计数导出为JSON"""
+        data = self.snapshot()
+        data['exported_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        data['buckets'] = {}
+        for name, histogram in self.histograms.items():
+            buckets = []
+            for index, count in enumerate(histogram.counts):
+                if count:
+                    low, high = _bucket_bounds(index)
+                    buckets.append([low, high, count])
+            data['buckets'][name] = buckets
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        return data
+
+
+# 进程内共享的指标实例，采集线程写入，指标页面读取
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """获取进程内共享的PipelineMetrics实例"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = PipelineMetrics()
+        return _metrics
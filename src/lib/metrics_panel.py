@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 17:20:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 17:20:00
+FilePath     : \\usbvna\\src\\lib\\metrics_panel.py
+Description  : 性能指标页面，显示道速率、各阶段时延分位数、队列深度和丢帧数，支持导出JSON
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import os
+from datetime import datetime
+
+from PyQt6.QtCore import QTimer, Qt
+from PyQt6.QtGui import QFont
+from PyQt6.QtWidgets import QFileDialog, QHBoxLayout, QTableWidgetItem, QVBoxLayout, QWidget
+from qfluentwidgets import (BodyLabel, CaptionLabel, CardWidget, FluentIcon as FIF, InfoBar, InfoBarPosition,
+                            PushButton, SubtitleLabel, TableWidget)
+
+from .metrics import get_metrics
+
+# 各阶段的显示名称
+STAGE_NAMES = {
+    'fetch': '取数(VNA查询)',
+    'parse': '解析',
+    'store': '存储',
+    'emit': '信号投递(排队)',
+    'render': '绘制',
+}
+
+
+class MetricsPanel(QWidget):
+    """性能指标页面，可见时每秒刷新一次"""
+
+    COLUMNS = ['阶段', '次数', '平均(ms)', 'P50(ms)', 'P90(ms)', 'P99(ms)', '最大(ms)']
+
+    def __init__(self, parent=None, metrics=None, refresh_ms=1000):
+        super().__init__(parent)
+        self.setObjectName("metricsInterface")
+        self.metrics = metrics or get_metrics()
+
+        layout = QVBoxLayout(self)
+        layout.setSpacing(10)
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        title = SubtitleLabel('采集性能指标')
+        title.setFont(QFont('Microsoft YaHei', 12, QFont.Weight.Bold))
+        title.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(title)
+
+        # 概要
+        summary_card = CardWidget()
+        summary_layout = QHBoxLayout(summary_card)
+        summary_layout.setContentsMargins(15, 10, 15, 10)
+        self.rate_label = BodyLabel("道速率: -- 道/秒")
+        self.traces_label = BodyLabel("累计道数: 0")
+        self.queue_label = BodyLabel("队列深度: --")
+        self.dropped_label = BodyLabel("丢帧: 0")
+        for label in (self.rate_label, self.traces_label, self.queue_label, self.dropped_label):
+            label.setMinimumWidth(160)
+            summary_layout.addWidget(label)
+        summary_layout.addStretch()
+        layout.addWidget(summary_card)
+
+        # 各阶段时延
+        self.table = TableWidget()
+        self.table.setColumnCount(len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(TableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table, 1)
+
+        hint = CaptionLabel("emit为采集线程发出信号到界面开始处理的排队时间；界面积压时跳过中间帧的绘制并计入丢帧")
+        layout.addWidget(hint)
+
+        # 操作按钮
+        button_layout = QHBoxLayout()
+        self.export_button = PushButton('导出JSON', icon=FIF.SAVE)
+        self.export_button.clicked.connect(self.export_json)
+        self.reset_button = PushButton('清零', icon=FIF.DELETE)
+        self.reset_button.clicked.connect(self.reset)
+        button_layout.addStretch()
+        button_layout.addWidget(self.reset_button)
+        button_layout.addWidget(self.export_button)
+        layout.addLayout(button_layout)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(refresh_ms)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.timer.stop()
+
+    def refresh(self):
+        snapshot = self.metrics.snapshot()
+        self.rate_label.setText(f"道速率: {snapshot['traces_per_s']:.2f} 道/秒")
+        self.traces_label.setText(f"累计道数: {snapshot['traces']}")
+        depths = "，".join(f"{name} {depth}" for name, depth in snapshot['queue_depths'].items())
+        self.queue_label.setText(f"队列深度: {depths}")
+        dropped = snapshot['dropped']
+        detail = "，".join(f"{name} {count}" for name, count in dropped.items())
+        self.dropped_label.setText(f"丢帧: {sum(dropped.values())}" + (f"（{detail}）" if detail else ""))
+
+        stages = snapshot['stages']
+        self.table.setRowCount(len(stages))
+        for row, (name, stats) in enumerate(stages.items()):
+            values = [STAGE_NAMES.get(name, name), stats['count'], stats['mean_ms'], stats['p50_ms'],
+                      stats['p90_ms'], stats['p99_ms'], stats['max_ms']]
+            for col, value in enumerate(values):
+                text = '--' if value is None else (f"{value:.3f}" if isinstance(value, float) else str(value))
+                item = self.table.item(row, col)
+                if item is None:
+                    self.table.setItem(row, col, QTableWidgetItem(text))
+                else:
+                    item.setText(text)
+
+    def reset(self):
+        self.metrics.reset()
+        self.refresh()
+
+    def export_json(self):
+        default_name = f"metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        file_path, _ = QFileDialog.getSaveFileName(self, "导出性能指标", os.path.join(os.getcwd(), default_name),
+                                                   "JSON (*.json)")
+        if not file_path:
+            return
+        try:
+            self.metrics.export_json(file_path)
+            InfoBar.success(title='导出完成', content=file_path, orient=Qt.Orientation.Horizontal,
+                            isClosable=True, position=InfoBarPosition.TOP, duration=2000, parent=self)
+        except OSError as e:
+            InfoBar.error(title='导出失败', content=str(e), orient=Qt.Orientation.Horizontal,
+                          isClosable=True, position=InfoBarPosition.TOP, duration=3000, parent=self)
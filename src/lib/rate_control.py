@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 14:50:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 14:50:00
+FilePath     : \\usbvna\\src\\lib\\rate_control.py
+Description  : 上行自适应码率控制：地面端回传丢包/RTT/抖动反馈，机载端据此调整采样抽取、道叠加和压缩质量
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from .clock_sync import get_clock_sync
+from .logger_config import setup_logger
+
+# 创建日志记录器
+logger = setup_logger("rate_control", "logs/rate_control.log", level=10)  # 10对应DEBUG级别
+
+# 控制通道上的反馈命令
+FEEDBACK_CMD = "FEEDBACK"
+
+# 上行档位：采样抽取倍数、道叠加数、编解码器名称
+UplinkProfile = namedtuple('UplinkProfile', ['decimation', 'stack', 'codec'])
+
+# 由高到低的档位，链路变差时逐级下降；只影响实时上行，本地存储始终为全分辨率
+DEFAULT_LADDER = (
+    UplinkProfile(1, 1, 'delta_zlib'),
+    UplinkProfile(1, 1, 'quant16'),
+    UplinkProfile(2, 1, 'quant16'),
+    UplinkProfile(2, 2, 'quant12'),
+    UplinkProfile(4, 4, 'quant12'),
+)
+
+
+class FeedbackReporter:
+    """
+    地面端反馈统计
+
+    on_datagram()记录每个遥测分片；make_report()按TelemetryReceiver的统计增量计算上一周期的
+    丢道率，并给出RFC 3550式到达抖动估计和用于RTT测量的回显时间戳。
+    """
+
+    def __init__(self, session_id=None):
+        """
+        Args:
+            session_id (int, optional): 只统计该会话，默认跟随最近收到的会话
+        """
+        self.session_id = session_id
+        self.jitter = 0.0
+        self._last_transit = None
+        self._echo_ts_us = None
+        self._echo_rx = None
+        self._bytes = 0
+        self._last_counts = None
+        self._last_report = time.monotonic()
+
+    def on_datagram(self, header, receive_mono, receive_wall, size):
+        """
+        记录一个分片
+
+        Args:
+            header (TelemetryHeader): 分片包头
+            receive_mono (float): 接收时刻time.monotonic()
+            receive_wall (float): 接收时刻time.time()，与包头时间戳比较得到传输时间
+            size (int): 数据报字节数
+        """
+        if self.session_id is None:
+            self.session_id = header.session_id
+        elif header.session_id != self.session_id:
+            return
+        self._bytes += size
+        self._echo_ts_us = header.timestamp_us
+        self._echo_rx = receive_mono
+        if header.frag_idx == 0:
+            # 两端时钟偏差在相邻差值中抵消
+            transit = receive_wall - header.timestamp_us / 1e6
+            if self._last_transit is not None:
+                d = abs(transit - self._last_transit)
+                self.jitter += (d - self.jitter) / 16.0
+            self._last_transit = transit
+
+    def make_report(self, receiver_stats, now=None):
+        """
+        生成一次反馈
+
+        Args:
+            receiver_stats (dict): TelemetryReceiver.get_stats()的结果
+            now (float, optional): time.monotonic()
+
+        Returns:
+            dict: 控制通道JSON命令，尚未收到任何数据时返回None
+        """
+        now = time.monotonic() if now is None else now
+        stats = receiver_stats.get(self.session_id)
+        if stats is None or self._echo_ts_us is None:
+            return None
+        counts = (stats['released'], stats['missing'], stats['undecodable'])
+        last = self._last_counts or (0, 0, 0)
+        released, missing, bad = (c - p for c, p in zip(counts, last))
+        self._last_counts = counts
+        expected = released + missing + bad
+        elapsed = max(now - self._last_report, 1e-3)
+        self._last_report = now
+
+        report = {
+            "type": "CTRL",
+            "cmd": FEEDBACK_CMD,
+            "session": self.session_id,
+            "loss": round((missing + bad) / expected, 4) if expected else 0.0,
+            "traces": released,
+            "jitter_ms": round(self.jitter * 1000.0, 2),
+            "rx_kbps": round(self._bytes * 8 / elapsed / 1000.0, 1),
+            "echo_ts_us": self._echo_ts_us,
+            "hold_ms": round((now - self._echo_rx) * 1000.0, 2),
+        }
+        self._bytes = 0
+        return report
+
+
+class RateController:
+    """
+    机载端码率控制器
+
+    丢道率超过loss_high或RTT比最小RTT高出rtt_margin时判为拥塞，按hold_down间隔逐级降档；
+    连续recover_reports次反馈丢道率低于loss_low且RTT正常时升一档。超过feedback_timeout
+    未收到反馈视为链路中断，同样降档。
+    """
+
+    def __init__(self, ladder=DEFAULT_LADDER, loss_high=0.05, loss_low=0.01, rtt_margin=0.25,
+                 hold_down=2.0, recover_reports=5, feedback_timeout=5.0, clock=None):
+        """
+        Args:
+            ladder (tuple): 由高到低的UplinkProfile档位
+            loss_high (float): 降档丢道率阈值
+            loss_low (float): 升档丢道率阈值
+            rtt_margin (float): RTT相对最小值的允许增量(秒)，超过说明链路排队
+            hold_down (float): 两次降档的最小间隔(秒)，等待上次调整生效
+            recover_reports (int): 升档所需的连续良好反馈数
+            feedback_timeout (float): 反馈超时(秒)
+            clock (callable, optional): 与发送端包头时间戳一致的时钟，用于计算RTT，默认共享ClockSync的now()
+        """
+        self.ladder = tuple(ladder)
+        self.loss_high = loss_high
+        self.loss_low = loss_low
+        self.rtt_margin = rtt_margin
+        self.hold_down = hold_down
+        self.recover_reports = recover_reports
+        self.feedback_timeout = feedback_timeout
+        self.clock = clock or get_clock_sync().now
+
+        self._lock = threading.Lock()
+        self.level = 0
+        self.srtt = None
+        self.min_rtt = None
+        self.last_report = {}
+        self._good_reports = 0
+        self._last_change = 0.0
+        self._last_feedback = time.monotonic()
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """档位变化时调用callback(profile)"""
+        self._listeners.append(callback)
+
+    @property
+    def profile(self):
+        return self.ladder[self.level]
+
+    def on_feedback(self, report, now=None):
+        """
+        处理一次地面端反馈
+
+        Args:
+            report (dict): FeedbackReporter.make_report()生成的命令
+            now (float, optional): time.monotonic()
+
+        Returns:
+            UplinkProfile: 处理后的档位
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._last_feedback = now
+            self.last_report = report
+            loss = float(report.get("loss", 0.0))
+
+            rtt = None
+            echo = report.get("echo_ts_us")
+            if echo:
+                rtt = self.clock() - echo / 1e6 - float(report.get("hold_ms", 0.0)) / 1000.0
+                if rtt >= 0:
+                    self.srtt = rtt if self.srtt is None else 0.875 * self.srtt + 0.125 * rtt
+                    self.min_rtt = rtt if self.min_rtt is None else min(self.min_rtt, rtt)
+                else:
+                    rtt = None
+
+            queueing = (rtt is not None and self.min_rtt is not None
+                        and self.srtt - self.min_rtt > self.rtt_margin)
+            if loss > self.loss_high or queueing:
+                self._good_reports = 0
+                reason = f"loss={loss:.3f}" if loss > self.loss_high else f"srtt={self.srtt:.3f}s"
+                changed = self._step_locked(+1, now, reason)
+            elif loss <= self.loss_low:
+                self._good_reports += 1
+                changed = None
+                if self._good_reports >= self.recover_reports:
+                    self._good_reports = 0
+                    changed = self._step_locked(-1, now, "链路恢复")
+            else:
+                self._good_reports = 0
+                changed = None
+            profile = self.ladder[self.level]
+        if changed:
+            self._notify(profile)
+        return profile
+
+    def check_timeout(self, now=None):
+        """反馈超时检查，由发送线程周期调用"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            changed = None
+            if now - self._last_feedback > self.feedback_timeout:
+                changed = self._step_locked(+1, now, "反馈超时")
+                # 每个超时周期只降一档
+                self._last_feedback = now
+            profile = self.ladder[self.level]
+        if changed:
+            self._notify(profile)
+        return profile
+
+    def _step_locked(self, direction, now, reason):
+        level = min(max(self.level + direction, 0), len(self.ladder) - 1)
+        if level == self.level:
+            return False
+        if direction > 0 and now - self._last_change < self.hold_down:
+            return False
+        self.level = level
+        self._last_change = now
+        logger.info(f"上行档位 -> {level} {self.ladder[level]}（{reason}）")
+        return True
+
+    def _notify(self, profile):
+        for callback in self._listeners:
+            try:
+                callback(profile)
+            except Exception as e:
+                logger.error(f"档位回调执行失败: {e}")
+
+
+class UplinkShaper:
+    """
+    按当前档位处理上行的道：叠加stack道求平均，再按decimation做块平均抽取
+
+    只处理发往地面的副本，本地存储仍写入原始全分辨率数据。
+    """
+
+    def __init__(self, controller):
+        self.controller = controller
+        self._acc = None
+        self._count = 0
+
+    def process(self, samples):
+        """
+        Args:
+            samples (np.ndarray): 一道全分辨率A-Scan
+
+        Returns:
+            np.ndarray: 需要发送的道，叠加未满时返回None
+        """
+        profile = self.controller.profile
+        samples = np.asarray(samples, dtype=np.float32)
+        if profile.stack > 1:
+            if self._acc is None or self._acc.shape != samples.shape:
+                self._acc = np.zeros(samples.shape, dtype=np.float64)
+                self._count = 0
+            self._acc += samples
+            self._count += 1
+            if self._count < profile.stack:
+                return None
+            samples = (self._acc / self._count).astype(np.float32)
+            self._acc[:] = 0.0
+            self._count = 0
+        else:
+            self._count = 0
+
+        d = profile.decimation
+        if d > 1 and samples.size >= d:
+            n = samples.size - samples.size % d
+            samples = samples[:n].reshape(-1, d).mean(axis=1, dtype=np.float32)
+        return samples
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 21:00:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 21:00:00
+FilePath     : \\usbvna\\src\\lib\\raw_capture.py
+Description  : 原始复数数据采集：关闭仪器时域变换，以二进制读取SDATA并原样保存到{prefix}_sdata.bin，
+               主机端变换后的时域道用于显示和流式CSV；保存的原始数据可用不同窗函数、频带重新变换
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from .instrument_state import InstrumentStateManager
+from .logger_config import setup_logger
+from .metrics import get_metrics
+from .time_domain import get_plan
+
+logger = setup_logger("raw_capture", "logs/raw_capture.log", level=10)  # 10对应DEBUG级别
+
+RAW_MODE = "原始复数数据方式"
+
+# 变换参数默认值，见TransformPlan
+DEFAULT_TRANSFORM_OPTIONS = {'window': 'kaiser', 'beta': 6.0, 'pad_factor': 4, 'band': None, 'output': 'real',
+                             'mode': 'lowpass'}
+
+
+def record_dtype(points):
+    """原始数据文件的记录格式：道号 + points个complex64"""
+    return np.dtype([('trace', '<u4'), ('data', '<c8', (points,))])
+
+
+class RawTraceFile:
+    """
+    原始SDATA文件
+
+    {prefix}_sdata.bin逐道追加定长记录（见record_dtype），{prefix}_sdata.json记录扫描设置和记录格式。
+    """
+
+    def __init__(self, path, file_prefix):
+        self.bin_path = os.path.join(path, f"{file_prefix}_sdata.bin")
+        self.meta_path = os.path.join(path, f"{file_prefix}_sdata.json")
+        self.file = None
+        self.dtype = None
+
+    def open(self, meta):
+        with open(self.meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2, ensure_ascii=False)
+        self.dtype = record_dtype(meta['points'])
+        self.file = open(self.bin_path, 'wb')
+
+    def write(self, trace_index, sdata):
+        record = np.empty(1, dtype=self.dtype)
+        record['trace'] = trace_index
+        record['data'] = sdata
+        self.file.write(record.tobytes())
+
+    def close(self):
+        if self.file:
+            try:
+                self.file.close()
+            except OSError:
+                pass
+            finally:
+                self.file = None
+
+
+def load_raw(path, file_prefix):
+    """
+    读取原始SDATA文件
+
+    Returns:
+        tuple: (扫描设置dict, 道号数组, complex64数组(道数, points))
+    """
+    with open(os.path.join(path, f"{file_prefix}_sdata.json"), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    records = np.fromfile(os.path.join(path, f"{file_prefix}_sdata.bin"), dtype=record_dtype(meta['points']))
+    return meta, records['trace'], records['data']
+
+
+class RawCapture:
+    """原始复数数据采集，由采集线程在实时数据流分支中使用"""
+
+    def __init__(self, vna_controller, path, file_prefix, channel=1, measurement=1, options=None):
+        """
+        Args:
+            vna_controller (VNAController): 已打开设备的控制器
+            path (str): 数据目录
+            file_prefix (str): 文件前缀
+            channel (int): 通道号
+            measurement (int): 测量编号
+            options (dict, optional): 变换参数，覆盖DEFAULT_TRANSFORM_OPTIONS
+        """
+        self.vna_controller = vna_controller
+        self.channel = channel
+        self.measurement = measurement
+        self.options = dict(DEFAULT_TRANSFORM_OPTIONS)
+        self.options.update(options or {})
+        self.raw_file = RawTraceFile(path, file_prefix)
+        self.metrics = get_metrics()
+        self.plan = None
+        self.transform_was_on = False
+
+    def start(self):
+        """
+        读取扫描设置，关闭仪器时域变换，创建变换计划和原始数据文件
+
+        Returns:
+            bool: 是否可以开始采集
+        """
+        state = InstrumentStateManager(self.vna_controller, self.channel, self.measurement).capture()
+        if not state or not all(key in state for key in ('freq_start', 'freq_stop', 'points')):
+            logger.error("无法读取扫描设置")
+            return False
+        self.transform_was_on = bool(state.get('transform'))
+        if not self.prepare_instrument():
+            return False
+
+        # 未指定时窗时沿用仪器时域变换的显示范围，变换结果与原FDATA显示一致
+        options = dict(self.options)
+        if 'time_stop' not in options and self.transform_was_on and state.get('transform_stop', 0) > 0:
+            options['time_start'] = max(0.0, state.get('transform_start', 0.0))
+            options['time_stop'] = state['transform_stop']
+        if options.get('band') is not None:
+            options['band'] = tuple(options['band'])
+        self.plan = get_plan(state['freq_start'], state['freq_stop'], state['points'], **options)
+
+        self.raw_file.open({
+            'freq_start': state['freq_start'],
+            'freq_stop': state['freq_stop'],
+            'points': state['points'],
+            'channel': self.channel,
+            'measurement': self.measurement,
+            'record': {'trace': '<u4', 'data': '<c8'},
+            'transform': options,
+        })
+        logger.info("原始数据采集开始: %d点, FFT %d点, 输出%d点", state['points'], self.plan.nfft, len(self.plan.time))
+        return True
+
+    def prepare_instrument(self):
+        """关闭仪器时域变换，SDATA为频域数据，仪器不做变换处理；重连后作为恢复步骤再次执行"""
+        if not self.transform_was_on:
+            return True
+        return self.vna_controller.write(f"CALC{self.channel}:MEAS{self.measurement}:TRAN:TIME:STAT 0")
+
+    def read(self):
+        """读取一道SDATA，失败时返回None"""
+        data = self.vna_controller.read_sdata(self.channel, self.measurement)
+        if data is not None and len(data) != self.plan.points:
+            logger.error("SDATA点数%d与扫描设置%d不一致", len(data), self.plan.points)
+            return None
+        return data
+
+    def process(self, trace_index, sdata):
+        """
+        保存一道原始数据并返回主机端变换后的时域道
+
+        Returns:
+            np.ndarray: float64时域数据
+        """
+        self.raw_file.write(trace_index, sdata)
+        # 主机端变换计入解析阶段，变换结果随后按实时数据流方式写入CSV，计入存储阶段
+        parse_start = time.monotonic()
+        trace = self.plan.apply(sdata)
+        self.metrics.record('parse', parse_start)
+        return trace
+
+    def close(self):
+        """关闭原始数据文件，恢复仪器时域变换"""
+        self.raw_file.close()
+        if self.transform_was_on:
+            self.vna_controller.write(f"CALC{self.channel}:MEAS{self.measurement}:TRAN:TIME:STAT 1")
+            self.transform_was_on = False
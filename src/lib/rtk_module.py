@@ -3,6 +3,7 @@
 """
 RTK模块处理类（优化版）
 用于处理RTK模块的数据读取、解析和存储，采用乒乓缓存机制优化性能
+解析结果合并为最新状态快照，由界面按固定频率拉取，不再逐条语句发信号
 作者: Linn
 日期: 2025-09-18
 """
@@ -17,19 +18,23 @@ from PyQt6.QtCore import QObject, pyqtSignal
 from queue import Queue, Empty
 import collections
 
+from .clock_sync import get_clock_sync, parse_nmea_utc, parse_nmea_time_of_day, SECONDS_PER_DAY
+
 
 class RTKModule(QObject):
     """RTK模块处理类（优化版）"""
 
-    # 定义信号，用于向GUI发送数据
-    rtk_data_updated = pyqtSignal(dict)  # 发送解析后的RTK数据
+    # 定义信号，用于向GUI发送数据；定位数据通过latest_state()拉取
     rtk_error_occurred = pyqtSignal(str)  # 发送错误信息
     rtk_module_info_received = pyqtSignal(dict)  # 发送模块信息
 
     # 常用波特率列表
     BAUDRATES = [4800, 9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600]
 
-    def __init__(self, port="COM11", baudrate=115200):
+    # 定位质量/HDOP历史长度（10Hz下约60秒）
+    HISTORY_LENGTH = 600
+
+    def __init__(self, port="COM11", baudrate=115200, clock_sync=None):
         super().__init__()
         self.port = port
         self.baudrate = baudrate
@@ -59,6 +64,22 @@ class RTKModule(QObject):
         # 控制标志
         self.writing_enabled = False
 
+        # 时钟同步：NMEA语句到达的主机单调时间与语句中的GNSS时间构成同步样本
+        self.clock_sync = clock_sync if clock_sync is not None else get_clock_sync()
+        self._gnss_day_start = None  # 最近一次RMC日期对应的UTC零点(纪元秒)
+        self._last_gnss_epoch = None  # 最近一次解析出的GNSS历元
+        # 多传感器协调器（可选）：接入后串口由协调器的事件循环读取，本模块不再启动读写线程
+        self.sensor_hub = None
+        self.hub_source = None
+        self._last_flush = 0.0
+
+        # 最新状态快照：按语句类型保存最近一条，合并结果整体替换，读取端无需加锁
+        self._latest_by_type = {}
+        self._latest = {}
+        self._state_seq = 0
+        self._history = collections.deque(maxlen=self.HISTORY_LENGTH)
+        self._history_lock = threading.Lock()
+
     def connect(self):
         """连接RTK模块"""
         try:
@@ -165,15 +186,31 @@ class RTKModule(QObject):
             self.ser.close()
             self.ser = None
 
-    def start(self):
-        """开始读取RTK数据"""
+    def start(self, sensor_hub=None):
+        """
+        开始读取RTK数据
+
+        Args:
+            sensor_hub (SensorHub, optional): 传感器协调器，给定时把串口作为NMEA数据源交给协调器读取，
+                定位数据随之写入同步会话文件；不给定时启动本模块自己的读写线程
+        """
         if not self.ser or not self.ser.is_open:
             if not self.connect():
                 return False
 
         self.running = True
         self.writing_enabled = (self.data_file is not None)
-        
+
+        if sensor_hub is not None:
+            from .sensor_hub import NmeaSource
+            self.hub_source = sensor_hub.add_source(NmeaSource('rtk', rtk_module=self))
+            if self.hub_source is None:
+                self.running = False
+                self.rtk_error_occurred.emit("RTK串口接入传感器协调器失败")
+                return False
+            self.sensor_hub = sensor_hub
+            return True
+
         # 启动读取线程
         self.read_thread = threading.Thread(target=self._read_data, daemon=True)
         self.read_thread.start()
@@ -188,7 +225,13 @@ class RTKModule(QObject):
     def stop(self):
         """停止读取RTK数据"""
         self.running = False
-        
+
+        # 从协调器移除数据源，返回后事件循环不再读取串口
+        if self.hub_source is not None:
+            self.sensor_hub.remove_source(self.hub_source)
+            self.hub_source = None
+            self.sensor_hub = None
+
         # 等待读取线程结束
         if self.read_thread and self.read_thread.is_alive():
             self.read_thread.join(timeout=2.0)  # 设置超时避免无限等待
@@ -225,7 +268,7 @@ class RTKModule(QObject):
             # 写入表头
             self.csv_writer.writerow([
                 'timestamp', 'gps_time', 'latitude', 'longitude', 'altitude',
-                'quality', 'satellites', 'hdop', 'speed', 'direction'
+                'quality', 'satellites', 'hdop', 'speed', 'direction', 'gnss_time'
             ])
             self.writing_enabled = True
         except Exception as e:
@@ -234,10 +277,12 @@ class RTKModule(QObject):
     def close_data_file(self):
         """关闭数据文件"""
         self.writing_enabled = False
-        if self.data_file:
-            self.data_file.close()
-            self.data_file = None
-            self.csv_writer = None
+        # 协调器事件循环可能正在写入，持锁关闭
+        with self.buffer_lock:
+            if self.data_file:
+                self.data_file.close()
+                self.data_file = None
+                self.csv_writer = None
 
     def set_location_storage(self, enabled):
         """设置是否存储位置数据（经纬度）"""
@@ -254,6 +299,8 @@ class RTKModule(QObject):
                 # 使用非阻塞方式读取数据，减少延迟
                 if self.ser.in_waiting > 0:
                     new_data = self.ser.read(min(self.ser.in_waiting, 4096))  # 限制单次读取量
+                    # 记录数据到达的主机单调时间，作为本批语句的时钟同步样本时间
+                    arrival = time.monotonic()
                     self.buffer += new_data
 
                     # 处理完整的行
@@ -263,13 +310,10 @@ class RTKModule(QObject):
                         self.buffer = self.buffer[line_end:]
 
                         # 解析数据
-                        parsed_data = self._parse_nmea_data(line.strip())
+                        parsed_data = self._parse_nmea_data(line.strip(), arrival)
                         if parsed_data:
-                            # 立即发送数据更新信号
-                            try:
-                                self.rtk_data_updated.emit(parsed_data)
-                            except Exception as e:
-                                self.rtk_error_occurred.emit(f"发送RTK数据信号时出错: {str(e)}")
+                            # 更新最新状态快照，由界面定时拉取
+                            self._update_latest(parsed_data)
 
                             # 存储数据到缓存队列
                             if self.writing_enabled:
@@ -290,6 +334,57 @@ class RTKModule(QObject):
                 self.rtk_error_occurred.emit(f"读取RTK数据时出错: {str(e)}")
                 time.sleep(0.1)  # 出错时增加延迟避免快速重试
 
+    def _update_latest(self, data):
+        """
+        把一条解析结果合并进最新状态快照
+
+        合并顺序与语句类型无关，固定为GGA、RMC、GSA，后者的同名字段（如hdop）覆盖前者
+        """
+        data_type = data.get('type')
+        self._latest_by_type[data_type] = data
+        merged = {}
+        for key in ('GGA', 'RMC', 'GSA'):
+            merged.update(self._latest_by_type.get(key, {}))
+        # 整体替换引用，读取端拿到的总是一个完整的字典
+        self._latest = merged
+        self._state_seq += 1
+
+        if data_type == 'GGA':
+            try:
+                quality = int(data.get('quality') or 0)
+            except ValueError:
+                quality = 0
+            try:
+                hdop = float(data.get('hdop') or 'nan')
+            except ValueError:
+                hdop = float('nan')
+            with self._history_lock:
+                self._history.append((data.get('host_mono'), quality, hdop))
+
+    def latest_state(self):
+        """
+        获取最新状态快照
+
+        Returns:
+            tuple: (序号, 合并后的字典)，序号未变化说明没有新数据；返回的字典不会再被修改
+        """
+        return self._state_seq, self._latest
+
+    def latest_fix(self):
+        """
+        Returns:
+            dict: 最近一条GGA解析结果（纬度、经度、海拔、定位质量、HDOP和host_mono），尚无定位时返回None
+        """
+        return self._latest_by_type.get('GGA')
+
+    def history(self):
+        """
+        Returns:
+            list: 最近的(主机单调时间, 定位质量, HDOP)记录
+        """
+        with self._history_lock:
+            return list(self._history)
+
     def _write_data(self):
         """写入数据到文件的线程函数"""
         while self.running:
@@ -328,13 +423,16 @@ class RTKModule(QObject):
         try:
             # 写入缓存中的所有数据
             with self.buffer_lock:
+                if not self.csv_writer:
+                    return
                 while self.cache_buffer:
                     data = self.cache_buffer.popleft()
                     self._save_to_csv(data)
-                
-            # 强制刷新文件
-            if self.data_file:
-                self.data_file.flush()
+
+                # 强制刷新文件
+                if self.data_file:
+                    self.data_file.flush()
+            self._last_flush = time.monotonic()
         except Exception as e:
             self.rtk_error_occurred.emit(f"刷新数据到文件时出错: {str(e)}")
 
@@ -352,23 +450,93 @@ class RTKModule(QObject):
         # 写入所有缓存数据
         self._flush_buffer_to_file()
 
-    def _parse_nmea_data(self, line):
+    def process_nmea_line(self, line, host_mono=None):
+        """
+        处理单行NMEA语句：解析、更新最新状态快照，开启存储时写入CSV缓存
+
+        由传感器协调器的事件循环逐行调用，代替本模块的读写线程；缓存满50条或距上次写入超过1秒时写入文件
+
+        Args:
+            line (str): 去除行尾的NMEA语句
+            host_mono (float, optional): 语句到达的主机单调时间
+
+        Returns:
+            dict: 解析结果，不支持或解析失败返回None
+        """
+        parsed_data = self._parse_nmea_data(line, host_mono)
+        if not parsed_data:
+            return None
+        self._update_latest(parsed_data)
+        if self.writing_enabled:
+            with self.buffer_lock:
+                self.cache_buffer.append(parsed_data)
+                pending = len(self.cache_buffer)
+            if pending >= 50 or time.monotonic() - self._last_flush >= 1.0:
+                self._flush_buffer_to_file()
+        return parsed_data
+
+    def parse_nmea_line(self, line, host_mono=None):
+        """
+        只解析单行NMEA语句，不更新最新状态也不存储（供解析基准测试等调用方使用）
+
+        Args:
+            line (str): 去除行尾的NMEA语句
+            host_mono (float, optional): 语句到达的主机单调时间
+
+        Returns:
+            dict: 解析结果，不支持或解析失败返回None
+        """
+        return self._parse_nmea_data(line, host_mono)
+
+    def _parse_nmea_data(self, line, host_mono=None):
         """解析NMEA数据"""
+        if host_mono is None:
+            host_mono = time.monotonic()
         try:
             # 解析GNGGA数据
             if line.startswith('$GNGGA') or line.startswith('$GPGGA'):
-                return self._parse_gga_data(line)
+                return self._parse_gga_data(line, host_mono)
             # 解析GNRMC数据
             elif line.startswith('$GNRMC') or line.startswith('$GPRMC'):
-                return self._parse_rmc_data(line)
+                return self._parse_rmc_data(line, host_mono)
             # 解析GPGSA数据
             elif line.startswith('$GPGSA'):
-                return self._parse_gsa_data(line)
+                return self._parse_gsa_data(line, host_mono)
         except Exception as e:
             self.rtk_error_occurred.emit(f"解析NMEA数据时出错: {str(e)}")
         return None
 
-    def _parse_gga_data(self, line):
+    def _stamp_gnss_time(self, data, host_mono, gnss_epoch):
+        """
+        为解析结果附加主机单调时间和GNSS时间，并把有效历元提交给时钟同步
+
+        语句自带历元时直接使用历元（定位对应的真实时刻），否则用同步模型换算到达时间
+        """
+        if host_mono is None:
+            host_mono = time.monotonic()
+        data['host_mono'] = host_mono
+        if gnss_epoch is not None:
+            self.clock_sync.add_sample(host_mono, gnss_epoch)
+            self._last_gnss_epoch = gnss_epoch
+            data['gnss_time'] = gnss_epoch
+        else:
+            data['gnss_time'] = self.clock_sync.to_gnss(host_mono)
+        return data
+
+    def _gga_epoch(self, time_str):
+        """GGA只有时间字段，借用最近一次RMC的日期组合为完整历元"""
+        if self._gnss_day_start is None:
+            return None
+        seconds_of_day = parse_nmea_time_of_day(time_str)
+        if seconds_of_day is None:
+            return None
+        epoch = self._gnss_day_start + seconds_of_day
+        # RMC日期尚未跨过UTC零点而GGA已经跨过
+        if self._last_gnss_epoch is not None and epoch < self._last_gnss_epoch - SECONDS_PER_DAY / 2:
+            epoch += SECONDS_PER_DAY
+        return epoch
+
+    def _parse_gga_data(self, line, host_mono=None):
         """解析GGA数据"""
         fields = line.split(',')
         if len(fields) < 15:
@@ -386,11 +554,11 @@ class RTKModule(QObject):
                 'altitude': fields[9],  # 海拔高度
                 'timestamp': time.time()  # 系统时间戳
             }
-            return data
+            return self._stamp_gnss_time(data, host_mono, self._gga_epoch(fields[1]))
         except Exception:
             return None
 
-    def _parse_rmc_data(self, line):
+    def _parse_rmc_data(self, line, host_mono=None):
         """解析RMC数据"""
         fields = line.split(',')
         if len(fields) < 12:
@@ -432,11 +600,15 @@ class RTKModule(QObject):
                 except Exception:
                     pass
 
-            return data
+            gnss_epoch = parse_nmea_utc(date_str, time_str)
+            if gnss_epoch is not None:
+                seconds_of_day = parse_nmea_time_of_day(time_str)
+                self._gnss_day_start = gnss_epoch - seconds_of_day
+            return self._stamp_gnss_time(data, host_mono, gnss_epoch)
         except Exception:
             return None
 
-    def _parse_gsa_data(self, line):
+    def _parse_gsa_data(self, line, host_mono=None):
         """解析GSA数据"""
         fields = line.split(',')
         # GSA语句至少需要18个字段（包括校验和）
@@ -459,7 +631,7 @@ class RTKModule(QObject):
                 'vdop': vdop_field if vdop_field else '',  # 垂直精度因子(去除校验和部分)
                 'timestamp': time.time()  # 系统时间戳
             }
-            return data
+            return self._stamp_gnss_time(data, host_mono, None)
         except Exception as e:
             self.rtk_error_occurred.emit(f"解析GSA数据时出错: {str(e)}")
             return None
@@ -510,7 +682,8 @@ class RTKModule(QObject):
                     data.get('satellites', ''),  # 卫星数
                     data.get('hdop', ''),  # HDOP
                     '',  # 速度 (GGA中没有)
-                    ''   # 方向 (GGA中没有)
+                    '',  # 方向 (GGA中没有)
+                    self._format_gnss_time(data)  # 同步后的GNSS时间
                 ])
             elif data['type'] == 'RMC':
                 # 根据设置决定是否存储位置数据
@@ -527,11 +700,18 @@ class RTKModule(QObject):
                     '',  # 卫星数 (RMC中没有)
                     '',  # HDOP (RMC中没有)
                     data.get('speed', ''),  # 速度
-                    data.get('direction', '')  # 方向
+                    data.get('direction', ''),  # 方向
+                    self._format_gnss_time(data)  # 同步后的GNSS时间
                 ])
         except Exception as e:
             self.rtk_error_occurred.emit(f"保存数据到CSV文件时出错: {str(e)}")
 
+    @staticmethod
+    def _format_gnss_time(data):
+        """GNSS时间格式化为毫秒精度的纪元秒字符串"""
+        gnss_time = data.get('gnss_time')
+        return f"{gnss_time:.3f}" if gnss_time is not None else ''
+
     @staticmethod
     def list_available_ports():
         """列出所有可用的串口"""
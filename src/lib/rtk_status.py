@@ -3,21 +3,86 @@
 Author       : Linn
 Date         : 2026-01-13 02:04:03
 LastEditors  : Linn
-LastEditTime : 2026-01-13 12:10:00
+LastEditTime : 2026-10-19 22:00:00
 FilePath     : \\usbvna\\src\\lib\\rtk_status.py
-Description  : RTK状态栏组件
+Description  : RTK状态栏组件，含定位质量/HDOP历史迷你曲线
 
 Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
 """
 
+import math
 from datetime import datetime
-from PyQt6.QtWidgets import (QVBoxLayout, QHBoxLayout)
-from qfluentwidgets import (HeaderCardWidget, BodyLabel) # 添加RTK状态栏需要的组件
+from PyQt6.QtCore import QPointF, QRectF, Qt
+from PyQt6.QtGui import QColor, QPainter, QPen, QPolygonF
+from PyQt6.QtWidgets import (QVBoxLayout, QHBoxLayout, QWidget)
+from qfluentwidgets import (HeaderCardWidget, BodyLabel, CaptionLabel) # 添加RTK状态栏需要的组件
+from .logger_config import setup_logger
+
+# 创建日志记录器
+logger = setup_logger("rtk_status", "logs/rtk_status.log", level=10)  # 10对应DEBUG级别
+
+# 定位质量对应的色带颜色：固定解绿色，浮点解橙色，其它有效解灰色，未定位红色
+QUALITY_COLORS = {4: QColor(46, 160, 67), 5: QColor(230, 145, 30), 0: QColor(210, 60, 60)}
+DEFAULT_QUALITY_COLOR = QColor(150, 150, 150)
+
+
+class RTKSparkline(QWidget):
+    """定位质量色带+HDOP折线的迷你历史图，用QPainter直接绘制，不依赖绘图库"""
+
+    def __init__(self, parent=None, hdop_ceiling=5.0):
+        super().__init__(parent)
+        self.hdop_ceiling = hdop_ceiling
+        self._samples = []
+        self.setFixedHeight(36)
+        self.setMinimumWidth(120)
+
+    def set_history(self, samples):
+        """
+        Args:
+            samples (list): (主机单调时间, 定位质量, HDOP)记录，按时间先后排列
+        """
+        self._samples = samples
+        self.update()
+
+    def paintEvent(self, event):
+        samples = self._samples
+        if not samples:
+            return
+        painter = QPainter(self)
+        width = self.width()
+        height = self.height()
+        band = 6
+        step = width / max(len(samples), 1)
+
+        # 底部定位质量色带，连续相同质量合并为一段
+        start = 0
+        for i in range(1, len(samples) + 1):
+            if i == len(samples) or samples[i][1] != samples[start][1]:
+                color = QUALITY_COLORS.get(samples[start][1], DEFAULT_QUALITY_COLOR)
+                painter.fillRect(QRectF(start * step, height - band, (i - start) * step + 1, band), color)
+                start = i
+
+        # HDOP折线，超过上限的截断
+        plot_height = height - band - 2
+        finite = [s[2] for s in samples if not math.isnan(s[2])]
+        ceiling = max(self.hdop_ceiling, min(max(finite), self.hdop_ceiling * 4)) if finite else self.hdop_ceiling
+        points = QPolygonF()
+        for i, (_, _, hdop) in enumerate(samples):
+            if math.isnan(hdop):
+                continue
+            y = plot_height * (1.0 - min(hdop, ceiling) / ceiling)
+            points.append(QPointF(i * step + step / 2, y + 1))
+        if points.size() > 1:
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            painter.setPen(QPen(QColor(0, 120, 212), 1.5, Qt.PenStyle.SolidLine))
+            painter.drawPolyline(points)
+        painter.end()
+
 
 class RTKStatusBar(HeaderCardWidget):
     """RTK状态栏"""
     
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, show_history=True):
         super().__init__()
         self.setTitle('RTK状态')
         
@@ -60,6 +125,15 @@ class RTKStatusBar(HeaderCardWidget):
         layout.addLayout(time_layout)
         layout.addLayout(satellite_layout)
         layout.addLayout(position_layout)
+
+        # 第四行（可选）：定位质量/HDOP历史
+        self.history_caption = None
+        self.sparkline = None
+        if show_history:
+            self.history_caption = CaptionLabel("定位质量/HDOP历史")
+            self.sparkline = RTKSparkline()
+            layout.addWidget(self.history_caption)
+            layout.addWidget(self.sparkline)
         
         # 添加布局到视图
         self.viewLayout.addLayout(layout)
@@ -67,6 +141,15 @@ class RTKStatusBar(HeaderCardWidget):
         # 缓存上一次显示的数据，避免不必要的更新
         self._last_display_data = {}
     
+    def update_history(self, samples):
+        """更新定位质量/HDOP历史曲线"""
+        if self.sparkline is None or not samples:
+            return
+        hdop = samples[-1][2]
+        hdop_text = f"{hdop:.1f}" if not math.isnan(hdop) else "-"
+        self.history_caption.setText(f"定位质量/HDOP历史（最近{len(samples)}条，当前HDOP {hdop_text}）")
+        self.sparkline.set_history(samples)
+
     def update_display(self, data):
         """高效更新显示内容，仅在数据变化时更新UI"""
         try:
@@ -157,5 +240,4 @@ class RTKStatusBar(HeaderCardWidget):
             #     print(f"RTK状态栏更新: {list(updates.keys())}")
                 
         except Exception as e:
-            # print(f"RTK状态栏更新时出错: {str(e)}")
-            pass
+            logger.error(f"RTK状态栏更新时出错: {e}")
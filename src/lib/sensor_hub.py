@@ -0,0 +1,667 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 10:05:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 22:10:00
+FilePath     : \\usbvna\\src\\lib\\sensor_hub.py
+Description  : 多传感器采集协调模块，用单个事件循环复用VNA、RTK及其它串口传感器，统一时间基准并写入同一会话文件
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import json
+import math
+import os
+import queue
+import re
+import selectors
+import socket
+import struct
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from .clock_sync import get_clock_sync
+from .logger_config import setup_logger
+
+# 创建日志记录器
+logger = setup_logger("sensor_hub", "logs/sensor_hub.log", level=10)  # 10对应DEBUG级别
+
+# 统一的记录信封：传感器名、传感器内序号、主机单调时间、GNSS时间、记录类型、负载
+SensorRecord = namedtuple('SensorRecord', ['sensor', 'seq', 'host_mono', 'gnss_time', 'kind', 'payload'])
+
+# 会话文件格式
+SESSION_MAGIC = b"GPRSESS1"
+RECORD_MAGIC = b"SREC"
+# magic, sensor_id, kind_id, payload_type, seq, host_mono, gnss_time, payload_len
+RECORD_FMT = "<4sBBBIddI"
+RECORD_SIZE = struct.calcsize(RECORD_FMT)
+
+PAYLOAD_JSON = 0
+PAYLOAD_FLOAT32 = 1
+PAYLOAD_FLOAT64 = 2
+
+# 记录类型编号，未登记的类型记为generic
+RECORD_KINDS = ['generic', 'trace', 'fix', 'altitude', 'imu', 'gap', 'event']
+
+# 激光测距串口配置的环境变量，格式同USBVNA_SIMULATOR，如"port=COM5,baudrate=115200,scale=0.001"
+ALTIMETER_ENV_VAR = "USBVNA_ALTIMETER"
+
+
+class SensorSource:
+    """
+    传感器数据源基类
+
+    可被select的数据源返回有效的fileno()，由事件循环在可读时调用poll()；
+    不可select的数据源（如Windows下的串口）fileno()返回None，由事件循环按固定周期轮询poll()。
+    """
+
+    # 记录类型，写入信封的kind字段
+    kind = 'generic'
+
+    def __init__(self, name):
+        self.name = name
+        self.seq = 0
+
+    def open(self):
+        """打开数据源，失败返回False"""
+        return True
+
+    def close(self):
+        """关闭数据源"""
+
+    def fileno(self):
+        """可select的文件描述符，不支持时返回None"""
+        return None
+
+    def poll(self, host_mono):
+        """
+        读取当前可用数据
+
+        Args:
+            host_mono (float): 本次读取的主机单调时间
+
+        Returns:
+            list: [(kind, payload), ...]
+        """
+        return []
+
+    def next_seq(self):
+        self.seq += 1
+        return self.seq
+
+
+class SerialLineSource(SensorSource):
+    """
+    按行输出的串口传感器数据源，串口以非阻塞方式打开
+
+    传入已打开的串口ser时直接读取该串口，串口由调用方负责关闭。
+    """
+
+    def __init__(self, name, port, baudrate=115200, max_line_bytes=4096, ser=None):
+        super().__init__(name)
+        self.port = port
+        self.baudrate = baudrate
+        self.max_line_bytes = max_line_bytes
+        self.ser = ser
+        self.owns_port = ser is None
+        self.buffer = b''
+
+    def open(self):
+        if not self.owns_port:
+            return bool(self.ser and self.ser.is_open)
+        import serial
+        try:
+            self.ser = serial.Serial(port=self.port, baudrate=self.baudrate, timeout=0)
+            return True
+        except Exception as e:
+            logger.error(f"打开串口传感器 {self.name} ({self.port}) 失败: {e}")
+            self.ser = None
+            return False
+
+    def close(self):
+        if not self.owns_port:
+            self.ser = None
+            return
+        if self.ser:
+            try:
+                self.ser.close()
+            except Exception as e:
+                logger.error(f"关闭串口传感器 {self.name} 失败: {e}")
+            finally:
+                self.ser = None
+
+    def fileno(self):
+        # POSIX下pyserial提供fileno，Windows下没有，退化为轮询
+        try:
+            return self.ser.fileno() if self.ser else None
+        except (AttributeError, OSError):
+            return None
+
+    def poll(self, host_mono):
+        if not self.ser:
+            return []
+        waiting = self.ser.in_waiting
+        if waiting <= 0:
+            return []
+        self.buffer += self.ser.read(waiting)
+
+        records = []
+        while b'\n' in self.buffer:
+            line_end = self.buffer.find(b'\n') + 1
+            line = self.buffer[:line_end].decode('utf-8', errors='ignore').strip()
+            self.buffer = self.buffer[line_end:]
+            if not line:
+                continue
+            payload = self.parse_line(line, host_mono)
+            if payload is not None:
+                records.append((self.kind, payload))
+
+        # 丢弃异常长的残行，防止噪声数据撑爆缓冲区
+        if len(self.buffer) > self.max_line_bytes:
+            self.buffer = b''
+        return records
+
+    def parse_line(self, line, host_mono):
+        """解析一行数据，返回负载字典或None"""
+        return {'raw': line}
+
+
+class NmeaSource(SerialLineSource):
+    """
+    RTK/GNSS NMEA数据源，复用RTKModule的解析逻辑并向时钟同步提交样本
+
+    传入rtk_module时读取该模块已连接的串口，每条语句交给模块处理（更新最新状态快照、按设置写CSV），
+    模块自身不再启动读写线程；否则自行打开串口，只用一个RTKModule做解析。
+    """
+
+    kind = 'fix'
+
+    def __init__(self, name, port=None, baudrate=115200, clock_sync=None, rtk_module=None):
+        if rtk_module is not None:
+            super().__init__(name, rtk_module.port, rtk_module.baudrate, ser=rtk_module.ser)
+            self.parser = rtk_module
+        else:
+            super().__init__(name, port, baudrate)
+            from .rtk_module import RTKModule
+            # 仅使用解析功能，不打开RTKModule自身的串口和线程
+            self.parser = RTKModule(port=port, baudrate=baudrate, clock_sync=clock_sync)
+
+    def parse_line(self, line, host_mono):
+        return self.parser.process_nmea_line(line, host_mono)
+
+
+class AltimeterSource(SerialLineSource):
+    """
+    激光测距（天线离地高度）数据源
+
+    多数激光测距模块以文本行输出距离，如"D=12.345m"或"12345"(毫米)；
+    从行中提取第一个数值，乘以scale换算为米。
+    """
+
+    kind = 'altitude'
+    NUMBER_RE = re.compile(r'[-+]?\d+(?:\.\d+)?')
+
+    def __init__(self, name, port, baudrate=115200, scale=1.0, ser=None):
+        super().__init__(name, port, baudrate, ser=ser)
+        self.scale = scale
+
+    def parse_line(self, line, host_mono):
+        match = self.NUMBER_RE.search(line)
+        if not match:
+            return None
+        return {'height_m': float(match.group(0)) * self.scale}
+
+
+def altimeter_from_env(name='altimeter'):
+    """
+    按环境变量USBVNA_ALTIMETER创建激光测距数据源
+
+    Returns:
+        AltimeterSource: 未设置、为"0"或未给出port时返回None
+    """
+    value = os.environ.get(ALTIMETER_ENV_VAR, "").strip()
+    if not value or value == "0":
+        return None
+    kwargs = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        key, val = (s.strip() for s in item.split("=", 1))
+        if key == "port":
+            kwargs[key] = val
+        elif key == "baudrate":
+            kwargs[key] = int(val)
+        elif key == "scale":
+            kwargs[key] = float(val)
+    if "port" not in kwargs:
+        logger.warning(f"{ALTIMETER_ENV_VAR}未指定port，不接入激光测距")
+        return None
+    return AltimeterSource(name, **kwargs)
+
+
+class SessionWriter:
+    """
+    同步会话文件写入器
+
+    文件头为SESSION_MAGIC + 4字节长度 + JSON元数据（传感器表），之后是定长记录头加负载的记录序列。
+    A-Scan道以float32原样写入，其它负载以紧凑JSON写入。
+    """
+
+    def __init__(self, file_path, flush_interval=1.0):
+        self.file_path = file_path
+        self.flush_interval = flush_interval
+        self.file = None
+        self.sensor_ids = {}
+        self._last_flush = 0.0
+
+    def open(self, sensor_names, metadata=None):
+        meta = dict(metadata or {})
+        meta['sensors'] = list(sensor_names)
+        meta['created'] = time.time()
+        self.sensor_ids = {name: i for i, name in enumerate(sensor_names)}
+        header = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+        self.file = open(self.file_path, 'wb')
+        self.file.write(SESSION_MAGIC + struct.pack("<I", len(header)) + header)
+        self._last_flush = time.monotonic()
+
+    def write(self, record):
+        if not self.file:
+            return
+        payload = record.payload
+        if isinstance(payload, np.ndarray):
+            if payload.dtype == np.float64:
+                payload_type, body = PAYLOAD_FLOAT64, payload.tobytes()
+            else:
+                payload_type, body = PAYLOAD_FLOAT32, payload.astype(np.float32, copy=False).tobytes()
+        else:
+            payload_type = PAYLOAD_JSON
+            body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode('utf-8')
+
+        gnss_time = record.gnss_time if record.gnss_time is not None else math.nan
+        kind_id = RECORD_KINDS.index(record.kind) if record.kind in RECORD_KINDS else 0
+        head = struct.pack(RECORD_FMT, RECORD_MAGIC, self.sensor_ids.get(record.sensor, 255), kind_id,
+                           payload_type, record.seq & 0xFFFFFFFF, record.host_mono, gnss_time, len(body))
+        self.file.write(head)
+        self.file.write(body)
+
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_interval:
+            self.file.flush()
+            self._last_flush = now
+
+    def close(self):
+        if self.file:
+            try:
+                self.file.flush()
+                self.file.close()
+            except Exception as e:
+                logger.error(f"关闭会话文件失败: {e}")
+            finally:
+                self.file = None
+
+
+def read_session(file_path):
+    """
+    读取会话文件
+
+    Args:
+        file_path (str): 会话文件路径
+
+    Returns:
+        tuple: (元数据dict, SensorRecord生成器)
+    """
+    f = open(file_path, 'rb')
+    magic = f.read(len(SESSION_MAGIC))
+    if magic != SESSION_MAGIC:
+        f.close()
+        raise ValueError(f"不是会话文件: {file_path}")
+    (meta_len,) = struct.unpack("<I", f.read(4))
+    meta = json.loads(f.read(meta_len).decode('utf-8'))
+    sensors = meta.get('sensors', [])
+
+    def records():
+        with f:
+            while True:
+                head = f.read(RECORD_SIZE)
+                if len(head) < RECORD_SIZE:
+                    return
+                (magic, sensor_id, kind_id, payload_type, seq,
+                 host_mono, gnss_time, length) = struct.unpack(RECORD_FMT, head)
+                body = f.read(length)
+                if magic != RECORD_MAGIC or len(body) < length:
+                    # 文件尾部不完整（采集中断），到此为止
+                    return
+                if payload_type == PAYLOAD_FLOAT32:
+                    payload = np.frombuffer(body, dtype=np.float32)
+                elif payload_type == PAYLOAD_FLOAT64:
+                    payload = np.frombuffer(body, dtype=np.float64)
+                else:
+                    payload = json.loads(body.decode('utf-8'))
+                kind = RECORD_KINDS[kind_id] if kind_id < len(RECORD_KINDS) else 'generic'
+                name = sensors[sensor_id] if sensor_id < len(sensors) else str(sensor_id)
+                yield SensorRecord(name, seq, host_mono, None if math.isnan(gnss_time) else gnss_time,
+                                   kind, payload)
+
+    return meta, records()
+
+
+class SensorHub:
+    """
+    多传感器采集协调器
+
+    所有串口传感器在同一个事件循环线程内处理：可select的数据源由selectors等待可读，
+    不可select的数据源按poll_interval轮询；VNA等阻塞式采集在自身线程中通过submit()
+    投递数据，经自管道唤醒事件循环。所有记录使用同一主机单调时钟打时间戳并换算为GNSS时间，
+    按到达顺序写入同一会话文件，并可通过回调分发给显示等消费者。
+
+    协调器可长期运行（如RTK启用期间一直读取串口），会话文件按每次采集用open_session()/close_session()
+    开关；运行中增删数据源和开关会话都在事件循环线程内执行，调用方等待其完成。
+    """
+
+    def __init__(self, session_path=None, poll_interval=0.005, clock_sync=None):
+        self.session_path = session_path
+        self.poll_interval = poll_interval
+        self.clock_sync = clock_sync if clock_sync is not None else get_clock_sync()
+        self.sources = []
+        self.external_sensors = []
+        self.listeners = []
+
+        self._selector = None
+        self._polled_sources = []
+        self._wake_r = None
+        self._wake_w = None
+        self._inbox = queue.SimpleQueue()
+        self._control = queue.SimpleQueue()
+        self._external_seq = {}
+        self._thread = None
+        self._running = False
+        self._writer = None
+        self.stats = {}
+
+    def add_source(self, source):
+        """
+        添加由事件循环读取的传感器数据源
+
+        start前添加的数据源在start时打开；运行中添加时立即打开并开始读取
+
+        Returns:
+            SensorSource: 添加的数据源，运行中打开失败返回None
+        """
+        if not self._running:
+            self.sources.append(source)
+            return source
+        return self._call(lambda: self._attach(source))
+
+    def remove_source(self, source):
+        """移除并关闭数据源，运行中移除时等待事件循环不再读取它"""
+        if not self._running:
+            if source in self.sources:
+                self.sources.remove(source)
+            return
+        self._call(lambda: self._detach(source))
+
+    def add_external_sensor(self, name):
+        """登记一个通过submit()投递数据的传感器（如VNA），需在打开会话文件前调用"""
+        if name not in self.external_sensors:
+            self.external_sensors.append(name)
+            self._external_seq[name] = 0
+
+    def add_listener(self, callback):
+        """添加记录回调，在事件循环线程中调用，回调内不应做耗时操作"""
+        self.listeners.append(callback)
+
+    def start(self):
+        """打开所有数据源并启动事件循环线程"""
+        if self._running:
+            return True
+
+        opened = []
+        for source in self.sources:
+            if source.open():
+                opened.append(source)
+            else:
+                logger.warning(f"传感器 {source.name} 打开失败，本次会话不记录该传感器")
+        self.sources = opened
+
+        self._selector = selectors.DefaultSelector()
+        # 自管道：submit()写入一个字节唤醒select
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+        self._polled_sources = []
+        for source in self.sources:
+            self._register(source)
+
+        if self.session_path:
+            self._open_writer(self.session_path)
+
+        self.stats = {name: 0 for name in [s.name for s in self.sources] + self.external_sensors}
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="SensorHub", daemon=True)
+        self._thread.start()
+        logger.info(f"传感器协调器已启动，数据源: {list(self.stats.keys())}")
+        return True
+
+    def stop(self):
+        """停止事件循环，写完剩余数据并关闭所有数据源"""
+        if not self._running:
+            return
+        self._running = False
+        self._wake()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+        for source in self.sources:
+            source.close()
+        if self._selector:
+            self._selector.close()
+            self._selector = None
+        for sock in (self._wake_r, self._wake_w):
+            if sock:
+                sock.close()
+        self._wake_r = self._wake_w = None
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+        logger.info(f"传感器协调器已停止，记录统计: {self.stats}")
+
+    @property
+    def session_open(self):
+        """是否正在写入会话文件"""
+        return self._writer is not None
+
+    def open_session(self, session_path, metadata=None):
+        """
+        开始写入会话文件，已有会话时先关闭
+
+        传感器表取打开时已添加的数据源和外部传感器，之后添加的传感器记为未知编号
+        """
+        self.session_path = session_path
+        if not self._running:
+            # 未运行时在start()中打开
+            return
+        self._call(lambda: self._open_writer(session_path, metadata))
+
+    def close_session(self):
+        """结束当前会话文件，协调器继续运行"""
+        self.session_path = None
+        if not self._running:
+            return
+        self._call(self._close_writer)
+
+    def submit(self, sensor, payload, host_mono=None, kind='trace'):
+        """
+        从其它线程投递一条记录（线程安全）
+
+        Args:
+            sensor (str): 传感器名，需先add_external_sensor()
+            payload: numpy数组或可JSON序列化的字典
+            host_mono (float, optional): 数据对应的主机单调时间，默认当前时间
+            kind (str): 记录类型
+        """
+        if not self._running:
+            return
+        if host_mono is None:
+            host_mono = time.monotonic()
+        self._inbox.put((sensor, host_mono, kind, payload))
+        self._wake()
+
+    def pending(self):
+        """收件箱中尚未处理的记录数"""
+        return self._inbox.qsize()
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b'\0')
+        except (BlockingIOError, OSError, AttributeError):
+            # 管道已满说明事件循环已被唤醒，忽略
+            pass
+
+    def _call(self, func, timeout=2.0):
+        """在事件循环线程中执行func并等待结果，超时记录错误并返回None"""
+        if threading.current_thread() is self._thread:
+            return func()
+        done = threading.Event()
+        result = {}
+
+        def run():
+            try:
+                result['value'] = func()
+            except Exception as e:
+                result['error'] = e
+            finally:
+                done.set()
+
+        self._control.put(run)
+        self._wake()
+        if not done.wait(timeout):
+            logger.error("传感器协调器事件循环无响应")
+            return None
+        if 'error' in result:
+            raise result['error']
+        return result.get('value')
+
+    def _apply_control(self):
+        while True:
+            try:
+                func = self._control.get_nowait()
+            except queue.Empty:
+                return
+            func()
+
+    def _register(self, source):
+        fd = source.fileno()
+        if fd is None:
+            self._polled_sources.append(source)
+        else:
+            self._selector.register(fd, selectors.EVENT_READ, source)
+
+    def _attach(self, source):
+        if not source.open():
+            logger.warning(f"传感器 {source.name} 打开失败，不记录该传感器")
+            return None
+        self._register(source)
+        self.sources.append(source)
+        self.stats.setdefault(source.name, 0)
+        logger.info(f"已接入传感器 {source.name}")
+        return source
+
+    def _detach(self, source):
+        if source not in self.sources:
+            return
+        self.sources.remove(source)
+        if source in self._polled_sources:
+            self._polled_sources.remove(source)
+        else:
+            try:
+                self._selector.unregister(source.fileno())
+            except (KeyError, ValueError, OSError):
+                pass
+        source.close()
+        logger.info(f"已移除传感器 {source.name}")
+
+    def _open_writer(self, session_path, metadata=None):
+        self._close_writer()
+        meta = {'poll_interval': self.poll_interval}
+        meta.update(metadata or {})
+        writer = SessionWriter(session_path)
+        writer.open([s.name for s in self.sources] + self.external_sensors, meta)
+        self._writer = writer
+
+    def _close_writer(self):
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+
+    def _emit(self, sensor, seq, host_mono, kind, payload):
+        gnss_time = payload.get('gnss_time') if isinstance(payload, dict) else None
+        if gnss_time is None:
+            gnss_time = self.clock_sync.to_gnss(host_mono)
+        record = SensorRecord(sensor, seq, host_mono, gnss_time, kind, payload)
+        self.stats[sensor] = self.stats.get(sensor, 0) + 1
+        if self._writer:
+            try:
+                self._writer.write(record)
+            except Exception as e:
+                logger.error(f"写入会话记录失败: {e}")
+        for callback in self.listeners:
+            try:
+                callback(record)
+            except Exception as e:
+                logger.error(f"记录回调出错: {e}")
+
+    def _drain_inbox(self):
+        while True:
+            try:
+                sensor, host_mono, kind, payload = self._inbox.get_nowait()
+            except queue.Empty:
+                return
+            self._external_seq[sensor] = self._external_seq.get(sensor, 0) + 1
+            self._emit(sensor, self._external_seq[sensor], host_mono, kind, payload)
+
+    def _read_source(self, source, host_mono):
+        try:
+            for kind, payload in source.poll(host_mono):
+                self._emit(source.name, source.next_seq(), host_mono, kind, payload)
+        except Exception as e:
+            logger.error(f"读取传感器 {source.name} 出错: {e}")
+
+    def _run(self):
+        """事件循环"""
+        while self._running:
+            # 有需要轮询的数据源时select带超时，否则只等待可读事件或唤醒
+            timeout = self.poll_interval if self._polled_sources else 0.5
+            try:
+                events = self._selector.select(timeout)
+            except OSError as e:
+                logger.error(f"select出错: {e}")
+                time.sleep(self.poll_interval)
+                continue
+
+            host_mono = time.monotonic()
+            for key, _ in events:
+                if key.data is None:
+                    try:
+                        while self._wake_r.recv(4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                else:
+                    self._read_source(key.data, host_mono)
+
+            for source in list(self._polled_sources):
+                self._read_source(source, host_mono)
+
+            self._drain_inbox()
+            self._apply_control()
+
+        # 退出前处理完已投递的数据和控制请求
+        self._drain_inbox()
+        self._apply_control()
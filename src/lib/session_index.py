@@ -0,0 +1,617 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 21:40:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 21:40:00
+FilePath     : \\usbvna\\src\\lib\\session_index.py
+Description  : 会话道索引与随机读取：采集时为每一道记录数据位置、时间戳、位置和质量标志到{prefix}_index.bin，
+               回放时按道号、时间段或经纬度范围直接定位，不必解析之前的全部数据。
+               支持实时数据流CSV、A-Scan分散存储文件夹和原始SDATA二进制三种存储方式；
+               索引缺失或落后于数据（如异常中止后恢复）时由数据文件和时间戳、中断、RTK旁路文件重建
+
+               用法（在src目录下）：python -m lib.session_index <目录> <前缀> [--rtk rtk_data_xxx.csv]
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+
+import numpy as np
+
+from .clock_sync import get_clock_sync
+from .logger_config import setup_logger
+from .raw_capture import record_dtype
+from .stream_journal import journal_path, read_journal, scan_rows
+
+logger = setup_logger("session_index", "logs/session_index.log", level=10)  # 10对应DEBUG级别
+
+INDEX_VERSION = 1
+
+# 存储方式
+LAYOUT_STREAMING = 'streaming'  # {prefix}_streaming.csv，一行一道
+LAYOUT_FOLDER = 'folder'        # {prefix}_0000001.csv，一道一个文件（仪器导出格式）
+LAYOUT_BINARY = 'binary'        # {prefix}_sdata.bin，定长记录的原始SDATA
+LAYOUTS = (LAYOUT_STREAMING, LAYOUT_FOLDER, LAYOUT_BINARY)
+
+# 质量标志
+FLAG_SYNC_LOCKED = 0x01  # 时间戳来自已锁定的GNSS时钟同步
+FLAG_AFTER_GAP = 0x02    # 重连后的第一道，与上一道之间有采集中断
+FLAG_POSITION = 0x04     # 有有效位置（与RTK定位的时间差不超过max_fix_age）
+
+# 定长索引记录；offset/length为数据文件中的字节位置（文件夹方式为0和文件大小），无效值为NaN
+INDEX_DTYPE = np.dtype([
+    ('trace', '<u4'),
+    ('offset', '<u8'),
+    ('length', '<u4'),
+    ('host_mono', '<f8'),
+    ('gnss_time', '<f8'),
+    ('latitude', '<f8'),
+    ('longitude', '<f8'),
+    ('altitude', '<f4'),
+    ('hdop', '<f4'),
+    ('fix_quality', 'u1'),
+    ('flags', 'u1'),
+])
+
+FOLDER_PATTERN = "{prefix}_{trace:07d}.csv"
+POINT_FOLDER_PATTERN = "{prefix}_{trace:08d}.csv"
+
+
+def index_paths(path, file_prefix):
+    """索引文件和描述文件路径"""
+    return (os.path.join(path, f"{file_prefix}_index.bin"),
+            os.path.join(path, f"{file_prefix}_index.json"))
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def _to_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def detect_layout(path, file_prefix):
+    """按目录中存在的数据文件判断存储方式，找不到时返回None"""
+    if os.path.exists(os.path.join(path, f"{file_prefix}_streaming.csv")):
+        return LAYOUT_STREAMING
+    if os.path.exists(os.path.join(path, f"{file_prefix}_sdata.bin")):
+        return LAYOUT_BINARY
+    if _folder_files(path, file_prefix):
+        return LAYOUT_FOLDER
+    return None
+
+
+def _folder_files(path, file_prefix):
+    """
+    Returns:
+        list: 按道号排序的(道号, 文件名)
+    """
+    pattern = re.compile(re.escape(file_prefix) + r'_(\d{7,8})\.csv$')
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return []
+    files = []
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            files.append((int(match.group(1)), name))
+    return sorted(files)
+
+
+def read_ascan_file(file_path):
+    """读取仪器导出的单道CSV（前7行为标题和元数据，第2列为幅值，END结束）"""
+    amp_data = []
+    with open(file_path, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        for _ in range(7):
+            next(reader, None)
+        for row in reader:
+            if len(row) >= 2 and row[0] != 'END':
+                try:
+                    amp_data.append(float(row[1]))
+                except ValueError:
+                    continue
+    return np.array(amp_data)
+
+
+class SessionIndexWriter:
+    """
+    采集时逐道追加索引记录
+
+    索引文件只作加速用途，按flush_every道刷新一次，不做fsync；异常中止后由SessionReader自动重建。
+    """
+
+    def __init__(self, path, file_prefix, layout=LAYOUT_STREAMING, file_pattern=FOLDER_PATTERN,
+                 position_source=None, max_fix_age=1.0, flush_every=50):
+        """
+        Args:
+            path (str): 数据目录
+            file_prefix (str): 文件前缀
+            layout (str): 存储方式
+            file_pattern (str): 文件夹方式的文件名格式
+            position_source (callable, optional): 返回最近一条RTK定位（RTKModule.latest_fix()格式）或None
+            max_fix_age (float): 定位与道时间戳的最大时间差(秒)，超过则不记录位置
+            flush_every (int): 每多少道刷新一次
+        """
+        self.path = path
+        self.file_prefix = file_prefix
+        self.layout = layout
+        self.file_pattern = file_pattern
+        self.position_source = position_source
+        self.max_fix_age = max_fix_age
+        self.flush_every = flush_every
+        self.clock_sync = get_clock_sync()
+        self.file = None
+        self.count = 0
+        self.reconnects = 0
+
+    def add(self, trace_index, host_mono, gnss_time=None, offset=0, length=0, reconnects=0):
+        """
+        记录一道
+
+        Args:
+            trace_index (int): 道号
+            host_mono (float): 道的主机单调时间
+            gnss_time (float, optional): 同步后的GNSS时间
+            offset (int): 数据在文件中的字节偏移
+            length (int): 数据字节长度
+            reconnects (int): 采集监管器累计的重连次数，增加时该道标记为中断后的第一道
+        """
+        record = np.zeros(1, dtype=INDEX_DTYPE)
+        record['trace'] = trace_index
+        record['offset'] = offset
+        record['length'] = length
+        record['host_mono'] = host_mono
+        record['gnss_time'] = gnss_time if gnss_time is not None else np.nan
+        flags = FLAG_SYNC_LOCKED if self.clock_sync.is_locked() else 0
+        if reconnects > self.reconnects:
+            flags |= FLAG_AFTER_GAP
+            self.reconnects = reconnects
+        record['latitude'] = record['longitude'] = record['altitude'] = record['hdop'] = np.nan
+        fix = self.position_source() if self.position_source else None
+        if fix and abs(host_mono - fix.get('host_mono', -np.inf)) <= self.max_fix_age:
+            latitude = _to_float(fix.get('latitude'))
+            longitude = _to_float(fix.get('longitude'))
+            if np.isfinite(latitude) and np.isfinite(longitude):
+                record['latitude'] = latitude
+                record['longitude'] = longitude
+                record['altitude'] = _to_float(fix.get('altitude'))
+                record['hdop'] = _to_float(fix.get('hdop'))
+                record['fix_quality'] = _to_int(fix.get('quality'))
+                flags |= FLAG_POSITION
+        record['flags'] = flags
+        try:
+            if self.file is None:
+                self._open()
+            self.file.write(record.tobytes())
+            self.count += 1
+            if self.count % self.flush_every == 0:
+                self.file.flush()
+        except OSError as e:
+            # 索引写入失败不影响采集流程，回放时可重建
+            logger.error(f"Error writing session index: {e}")
+
+    def _open(self):
+        index_path, meta_path = index_paths(self.path, self.file_prefix)
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'layout': self.layout, 'file_pattern': self.file_pattern,
+                       'fields': INDEX_DTYPE.descr}, f, indent=2, ensure_ascii=False)
+        self.file = open(index_path, 'wb')
+
+    def close(self):
+        if self.file:
+            try:
+                self.file.close()
+            except OSError as e:
+                logger.error(f"Error closing session index: {e}")
+            finally:
+                self.file = None
+
+
+def _read_timestamps(path, file_prefix):
+    """{prefix}_timestamps.csv -> {道号: (host_mono, gnss_time, sync_locked)}"""
+    timestamps = {}
+    try:
+        with open(os.path.join(path, f"{file_prefix}_timestamps.csv"), 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                timestamps[_to_int(row.get('Trace'))] = (
+                    _to_float(row.get('host_mono')), _to_float(row.get('gnss_time')), row.get('sync_locked') == '1')
+    except OSError:
+        pass
+    return timestamps
+
+
+def _read_gaps(path, file_prefix):
+    """{prefix}_gaps.csv -> 重连成功后第一道的道号集合"""
+    traces = set()
+    try:
+        with open(os.path.join(path, f"{file_prefix}_gaps.csv"), 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                if row.get('recovered') == '1' and row.get('after_trace', '') != '':
+                    traces.add(_to_int(row['after_trace']) + 1)
+    except OSError:
+        pass
+    return traces
+
+
+def _read_rtk(rtk_csv):
+    """
+    读取RTKModule保存的定位文件中带GNSS时间的GGA记录
+
+    Returns:
+        np.ndarray: 按GNSS时间排序的(gnss_time, latitude, longitude, altitude, quality, hdop)，形状(n, 6)
+    """
+    rows = []
+    with open(rtk_csv, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if not row.get('quality'):
+                continue
+            values = [_to_float(row.get(key)) for key in ('gnss_time', 'latitude', 'longitude', 'altitude',
+                                                          'quality', 'hdop')]
+            if all(np.isfinite(values[:3])):
+                rows.append(values)
+    fixes = np.array(rows, dtype=np.float64).reshape(-1, 6)
+    return fixes[np.argsort(fixes[:, 0], kind='stable')]
+
+
+def _apply_positions(index, fixes, max_fix_age):
+    """按GNSS时间在定位记录之间线性插值经纬度和海拔，质量和HDOP取时间最近的定位"""
+    if not len(fixes):
+        return
+    times = index['gnss_time']
+    right = np.clip(np.searchsorted(fixes[:, 0], times), 0, len(fixes) - 1)
+    left = np.clip(right - 1, 0, len(fixes) - 1)
+    nearest = np.where(np.abs(fixes[left, 0] - times) <= np.abs(fixes[right, 0] - times), left, right)
+    valid = np.isfinite(times) & (np.abs(fixes[nearest, 0] - times) <= max_fix_age)
+    index['latitude'] = np.where(valid, np.interp(times, fixes[:, 0], fixes[:, 1]), np.nan)
+    index['longitude'] = np.where(valid, np.interp(times, fixes[:, 0], fixes[:, 2]), np.nan)
+    index['altitude'] = np.where(valid, np.interp(times, fixes[:, 0], fixes[:, 3]), np.nan)
+    index['hdop'] = np.where(valid, fixes[nearest, 5], np.nan)
+    index['fix_quality'] = np.where(valid, np.nan_to_num(fixes[nearest, 4]), 0).astype(np.uint8)
+    index['flags'] = np.where(valid, index['flags'] | FLAG_POSITION, index['flags'] & np.uint8(0xFF ^ FLAG_POSITION))
+
+
+def _data_records(path, file_prefix, layout):
+    """
+    由数据文件得到每道的道号和字节位置
+
+    Returns:
+        tuple: (索引数组（只填写trace/offset/length）, 文件夹方式的文件名格式)
+    """
+    file_pattern = FOLDER_PATTERN
+    if layout == LAYOUT_STREAMING:
+        csv_path = os.path.join(path, f"{file_prefix}_streaming.csv")
+        records = read_journal(journal_path(csv_path))
+        size = os.path.getsize(csv_path)
+        end = records[-1].offset + records[-1].length if records else 0
+        if not records or end != size:
+            # 日志缺失或与CSV不一致（未提交的行、未恢复的文件）时逐行扫描
+            with open(csv_path, 'rb') as f:
+                content = f.read()
+            header_end = content.find(b'\n') + 1
+            columns = len(next(csv.reader([content[:header_end].decode('utf-8', errors='replace')]), []))
+            records = scan_rows(content, header_end, columns) if header_end > 0 else []
+        else:
+            records = records[1:]
+        index = np.zeros(len(records), dtype=INDEX_DTYPE)
+        if records:
+            index['trace'], index['offset'], index['length'] = np.array([r[:3] for r in records]).T
+    elif layout == LAYOUT_FOLDER:
+        files = _folder_files(path, file_prefix)
+        if files and len(re.search(r'_(\d+)\.csv$', files[0][1]).group(1)) == 8:
+            file_pattern = POINT_FOLDER_PATTERN
+        index = np.zeros(len(files), dtype=INDEX_DTYPE)
+        index['trace'] = [trace for trace, _ in files]
+        index['length'] = [os.path.getsize(os.path.join(path, name)) for _, name in files]
+    elif layout == LAYOUT_BINARY:
+        with open(os.path.join(path, f"{file_prefix}_sdata.json"), 'r', encoding='utf-8') as f:
+            dtype = record_dtype(json.load(f)['points'])
+        records = np.memmap(os.path.join(path, f"{file_prefix}_sdata.bin"), dtype=dtype, mode='r')
+        index = np.zeros(len(records), dtype=INDEX_DTYPE)
+        index['trace'] = records['trace']
+        index['offset'] = np.arange(len(records), dtype=np.uint64) * dtype.itemsize
+        index['length'] = dtype.itemsize
+        del records
+    else:
+        raise ValueError(f"未知的存储方式: {layout}")
+    return index, file_pattern
+
+
+def _write_index(path, file_prefix, index, layout, file_pattern):
+    index_path, meta_path = index_paths(path, file_prefix)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': INDEX_VERSION, 'layout': layout, 'file_pattern': file_pattern,
+                   'fields': INDEX_DTYPE.descr, 'rebuilt': True}, f, indent=2, ensure_ascii=False)
+    index.tofile(index_path)
+
+
+def _build(path, file_prefix, layout, rtk_csv=None, max_fix_age=1.0):
+    """
+    Returns:
+        tuple: (INDEX_DTYPE数组, 文件夹方式的文件名格式)
+    """
+    index, file_pattern = _data_records(path, file_prefix, layout)
+    timestamps = _read_timestamps(path, file_prefix)
+    gap_traces = _read_gaps(path, file_prefix)
+    for field in ('host_mono', 'gnss_time', 'latitude', 'longitude', 'altitude', 'hdop'):
+        index[field] = np.nan
+    for i, trace in enumerate(index['trace'].tolist()):
+        host_mono, gnss_time, locked = timestamps.get(trace, (np.nan, np.nan, False))
+        index['host_mono'][i] = host_mono
+        index['gnss_time'][i] = gnss_time
+        index['flags'][i] = (FLAG_SYNC_LOCKED if locked else 0) | (FLAG_AFTER_GAP if trace in gap_traces else 0)
+    if rtk_csv:
+        _apply_positions(index, _read_rtk(rtk_csv), max_fix_age)
+    logger.info("Built %s index for %s/%s: %d traces", layout, path, file_prefix, len(index))
+    return index, file_pattern
+
+
+def build_index(path, file_prefix, layout=None, rtk_csv=None, max_fix_age=1.0, write=True):
+    """
+    由数据文件和旁路文件重建索引
+
+    Args:
+        path (str): 数据目录
+        file_prefix (str): 文件前缀
+        layout (str, optional): 存储方式，默认自动判断
+        rtk_csv (str, optional): RTK定位文件（rtk_data_*.csv），提供时按GNSS时间插值位置
+        max_fix_age (float): 定位与道时间戳的最大时间差(秒)
+        write (bool): 是否写入{prefix}_index.bin
+
+    Returns:
+        np.ndarray: INDEX_DTYPE数组
+    """
+    layout = layout or detect_layout(path, file_prefix)
+    if layout is None:
+        raise FileNotFoundError(f"{path}中没有前缀为{file_prefix}的采集数据")
+    index, file_pattern = _build(path, file_prefix, layout, rtk_csv, max_fix_age)
+    if write:
+        _write_index(path, file_prefix, index, layout, file_pattern)
+    return index
+
+
+def load_index(path, file_prefix):
+    """
+    读取索引
+
+    Returns:
+        tuple: (描述dict, INDEX_DTYPE数组)，索引不存在或版本不兼容时返回(None, None)
+    """
+    index_path, meta_path = index_paths(path, file_prefix)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != INDEX_VERSION:
+            return None, None
+        # 末尾可能有未写完的记录，只取完整部分
+        count = os.path.getsize(index_path) // INDEX_DTYPE.itemsize
+        return meta, np.fromfile(index_path, dtype=INDEX_DTYPE, count=count)
+    except (OSError, ValueError):
+        return None, None
+
+
+def _merge_metadata(target, source):
+    """把source中同道号记录的时间戳、位置和标志复制到target（数据位置保持不变）"""
+    if not len(source) or not len(target):
+        return
+    order = np.argsort(source['trace'], kind='stable')
+    position = np.clip(np.searchsorted(source['trace'][order], target['trace']), 0, len(source) - 1)
+    matched = source['trace'][order][position] == target['trace']
+    rows = source[order][position[matched]]
+    for field in ('host_mono', 'gnss_time', 'latitude', 'longitude', 'altitude', 'hdop', 'fix_quality', 'flags'):
+        target[field][matched] = rows[field]
+
+
+class SessionReader:
+    """
+    会话数据的随机读取
+
+    位置参数i为会话中的第i道（从0开始，按采集顺序），道号见traces。
+    实时数据流方式返回一行的采样值（不含道数列，多测量时按表头顺序排列），
+    文件夹方式返回幅值列，二进制方式返回complex64原始SDATA（可用time_domain.transform变换）。
+    """
+
+    def __init__(self, path, file_prefix, layout=None, rtk_csv=None):
+        """
+        Args:
+            path (str): 数据目录
+            file_prefix (str): 文件前缀
+            layout (str, optional): 存储方式，默认自动判断；原始复数数据方式的会话可指定binary读取原始数据
+            rtk_csv (str, optional): RTK定位文件，提供时按其重新插值位置（不修改索引文件）
+        """
+        self.path = path
+        self.file_prefix = file_prefix
+        self.layout = layout or detect_layout(path, file_prefix)
+        if self.layout not in LAYOUTS:
+            raise FileNotFoundError(f"{path}中没有前缀为{file_prefix}的采集数据")
+        meta, stored = load_index(path, file_prefix)
+        self.file_pattern = (meta or {}).get('file_pattern', FOLDER_PATTERN)
+        if meta is None or meta.get('layout') != self.layout or self._is_stale(stored):
+            # 索引缺失、落后于数据或属于另一种存储方式时重建，采集时记录的位置等信息按道号保留
+            logger.info("Session index for %s/%s missing or stale, rebuilding", path, file_prefix)
+            index, self.file_pattern = _build(path, file_prefix, self.layout)
+            if stored is not None:
+                _merge_metadata(index, stored)
+            # 另一种存储方式的索引（如原始复数数据会话中CSV的索引）保留不覆盖
+            if meta is None or meta.get('layout') == self.layout:
+                _write_index(path, file_prefix, index, self.layout, self.file_pattern)
+        else:
+            index = stored
+        if rtk_csv:
+            _apply_positions(index, _read_rtk(rtk_csv), 1.0)
+        self.index = index
+        self.header = None
+        self._file = None
+        self._records = None
+        self._open_data()
+
+    def _data_path(self):
+        if self.layout == LAYOUT_STREAMING:
+            return os.path.join(self.path, f"{self.file_prefix}_streaming.csv")
+        if self.layout == LAYOUT_BINARY:
+            return os.path.join(self.path, f"{self.file_prefix}_sdata.bin")
+        return self.path
+
+    def _is_stale(self, stored):
+        """索引记录与数据文件是否对不上（数据多于或少于索引）"""
+        if stored is None:
+            return True
+        if self.layout == LAYOUT_FOLDER:
+            return len(_folder_files(self.path, self.file_prefix)) != len(stored)
+        # 数据文件须恰好结束于最后一道之后
+        size = os.path.getsize(self._data_path())
+        if not len(stored):
+            return size > 0
+        return size != int(stored['offset'][-1]) + int(stored['length'][-1])
+
+    def _open_data(self):
+        if self.layout == LAYOUT_STREAMING:
+            self._file = open(self._data_path(), 'rb')
+            self.header = self._file.readline().decode('utf-8').strip().split(',')
+        elif self.layout == LAYOUT_BINARY:
+            with open(os.path.join(self.path, f"{self.file_prefix}_sdata.json"), 'r', encoding='utf-8') as f:
+                self.meta = json.load(f)
+            self._records = np.memmap(self._data_path(), dtype=record_dtype(self.meta['points']), mode='r')
+
+    def __len__(self):
+        return len(self.index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def traces(self):
+        """各道的道号"""
+        return self.index['trace']
+
+    def find(self, trace_index):
+        """
+        Returns:
+            int: 道号对应的位置，不存在时返回None
+        """
+        positions = np.flatnonzero(self.index['trace'] == trace_index)
+        return int(positions[0]) if len(positions) else None
+
+    def get_trace(self, i):
+        """读取第i道"""
+        if not -len(self) <= i < len(self):
+            raise IndexError(f"道位置{i}超出范围(共{len(self)}道)")
+        record = self.index[i]
+        if self.layout == LAYOUT_STREAMING:
+            self._file.seek(int(record['offset']))
+            return self._parse_rows(self._file.read(int(record['length'])))[0]
+        if self.layout == LAYOUT_BINARY:
+            return np.array(self._records['data'][int(record['offset']) // self._records.dtype.itemsize])
+        name = self.file_pattern.format(prefix=self.file_prefix, trace=int(record['trace']))
+        return read_ascan_file(os.path.join(self.path, name))
+
+    def get_range(self, a, b):
+        """
+        读取第a道到第b道（不含b）
+
+        Returns:
+            np.ndarray: 形状(道数, 采样点数)
+        """
+        a, b, _ = slice(a, b).indices(len(self))
+        if b <= a:
+            return np.empty((0, 0))
+        records = self.index[a:b]
+        if self.layout == LAYOUT_STREAMING:
+            start = int(records['offset'][0])
+            end = int(records['offset'][-1]) + int(records['length'][-1])
+            # 流式CSV中的道连续存放，一次读出
+            if end - start == int(records['length'].sum()):
+                self._file.seek(start)
+                return self._parse_rows(self._file.read(end - start))
+        if self.layout == LAYOUT_BINARY:
+            rows = records['offset'] // self._records.dtype.itemsize
+            if len(rows) and rows[-1] - rows[0] + 1 == len(rows):
+                return np.array(self._records['data'][int(rows[0]):int(rows[-1]) + 1])
+        return np.array([self.get_trace(i) for i in range(a, b)])
+
+    def get_traces(self, positions):
+        """读取一组位置（如query_time()的结果）上的道"""
+        positions = np.asarray(positions, dtype=np.intp)
+        if len(positions) and np.all(np.diff(positions) == 1):
+            return self.get_range(int(positions[0]), int(positions[-1]) + 1)
+        return np.array([self.get_trace(int(i)) for i in positions])
+
+    def query_time(self, t0, t1, clock='gnss'):
+        """
+        按时间段查询
+
+        Args:
+            t0 (float): 起始时间
+            t1 (float): 终止时间（含）
+            clock (str): gnss为同步后的GNSS纪元秒，host为主机单调时间
+
+        Returns:
+            np.ndarray: 时间段内各道的位置
+        """
+        times = self.index['gnss_time' if clock == 'gnss' else 'host_mono']
+        return np.flatnonzero((times >= t0) & (times <= t1))
+
+    def query_bbox(self, lat_min, lon_min, lat_max, lon_max, min_quality=0):
+        """
+        按经纬度范围查询
+
+        Args:
+            lat_min (float): 最小纬度
+            lon_min (float): 最小经度
+            lat_max (float): 最大纬度
+            lon_max (float): 最大经度
+            min_quality (int): 最低定位质量（GGA定位质量，4为RTK固定解）
+
+        Returns:
+            np.ndarray: 范围内各道的位置
+        """
+        index = self.index
+        mask = (index['flags'] & FLAG_POSITION).astype(bool) & (index['fix_quality'] >= min_quality)
+        mask &= (index['latitude'] >= lat_min) & (index['latitude'] <= lat_max)
+        mask &= (index['longitude'] >= lon_min) & (index['longitude'] <= lon_max)
+        return np.flatnonzero(mask)
+
+    @staticmethod
+    def _parse_rows(blob):
+        """解析连续的CSV行，去掉第一列道数"""
+        lines = blob.decode('utf-8').splitlines()
+        return np.array([line.split(',')[1:] for line in lines], dtype=np.float64)
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        self._records = None
+
+
+def main():
+    ap = argparse.ArgumentParser(description="由数据文件和旁路文件重建会话道索引")
+    ap.add_argument("path", help="数据目录")
+    ap.add_argument("file_prefix", help="文件前缀")
+    ap.add_argument("--layout", choices=LAYOUTS, default=None, help="存储方式，默认自动判断")
+    ap.add_argument("--rtk", default=None, help="RTK定位文件（rtk_data_*.csv），按GNSS时间插值位置")
+    ap.add_argument("--max-fix-age", type=float, default=1.0, help="定位与道的最大时间差(秒)")
+    args = ap.parse_args()
+    index = build_index(args.path, args.file_prefix, args.layout, args.rtk, args.max_fix_age)
+    positioned = int(np.count_nonzero(index['flags'] & FLAG_POSITION))
+    print(f"共{len(index)}道，其中{positioned}道有位置，索引已写入{index_paths(args.path, args.file_prefix)[0]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 18:10:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 18:10:00
+FilePath     : \\usbvna\\src\\lib\\startup_profile.py
+Description  : 启动耗时剖析：按顶层包统计导入耗时，按阶段记录界面初始化耗时，输出JSON报告用于发现启动回退
+               设置环境变量USBVNA_STARTUP_PROFILE=1或以--profile-startup启动时生效
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import importlib.abc
+import json
+import os
+import sys
+import time
+
+PROFILE_ENV_VAR = "USBVNA_STARTUP_PROFILE"
+
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    """
+    导入计时钩子：包装每个模块加载器的exec_module，记录模块自身耗时（扣除嵌套导入）和累计耗时
+    """
+
+    def __init__(self):
+        self.modules = {}
+        self._stack = []
+        self._finding = set()
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname in self._finding:
+            return None
+        self._finding.add(fullname)
+        try:
+            spec = None
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, 'find_spec'):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+        finally:
+            self._finding.discard(fullname)
+        loader = getattr(spec, 'loader', None) if spec is not None else None
+        # 内置/冻结模块的加载器是类本身，为所有模块共享，不做包装
+        if loader is None or isinstance(loader, type) or not hasattr(loader, 'exec_module'):
+            return spec
+        exec_module = loader.exec_module
+
+        def timed_exec_module(module, _exec=exec_module, _name=fullname):
+            self._stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                _exec(module)
+            finally:
+                elapsed = time.perf_counter() - start
+                children = self._stack.pop()
+                if self._stack:
+                    self._stack[-1] += elapsed
+                self.modules[_name] = (elapsed - children, elapsed)
+
+        loader.exec_module = timed_exec_module
+        return spec
+
+
+class StartupProfiler:
+    """启动剖析器，未启用时所有方法均为空操作"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.t0 = time.perf_counter()
+        self.phases = []
+        self._last = self.t0
+        self._import_timer = None
+
+    def install_import_hook(self):
+        """安装导入计时钩子，需在导入lib其它模块之前调用"""
+        if self.enabled and self._import_timer is None:
+            self._import_timer = _ImportTimer()
+            sys.meta_path.insert(0, self._import_timer)
+
+    def mark(self, phase):
+        """记录从上一个阶段结束到现在的耗时"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last, now - self.t0))
+        self._last = now
+
+    def report(self, top=15):
+        """
+        Returns:
+            dict: 阶段耗时、按顶层包汇总的导入耗时和耗时最多的模块
+        """
+        packages = {}
+        slowest = []
+        if self._import_timer is not None:
+            for name, (self_time, cumulative) in self._import_timer.modules.items():
+                package = name.split('.')[0]
+                packages[package] = packages.get(package, 0.0) + self_time
+                slowest.append((name, self_time, cumulative))
+        slowest.sort(key=lambda item: item[1], reverse=True)
+        return {
+            'total_ms': round((self._last - self.t0) * 1000.0, 1),
+            'phases': [{'phase': p, 'ms': round(d * 1000.0, 1), 'at_ms': round(t * 1000.0, 1)}
+                       for p, d, t in self.phases],
+            'imports_by_package_ms': {k: round(v * 1000.0, 1)
+                                      for k, v in sorted(packages.items(), key=lambda kv: -kv[1])[:top]},
+            'slowest_modules': [{'module': n, 'self_ms': round(s * 1000.0, 1), 'cumulative_ms': round(c * 1000.0, 1)}
+                                for n, s, c in slowest[:top]],
+        }
+
+    def dump(self, file_path=None):
+        """打印报告，指定路径时同时写入JSON"""
+        if not self.enabled:
+            return None
+        report = self.report()
+        lines = [f"启动耗时 {report['total_ms']:.1f} ms"]
+        lines += [f"  阶段 {p['phase']:<24}{p['ms']:>9.1f} ms  (累计 {p['at_ms']:.1f} ms)" for p in report['phases']]
+        lines += [f"  导入 {name:<24}{ms:>9.1f} ms" for name, ms in report['imports_by_package_ms'].items()]
+        print("\n".join(lines))
+        if file_path:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+        return report
+
+
+_profiler = None
+
+
+def get_startup_profiler():
+    """获取进程内共享的StartupProfiler，首次调用时按环境变量决定是否启用"""
+    global _profiler
+    if _profiler is None:
+        _profiler = StartupProfiler(enabled=os.environ.get(PROFILE_ENV_VAR, "") not in ("", "0"))
+    return _profiler
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 21:20:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 21:40:00
+FilePath     : \\usbvna\\src\\lib\\stream_journal.py
+Description  : 流式CSV的日志式写入：数据行仍按原格式写入{prefix}_streaming.csv，每道的偏移、长度和CRC32
+               作为提交记录写入{prefix}_streaming.jnl；按时间或道数分组fsync，落盘开销可配置。
+               断电等异常中止后用recover()截断到最后一条有效记录并重建日志
+
+               用法（在src目录下）：python -m lib.stream_journal <streaming.csv> [--dry-run]
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import argparse
+import csv
+import io
+import os
+import struct
+import time
+import zlib
+from collections import namedtuple
+
+from .logger_config import setup_logger
+from .metrics import get_metrics
+
+logger = setup_logger("stream_journal", "logs/stream_journal.log", level=10)  # 10对应DEBUG级别
+
+# 落盘策略
+DURABILITY_NONE = 'none'    # 只在分组提交时flush到操作系统缓存，不fsync；断电可能丢失最近数秒的数据
+DURABILITY_GROUP = 'group'  # 每sync_interval_ms毫秒或sync_traces道（先到者）fsync一次
+DURABILITY_TRACE = 'trace'  # 每道fsync，最安全，开销最大
+DURABILITIES = (DURABILITY_NONE, DURABILITY_GROUP, DURABILITY_TRACE)
+
+JOURNAL_MAGIC = b'USBVNAJ1'
+# 提交记录：道号(0为表头行)、数据行在CSV中的字节偏移、字节长度、数据行CRC32，末尾为前20字节的CRC32
+_RECORD = struct.Struct('<IQII')
+_RECORD_CRC = struct.Struct('<I')
+RECORD_SIZE = _RECORD.size + _RECORD_CRC.size
+
+JournalRecord = namedtuple('JournalRecord', ['trace', 'offset', 'length', 'crc'])
+
+
+def journal_path(csv_path):
+    """CSV文件对应的日志文件路径，{prefix}_streaming.csv -> {prefix}_streaming.jnl"""
+    return os.path.splitext(csv_path)[0] + '.jnl'
+
+
+def pack_record(record):
+    body = _RECORD.pack(*record)
+    return body + _RECORD_CRC.pack(zlib.crc32(body))
+
+
+def read_journal(file_path):
+    """
+    读取日志文件中的提交记录，遇到残缺或校验失败的记录即停止
+
+    Returns:
+        list: JournalRecord列表，文件不存在或文件头无效时返回None
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            content = f.read()
+    except OSError:
+        return None
+    if not content.startswith(JOURNAL_MAGIC):
+        return None
+    records = []
+    for start in range(len(JOURNAL_MAGIC), len(content) - RECORD_SIZE + 1, RECORD_SIZE):
+        body = content[start:start + _RECORD.size]
+        (crc,) = _RECORD_CRC.unpack_from(content, start + _RECORD.size)
+        if zlib.crc32(body) != crc:
+            break
+        records.append(JournalRecord(*_RECORD.unpack(body)))
+    return records
+
+
+class JournaledCSVWriter:
+    """
+    流式CSV的日志式写入器
+
+    数据行先写入CSV，提交时先fsync CSV再追加并fsync提交记录，因此日志中的每条记录所指的数据都已落盘；
+    CSV末尾可能有已写入但未提交的行，恢复时逐行校验后补记。
+    """
+
+    def __init__(self, file_path, durability=DURABILITY_GROUP, sync_interval_ms=200, sync_traces=50):
+        """
+        Args:
+            file_path (str): CSV文件路径
+            durability (str): 落盘策略，见DURABILITIES
+            sync_interval_ms (float): 分组提交的最长间隔(毫秒)
+            sync_traces (int): 分组提交的最大道数
+        """
+        if durability not in DURABILITIES:
+            raise ValueError(f"未知的落盘策略: {durability}")
+        self.file_path = file_path
+        self.journal_path = journal_path(file_path)
+        self.durability = durability
+        self.sync_interval = sync_interval_ms / 1000.0
+        self.sync_traces = 1 if durability == DURABILITY_TRACE else max(1, int(sync_traces))
+        self.metrics = get_metrics()
+        self.file = None
+        self.journal = None
+        self.offset = 0
+        self.pending = []
+        self.last_commit = 0.0
+        # 行编码缓冲区，与原先newline=''打开文件后csv.writer写出的内容逐字节一致
+        self.buffer = io.StringIO()
+        self.row_writer = csv.writer(self.buffer)
+        self.traces = 0
+        self.sync_count = 0
+        self.sync_seconds = 0.0
+
+    @property
+    def is_open(self):
+        return self.file is not None
+
+    def open(self, header):
+        """创建CSV和日志文件并写入表头行（道号0）"""
+        self.file = open(self.file_path, 'wb')
+        self.journal = open(self.journal_path, 'wb')
+        self.journal.write(JOURNAL_MAGIC)
+        self.offset = 0
+        self.pending = []
+        self.last_commit = time.monotonic()
+        self._append(0, header)
+        self.commit()
+
+    def write(self, trace_index, row):
+        """
+        写入一道，满足分组条件时提交
+
+        Args:
+            trace_index (int): 道号
+            row (list): trace_row()得到的一行
+
+        Returns:
+            JournalRecord: 该行在CSV中的位置，供会话索引使用
+        """
+        record = self._append(trace_index, row)
+        self.traces += 1
+        if len(self.pending) >= self.sync_traces or time.monotonic() - self.last_commit >= self.sync_interval:
+            self.commit()
+        return record
+
+    def _append(self, trace_index, row):
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        self.row_writer.writerow(row)
+        data = self.buffer.getvalue().encode('utf-8')
+        self.file.write(data)
+        record = JournalRecord(trace_index, self.offset, len(data), zlib.crc32(data))
+        self.pending.append(record)
+        self.offset += len(data)
+        return record
+
+    def commit(self):
+        """提交已写入的行：数据先落盘，再写提交记录"""
+        if self.file is None or not self.pending:
+            return
+        sync_start = time.monotonic()
+        self.file.flush()
+        if self.durability != DURABILITY_NONE:
+            os.fsync(self.file.fileno())
+        self.journal.write(b''.join(pack_record(record) for record in self.pending))
+        self.journal.flush()
+        if self.durability != DURABILITY_NONE:
+            os.fsync(self.journal.fileno())
+            self.sync_count += 1
+            self.sync_seconds += time.monotonic() - sync_start
+            self.metrics.record('sync', sync_start)
+        self.pending = []
+        self.last_commit = time.monotonic()
+
+    def close(self):
+        """提交剩余的行并关闭文件，失败时记录日志"""
+        if self.file is None:
+            return
+        try:
+            self.commit()
+        except OSError as e:
+            logger.error(f"Error committing {self.file_path}: {e}")
+        for f in (self.file, self.journal):
+            try:
+                f.close()
+            except OSError as e:
+                logger.error(f"Error closing {f.name}: {e}")
+        self.file = None
+        self.journal = None
+        logger.info("Closed %s: %d traces, %d fsync groups, %.1f ms in fsync (%s)", self.file_path, self.traces,
+                    self.sync_count, self.sync_seconds * 1000.0, self.durability)
+
+
+RecoveryReport = namedtuple('RecoveryReport', ['traces', 'committed', 'salvaged', 'truncated_bytes', 'rebuilt'])
+
+
+def scan_rows(content, offset, columns):
+    """
+    从offset开始逐行校验CSV内容：行须以换行结束、列数与表头一致、首列为道号、其余列为数值
+
+    Returns:
+        list: 有效行的JournalRecord，遇到第一条无效行即停止
+    """
+    records = []
+    while offset < len(content):
+        end = content.find(b'\n', offset)
+        if end < 0:
+            break
+        data = content[offset:end + 1]
+        try:
+            fields = next(csv.reader([data.decode('utf-8')]))
+            if len(fields) != columns:
+                break
+            trace_index = int(fields[0])
+            for value in fields[1:]:
+                float(value)
+        except (UnicodeDecodeError, ValueError, StopIteration):
+            break
+        records.append(JournalRecord(trace_index, offset, len(data), zlib.crc32(data)))
+        offset = end + 1
+    return records
+
+
+def recover(csv_path, dry_run=False):
+    """
+    恢复异常中止的流式CSV
+
+    按日志校验已提交的行（偏移连续且CRC一致），其后未提交的完整行逐行校验后补记，
+    CSV截断到最后一条有效行的末尾，日志重写为与CSV一致。日志缺失或损坏时按CSV内容重建。
+
+    Args:
+        csv_path (str): {prefix}_streaming.csv路径
+        dry_run (bool): 只检查不修改文件
+
+    Returns:
+        RecoveryReport: 有效道数、日志中已提交的道数、补记的道数、截断的字节数、日志是否整体重建
+    """
+    with open(csv_path, 'rb') as f:
+        content = f.read()
+    journal = read_journal(journal_path(csv_path))
+    rebuilt = journal is None
+
+    # 校验日志中的记录
+    valid = []
+    end = 0
+    for record in journal or []:
+        data = content[record.offset:record.offset + record.length]
+        if record.offset != end or len(data) != record.length or zlib.crc32(data) != record.crc:
+            logger.warning("Journal record for trace %d does not match %s", record.trace, csv_path)
+            break
+        valid.append(record)
+        end = record.offset + record.length
+    committed = max(0, len(valid) - 1)
+
+    # 没有有效的表头记录时从文件开头重建
+    if not valid or valid[0].trace != 0:
+        valid = []
+        end = content.find(b'\n') + 1
+        if end > 0:
+            valid.append(JournalRecord(0, 0, end, zlib.crc32(content[:end])))
+        rebuilt = True
+        committed = 0
+
+    salvaged = []
+    if valid:
+        columns = len(next(csv.reader([content[:valid[0].length].decode('utf-8', errors='replace')])))
+        salvaged = scan_rows(content, end, columns)
+        if salvaged:
+            end = salvaged[-1].offset + salvaged[-1].length
+        valid += salvaged
+
+    report = RecoveryReport(max(0, len(valid) - 1), committed, len(salvaged), len(content) - end, rebuilt)
+    if dry_run:
+        return report
+
+    with open(csv_path, 'r+b') as f:
+        f.truncate(end)
+        f.flush()
+        os.fsync(f.fileno())
+    # 日志先写临时文件再替换，恢复过程中断电不会留下半份日志
+    temp_path = journal_path(csv_path) + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(JOURNAL_MAGIC)
+        f.write(b''.join(pack_record(record) for record in valid))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, journal_path(csv_path))
+    logger.info("Recovered %s: %s", csv_path, report)
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description="恢复异常中止的流式CSV：截断到最后一条有效记录并重建日志")
+    ap.add_argument("csv_path", help="{prefix}_streaming.csv路径")
+    ap.add_argument("--dry-run", action="store_true", help="只检查不修改文件")
+    args = ap.parse_args()
+    report = recover(args.csv_path, dry_run=args.dry_run)
+    print(f"有效道数: {report.traces}（日志已提交{report.committed}道，补记{report.salvaged}道）")
+    print(f"截断字节数: {report.truncated_bytes}{'（未修改文件）' if args.dry_run else ''}")
+    if report.rebuilt:
+        print("日志缺失或损坏，已按CSV内容重建")
+
+
+if __name__ == "__main__":
+    main()
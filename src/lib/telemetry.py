@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 11:02:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 22:00:00
+FilePath     : \\usbvna\\src\\lib\\telemetry.py
+Description  : A-Scan二进制UDP遥测协议，定长包头 + 零拷贝分片负载，替代JSON分片上行
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import socket
+import struct
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from .clock_sync import get_clock_sync
+from .datagram_io import DEFAULT_SNDBUF, BatchSender
+from .fec import FEC_RS, FEC_XOR
+from .logger_config import setup_logger
+from .trace_codec import TraceDecoder, TraceEncoder
+
+# 创建日志记录器
+logger = setup_logger("telemetry", "logs/telemetry.log", level=10)  # 10对应DEBUG级别
+
+# ========== 包头定义 ==========
+# magic, version, dtype, codec, flags, session_id, trace_id, frag_idx, frag_cnt,
+# n_samples, payload_len, byte_offset, timestamp_us
+MAGIC = b"GPRT"
+VERSION = 1
+HDR_FMT = "!4sBBBBIIHHIIIQ"
+HDR_SIZE = struct.calcsize(HDR_FMT)
+_HDR = struct.Struct(HDR_FMT)
+
+# 样本数据类型编号
+DTYPE_FLOAT32 = 1
+DTYPE_INT16 = 2
+DTYPE_FLOAT64 = 3
+DTYPE_UINT8 = 4
+
+DTYPES = {
+    DTYPE_FLOAT32: np.dtype('>f4'),
+    DTYPE_INT16: np.dtype('>i2'),
+    DTYPE_FLOAT64: np.dtype('>f8'),
+    DTYPE_UINT8: np.dtype('u1'),
+}
+
+# 编解码器编号（0为未压缩原始样本，其余见trace_codec）
+CODEC_RAW = 0
+
+# 标志位
+FLAG_LAST_OF_BURST = 0x01
+# 该道带XOR/Reed-Solomon校验分片（所有分片都置位），以及校验分片标志
+FLAG_FEC_XOR = 0x02
+FLAG_FEC_RS = 0x04
+FLAG_PARITY = 0x08
+
+# 默认单个UDP数据报上限：4G/电台链路上经隧道封装后仍不超过常见路径MTU
+DEFAULT_MAX_DATAGRAM = 1200
+
+TelemetryHeader = namedtuple('TelemetryHeader', [
+    'version', 'dtype', 'codec', 'flags', 'session_id', 'trace_id', 'frag_idx', 'frag_cnt',
+    'n_samples', 'payload_len', 'byte_offset', 'timestamp_us'
+])
+
+
+def dtype_code(dtype):
+    """numpy数据类型转换为协议编号"""
+    dtype = np.dtype(dtype)
+    for code, wire_dtype in DTYPES.items():
+        if wire_dtype.kind == dtype.kind and wire_dtype.itemsize == dtype.itemsize:
+            return code
+    raise ValueError(f"不支持的样本数据类型: {dtype}")
+
+
+def pack_header(header):
+    """打包包头"""
+    return _HDR.pack(MAGIC, *header)
+
+
+def parse_datagram(datagram):
+    """
+    解析一个遥测数据报
+
+    Args:
+        datagram (bytes | bytearray | memoryview): 收到的数据报
+
+    Returns:
+        tuple: (TelemetryHeader, 负载memoryview)，不是遥测数据报时返回(None, None)
+    """
+    if len(datagram) < HDR_SIZE:
+        return None, None
+    fields = _HDR.unpack_from(datagram, 0)
+    if fields[0] != MAGIC:
+        return None, None
+    header = TelemetryHeader(*fields[1:])
+    if header.version != VERSION or header.frag_cnt == 0 or header.frag_idx >= header.frag_cnt:
+        return None, None
+    return header, memoryview(datagram)[HDR_SIZE:]
+
+
+def fragment_payload_size(max_datagram, itemsize=1):
+    """
+    计算单个分片可承载的负载字节数，并对齐到样本字节数，保证每个分片都能独立解析
+
+    Args:
+        max_datagram (int): 单个数据报上限（含包头）
+        itemsize (int): 样本字节数
+
+    Returns:
+        int: 每个分片的负载字节数
+    """
+    size = max_datagram - HDR_SIZE
+    size -= size % itemsize
+    if size <= 0:
+        raise ValueError(f"数据报上限{max_datagram}字节不足以容纳包头")
+    return size
+
+
+def fragment_count(payload_len, frag_size):
+    """负载分片数，空负载也占一个分片"""
+    return max(1, -(-payload_len // frag_size))
+
+
+def fec_scheme(flags):
+    """包头标志位中的FEC方案，未启用返回None"""
+    if flags & FLAG_FEC_RS:
+        return FEC_RS
+    if flags & FLAG_FEC_XOR:
+        return FEC_XOR
+    return None
+
+
+def fec_layout(header, payload_size):
+    """
+    由带FEC的任一分片推算分片大小和数据分片数
+
+    数据分片按等长切分：序号i>0的分片偏移为i*frag_size，0号分片不是唯一数据分片时长度即frag_size；
+    校验分片补零到frag_size。
+
+    Returns:
+        tuple: (frag_size, 数据分片数k)
+    """
+    if header.flags & FLAG_PARITY or header.frag_idx == 0:
+        frag_size = payload_size
+    else:
+        frag_size = header.byte_offset // header.frag_idx
+    if frag_size <= 0:
+        return max(1, header.payload_len), 1
+    return frag_size, fragment_count(header.payload_len, frag_size)
+
+
+def to_wire(samples, dtype=np.float32):
+    """
+    将样本转换为网络字节序的连续数组（已符合要求时不复制）
+
+    整数传输类型只接受已是整数的样本（如ADC计数）：浮点幅值直接转换会截断为0，
+    需要压缩浮点样本时应使用带缩放系数的quant16编解码器。
+
+    Args:
+        samples (np.ndarray | list): A-Scan样本
+        dtype: 传输数据类型，float32或int16等
+
+    Returns:
+        np.ndarray: 大端连续数组，浮点样本配整数传输类型时抛出ValueError
+    """
+    code = dtype_code(dtype)
+    wire_dtype = DTYPES[code]
+    samples = np.asarray(samples)
+    if wire_dtype.kind in 'iu' and samples.dtype.kind not in 'iub':
+        raise ValueError(f"{samples.dtype}样本不能直接按{wire_dtype}传输，请使用quant16编解码器")
+    return np.ascontiguousarray(samples, dtype=wire_dtype)
+
+
+def payload_to_array(payload, dtype_id):
+    """
+    将重组后的负载还原为本机字节序的numpy数组
+
+    Args:
+        payload (bytes | memoryview): 负载
+        dtype_id (int): 包头中的数据类型编号
+
+    Returns:
+        np.ndarray: 样本数组
+    """
+    wire_dtype = DTYPES[dtype_id]
+    return np.frombuffer(payload, dtype=wire_dtype).astype(wire_dtype.newbyteorder('='), copy=False)
+
+
+def decode_payload(header, payload, decoder=None):
+    """
+    按包头中的codec字段还原一道完整负载
+
+    Args:
+        header (TelemetryHeader): 该道任一分片的包头
+        payload (bytes | memoryview): 重组后的完整负载
+        decoder (TraceDecoder, optional): 该会话的解码端，道间差分编码需要跨道保存状态
+
+    Returns:
+        np.ndarray: 样本数组，无法解码（如参考道丢失）时返回None
+    """
+    if header.codec == CODEC_RAW:
+        return payload_to_array(payload, header.dtype)
+    if decoder is None:
+        decoder = TraceDecoder()
+    return decoder.decode(header.codec, payload, header.n_samples, header.trace_id)
+
+
+class TelemetrySender:
+    """
+    A-Scan遥测发送端
+
+    负载以memoryview切片，不为每个分片复制数据；一道的全部分片经BatchSender发送，Linux下
+    一次sendmmsg系统调用完成，其它平台退回逐包sendmsg/sendto。
+    """
+
+    def __init__(self, server_ip, server_port, session_id=None, max_datagram=DEFAULT_MAX_DATAGRAM,
+                 dtype=np.float32, sock=None, sndbuf=DEFAULT_SNDBUF, codec=CODEC_RAW, fec=None):
+        """
+        Args:
+            server_ip (str): 接收端IP
+            server_port (int): 接收端UDP端口
+            session_id (int, optional): 会话ID，地面端据此区分不同无人机/不同次飞行，默认取启动时间
+            max_datagram (int): 单个数据报上限（含包头）
+            dtype: 样本传输类型，np.float32或np.int16（int16只用于整数样本，浮点样本请用quant16编解码器）
+            sock (socket.socket, optional): 复用已有的UDP socket
+            sndbuf (int): 发送缓冲区大小
+            codec (int | str): 编解码器编号或名称，非原始编码时样本按float32编码
+            fec (FecCodec, optional): 前向纠错，为每道追加校验分片
+        """
+        self.addr = (server_ip, server_port)
+        self.session_id = (session_id if session_id is not None else int(time.time())) & 0xFFFFFFFF
+        self.max_datagram = max_datagram
+        self.dtype = np.dtype(dtype)
+        self.dtype_id = dtype_code(self.dtype)
+        self.clock_sync = get_clock_sync()
+        self.encoder = TraceEncoder(codec)
+        self.fec = fec
+        self.trace_id = 0
+        self.bytes_sent = 0
+        self.datagrams_sent = 0
+
+        self.socket = sock if sock is not None else socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.batch = BatchSender(self.socket, self.addr, max_datagram=max_datagram, sndbuf=sndbuf)
+
+    def set_codec(self, codec):
+        """切换编解码器，下一道生效"""
+        self.encoder.set_codec(codec)
+
+    def fragments(self, payload, trace_id, n_samples, timestamp=None, dtype_id=None, codec=CODEC_RAW,
+                  itemsize=None):
+        """
+        将一道负载切分为(包头bytes, 负载memoryview)分片列表
+
+        Args:
+            payload (bytes | np.ndarray | memoryview): 待发送负载
+            trace_id (int): 道序号
+            n_samples (int): 样本数
+            timestamp (float, optional): 道时间（GNSS纪元秒），默认当前时间
+            dtype_id (int, optional): 数据类型编号，默认发送端类型
+            codec (int): 编解码器编号
+            itemsize (int, optional): 分片对齐字节数，默认按数据类型对齐（压缩负载传1）
+
+        Returns:
+            list: [(header_bytes, memoryview), ...]
+        """
+        view = memoryview(payload).cast('B') if not isinstance(payload, memoryview) else payload.cast('B')
+        payload_len = view.nbytes
+        if dtype_id is None:
+            dtype_id = self.dtype_id
+        if itemsize is None:
+            itemsize = DTYPES[dtype_id].itemsize if codec == CODEC_RAW else 1
+        if timestamp is None:
+            timestamp = self.clock_sync.now()
+        timestamp_us = int(timestamp * 1e6) & 0xFFFFFFFFFFFFFFFF
+
+        frag_size = fragment_payload_size(self.max_datagram, itemsize)
+        k = fragment_count(payload_len, frag_size)
+        m = self.fec.parity_count(k) if self.fec is not None else 0
+        frag_cnt = k + m
+        if frag_cnt > 0xFFFF:
+            raise ValueError(f"负载过大，需要{frag_cnt}个分片")
+        fec_flags = 0
+        if m:
+            fec_flags = FLAG_FEC_RS if self.fec.scheme == FEC_RS else FLAG_FEC_XOR
+
+        out = []
+        trace_id &= 0xFFFFFFFF
+        for frag_idx in range(k):
+            offset = frag_idx * frag_size
+            flags = fec_flags | (FLAG_LAST_OF_BURST if frag_idx == frag_cnt - 1 else 0)
+            header = TelemetryHeader(VERSION, dtype_id, codec, flags, self.session_id, trace_id,
+                                     frag_idx, frag_cnt, n_samples, payload_len, offset, timestamp_us)
+            out.append((pack_header(header), view[offset:offset + frag_size]))
+
+        if m:
+            # 数据分片补零成(k, frag_size)矩阵后计算校验分片，校验分片的byte_offset为其在校验区内的偏移；
+            # 只有一个数据分片时校验分片与负载等长，接收端据此推算布局
+            stripe = frag_size if k > 1 else max(1, payload_len)
+            stripes = np.zeros((k, stripe), dtype=np.uint8)
+            stripes.reshape(-1)[:payload_len] = np.frombuffer(view, dtype=np.uint8)
+            parity = self.fec.encode(stripes, m)
+            for j in range(m):
+                flags = fec_flags | FLAG_PARITY | (FLAG_LAST_OF_BURST if j == m - 1 else 0)
+                header = TelemetryHeader(VERSION, dtype_id, codec, flags, self.session_id, trace_id,
+                                         k + j, frag_cnt, n_samples, payload_len, j * stripe, timestamp_us)
+                out.append((pack_header(header), memoryview(parity[j])))
+        return out
+
+    def send_fragments(self, fragments):
+        """发送分片列表，返回发送的数据报数"""
+        self.bytes_sent += self.batch.send(fragments)
+        sent = len(fragments)
+        self.datagrams_sent += sent
+        return sent
+
+    def send_trace(self, samples, timestamp=None):
+        """
+        发送一道A-Scan数据
+
+        Args:
+            samples (np.ndarray): A-Scan样本
+            timestamp (float, optional): 道时间（GNSS纪元秒）
+
+        Returns:
+            int: 分片数，发送失败返回0
+        """
+        trace_id = self.trace_id
+        self.trace_id = (self.trace_id + 1) & 0xFFFFFFFF
+        try:
+            if self.encoder.codec_id == CODEC_RAW:
+                wire = to_wire(samples, self.dtype)
+                frags = self.fragments(wire, trace_id, wire.size, timestamp)
+            else:
+                samples = np.asarray(samples, dtype=np.float32)
+                codec, payload = self.encoder.encode(samples, trace_id)
+                frags = self.fragments(payload, trace_id, samples.size, timestamp,
+                                       dtype_id=DTYPE_FLOAT32, codec=codec, itemsize=1)
+            return self.send_fragments(frags)
+        except OSError as e:
+            logger.error(f"发送遥测数据失败 trace_id={trace_id}: {e}")
+            return 0
+
+    def close(self):
+        try:
+            self.socket.close()
+        except OSError as e:
+            logger.error(f"关闭遥测socket失败: {e}")
@@ -0,0 +1,462 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 12:20:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 14:25:00
+FilePath     : \\usbvna\\src\\lib\\telemetry_receiver.py
+Description  : 地面端遥测接收引擎：预分配分片重组槽、FEC恢复、时间轮超时回收、有界时延的有序抖动缓冲与缺道报告
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import heapq
+import time
+
+import numpy as np
+
+from .fec import recover
+from .logger_config import setup_logger
+from .telemetry import FLAG_PARITY, decode_payload, fec_layout, fec_scheme, parse_datagram
+from .trace_codec import TraceDecoder
+
+# 创建日志记录器
+logger = setup_logger("telemetry_receiver", "logs/telemetry_receiver.log", level=10)  # 10对应DEBUG级别
+
+# trace_id为32位回绕计数
+_SEQ_MOD = 1 << 32
+_SEQ_HALF = 1 << 31
+
+
+class TimerWheel:
+    """
+    单层时间轮
+
+    按tick把到期时间散列到环形桶中，advance()只访问已走过的桶，不必每个包都扫描全部重组槽。
+    超出一圈的定时器放入最远的桶，取出时未到期则重新挂入；取消采用惰性方式，由调用方在
+    到期回调时检查对象是否仍然有效。
+    """
+
+    def __init__(self, tick=0.05, n_buckets=256, now=None):
+        """
+        Args:
+            tick (float): 时间轮刻度(秒)
+            n_buckets (int): 桶数，tick*n_buckets为一圈覆盖的时长
+            now (float, optional): 起始时间，默认time.monotonic()
+        """
+        self.tick = tick
+        self.n_buckets = n_buckets
+        self._buckets = [[] for _ in range(n_buckets)]
+        self._current = int((time.monotonic() if now is None else now) / tick)
+
+    def schedule(self, item, deadline):
+        """挂入一个定时器，item在到期后由advance()返回"""
+        target = int(deadline / self.tick)
+        # 已过期的放到当前桶，下次advance立即返回；超出一圈的放到最远的桶
+        target = min(max(target, self._current), self._current + self.n_buckets - 1)
+        self._buckets[target % self.n_buckets].append((deadline, item))
+
+    def advance(self, now):
+        """
+        推进时间轮
+
+        Returns:
+            list: 到期的item列表
+        """
+        expired = []
+        end = int(now / self.tick)
+        if end - self._current >= self.n_buckets:
+            # 长时间未推进时最多转一圈
+            self._current = end - self.n_buckets + 1
+        while self._current <= end:
+            bucket = self._buckets[self._current % self.n_buckets]
+            if bucket:
+                self._buckets[self._current % self.n_buckets] = []
+                for deadline, item in bucket:
+                    if deadline <= now:
+                        expired.append(item)
+                    else:
+                        # 未到期（超出一圈或落在当前刻度内），重新挂入
+                        self._buckets[max(int(deadline / self.tick), self._current + 1) % self.n_buckets].append(
+                            (deadline, item))
+            self._current += 1
+        # 当前刻度尚未走完，下次仍需检查
+        self._current = end
+        return expired
+
+
+class TraceSlot:
+    """
+    一道数据的重组槽：按字节偏移写入预分配的缓冲区，用位图记录已收到的分片
+
+    带FEC的道，缓冲区前k*frag_size字节为补零的数据区，其后依次存放校验分片。
+    """
+
+    __slots__ = ('key', 'header', 'buffer', 'seen', 'received', 'data_received', 'fec', 'k', 'frag_size',
+                 'first_rx', 'last_rx', 'complete', 'active')
+
+    def __init__(self):
+        self.key = None
+        self.header = None
+        self.buffer = None
+        self.seen = None
+        self.received = 0
+        self.data_received = 0
+        self.fec = None
+        self.k = 0
+        self.frag_size = 0
+        self.first_rx = 0.0
+        self.last_rx = 0.0
+        self.complete = False
+        self.active = False
+
+    @property
+    def payload(self):
+        return self.buffer[:self.header.payload_len]
+
+
+class SlotPool:
+    """重组槽与缓冲区复用池，稳态下不再为每道数据分配内存"""
+
+    def __init__(self, initial_capacity=8192, max_free=256):
+        self.initial_capacity = initial_capacity
+        self.max_free = max_free
+        self._free = []
+
+    def acquire(self, key, header, now, capacity=None):
+        capacity = header.payload_len if capacity is None else capacity
+        slot = self._free.pop() if self._free else TraceSlot()
+        if slot.buffer is None or slot.buffer.size < capacity:
+            slot.buffer = np.empty(max(self.initial_capacity, capacity), dtype=np.uint8)
+        if slot.seen is None or slot.seen.size < header.frag_cnt:
+            slot.seen = np.zeros(max(64, header.frag_cnt), dtype=bool)
+        else:
+            slot.seen[:header.frag_cnt] = False
+        slot.key = key
+        slot.header = header
+        slot.received = 0
+        slot.data_received = 0
+        slot.fec = None
+        slot.k = header.frag_cnt
+        slot.frag_size = 0
+        slot.first_rx = now
+        slot.last_rx = now
+        slot.complete = False
+        slot.active = True
+        return slot
+
+    def release(self, slot):
+        slot.active = False
+        slot.header = None
+        if len(self._free) < self.max_free:
+            self._free.append(slot)
+
+
+class JitterBuffer:
+    """
+    单个会话的有序抖动缓冲
+
+    完整的道按trace_id排序后依次放出；缺失的道最多等待max_latency秒，超时后跳过并报告缺道，
+    之后到达的迟到道直接丢弃。trace_id按32位回绕展开为递增序号。
+    """
+
+    def __init__(self, max_latency=0.3, max_held=256):
+        """
+        Args:
+            max_latency (float): 为缺失的道等待的最长时间(秒)
+            max_held (int): 最多缓存的道数，超出时立即跳过缺失的道
+        """
+        self.max_latency = max_latency
+        self.max_held = max_held
+        self.next_seq = None
+        self._heap = []
+        self._held = {}
+
+    def unwrap(self, trace_id):
+        """trace_id展开为相对next_seq的64位序号，落后半圈以上视为迟到返回None"""
+        if self.next_seq is None:
+            return trace_id
+        diff = (trace_id - self.next_seq) % _SEQ_MOD
+        if diff >= _SEQ_HALF:
+            return None
+        return self.next_seq + diff
+
+    def push(self, trace_id, item, now):
+        """
+        放入一道完整数据
+
+        Returns:
+            bool: 是否接收（迟到或重复返回False）
+        """
+        seq = self.unwrap(trace_id)
+        if seq is None or seq in self._held:
+            return False
+        if self.next_seq is None:
+            self.next_seq = seq
+        self._held[seq] = (now, item)
+        heapq.heappush(self._heap, seq)
+        return True
+
+    def pop_ready(self, now, flush=False):
+        """
+        取出可放出的道
+
+        Returns:
+            list: [('trace', trace_id, item) | ('gap', first_trace_id, count), ...]
+        """
+        out = []
+        while self._heap:
+            seq = self._heap[0]
+            if seq != self.next_seq:
+                arrived, _ = self._held[seq]
+                if not flush and len(self._held) <= self.max_held and now - arrived < self.max_latency:
+                    break
+                out.append(('gap', self.next_seq % _SEQ_MOD, seq - self.next_seq))
+                self.next_seq = seq
+            heapq.heappop(self._heap)
+            _, item = self._held.pop(seq)
+            out.append(('trace', seq % _SEQ_MOD, item))
+            self.next_seq = seq + 1
+        return out
+
+    def __len__(self):
+        return len(self._held)
+
+
+class SessionState:
+    """单个会话（一架无人机/一次飞行）的重组、排序和解码状态"""
+
+    def __init__(self, session_id, max_latency, max_held):
+        self.session_id = session_id
+        self.slots = {}
+        self.jitter = JitterBuffer(max_latency, max_held)
+        self.decoder = TraceDecoder()
+        self.stats = {
+            'datagrams': 0, 'duplicates': 0, 'malformed': 0, 'complete': 0, 'expired': 0,
+            'late': 0, 'gaps': 0, 'missing': 0, 'undecodable': 0, 'released': 0, 'recovered': 0,
+            'surplus_parity': 0,
+        }
+
+
+class TelemetryReceiver:
+    """
+    地面端遥测接收引擎
+
+    feed()处理单个数据报，poll()推进时间轮和抖动缓冲；按序放出的道经解码后交给on_trace回调，
+    跳过的道交给on_gap回调。不负责socket，可接入任意收包循环。
+    """
+
+    def __init__(self, on_trace=None, on_gap=None, max_latency=0.3, fragment_timeout=2.0, max_held=256,
+                 tick=0.05):
+        """
+        Args:
+            on_trace (callable): on_trace(header, samples, receive_time)，按trace_id顺序调用
+            on_gap (callable): on_gap(session_id, first_trace_id, count)
+            max_latency (float): 抖动缓冲为缺失的道等待的最长时间(秒)
+            fragment_timeout (float): 未收齐的道自最后一个分片起的保留时间(秒)
+            max_held (int): 每个会话抖动缓冲最多缓存的道数
+            tick (float): 时间轮刻度(秒)
+        """
+        self.on_trace = on_trace
+        self.on_gap = on_gap
+        self.max_latency = max_latency
+        self.fragment_timeout = fragment_timeout
+        self.max_held = max_held
+        self.sessions = {}
+        self.pool = SlotPool()
+        self.wheel = TimerWheel(tick=tick, n_buckets=max(16, int(fragment_timeout / tick) + 2))
+
+    def session(self, session_id):
+        state = self.sessions.get(session_id)
+        if state is None:
+            state = SessionState(session_id, self.max_latency, self.max_held)
+            self.sessions[session_id] = state
+            logger.info(f"新会话 {session_id:08x}")
+        return state
+
+    def feed(self, datagram, receive_time=None):
+        """
+        处理一个数据报
+
+        Args:
+            datagram (bytes | bytearray | memoryview): 收到的数据报
+            receive_time (float, optional): 接收时刻(time.monotonic())
+
+        Returns:
+            TelemetryHeader: 遥测数据报的包头，不是遥测数据报返回None
+        """
+        header, payload = parse_datagram(datagram)
+        if header is None:
+            return None
+        now = time.monotonic() if receive_time is None else receive_time
+        self.feed_fragment(header, payload, now)
+        return header
+
+    def feed_fragment(self, header, payload, now):
+        """处理一个已解析的分片"""
+        state = self.session(header.session_id)
+        stats = state.stats
+        stats['datagrams'] += 1
+
+        key = header.trace_id
+        slot = state.slots.get(key)
+        parity = bool(header.flags & FLAG_PARITY)
+        if slot is None:
+            # 已放出或已跳过的道，其迟到分片不再重组；数据分片齐全后陆续到达的校验分片属正常冗余，单独计数
+            if state.jitter.unwrap(key) is None:
+                stats['surplus_parity' if parity else 'late'] += 1
+                return
+            slot = self._new_slot(header, len(payload), now)
+            if slot is None:
+                stats['malformed'] += 1
+                return
+            state.slots[key] = slot
+        elif slot.complete:
+            stats['surplus_parity' if parity else 'duplicates'] += 1
+            return
+        elif slot.header.frag_cnt != header.frag_cnt or slot.header.payload_len != header.payload_len:
+            stats['malformed'] += 1
+            return
+
+        size = len(payload)
+        if parity:
+            # 校验分片写到数据区之后
+            if slot.fec is None or header.frag_idx < slot.k or size != slot.frag_size:
+                stats['malformed'] += 1
+                return
+            start = header.frag_idx * slot.frag_size
+        else:
+            start = header.byte_offset
+            if (header.frag_idx >= slot.k or start + size > header.payload_len
+                    or (slot.fec is not None and start != header.frag_idx * slot.frag_size)):
+                stats['malformed'] += 1
+                return
+
+        if slot.seen[header.frag_idx]:
+            stats['duplicates'] += 1
+            return
+        slot.seen[header.frag_idx] = True
+        slot.received += 1
+        if header.frag_idx < slot.k:
+            slot.data_received += 1
+        slot.last_rx = now
+        if size:
+            slot.buffer[start:start + size] = np.frombuffer(payload, dtype=np.uint8)
+
+        if slot.data_received == slot.k:
+            self._complete(state, slot, now)
+        elif slot.fec is not None and slot.received >= slot.k:
+            if self._recover(slot):
+                stats['recovered'] += 1
+                self._complete(state, slot, now)
+
+    def _new_slot(self, header, payload_size, now):
+        """按第一个到达的分片分配重组槽，带FEC时由其推算分片布局"""
+        scheme = fec_scheme(header.flags)
+        if scheme is None:
+            slot = self.pool.acquire((header.session_id, header.trace_id), header, now)
+        else:
+            frag_size, k = fec_layout(header, payload_size)
+            if k >= header.frag_cnt:
+                return None
+            slot = self.pool.acquire((header.session_id, header.trace_id), header, now,
+                                     capacity=header.frag_cnt * frag_size)
+            slot.fec = scheme
+            slot.k = k
+            slot.frag_size = frag_size
+            # 最后一个数据分片的补零区参与校验计算
+            slot.buffer[header.payload_len:k * frag_size] = 0
+        self.wheel.schedule(slot, now + self.fragment_timeout)
+        return slot
+
+    def _recover(self, slot):
+        """用校验分片恢复丢失的数据分片"""
+        k = slot.k
+        fs = slot.frag_size
+        n = slot.header.frag_cnt
+        rows = slot.buffer[:n * fs].reshape(n, fs)
+        fragments = {i: rows[i] for i in np.flatnonzero(slot.seen[:n]).tolist()}
+        try:
+            data = recover(slot.fec, k, n - k, fragments)
+        except ValueError as e:
+            logger.error(f"FEC恢复失败 trace_id={slot.header.trace_id}: {e}")
+            return False
+        if data is None:
+            return False
+        rows[:k] = data
+        slot.data_received = k
+        return True
+
+    def _complete(self, state, slot, now):
+        slot.complete = True
+        state.stats['complete'] += 1
+        if not state.jitter.push(slot.header.trace_id, slot, now):
+            state.stats['late'] += 1
+            self._drop_slot(state, slot)
+            return
+        self._release(state, now)
+
+    def poll(self, now=None):
+        """推进时间轮回收超时的未完整道，并放出抖动缓冲中等待超时的道"""
+        now = time.monotonic() if now is None else now
+        for slot in self.wheel.advance(now):
+            if not slot.active or slot.complete:
+                continue
+            # 收到新分片后顺延
+            if now - slot.last_rx < self.fragment_timeout:
+                self.wheel.schedule(slot, slot.last_rx + self.fragment_timeout)
+                continue
+            state = self.sessions.get(slot.key[0])
+            if state is not None:
+                state.stats['expired'] += 1
+                self._drop_slot(state, slot)
+        for state in self.sessions.values():
+            if len(state.jitter):
+                self._release(state, now)
+
+    def flush(self):
+        """放出所有会话缓存的道（结束接收时调用）"""
+        now = time.monotonic()
+        for state in self.sessions.values():
+            self._release(state, now, flush=True)
+
+    def _drop_slot(self, state, slot):
+        state.slots.pop(slot.key[1], None)
+        self.pool.release(slot)
+
+    def _release(self, state, now, flush=False):
+        for kind, trace_id, item in state.jitter.pop_ready(now, flush):
+            if kind == 'gap':
+                state.stats['gaps'] += 1
+                state.stats['missing'] += item
+                logger.warning(f"会话{state.session_id:08x}缺道: trace_id={trace_id} 共{item}道")
+                if self.on_gap:
+                    self.on_gap(state.session_id, trace_id, item)
+                continue
+
+            slot = item
+            header = slot.header
+            try:
+                samples = decode_payload(header, slot.payload, state.decoder)
+            except Exception as e:
+                logger.error(f"解码失败 trace_id={trace_id} codec={header.codec}: {e}")
+                samples = None
+            receive_time = slot.last_rx
+            # 原始uint8等无需转换的负载会直接引用槽缓冲区，槽复用前先复制
+            if samples is not None and np.may_share_memory(samples, slot.buffer):
+                samples = samples.copy()
+            self._drop_slot(state, slot)
+            if samples is None:
+                state.stats['undecodable'] += 1
+                continue
+            state.stats['released'] += 1
+            if self.on_trace:
+                self.on_trace(header, samples, receive_time)
+
+    def get_stats(self):
+        """
+        Returns:
+            dict: session_id -> 统计计数
+        """
+        return {sid: dict(state.stats, pending=len(state.slots), held=len(state.jitter))
+                for sid, state in self.sessions.items()}
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 21:00:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 21:00:00
+FilePath     : \\usbvna\\src\\lib\\time_domain.py
+Description  : 主机端时域变换：对SDATA复数频域数据做频带选择、加窗（Kaiser/Hann）、补零和逆FFT，
+               支持按道批量变换；同一配置的窗函数、FFT长度和载波相位只计算一次并缓存
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import functools
+
+import numpy as np
+
+WINDOWS = ('kaiser', 'hann', 'rect')
+MODES = ('lowpass', 'bandpass')
+
+
+def _next_pow2(n):
+    return 1 << max(0, int(n - 1).bit_length())
+
+
+class TransformPlan:
+    """
+    一种扫描设置和变换参数下的变换计划
+
+    扫描频率f_n = f0 + n*df。时域信号x(t) = Re{sum(X_n * w_n * exp(j2πf_n t))}，
+    令t = m/(nfft*df)，求和部分即exp(j2πf0 t)乘以加窗频谱补零到nfft点后的逆FFT，
+    因此不要求起始频率为df的整数倍（低通模式的谐波网格限制）。
+    幅度归一化为：平坦频谱H=1变换后在t=0处为1。
+    """
+
+    def __init__(self, freq_start, freq_stop, points, window='kaiser', beta=6.0, pad_factor=4,
+                 band=None, time_start=0.0, time_stop=None, output='real', mode='lowpass'):
+        """
+        Args:
+            freq_start (float): 起始频率(Hz)
+            freq_stop (float): 终止频率(Hz)
+            points (int): 扫描点数
+            window (str): 窗函数，kaiser、hann或rect
+            beta (float): Kaiser窗参数，6约对应仪器的Normal窗
+            pad_factor (int): 补零倍数，FFT长度取不小于pad_factor*频带点数的2的幂
+            band (tuple, optional): 参与变换的频带(Hz)，默认整个扫描范围
+            time_start (float): 输出时窗起点(秒)
+            time_stop (float, optional): 输出时窗终点(秒)，默认不模糊时间范围1/df
+            output (str): real为实信号，envelope为包络（幅值）
+            mode (str): lowpass时窗函数以0频为中心，只取右半部分（与仪器低通冲激模式一致）；
+                bandpass时窗函数以频带中心为中心
+        """
+        if points < 2 or freq_stop <= freq_start:
+            raise ValueError(f"无效的扫描设置: {freq_start}-{freq_stop} Hz, {points}点")
+        if window not in WINDOWS:
+            raise ValueError(f"未知的窗函数: {window}")
+        if mode not in MODES:
+            raise ValueError(f"未知的变换模式: {mode}")
+        self.freq_start = freq_start
+        self.freq_stop = freq_stop
+        self.points = points
+        self.window_name = window
+        self.output = output
+        self.df = (freq_stop - freq_start) / (points - 1)
+
+        # 频带选择
+        frequencies = freq_start + self.df * np.arange(points)
+        if band is not None:
+            lo, hi = band
+            index = np.flatnonzero((frequencies >= lo) & (frequencies <= hi))
+            if len(index) < 2:
+                raise ValueError(f"频带{lo}-{hi} Hz内的扫描点不足")
+            self.band = slice(int(index[0]), int(index[-1]) + 1)
+        else:
+            self.band = slice(0, points)
+        band_points = self.band.stop - self.band.start
+        self.f0 = float(frequencies[self.band.start])
+
+        # 低通模式按关于0频对称的完整窗计算，再取正频率一侧
+        length = 2 * band_points - 1 if mode == 'lowpass' else band_points
+        if window == 'kaiser':
+            weights = np.kaiser(length, beta)
+        elif window == 'hann':
+            # 两端不取零，避免丢掉频带边缘的点
+            weights = np.hanning(length + 2)[1:-1]
+        else:
+            weights = np.ones(length)
+        if mode == 'lowpass':
+            weights = weights[band_points - 1:]
+
+        self.nfft = _next_pow2(max(band_points, int(pad_factor * band_points)))
+        self.dt = 1.0 / (self.nfft * self.df)
+        first = max(0, int(np.ceil(time_start / self.dt)))
+        last = self.nfft if time_stop is None else min(self.nfft, int(np.floor(time_stop / self.dt)) + 1)
+        if last <= first:
+            raise ValueError(f"输出时窗{time_start}-{time_stop} s为空")
+        self.out = slice(first, last)
+        self.time = np.arange(first, last) * self.dt
+
+        # 窗函数与幅度归一化合并，载波相位只与输出时刻有关，均预先计算
+        self.weights = (weights * (self.nfft / weights.sum())).astype(np.complex128)
+        self.carrier = np.exp(2j * np.pi * self.f0 * self.time)
+        self.weights.flags.writeable = False
+        self.carrier.flags.writeable = False
+
+    def apply(self, sdata):
+        """
+        变换一道或多道
+
+        Args:
+            sdata (np.ndarray): 复数频域数据，形状(points,)或(道数, points)
+
+        Returns:
+            np.ndarray: 时域数据，形状(len(time),)或(道数, len(time))
+        """
+        data = np.asarray(sdata)
+        if data.shape[-1] != self.points:
+            raise ValueError(f"数据点数{data.shape[-1]}与变换计划{self.points}不一致")
+        spectrum = data[..., self.band] * self.weights
+        signal = np.fft.ifft(spectrum, n=self.nfft, axis=-1)[..., self.out] * self.carrier
+        if self.output == 'envelope':
+            return np.abs(signal)
+        return signal.real
+
+
+@functools.lru_cache(maxsize=16)
+def get_plan(freq_start, freq_stop, points, window='kaiser', beta=6.0, pad_factor=4, band=None,
+             time_start=0.0, time_stop=None, output='real', mode='lowpass'):
+    """获取缓存的变换计划，参数同TransformPlan（band需为元组）"""
+    return TransformPlan(freq_start, freq_stop, points, window=window, beta=beta, pad_factor=pad_factor,
+                         band=band, time_start=time_start, time_stop=time_stop, output=output, mode=mode)
+
+
+def transform(sdata, freq_start, freq_stop, window='kaiser', batch_size=256, **options):
+    """
+    批量变换，道数很多时分块处理以限制临时内存
+
+    Args:
+        sdata (np.ndarray): 复数频域数据，形状(points,)或(道数, points)
+        freq_start (float): 起始频率(Hz)
+        freq_stop (float): 终止频率(Hz)
+        window (str): 窗函数
+        batch_size (int): 每块道数
+        **options: 传给get_plan的其它参数
+
+    Returns:
+        tuple: (时间轴(秒), 时域数据)
+    """
+    data = np.asarray(sdata)
+    plan = get_plan(freq_start, freq_stop, data.shape[-1], window=window, **options)
+    if data.ndim == 1:
+        return plan.time, plan.apply(data)
+    result = np.empty((data.shape[0], len(plan.time)), dtype=np.float64)
+    for start in range(0, data.shape[0], batch_size):
+        result[start:start + batch_size] = plan.apply(data[start:start + batch_size])
+    return plan.time, result
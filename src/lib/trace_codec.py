@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 11:40:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 11:40:00
+FilePath     : \\usbvna\\src\\lib\\trace_codec.py
+Description  : A-Scan上行压缩编解码器（无损差分+zlib/lzma，有损int16/int12量化及道间参考差分）
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import lzma
+import struct
+import zlib
+
+import numpy as np
+
+# 编解码器编号，写入遥测包头的codec字段（0与telemetry.CODEC_RAW一致）
+CODEC_RAW = 0
+CODEC_DELTA_ZLIB = 1
+CODEC_DELTA_LZMA = 2
+CODEC_QUANT16 = 3
+CODEC_QUANT12 = 4
+CODEC_REFDIFF16 = 5
+
+
+class TraceCodec:
+    """
+    编解码器基类
+
+    encode/decode均为NumPy向量化实现；ctx为每个数据流独立的状态字典
+    （如道间差分的参考道），编码端和解码端各自维护。
+    """
+
+    codec_id = None
+    name = ''
+    lossless = True
+
+    def encode(self, samples, trace_id, ctx):
+        """
+        Args:
+            samples (np.ndarray): float32样本
+            trace_id (int): 道序号
+            ctx (dict): 编码端状态
+
+        Returns:
+            bytes: 编码后的负载
+        """
+        raise NotImplementedError
+
+    def decode(self, payload, n_samples, trace_id, ctx):
+        """
+        Args:
+            payload (bytes | memoryview): 负载
+            n_samples (int): 样本数
+            trace_id (int): 道序号
+            ctx (dict): 解码端状态
+
+        Returns:
+            np.ndarray: float32样本，依赖的参考数据缺失时返回None
+        """
+        raise NotImplementedError
+
+
+class RawCodec(TraceCodec):
+    """未压缩的小端float32"""
+
+    codec_id = CODEC_RAW
+    name = 'raw'
+
+    def encode(self, samples, trace_id, ctx):
+        return np.ascontiguousarray(samples, dtype='<f4').tobytes()
+
+    def decode(self, payload, n_samples, trace_id, ctx):
+        return np.frombuffer(payload, dtype='<f4', count=n_samples).astype(np.float32)
+
+
+class DeltaDeflateCodec(TraceCodec):
+    """
+    无损：float32位模式按uint32做相邻差分，再按字节平面重排后用zlib/lzma压缩
+
+    GPR道相邻样本连续，差分后高字节大多为0或0xFF，字节平面重排让这些字节连成长串，
+    通用压缩器才能有效压缩浮点数据。
+    """
+
+    def __init__(self, codec_id, name, compress, decompress):
+        self.codec_id = codec_id
+        self.name = name
+        self._compress = compress
+        self._decompress = decompress
+
+    def encode(self, samples, trace_id, ctx):
+        bits = np.ascontiguousarray(samples, dtype='<f4').view('<u4')
+        delta = np.empty_like(bits)
+        if bits.size:
+            delta[0] = bits[0]
+            np.subtract(bits[1:], bits[:-1], out=delta[1:])
+        # 字节平面重排：(n, 4) -> (4, n)
+        shuffled = delta.view(np.uint8).reshape(-1, 4).T.tobytes()
+        return self._compress(shuffled)
+
+    def decode(self, payload, n_samples, trace_id, ctx):
+        raw = np.frombuffer(self._decompress(bytes(payload)), dtype=np.uint8)
+        if raw.size != n_samples * 4:
+            raise ValueError(f"解压长度{raw.size}与样本数{n_samples}不符")
+        delta = np.ascontiguousarray(raw.reshape(4, -1).T).view('<u4').ravel()
+        # uint32累加自然按2^32回绕，与编码端的回绕减法互逆
+        bits = np.cumsum(delta, dtype=np.uint32)
+        return bits.view('<f4').astype(np.float32)
+
+
+def _quantize(samples, max_code):
+    """按道峰值缩放量化，返回(整数码, 缩放系数)"""
+    samples = np.asarray(samples, dtype=np.float32)
+    peak = float(np.max(np.abs(samples))) if samples.size else 0.0
+    scale = peak / max_code if peak > 0 else 1.0
+    codes = np.rint(samples / scale).astype(np.int32)
+    np.clip(codes, -max_code, max_code, out=codes)
+    return codes, scale
+
+
+class Quant16Codec(TraceCodec):
+    """有损：每道独立缩放的int16量化，负载为float32缩放系数 + int16码"""
+
+    codec_id = CODEC_QUANT16
+    name = 'quant16'
+    lossless = False
+    MAX_CODE = 32767
+
+    def encode(self, samples, trace_id, ctx):
+        codes, scale = _quantize(samples, self.MAX_CODE)
+        return struct.pack('<f', scale) + codes.astype('<i2').tobytes()
+
+    def decode(self, payload, n_samples, trace_id, ctx):
+        (scale,) = struct.unpack_from('<f', payload, 0)
+        codes = np.frombuffer(payload, dtype='<i2', count=n_samples, offset=4)
+        return codes.astype(np.float32) * np.float32(scale)
+
+
+class Quant12Codec(TraceCodec):
+    """有损：每道独立缩放的12位量化，两个样本打包为3字节"""
+
+    codec_id = CODEC_QUANT12
+    name = 'quant12'
+    lossless = False
+    MAX_CODE = 2047
+
+    def encode(self, samples, trace_id, ctx):
+        codes, scale = _quantize(samples, self.MAX_CODE)
+        # 偏移为无符号12位，样本数为奇数时补一个0
+        u = (codes + 2048).astype(np.uint16)
+        if u.size % 2:
+            u = np.append(u, np.uint16(2048))
+        a = u[0::2]
+        b = u[1::2]
+        packed = np.empty((a.size, 3), dtype=np.uint8)
+        packed[:, 0] = a & 0xFF
+        packed[:, 1] = ((a >> 8) & 0x0F) | ((b & 0x0F) << 4)
+        packed[:, 2] = b >> 4
+        return struct.pack('<f', scale) + packed.tobytes()
+
+    def decode(self, payload, n_samples, trace_id, ctx):
+        (scale,) = struct.unpack_from('<f', payload, 0)
+        n_pairs = (n_samples + 1) // 2
+        packed = np.frombuffer(payload, dtype=np.uint8, count=n_pairs * 3, offset=4).reshape(-1, 3)
+        packed = packed.astype(np.uint16)
+        u = np.empty(n_pairs * 2, dtype=np.uint16)
+        u[0::2] = packed[:, 0] | ((packed[:, 1] & 0x0F) << 8)
+        u[1::2] = (packed[:, 1] >> 4) | (packed[:, 2] << 4)
+        codes = u[:n_samples].astype(np.int32) - 2048
+        return codes.astype(np.float32) * np.float32(scale)
+
+
+class RefDiffCodec(TraceCodec):
+    """
+    有损：道间参考差分
+
+    每keyframe_interval道发送一个关键道（int16量化），其余道发送与最近关键道重建值的
+    差值（int16量化后zlib压缩）。编码端使用与解码端相同的重建值作参考，误差不会累积；
+    关键道丢失时，依赖它的差分道无法解码并返回None，等待下一个关键道恢复。
+
+    负载：u8关键道标志 + u32参考道序号 + f32缩放系数 + zlib(int16码)
+    """
+
+    codec_id = CODEC_REFDIFF16
+    name = 'refdiff16'
+    lossless = False
+    MAX_CODE = 32767
+    HEAD = struct.Struct('<BIf')
+    # 解码端保留的参考道数，容忍关键道之后的少量乱序
+    MAX_REFS = 4
+
+    def __init__(self, keyframe_interval=25, level=1):
+        self.keyframe_interval = keyframe_interval
+        self.level = level
+
+    def encode(self, samples, trace_id, ctx):
+        samples = np.asarray(samples, dtype=np.float32)
+        ref = ctx.get('ref')
+        since_key = ctx.get('since_key', 0)
+        is_key = (ref is None or ref.shape != samples.shape or since_key >= self.keyframe_interval)
+
+        if is_key:
+            codes, scale = _quantize(samples, self.MAX_CODE)
+            ctx['ref'] = codes.astype(np.float32) * np.float32(scale)
+            ctx['ref_id'] = trace_id
+            ctx['since_key'] = 1
+            ref_id = trace_id
+        else:
+            codes, scale = _quantize(samples - ref, self.MAX_CODE)
+            ctx['since_key'] = since_key + 1
+            ref_id = ctx['ref_id']
+
+        body = zlib.compress(codes.astype('<i2').tobytes(), self.level)
+        return self.HEAD.pack(1 if is_key else 0, ref_id & 0xFFFFFFFF, scale) + body
+
+    def decode(self, payload, n_samples, trace_id, ctx):
+        is_key, ref_id, scale = self.HEAD.unpack_from(payload, 0)
+        codes = np.frombuffer(zlib.decompress(bytes(payload[self.HEAD.size:])), dtype='<i2', count=n_samples)
+        values = codes.astype(np.float32) * np.float32(scale)
+
+        refs = ctx.setdefault('refs', {})
+        if is_key:
+            refs[trace_id] = values
+            while len(refs) > self.MAX_REFS:
+                refs.pop(min(refs))
+            return values
+
+        ref = refs.get(ref_id)
+        if ref is None or ref.shape != values.shape:
+            return None
+        return ref + values
+
+
+# 编解码器注册表
+CODECS = {}
+
+
+def register_codec(codec):
+    """注册编解码器，可用于扩展新的压缩方式"""
+    CODECS[codec.codec_id] = codec
+    return codec
+
+
+register_codec(RawCodec())
+register_codec(DeltaDeflateCodec(CODEC_DELTA_ZLIB, 'delta_zlib',
+                                 lambda b: zlib.compress(b, 6), zlib.decompress))
+register_codec(DeltaDeflateCodec(CODEC_DELTA_LZMA, 'delta_lzma',
+                                 lambda b: lzma.compress(b, preset=1), lzma.decompress))
+register_codec(Quant16Codec())
+register_codec(Quant12Codec())
+register_codec(RefDiffCodec())
+
+
+def get_codec(codec):
+    """按编号或名称获取编解码器"""
+    if isinstance(codec, TraceCodec):
+        return codec
+    if isinstance(codec, str):
+        for item in CODECS.values():
+            if item.name == codec:
+                return item
+        raise KeyError(f"未知编解码器: {codec}")
+    return CODECS[codec]
+
+
+class TraceEncoder:
+    """单个数据流的编码端，保存道间差分等状态"""
+
+    def __init__(self, codec=CODEC_RAW):
+        self.codec = get_codec(codec)
+        self.ctx = {}
+
+    @property
+    def codec_id(self):
+        return self.codec.codec_id
+
+    def set_codec(self, codec):
+        """切换编解码器（状态随之重置，道间差分会从关键道重新开始）"""
+        codec = get_codec(codec)
+        if codec is not self.codec:
+            self.codec = codec
+            self.ctx = {}
+
+    def encode(self, samples, trace_id):
+        """返回(编解码器编号, 负载bytes)"""
+        return self.codec.codec_id, self.codec.encode(samples, trace_id, self.ctx)
+
+
+class TraceDecoder:
+    """单个数据流的解码端，按包头中的codec编号分派，每种编解码器独立保存状态"""
+
+    def __init__(self):
+        self.ctx = {}
+
+    def decode(self, codec_id, payload, n_samples, trace_id):
+        """
+        Returns:
+            np.ndarray: float32样本，无法解码时返回None
+        """
+        codec = CODECS.get(codec_id)
+        if codec is None:
+            return None
+        return codec.decode(payload, n_samples, trace_id, self.ctx.setdefault(codec_id, {}))
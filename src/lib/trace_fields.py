@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 20:40:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 20:40:00
+FilePath     : \\usbvna\\src\\lib\\trace_fields.py
+Description  : 多测量道数据：测量编号解析、结构化数组的字段定义，以及存储和显示共用的通道访问
+               单测量时道数据仍为一维float数组，多测量时为每个测量一个字段的结构化数组
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import numpy as np
+
+FDATA = 'FDATA'  # 格式化后的显示数据（实数）
+SDATA = 'SDATA'  # 未格式化的复数数据，仪器按实部、虚部交替返回
+
+
+def parse_measurements(text):
+    """
+    解析测量编号设置，如"1"、"1,2"、"1,2:SDATA"
+
+    Returns:
+        list: (测量编号, FDATA或SDATA)列表
+
+    Raises:
+        ValueError: 格式不正确或编号重复
+    """
+    specs = []
+    for item in text.replace('，', ',').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        number, _, kind = item.partition(':')
+        kind = kind.strip().upper() or FDATA
+        if kind not in (FDATA, SDATA):
+            raise ValueError(f"未知的数据类型: {kind}")
+        spec = (int(number), kind)
+        if spec[0] < 1:
+            raise ValueError(f"测量编号必须为正整数: {number}")
+        if spec in specs:
+            raise ValueError(f"测量编号重复: {item}")
+        specs.append(spec)
+    if not specs:
+        raise ValueError("至少需要一个测量编号")
+    return specs
+
+
+def is_single(specs):
+    """只有一个FDATA测量时沿用一维数组，存储格式与单测量采集完全一致"""
+    return specs is None or (len(specs) == 1 and specs[0][1] == FDATA)
+
+
+def field_name(measurement, kind=FDATA):
+    return f"M{measurement}" if kind == FDATA else f"M{measurement}_{kind}"
+
+
+def measurement_dtype(specs):
+    """多测量道数据的结构化dtype，FDATA为float64字段，SDATA为complex128字段"""
+    return np.dtype([(field_name(m, k), np.float64 if k == FDATA else np.complex128) for m, k in specs])
+
+
+def channel_names(data):
+    """道数据的通道名，一维数组返回空列表"""
+    return list(data.dtype.names or ())
+
+
+def channel(data, name=None):
+    """
+    取一个通道用于显示
+
+    Args:
+        data (np.ndarray): 道数据
+        name (str, optional): 通道名，默认第一个通道
+
+    Returns:
+        np.ndarray: float数组，复数通道取幅值
+    """
+    names = channel_names(data)
+    if not names:
+        return data
+    values = data[name if name in names else names[0]]
+    return np.abs(values) if np.iscomplexobj(values) else values
+
+
+def trace_header(data):
+    """流式CSV表头：第一列为道数，其后为各通道的采样点，复数通道拆为实部和虚部两组列"""
+    names = channel_names(data)
+    if not names:
+        return ['Trace'] + [f'Sample_{j}' for j in range(len(data))]
+    header = ['Trace']
+    for name in names:
+        if np.iscomplexobj(data[name]):
+            header += [f'{name}_Re_{j}' for j in range(len(data))]
+            header += [f'{name}_Im_{j}' for j in range(len(data))]
+        else:
+            header += [f'{name}_Sample_{j}' for j in range(len(data))]
+    return header
+
+
+def trace_row(trace_index, data):
+    """与trace_header()对应的一行"""
+    names = channel_names(data)
+    if not names:
+        return [trace_index] + data.tolist()
+    row = [trace_index]
+    for name in names:
+        values = data[name]
+        if np.iscomplexobj(values):
+            row += values.real.tolist()
+            row += values.imag.tolist()
+        else:
+            row += values.tolist()
+    return row
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 19:20:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 22:00:00
+FilePath     : \\usbvna\\src\\lib\\visa_pool.py
+Description  : 进程内共享的VISA资源管理器、带TTL缓存的设备发现和会话池
+               资源管理器创建和HiSLIP/USB枚举都可能耗时数秒，刷新设备和断线重连时复用已有后端
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import atexit
+import threading
+import time
+
+import pyvisa as visa
+from .logger_config import setup_logger
+from .vna_simulator import simulator_from_env
+
+logger = setup_logger("visa_pool", "logs/visa_pool.log", level=10)  # 10对应DEBUG级别
+
+_rm = None
+_rm_lock = threading.Lock()
+
+
+def get_resource_manager():
+    """
+    获取进程内共享的资源管理器，首次调用时创建
+
+    设置了USBVNA_SIMULATOR环境变量时为仿真资源管理器，否则为pyvisa.ResourceManager
+
+    Returns:
+        资源管理器，创建失败时抛出异常，下次调用会重试
+    """
+    global _rm
+    with _rm_lock:
+        if _rm is None:
+            start = time.monotonic()
+            _rm = simulator_from_env() or visa.ResourceManager()
+            logger.info("VISA Resource Manager created: %s (%.0f ms)",
+                        type(_rm).__name__, (time.monotonic() - start) * 1000.0)
+        return _rm
+
+
+class DeviceDiscovery:
+    """
+    带TTL缓存的设备发现
+
+    缓存未过期时直接返回；已过期时先返回旧结果并在后台刷新，只有从未枚举过时才同步等待。
+    """
+
+    def __init__(self, rm_getter=get_resource_manager, ttl=30.0, query='?*::INSTR'):
+        """
+        Args:
+            rm_getter (callable): 返回资源管理器的函数
+            ttl (float): 缓存有效期(秒)
+            query (str): list_resources的查询表达式
+        """
+        self.rm_getter = rm_getter
+        self.ttl = ttl
+        self.query = query
+        self._devices = None
+        self._updated = 0.0
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+
+    def age(self):
+        """缓存已存在的秒数，从未枚举时为None"""
+        if self._devices is None:
+            return None
+        return time.monotonic() - self._updated
+
+    def cached(self):
+        """缓存的设备列表，从未枚举时为None"""
+        return self._devices
+
+    def refresh(self):
+        """
+        同步枚举设备并更新缓存
+
+        Returns:
+            tuple: 设备地址列表
+        """
+        start = time.monotonic()
+        devices = tuple(self.rm_getter().list_resources(self.query))
+        with self._lock:
+            self._devices = devices
+            self._updated = time.monotonic()
+        logger.debug("Found resources in %.0f ms: %s", (time.monotonic() - start) * 1000.0, devices)
+        return devices
+
+    def refresh_async(self, callback=None):
+        """
+        在后台线程中枚举设备，已有刷新在进行时不重复启动
+
+        Args:
+            callback (callable, optional): 完成后以(devices, error)调用，在后台线程中执行
+        """
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return False
+            self._refresh_thread = threading.Thread(target=self._refresh_worker, args=(callback,), daemon=True)
+            self._refresh_thread.start()
+            return True
+
+    def _refresh_worker(self, callback):
+        devices, error = (), None
+        try:
+            devices = self.refresh()
+        except Exception as e:
+            error = e
+            logger.error(f"Error listing devices: {e}")
+        if callback is not None:
+            callback(devices, error)
+
+    def list_devices(self, force=False):
+        """
+        获取设备列表
+
+        Args:
+            force (bool): 忽略缓存同步重新枚举
+
+        Returns:
+            tuple: 设备地址列表
+        """
+        if force or self._devices is None:
+            return self.refresh()
+        if self.age() > self.ttl:
+            self.refresh_async()
+        return self._devices
+
+
+class SessionPool:
+    """
+    VISA会话池
+
+    release()后会话保持打开，同一资源再次acquire()时用*IDN?确认会话仍可用后直接复用，
+    失效则关闭重开；空闲超过idle_timeout的会话在下次访问池时关闭。
+    """
+
+    def __init__(self, rm_getter=get_resource_manager, idle_timeout=600.0, validate_command="*IDN?"):
+        self.rm_getter = rm_getter
+        self.idle_timeout = idle_timeout
+        self.validate_command = validate_command
+        self._sessions = {}  # 资源地址 -> [会话, 是否借出, 归还时间]
+        self._lock = threading.Lock()
+
+    def acquire(self, resource_name, timeout_ms=5000):
+        """
+        获取资源的会话
+
+        Args:
+            resource_name (str): VISA资源地址
+            timeout_ms (int): 会话超时(毫秒)
+
+        Returns:
+            会话对象，打开失败时抛出VISA异常；该资源的会话已被借出时抛出RuntimeError
+        """
+        # 在锁内登记借出，*IDN?校验和打开会话在锁外进行，其间其他线程无法取得同一资源
+        with self._lock:
+            self._close_idle_locked()
+            entry = self._sessions.get(resource_name)
+            if entry is not None and entry[1]:
+                raise RuntimeError(f"{resource_name} 的会话正在使用中")
+            if entry is None:
+                entry = [None, True, 0.0]
+                self._sessions[resource_name] = entry
+            entry[1] = True
+            session = entry[0]
+
+        try:
+            if session is not None:
+                try:
+                    session.timeout = timeout_ms
+                    session.query(self.validate_command)
+                    logger.debug("Reusing pooled session for %s", resource_name)
+                except Exception as e:
+                    logger.warning(f"Pooled session for {resource_name} is stale, reopening: {e}")
+                    self._close_session(session)
+                    session = None
+
+            if session is None:
+                start = time.monotonic()
+                session = self.rm_getter().open_resource(resource_name)
+                session.timeout = timeout_ms
+                logger.info("Opened session for %s (%.0f ms)", resource_name, (time.monotonic() - start) * 1000.0)
+        except Exception:
+            # 打开失败时撤销登记，下次acquire()重新打开
+            with self._lock:
+                if self._sessions.get(resource_name) is entry:
+                    del self._sessions[resource_name]
+            raise
+
+        with self._lock:
+            entry[0] = session
+        return session
+
+    def release(self, resource_name, session=None):
+        """归还会话，会话保持打开以便复用"""
+        with self._lock:
+            entry = self._sessions.get(resource_name)
+            if entry is not None and (session is None or entry[0] is session):
+                entry[1] = False
+                entry[2] = time.monotonic()
+
+    def discard(self, resource_name):
+        """关闭并移除会话（会话出错或需要彻底断开时调用）"""
+        with self._lock:
+            entry = self._sessions.pop(resource_name, None)
+        if entry is not None:
+            self._close_session(entry[0])
+
+    def close_all(self):
+        with self._lock:
+            entries = list(self._sessions.values())
+            self._sessions.clear()
+        for session, _, _ in entries:
+            if session is not None:
+                self._close_session(session)
+
+    def _close_idle_locked(self):
+        now = time.monotonic()
+        for name in [n for n, (_, in_use, released) in self._sessions.items()
+                     if not in_use and now - released > self.idle_timeout]:
+            session = self._sessions.pop(name)[0]
+            logger.debug("Closing idle session for %s", name)
+            self._close_session(session)
+
+    @staticmethod
+    def _close_session(session):
+        try:
+            session.close()
+        except Exception as e:
+            logger.debug(f"Error closing session: {e}")
+
+
+_discovery = None
+_pool = None
+_shared_lock = threading.Lock()
+
+
+def get_discovery():
+    """获取进程内共享的DeviceDiscovery"""
+    global _discovery
+    with _shared_lock:
+        if _discovery is None:
+            _discovery = DeviceDiscovery()
+        return _discovery
+
+
+def get_session_pool():
+    """获取进程内共享的SessionPool，进程退出时关闭所有会话"""
+    global _pool
+    with _shared_lock:
+        if _pool is None:
+            _pool = SessionPool()
+            atexit.register(_pool.close_all)
+        return _pool
@@ -3,32 +3,140 @@
 Author       : Linn
 Date         : 2025-07-26 16:05:07
 LastEditors  : Linn
-LastEditTime : 2025-07-29 09:30:00
+LastEditTime : 2026-10-19 21:00:00
 FilePath     : \\usbvna\\src\\lib\\vna_controller.py
 Description  : VNA Controller class for KeySight USB VNA control via PyVISA
 
 Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
 """
 
+import time
+
 import pyvisa as visa
-from .logger_config import setup_logger
+from .logger_config import set_rate_limit, setup_logger, truncate
+from .metrics import get_metrics
+from .trace_fields import FDATA, SDATA, measurement_dtype
+from .visa_pool import get_discovery, get_resource_manager, get_session_pool
 
 # 创建日志记录器
 logger = setup_logger("vna_controller", "logs/vna_controller.log", level=10)  # 10对应DEBUG级别
+# 采集循环中每道都会查询，DEBUG/INFO日志限速，WARNING及以上不受影响
+set_rate_limit("vna_controller", rate=10, burst=50)
+
+
+def join_commands(commands):
+    """
+    把多条SCPI命令拼成一条消息
+
+    分号后的命令头默认相对于前一条命令的子系统，因此除第一条外不以':'或'*'开头的命令补上根路径':'
+    """
+    parts = []
+    for command in commands:
+        command = command.strip()
+        if parts and not command.startswith((':', '*')):
+            command = ':' + command
+        parts.append(command)
+    return ";".join(parts)
+
+
+def split_response(response):
+    """按分号拆分复合查询的响应，引号内的分号不拆分"""
+    parts = []
+    current = []
+    quoted = False
+    for char in response.strip():
+        if char == '"':
+            quoted = not quoted
+        if char == ';' and not quoted:
+            parts.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append(''.join(current))
+    return parts
+
+
+class SCPIBatch:
+    """
+    命令批：在with块中累积命令，退出时作为一条消息发送
+
+    用法：
+        with vna.batch() as batch:
+            batch.write("FORM:DATA ASCII")
+            index = batch.query("CALC1:MEAS1:DATA:FDATA?")
+        data = batch.results[index] if batch.ok else None
+    """
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.commands = []
+        self.query_count = 0
+        self.results = None
+        self.ok = None
+
+    def write(self, command):
+        self.commands.append(command)
+        return self
+
+    def query(self, command):
+        """
+        添加一条查询
+
+        Returns:
+            int: 发送后该查询的响应在results中的下标
+        """
+        self.commands.append(command)
+        self.query_count += 1
+        return self.query_count - 1
+
+    def send(self):
+        """发送已累积的命令，有查询时等待并拆分响应"""
+        if not self.commands:
+            self.results, self.ok = [], True
+        elif self.query_count:
+            self.results = self.controller.query_batch(self.commands)
+            self.ok = self.results is not None and len(self.results) == self.query_count
+        else:
+            self.results = []
+            self.ok = self.controller.write_batch(self.commands)
+        self.commands = []
+        self.query_count = 0
+        return self.ok
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.send()
+        return False
 
 
 class VNAController:
     """A class to control a KeySight USB VNA using PyVISA."""
 
-    def __init__(self):
+    def __init__(self, resource_manager=None):
         """
         Initialize the VISA Resource Manager
+
+        Args:
+            resource_manager (optional): 注入的资源管理器（如SimulatedResourceManager），此时直接打开/关闭会话；
+                默认使用进程内共享的资源管理器（设置了USBVNA_SIMULATOR环境变量时为仿真后端）、
+                带缓存的设备发现和会话池
         """
         self.rm = None
         self.P9371B_VISA = None
+        self.resource_name = None
+        self.discovery = None
+        self.pool = None
         try:
-            self.rm = visa.ResourceManager()
-            logger.debug("VISA Resource Manager initialized")
+            if resource_manager is not None:
+                self.rm = resource_manager
+            else:
+                self.rm = get_resource_manager()
+                self.discovery = get_discovery()
+                self.pool = get_session_pool()
+            logger.debug(f"VISA Resource Manager initialized: {type(self.rm).__name__}")
         except Exception as e:
             logger.error(f"Failed to initialize VISA Resource Manager: {e}")
             # 不抛出异常，允许对象创建成功但标记为未初始化状态
@@ -44,13 +152,21 @@ class VNAController:
         except Exception as e:
             logger.error(f"Error in destructor: {e}")
 
-    def list_devices(self):
-        """List all connected VISA devices."""
+    def list_devices(self, force=False):
+        """
+        List all connected VISA devices.
+
+        Args:
+            force (bool): 忽略设备发现缓存，重新枚举
+        """
         if not self.rm:
             logger.error("Resource Manager not initialized")
             return []
         try:
-            resources = self.rm.list_resources()
+            if self.discovery is not None:
+                resources = self.discovery.list_devices(force=force)
+            else:
+                resources = self.rm.list_resources()
             logger.debug(f"Found resources: {resources}")
             return resources
         except Exception as e:
@@ -82,9 +198,14 @@ class VNAController:
             
             # 直接尝试打开设备，不再检查设备是否在可用列表中
             # 这样允许用户手动输入设备地址连接
-            self.P9371B_VISA = self.rm.open_resource(resource_name)
-            # 设置默认超时时间
-            self.P9371B_VISA.timeout = 5000  # 5秒超时
+            if self.pool is not None:
+                # 会话池中已有该资源的可用会话时直接复用
+                self.P9371B_VISA = self.pool.acquire(resource_name, timeout_ms=5000)
+            else:
+                self.P9371B_VISA = self.rm.open_resource(resource_name)
+                # 设置默认超时时间
+                self.P9371B_VISA.timeout = 5000  # 5秒超时
+            self.resource_name = resource_name
             logger.debug(f"Device {self.P9371B_VISA} opened successfully")
             return self.P9371B_VISA
         except visa.VisaIOError as e:
@@ -97,10 +218,23 @@ class VNAController:
             logger.error(f"Unexpected error opening device {resource_name}: {e}")
             return None
 
-    def close_device(self):
-        """Close the opened VISA device."""
+    def close_device(self, discard=False):
+        """
+        Close the opened VISA device.
+
+        Args:
+            discard (bool): 使用会话池时默认只归还会话以便重连复用，为True时真正关闭
+        """
         if self.P9371B_VISA:
             try:
+                if self.pool is not None and self.resource_name:
+                    if discard:
+                        self.pool.discard(self.resource_name)
+                        logger.debug("Device session discarded")
+                    else:
+                        self.pool.release(self.resource_name, self.P9371B_VISA)
+                        logger.debug("Device session released to pool")
+                    return
                 logger.debug("Closing device")
                 # 不使用clear操作，直接关闭设备，避免不必要的警告
                 self.P9371B_VISA.close()
@@ -111,6 +245,7 @@ class VNAController:
                 logger.error(f"Unexpected error closing device: {e}")
             finally:
                 self.P9371B_VISA = None
+                self.resource_name = None
                 logger.debug("Device reference cleared")
 
     def read(self):
@@ -124,7 +259,7 @@ class VNAController:
             # 检查是否有read方法
             if hasattr(self.P9371B_VISA, 'read'):
                 response = self.P9371B_VISA.read()
-                logger.debug(f"Response received: {response}")
+                logger.debug("Response received: %s", truncate(response))
                 return response
             else:
                 logger.error("Device does not support read method.")
@@ -146,17 +281,17 @@ class VNAController:
             return None
             
         try:
-            logger.debug(f"Sending command: {command}")
+            logger.debug("Sending command: %s", command)
             # 检查是否有query方法，如果有则直接使用（目前KeySight为此方法）
             if hasattr(self.P9371B_VISA, 'query'):
                 response = self.P9371B_VISA.query(command)
-                logger.debug(f"Response received: {response}")
+                logger.debug("Response received: %s", truncate(response))
                 return response
             # 否则尝试使用write和read方法组合
             elif hasattr(self.P9371B_VISA, 'write') and hasattr(self.P9371B_VISA, 'read'):
                 self.P9371B_VISA.write(command)
                 response = self.P9371B_VISA.read()
-                logger.debug(f"Response received: {response}")
+                logger.debug("Response received: %s", truncate(response))
                 return response
             else:
                 logger.error("Device does not support query, write, or read methods.")
@@ -178,7 +313,7 @@ class VNAController:
             return False
             
         try:
-            logger.debug(f"Sending command: {command}")
+            logger.debug("Sending command: %s", command)
             # 检查是否有write方法
             if hasattr(self.P9371B_VISA, 'write'):
                 self.P9371B_VISA.write(command)
@@ -197,6 +332,57 @@ class VNAController:
             logger.error(f"Unexpected error writing to device: {e}")
             return False
 
+    def batch(self):
+        """创建命令批，见SCPIBatch"""
+        return SCPIBatch(self)
+
+    def write_batch(self, commands):
+        """
+        把多条命令拼成一条消息写入，一次传输
+
+        Args:
+            commands (list): SCPI命令
+
+        Returns:
+            bool: 是否写入成功
+        """
+        if not self.P9371B_VISA:
+            logger.warning("No device session is open.")
+            return False
+        message = join_commands(commands)
+        try:
+            logger.debug("Sending batch: %s", truncate(message))
+            self.P9371B_VISA.write(message)
+            return True
+        except Exception as e:
+            logger.error(f"Error writing batch to device: {e}")
+            return False
+
+    def query_batch(self, commands):
+        """
+        把多条命令（可混合设置命令和查询）拼成一条消息，一次往返读回所有查询的响应
+
+        仅用于文本响应；二进制块数据（#开头）应单独查询。
+
+        Args:
+            commands (list): SCPI命令
+
+        Returns:
+            list: 各查询的响应，按查询在commands中的顺序；失败时返回None
+        """
+        if not self.P9371B_VISA:
+            logger.warning("No device session is open.")
+            return None
+        message = join_commands(commands)
+        try:
+            logger.debug("Sending batch query: %s", truncate(message))
+            response = self.P9371B_VISA.query(message)
+            logger.debug("Response received: %s", truncate(response))
+        except Exception as e:
+            logger.error(f"Error querying batch: {e}")
+            return None
+        return split_response(response)
+
     def check_instrument_info(self):
         """Check the instrument information."""
         if not self.P9371B_VISA:
@@ -261,13 +447,15 @@ class VNAController:
                 logger.error("Device does not support write method.")
                 return None
                 
-            self.P9371B_VISA.write(f":MMEMory:CDIRectory \"{path}\"")
-            logger.debug(f"Current Remote directory set to '{path}'")
-            
-            # 检查设备是否支持query方法
+            # 检查设备是否支持query方法，支持时设置与回读合并为一次往返
             if hasattr(self.P9371B_VISA, 'query'):
-                return self.P9371B_VISA.query(':MMEMory:CDIRectory?')
+                response = self.P9371B_VISA.query(join_commands([f":MMEMory:CDIRectory \"{path}\"",
+                                                                 ':MMEMory:CDIRectory?']))
+                logger.debug(f"Current Remote directory set to '{path}'")
+                return response
             else:
+                self.P9371B_VISA.write(f":MMEMory:CDIRectory \"{path}\"")
+                logger.debug(f"Current Remote directory set to '{path}'")
                 logger.warning("Device does not support query method for directory check")
                 return path  # 返回路径作为成功标识
         except visa.VisaIOError as e:
@@ -331,12 +519,13 @@ class VNAController:
             return None
         
         try:
-            # 设置数据格式为ASCII
-            self.write("FORM:DATA ASCII")
-            
-            # 使用FDATA获取显示的时域数据
-            command = f"CALC{channel}:MEAS{measurement}:DATA:FDATA?"
-            ascii_data = self.query(command)
+            # 设置数据格式为ASCII并用FDATA获取显示的时域数据，合并为一次往返
+            metrics = get_metrics()
+            fetch_start = time.monotonic()
+            responses = self.query_batch(["FORM:DATA ASCII", f"CALC{channel}:MEAS{measurement}:DATA:FDATA?"])
+            ascii_data = responses[0] if responses else None
+            parse_start = time.monotonic()
+            metrics.record('fetch', fetch_start, parse_start)
             
             # 解析ASCII数据
             if ascii_data:
@@ -344,11 +533,99 @@ class VNAController:
                 data_points = ascii_data.split(',')
                 float_data = [float(point) for point in data_points if point.strip()]
                 np_data = np.array(float_data)
+                metrics.record('parse', parse_start)
                 
-                logger.debug(f"读取A-Scan时域数据完成，数据点: {len(np_data)}")
+                logger.debug("读取A-Scan时域数据完成，数据点: %d", len(np_data))
                 return np_data
             
             return None
         except Exception as e:
             logger.error(f"读取A-Scan数据失败: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def read_multi_data(self, measurements, channel=1):
+        """
+        一次往返读取同一通道的多个测量，如S21与S11、不同时间门或复数SDATA
+
+        所有查询拼成一条消息，仪器连续应答，各测量取自同一次或紧邻的扫描。
+
+        Args:
+            measurements (list): (测量编号, FDATA或SDATA)列表，也可只给测量编号（按FDATA）
+            channel (int): 通道号，默认1
+
+        Returns:
+            numpy structured array: 每个测量一个字段（见trace_fields.measurement_dtype），或None如果读取失败
+        """
+        import numpy as np
+
+        if not self.P9371B_VISA:
+            logger.warning("No device session is open.")
+            return None
+
+        specs = [m if isinstance(m, tuple) else (m, FDATA) for m in measurements]
+        try:
+            metrics = get_metrics()
+            fetch_start = time.monotonic()
+            responses = self.query_batch(["FORM:DATA ASCII"] +
+                                         [f"CALC{channel}:MEAS{m}:DATA:{kind}?" for m, kind in specs])
+            parse_start = time.monotonic()
+            metrics.record('fetch', fetch_start, parse_start)
+            if responses is None or len(responses) != len(specs):
+                logger.error("多测量读取响应数量不符: %s", None if responses is None else len(responses))
+                return None
+
+            columns = []
+            for (m, kind), text in zip(specs, responses):
+                values = np.array([float(v) for v in text.split(',') if v.strip()])
+                if kind == SDATA:
+                    values = values[0::2] + 1j * values[1::2]
+                columns.append(values)
+            points = len(columns[0])
+            if any(len(values) != points for values in columns):
+                logger.error("多测量读取的点数不一致: %s", [len(values) for values in columns])
+                return None
+
+            data = np.empty(points, dtype=measurement_dtype(specs))
+            for name, values in zip(data.dtype.names, columns):
+                data[name] = values
+            metrics.record('parse', parse_start)
+            logger.debug("读取%d个测量完成，数据点: %d", len(specs), points)
+            return data
+        except Exception as e:
+            logger.error(f"多测量读取失败: {e}")
+            return None
+
+    def read_sdata(self, channel=1, measurement=1):
+        """
+        以二进制格式读取未格式化的复数数据SDATA
+
+        数据格式、字节序设置与查询合并为一条消息，一次往返；REAL,32小端数据按实部、虚部交替排列，
+        直接视为complex64数组，不做逐点解析。
+
+        Args:
+            channel (int): 通道号，默认1
+            measurement (int): 测量编号，默认1
+
+        Returns:
+            numpy array: complex64数组，或None如果读取失败
+        """
+        import numpy as np
+
+        if not self.P9371B_VISA:
+            logger.warning("No device session is open.")
+            return None
+
+        try:
+            metrics = get_metrics()
+            fetch_start = time.monotonic()
+            values = self.P9371B_VISA.query_binary_values(
+                join_commands(["FORM:DATA REAL,32", "FORM:BORD SWAP", f"CALC{channel}:MEAS{measurement}:DATA:SDATA?"]),
+                datatype='f', is_big_endian=False, container=np.ndarray)
+            parse_start = time.monotonic()
+            metrics.record('fetch', fetch_start, parse_start)
+            data = np.ascontiguousarray(values, dtype='<f4').view(np.complex64)
+            logger.debug("读取SDATA完成，数据点: %d", len(data))
+            return data
+        except Exception as e:
+            logger.error(f"读取SDATA失败: {e}")
+            return None
@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+"""
+Author       : Linn
+Date         : 2026-10-19 16:40:00
+LastEditors  : Linn
+LastEditTime : 2026-10-19 21:00:00
+FilePath     : \\usbvna\\src\\lib\\vna_simulator.py
+Description  : 进程内VNA仿真后端：接口与pyvisa的ResourceManager/Resource一致，按扫描周期生成合成GPR道，
+               用于无P9371B时对采集、存储和显示链路做离线压测
+
+Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
+"""
+
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from pyvisa import VisaIOError, constants
+
+from .logger_config import setup_logger
+
+# 创建日志记录器
+logger = setup_logger("vna_simulator", "logs/vna_simulator.log", level=10)  # 10对应DEBUG级别
+
+# 启用仿真后端的环境变量，取值为"1"或逗号分隔的参数，如"sweep_time=0.05,jitter=0.005,points=1001"
+SIM_ENV_VAR = "USBVNA_SIMULATOR"
+SIM_RESOURCE = "SIM0::P9371B::INSTR"
+SIM_IDN = "Keysight Technologies,P9371B,SIM00001,A.17.20.07"
+
+_DATA_RE = re.compile(r"^CALC(?:ULATE)?(\d*):MEAS(?:URE)?(\d*):DATA:(FDATA|SDATA)\?$")
+# 省略编号的子系统按1处理，如SENS:FREQ:STAR等同SENS1:FREQ:STAR
+_SUFFIX_RE = re.compile(r"(SENS|SOUR|CALC|MEAS)(?=:|$)")
+
+# 可读写的仿真设置及初始值（响应文本）
+# 频率步进0.5MHz对应不模糊时间范围2000ns，覆盖场景的900ns时窗；终止频率低于场景采样的奈奎斯特频率
+_DEFAULT_SETTINGS = {
+    "SENS1:FREQ:STAR": "+5.00000000000E+005",
+    "SENS1:FREQ:STOP": "+5.00500000000E+008",
+    "SENS1:BWID": "+1.00000000000E+004",
+    "SOUR1:POW": "+0.00000000000E+000",
+    "SENS1:AVER": "0",
+    "SENS1:AVER:COUN": "+1",
+    "CALC1:MEAS1:PAR": "\"S21\"",
+    "CALC1:MEAS1:FORM": "REAL",
+    "CALC1:MEAS1:TRAN:TIME:STAT": "1",
+    "CALC1:MEAS1:TRAN:TIME:TYPE": "LPAS",
+    "CALC1:MEAS1:TRAN:TIME:STIM": "IMP",
+    "CALC1:MEAS1:TRAN:TIME:STAR": "+0.00000000000E+000",
+    "CALC1:MEAS1:TRAN:TIME:STOP": "+9.00000000000E-007",
+    "CALC1:MEAS1:FILT:TIME:STAT": "0",
+    "CALC1:MEAS1:FILT:TIME:STAR": "-1.00000000000E-009",
+    "CALC1:MEAS1:FILT:TIME:STOP": "+1.00000000000E-009",
+}
+
+
+class GPRScene:
+    """
+    合成GPR场景：直达波/地面反射、若干点目标绕射双曲线、层位反射和随机噪声
+
+    第n道对应测线位置 n * trace_spacing，同一seed下序列可复现。
+    """
+
+    def __init__(self, points=1001, time_range_ns=900.0, trace_spacing=0.02, velocity=0.1,
+                 noise=0.01, seed=0):
+        """
+        Args:
+            points (int): 每道采样点数
+            time_range_ns (float): 时窗(ns)
+            trace_spacing (float): 道间距(m)
+            velocity (float): 介质波速(m/ns)
+            noise (float): 噪声标准差（相对直达波幅度）
+            seed (int): 随机种子
+        """
+        self.points = points
+        self.time_range_ns = time_range_ns
+        self.trace_spacing = trace_spacing
+        self.velocity = velocity
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+        self.t = np.linspace(0.0, time_range_ns, points)
+        # 点目标：(测线位置m, 深度m, 反射系数)
+        self.targets = [(2.0, 1.0, 0.35), (5.0, 2.5, 0.25), (8.5, 1.6, -0.3), (12.0, 4.0, 0.2)]
+        self._ground = self._ricker(40.0, 8.0)
+
+    def _ricker(self, t0, width):
+        a = ((self.t - t0) / width) ** 2
+        return (1.0 - 2.0 * a) * np.exp(-a)
+
+    def trace(self, index):
+        """生成第index道，float64数组"""
+        x = index * self.trace_spacing
+        data = self._ground.copy()
+        # 缓慢起伏的层位
+        layer_t = 300.0 + 40.0 * np.sin(x / 3.0)
+        data += 0.15 * self._ricker(layer_t, 10.0)
+        for x0, depth, refl in self.targets:
+            # 双程走时 t = 2 * sqrt(d^2 + (x - x0)^2) / v
+            dist = np.hypot(depth, x - x0)
+            t_hyp = 40.0 + 2.0 * dist / self.velocity
+            if t_hyp < self.time_range_ns:
+                # 随距离的几何扩散衰减
+                data += refl * depth / dist * self._ricker(t_hyp, 10.0)
+        data += self.noise * self.rng.standard_normal(self.points)
+        return data
+
+
+class SimulatedInstrument:
+    """
+    仿真仪器会话，提供pyvisa MessageBasedResource的常用方法
+
+    仪器处于连续扫描状态，每次扫描耗时sweep_time（高斯抖动jitter）；读取FDATA时若距上次读取
+    尚未完成新的扫描则阻塞到下一次扫描完成，以此模拟真实的扫描速率上限。
+    """
+
+    def __init__(self, resource_name, sweep_time=0.08, jitter=0.005, points=1001, command_latency=0.0005,
+                 seed=0, scene=None):
+        """
+        Args:
+            resource_name (str): 资源名
+            sweep_time (float): 单次扫描时间(秒)
+            jitter (float): 扫描时间抖动标准差(秒)
+            points (int): 每道采样点数
+            command_latency (float): 每条命令的固定开销(秒)
+            seed (int): 随机种子
+            scene (GPRScene, optional): 合成场景
+        """
+        self.resource_name = resource_name
+        self.sweep_time = sweep_time
+        self.jitter = jitter
+        self.command_latency = command_latency
+        self.scene = scene or GPRScene(points=points, seed=seed)
+        self.timeout = 2000
+        self.read_termination = '\n'
+        self.write_termination = '\n'
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._format = "ASCII"
+        self._big_endian = True
+        self._cdir = "C:/Users/Public/Documents/Network Analyzer"
+        self._output = b""
+        self._sweep_index = 0
+        self._next_sweep = time.monotonic() + self._sweep_duration()
+        self._last_fetched = -1
+        self._closed = False
+        self._settings = dict(_DEFAULT_SETTINGS)
+        self._message_trace = None
+        self._dft_key = None
+        self._dft = None
+
+    def _sweep_duration(self):
+        if self.jitter:
+            return max(1e-4, self._rng.gauss(self.sweep_time, self.jitter))
+        return self.sweep_time
+
+    def _wait_new_sweep(self):
+        """推进扫描计数，必要时等待下一次扫描完成，返回最近完成的扫描序号"""
+        now = time.monotonic()
+        while now >= self._next_sweep:
+            self._sweep_index += 1
+            self._next_sweep += self._sweep_duration()
+        if self._sweep_index <= self._last_fetched:
+            wait = self._next_sweep - now
+            if wait * 1000.0 > self.timeout:
+                time.sleep(self.timeout / 1000.0)
+                raise VisaIOError(constants.StatusCode.error_timeout)
+            time.sleep(wait)
+            self._sweep_index += 1
+            self._next_sweep += self._sweep_duration()
+        self._last_fetched = self._sweep_index
+        return self._sweep_index
+
+    def _encode(self, data):
+        if self._format == "ASCII":
+            return (",".join(f"{v:+.10E}" for v in data) + "\n").encode("ascii")
+        dtype = np.dtype(">f4" if self._format == "REAL32" else ">f8")
+        if not self._big_endian:
+            dtype = dtype.newbyteorder("<")
+        body = np.asarray(data, dtype=dtype).tobytes()
+        size = str(len(body))
+        return f"#{len(size)}{size}".encode("ascii") + body + b"\n"
+
+    def _handle(self, command):
+        """执行一条命令，查询命令返回响应字节"""
+        cmd = command.strip()
+        upper = cmd.upper()
+        # 命令头前的冒号表示从根路径开始，不影响含义
+        bare = upper.lstrip(":")
+        if upper == "*IDN?":
+            return (SIM_IDN + "\n").encode("ascii")
+        if upper == "*OPC?":
+            return b"+1\n"
+        if upper in ("*CLS", "*RST", "*WAI", "*OPC"):
+            return None
+        if bare.startswith("FORM:DATA?"):
+            return {"ASCII": b"ASC,+0\n", "REAL32": b"REAL,+32\n", "REAL64": b"REAL,+64\n"}[self._format]
+        if bare.startswith("FORM:DATA") or bare.startswith("FORM "):
+            arg = upper.split(None, 1)[1].replace(" ", "") if " " in upper else ""
+            if arg.startswith("ASC"):
+                self._format = "ASCII"
+            elif arg in ("REAL,32", "REAL32"):
+                self._format = "REAL32"
+            elif arg in ("REAL,64", "REAL64", "REAL"):
+                self._format = "REAL64"
+            return None
+        if bare.startswith("FORM:BORD"):
+            self._big_endian = not upper.endswith("SWAP")
+            return None
+        match = _DATA_RE.match(bare)
+        if match:
+            # 同一条消息中的多个测量取自同一次扫描
+            if self._message_trace is None:
+                self._message_trace = self.scene.trace(self._wait_new_sweep())
+            measurement = int(match.group(2) or 1)
+            # 其它测量（如交叉极化）幅度减半、极性相反
+            data = self._message_trace * (-0.5) ** (measurement - 1)
+            if match.group(3) == "SDATA":
+                spectrum = self._spectrum(data)
+                data = np.column_stack((spectrum.real, spectrum.imag)).ravel()
+            return self._encode(data)
+        if bare.startswith("SENS") and upper.endswith("SWE:POIN?"):
+            return f"+{self.scene.points}\n".encode("ascii")
+        header, _, arg = bare.partition(" ")
+        key = _SUFFIX_RE.sub(r"\g<1>1", header.rstrip("?"))
+        if key.startswith("SENS") and key.endswith("SWE:POIN") and not header.endswith("?"):
+            # 改变点数后按新点数重建场景
+            scene = self.scene
+            self.scene = GPRScene(points=int(float(arg)), time_range_ns=scene.time_range_ns,
+                                  trace_spacing=scene.trace_spacing, velocity=scene.velocity, noise=scene.noise)
+            return None
+        if key in self._settings:
+            if header.endswith("?"):
+                return (self._settings[key] + "\n").encode("ascii")
+            self._settings[key] = cmd.lstrip(":").partition(" ")[2].strip()
+            return None
+        if upper.startswith(":MMEM") and "CDIR" in upper:
+            if upper.endswith("?"):
+                return f"\"{self._cdir}\"\n".encode("ascii")
+            self._cdir = cmd.split(None, 1)[1].strip().strip('"')
+            return None
+        if upper.startswith(":MMEM") and "STOR:DATA" in upper.replace("STORE", "STOR").replace("MEMORY", "MEM"):
+            self._store_data(cmd)
+            return None
+        if upper.startswith(":MMEM") and "CAT" in upper and "?" in upper:
+            folder = cmd.split("?", 1)[1].strip().strip('"') or self._cdir
+            files = sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+            return ("\"" + ",".join(files) + "\"\n").encode("utf-8")
+        if upper.endswith("?"):
+            logger.warning(f"仿真仪器不支持的查询: {cmd}")
+            return b"0\n"
+        return None
+
+    def _spectrum(self, data):
+        """
+        按当前扫描频率计算时域道的频谱，作为仿真的SDATA；DFT矩阵按频率设置缓存
+
+        幅度按仪器冲激响应的约定缩放：矩形窗变换回时域后与原道幅度一致。
+        """
+        key = (self._settings["SENS1:FREQ:STAR"], self._settings["SENS1:FREQ:STOP"], len(data))
+        if key != self._dft_key:
+            frequencies = np.linspace(float(key[0]), float(key[1]), len(data))
+            t = self.scene.t * 1e-9
+            scale = 2.0 * len(data) * (frequencies[1] - frequencies[0]) * (t[1] - t[0])
+            self._dft = (scale * np.exp(-2j * np.pi * np.outer(frequencies, t))).astype(np.complex64)
+            self._dft_key = key
+        return self._dft @ data.astype(np.complex64)
+
+    def _store_data(self, command):
+        """模拟:MMEMory:STORe:DATA，按仪器CSV格式把当前道写到CDIR目录"""
+        args = [a.strip().strip('"') for a in command.split(None, 1)[1].split(",")]
+        filename = args[0]
+        index = self._wait_new_sweep()
+        data = self.scene.trace(index)
+        path = filename if os.path.isabs(filename) else os.path.join(self._cdir, filename)
+        lines = [
+            "!CSV A.01.01",
+            f"!{SIM_IDN}",
+            f"!Date: {datetime.now().strftime('%A, %B %d, %Y %H:%M:%S')}",
+            "!Source: Standard",
+            "!",
+            "BEGIN CH1_DATA",
+            "Time(s),S21 Real(U)",
+        ]
+        t = self.scene.t * 1e-9
+        lines.extend(f"{ti:.10E},{v:.10E}" for ti, v in zip(t, data))
+        lines.append("END")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def _check_open(self):
+        if self._closed:
+            raise VisaIOError(constants.StatusCode.error_connection_lost)
+
+    def write(self, command, termination=None, encoding=None):
+        self._check_open()
+        time.sleep(self.command_latency)
+        with self._lock:
+            self._message_trace = None
+            responses = []
+            for part in command.split(";"):
+                if part.strip():
+                    response = self._handle(part)
+                    if response is not None:
+                        responses.append(response)
+            # 与真实仪器一致：复合查询的各响应以分号分隔，共用一个结束符
+            if len(responses) > 1 and not any(r.startswith(b"#") for r in responses):
+                responses = [b";".join(r.rstrip(b"\n") for r in responses) + b"\n"]
+            self._output += b"".join(responses)
+        return len(command)
+
+    def read_raw(self, size=None):
+        self._check_open()
+        with self._lock:
+            if not self._output:
+                raise VisaIOError(constants.StatusCode.error_timeout)
+            data, self._output = self._output, b""
+        return data
+
+    def read_bytes(self, count, chunk_size=None, break_on_termchar=False):
+        self._check_open()
+        with self._lock:
+            if len(self._output) < count:
+                raise VisaIOError(constants.StatusCode.error_timeout)
+            data, self._output = self._output[:count], self._output[count:]
+        return data
+
+    def read(self, termination=None, encoding=None):
+        return self.read_raw().decode("ascii", errors="replace").rstrip("\r\n")
+
+    def query(self, message, delay=None):
+        self.write(message)
+        return self.read()
+
+    def query_ascii_values(self, message, converter='f', separator=',', container=list, delay=None):
+        values = [float(v) for v in self.query(message).split(separator) if v.strip()]
+        return container(values)
+
+    def query_binary_values(self, message, datatype='f', is_big_endian=False, container=list, delay=None,
+                            header_fmt='ieee', expect_termination=True, data_points=0, chunk_size=None):
+        self.write(message)
+        raw = self.read_raw()
+        if not raw.startswith(b"#"):
+            raise VisaIOError(constants.StatusCode.error_invalid_format)
+        n = int(raw[1:2])
+        length = int(raw[2:2 + n])
+        body = raw[2 + n:2 + n + length]
+        dtype = np.dtype(datatype).newbyteorder(">" if is_big_endian else "<")
+        values = np.frombuffer(body, dtype=dtype)
+        return values.copy() if container is np.ndarray else container(values.tolist())
+
+    def clear(self):
+        with self._lock:
+            self._output = b""
+
+    def close(self):
+        self._closed = True
+
+
+class SimulatedResourceManager:
+    """与pyvisa.ResourceManager接口一致的仿真资源管理器，只提供一台P9371B"""
+
+    def __init__(self, **instrument_kwargs):
+        """
+        Args:
+            **instrument_kwargs: 传给SimulatedInstrument的参数（sweep_time、jitter、points等）
+        """
+        self.instrument_kwargs = instrument_kwargs
+
+    def list_resources(self, query='?*::INSTR'):
+        return (SIM_RESOURCE,)
+
+    def open_resource(self, resource_name, **kwargs):
+        if resource_name != SIM_RESOURCE and not resource_name.upper().startswith("SIM"):
+            raise VisaIOError(constants.StatusCode.error_resource_not_found)
+        logger.info(f"打开仿真仪器 {resource_name} {self.instrument_kwargs}")
+        return SimulatedInstrument(resource_name, **self.instrument_kwargs)
+
+    def close(self):
+        pass
+
+
+def simulator_from_env():
+    """
+    按环境变量USBVNA_SIMULATOR创建仿真资源管理器
+
+    Returns:
+        SimulatedResourceManager: 未设置或为"0"时返回None
+    """
+    value = os.environ.get(SIM_ENV_VAR, "").strip()
+    if not value or value == "0":
+        return None
+    kwargs = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        key, val = (s.strip() for s in item.split("=", 1))
+        kwargs[key] = int(val) if key in ("points", "seed") else float(val)
+    return SimulatedResourceManager(**kwargs)
@@ -3,7 +3,7 @@
 Author       : Linn
 Date         : 2026-01-12 22:04:03
 LastEditors  : Linn
-LastEditTime : 2026-01-13 18:10:00
+LastEditTime : 2026-10-19 22:30:00
 FilePath     : \\usbvna\\src\\lib\\workers.py
 Description  : 数据采集工作线程
 
@@ -13,16 +13,293 @@ Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
 import time
 import numpy as np
 import csv
+import functools
 import os
 from PyQt6.QtCore import QThread, pyqtSignal
 
+from .acq_supervisor import AcquisitionSupervisor, GapLog
+from .clock_sync import get_clock_sync
+from .logger_config import setup_logger
+from .metrics import get_metrics
+from .raw_capture import RAW_MODE, RawCapture
+from .session_index import FOLDER_PATTERN, LAYOUT_FOLDER, LAYOUT_STREAMING, POINT_FOLDER_PATTERN, SessionIndexWriter
+from .stream_journal import JournaledCSVWriter
+from .trace_fields import channel, is_single, trace_header, trace_row
+
+# 创建日志记录器
+logger = setup_logger("workers", "logs/workers.log", level=10)  # 10对应DEBUG级别
+
+
+def trace_reader(vna_controller, measurements=None):
+    """
+    按测量设置选择每道的读取函数
+
+    Args:
+        measurements (list, optional): (测量编号, FDATA或SDATA)列表，None为测量1
+
+    Returns:
+        callable: 单个FDATA测量为read_ascan_data（一维数组），否则为read_multi_data（结构化数组）
+    """
+    if measurements is None or measurements == [(1, 'FDATA')]:
+        return vna_controller.read_ascan_data
+    if is_single(measurements):
+        return functools.partial(vna_controller.read_ascan_data, measurement=measurements[0][0])
+    return functools.partial(vna_controller.read_multi_data, measurements)
+
+
+class TraceTimestampLog:
+    """道时间戳旁路文件，记录每一道的主机单调时间和同步后的GNSS时间"""
+
+    HEADER = ['Trace', 'host_mono', 'gnss_time', 'sync_locked']
+
+    def __init__(self, path, file_prefix):
+        self.file_path = os.path.join(path, f"{file_prefix}_timestamps.csv")
+        self.clock_sync = get_clock_sync()
+        self.file = None
+        self.writer = None
+
+    def write(self, trace_index, fetch_start, fetch_end):
+        """
+        记录一道的时间戳
+
+        VNA连续扫描时读出的是最近完成的一次扫描，取读取前后的中点作为该道的采集时刻
+        """
+        host_mono = (fetch_start + fetch_end) / 2.0
+        gnss_time = self.clock_sync.to_gnss(host_mono)
+        try:
+            if self.file is None:
+                self.file = open(self.file_path, 'w', newline='', encoding='utf-8')
+                self.writer = csv.writer(self.file)
+                self.writer.writerow(self.HEADER)
+            self.writer.writerow([
+                trace_index,
+                f"{host_mono:.6f}",
+                f"{gnss_time:.3f}" if gnss_time is not None else '',
+                int(self.clock_sync.is_locked())
+            ])
+        except OSError:
+            # 时间戳写入失败不影响采集流程
+            pass
+        return host_mono, gnss_time
+
+    def close(self):
+        if self.file:
+            try:
+                self.file.close()
+            except OSError:
+                pass
+            finally:
+                self.file = None
+                self.writer = None
+
+
+FOLDER_MODE = "A-Scan分散存储"
+
+
+class AcquisitionSession:
+    """
+    一次采集的公共部分，供各采集线程共用
+
+    负责会话级的准备（采集监管、道时间戳、流式CSV、会话索引、原始数据采集）、每一道的读取与写入，
+    以及结束时按固定顺序关闭各文件。
+    """
+
+    def __init__(self, vna_controller, path, file_prefix, data_acquisition_mode, dump_settings,
+                 measurements=None, transform_options=None, journal_options=None, position_source=None,
+                 file_pattern=FOLDER_PATTERN, sensor_hub=None, should_continue=None, on_event=None, on_trace=None):
+        """
+        Args:
+            vna_controller: VNA控制器
+            path (str): 存储路径
+            file_prefix (str): 文件前缀
+            data_acquisition_mode (str): 数据获取方式
+            dump_settings (tuple): 分散存储方式的(data_type, scope, data_format, selector)
+            measurements (list, optional): (测量编号, FDATA或SDATA)列表
+            transform_options (dict, optional): 原始数据方式的主机端变换设置
+            journal_options (dict, optional): 流式CSV的落盘策略
+            position_source (callable, optional): 返回最新RTK定位的函数
+            file_pattern (str): 分散存储方式的文件名格式
+            sensor_hub (SensorHub, optional): 多传感器协调器，道数据同时投递到同步会话文件
+            should_continue (callable, optional): 重连等待期间判断是否继续
+            on_event (callable, optional): 重连等状态消息回调
+            on_trace (callable, optional): 每道可显示数据的回调
+        """
+        self.vna_controller = vna_controller
+        self.path = path
+        self.file_prefix = file_prefix
+        self.folder_mode = data_acquisition_mode == FOLDER_MODE
+        self.dump_settings = dump_settings
+        self.sensor_hub = sensor_hub
+        self.on_trace = on_trace
+        # 实时数据流方式的每道读取函数，多个测量时一次往返读出结构化数组
+        self.read_trace = trace_reader(vna_controller, measurements)
+        # 原始复数数据方式：读取二进制SDATA原样保存，主机端变换后的时域道用于显示和CSV
+        self.raw_capture = None
+        if data_acquisition_mode == RAW_MODE:
+            self.raw_capture = RawCapture(vna_controller, path, file_prefix,
+                                          measurement=measurements[0][0] if measurements else 1,
+                                          options=transform_options)
+            self.read_trace = self.raw_capture.read
+        # 道时间戳旁路文件
+        self.timestamp_log = TraceTimestampLog(path, file_prefix)
+        # 分阶段时延统计
+        self.metrics = get_metrics()
+        # 采集监管：读取失败时自动重连，继续写入同一文件，中断区间记入{prefix}_gaps.csv
+        self.supervisor = AcquisitionSupervisor(vna_controller, GapLog(path, file_prefix),
+                                                should_continue=should_continue, on_event=on_event)
+        # 实时数据流方式的CSV写入器，按落盘策略分组fsync，重连期间先提交已写入的道
+        self.stream_writer = JournaledCSVWriter(os.path.join(path, f"{file_prefix}_streaming.csv"),
+                                                **(journal_options or {}))
+        self.supervisor.add_outage_step(self.stream_writer.commit)
+        # 会话道索引：每道的数据位置、时间戳、位置和质量标志，回放时按道号、时间或范围随机读取
+        self.session_index = SessionIndexWriter(
+            path, file_prefix, LAYOUT_FOLDER if self.folder_mode else LAYOUT_STREAMING,
+            file_pattern=file_pattern, position_source=position_source)
+        self.closed = False
+
+    def start(self):
+        """采集开始前的准备，失败时抛出异常"""
+        # 切换目录，重连后同样需要恢复
+        self.vna_controller.cdir(self.path)
+        self.supervisor.add_restore_step(lambda: self.vna_controller.cdir(self.path))
+        # 记录本次采集的仪器配置，重连后据此恢复
+        self.supervisor.track_state(self.path, self.file_prefix)
+        if self.raw_capture is not None:
+            if not self.raw_capture.start():
+                raise RuntimeError("无法读取扫描设置，原始数据采集未开始")
+            self.supervisor.add_restore_step(self.raw_capture.prepare_instrument)
+
+    def acquire(self, trace_index, filename=None):
+        """
+        采集一道
+
+        Args:
+            trace_index (int): 道号
+            filename (str, optional): 分散存储方式下仪器端保存的文件名
+
+        Returns:
+            bool: 读取成功返回True，重连失败或采集被停止返回False
+        """
+        if self.folder_mode:
+            return self._acquire_file(trace_index, filename)
+        return self._acquire_stream(trace_index)
+
+    def _acquire_file(self, trace_index, filename):
+        fetch_start = time.monotonic()
+        response = self.supervisor.call(self.vna_controller.data_dump, filename, *self.dump_settings,
+                                        trace_index=trace_index)
+        fetch_end = time.monotonic()
+        # 发生过重连时以成功那次读取的开始时刻为准
+        fetch_start = self.supervisor.attempt_start
+        self.metrics.record('fetch', fetch_start, fetch_end)
+
+        if response is None:
+            return False
+
+        host_mono, gnss_time = self.timestamp_log.write(trace_index, fetch_start, fetch_end)
+        self.session_index.add(trace_index, host_mono, gnss_time, reconnects=self.supervisor.reconnects)
+
+        # 尝试读取刚刚存储的数据以用于实时显示
+        parse_start = time.monotonic()
+        ascan_data = self._read_dumped(filename)
+        if ascan_data is not None:
+            self.metrics.record('parse', parse_start)
+            self.metrics.trace_done()
+            self.metrics.mark_emitted()
+            if self.on_trace:
+                self.on_trace(ascan_data)
+        return True
+
+    def _read_dumped(self, filename):
+        """读取仪器保存的单道CSV的幅值列，读取失败不影响采集流程，返回None"""
+        try:
+            with open(os.path.join(self.path, filename), 'r', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                # 跳过前7行标题和元数据
+                for _ in range(7):
+                    next(reader)
+                # 读取数据
+                amp_data = []
+                for row in reader:
+                    if len(row) >= 2 and row[0] != 'END':
+                        try:
+                            amp_data.append(float(row[1]))
+                        except ValueError:
+                            continue
+        except Exception:
+            return None
+        return np.array(amp_data) if amp_data else None
+
+    def _acquire_stream(self, trace_index):
+        # 读取A-Scan数据（单测量为read_ascan_data，多测量为read_multi_data）
+        fetch_start = time.monotonic()
+        ascan_data = self.supervisor.call(self.read_trace, trace_index=trace_index)
+        fetch_end = time.monotonic()
+        # 发生过重连时以成功那次读取的开始时刻为准
+        fetch_start = self.supervisor.attempt_start
+
+        if ascan_data is None:
+            return False
+
+        if self.raw_capture is not None:
+            ascan_data = self.raw_capture.process(trace_index, ascan_data)
+
+        host_mono, gnss_time = self.timestamp_log.write(trace_index, fetch_start, fetch_end)
+        if self.sensor_hub:
+            self.sensor_hub.submit('vna', channel(ascan_data), host_mono)
+
+        # 发送A-Scan数据用于实时显示
+        self.metrics.mark_emitted()
+        if self.on_trace:
+            self.on_trace(ascan_data)
+
+        # 第一次采集时创建文件并写入表头
+        store_start = time.monotonic()
+        if not self.stream_writer.is_open:
+            # 写入表头，第一列为道数，后续为采样点（多测量时按通道依次排列）
+            self.stream_writer.open(trace_header(ascan_data))
+
+        # 写入数据到CSV文件，第一列为道数，后续为采样点数据；
+        # 每sync_interval_ms毫秒或sync_traces道提交一次，落盘方式见stream_journal
+        record = self.stream_writer.write(trace_index, trace_row(trace_index, ascan_data))
+        self.session_index.add(trace_index, host_mono, gnss_time, record.offset, record.length,
+                               self.supervisor.reconnects)
+        self.metrics.record('store', store_start)
+        self.metrics.trace_done()
+        if self.sensor_hub:
+            self.metrics.set_queue_depth('sensor_hub', self.sensor_hub.pending())
+        return True
+
+    def close(self):
+        """
+        关闭本次采集打开的文件，重复调用无副作用
+
+        各采集方式按同一顺序关闭：先提交剩余的道并关闭流式CSV，使数据行和提交记录先落盘，
+        再关闭引用其偏移的会话索引，最后关闭时间戳、原始数据和中断记录；某一步失败不影响其余步骤。
+        """
+        if self.closed:
+            return
+        self.closed = True
+        steps = [self.stream_writer.close, self.session_index.close, self.timestamp_log.close]
+        if self.raw_capture is not None:
+            steps.append(self.raw_capture.close)
+        steps.append(self.supervisor.close)
+        for step in steps:
+            try:
+                step()
+            except Exception as e:
+                logger.error(f"Error closing acquisition session {self.file_prefix}: {e}")
+
+
 class DataDumpWorker(QThread):
     """工作线程，用于执行数据采集操作，避免阻塞GUI"""
     progress_updated = pyqtSignal(int, int)  # 当前进度, 总数
     finished_signal = pyqtSignal(bool, str)  # 成功与否, 消息
     ascan_data_available = pyqtSignal(object)  # A-Scan数据可用信号
+    status_message = pyqtSignal(str)  # 重连等状态消息
 
-    def __init__(self, vna_controller, count, file_prefix, path, data_type, scope, data_format, selector, interval, data_acquisition_mode="传统存储方式"):
+    def __init__(self, vna_controller, count, file_prefix, path, data_type, scope, data_format, selector, interval, data_acquisition_mode="传统存储方式",
+                 measurements=None, transform_options=None, journal_options=None, position_source=None):
         super().__init__()
         self.vna_controller = vna_controller
         self.count = count
@@ -34,80 +311,24 @@ class DataDumpWorker(QThread):
         self.selector = selector
         self.interval = interval
         self.data_acquisition_mode = data_acquisition_mode
+        self.session = AcquisitionSession(
+            vna_controller, path, file_prefix, data_acquisition_mode, (data_type, scope, data_format, selector),
+            measurements=measurements, transform_options=transform_options, journal_options=journal_options,
+            position_source=position_source, on_event=self.status_message.emit,
+            on_trace=self.ascan_data_available.emit)
 
     def run(self):
+        ok, message = False, ""
         try:
-            # 切换目录
-            self.vna_controller.cdir(self.path)
+            self.session.start()
 
             # 执行数据采集循环
             for i in range(self.count):
-                # 根据数据获取方式执行不同的采集逻辑
-                if self.data_acquisition_mode == "A-Scan分散存储":
-                    # 生成文件名，格式为{prefix}_0000001.csv
-                    filename = f"{self.file_prefix}_{i + 1:07d}.csv"
-                    response = self.vna_controller.data_dump(
-                        filename, self.data_type, self.scope, self.data_format, self.selector)
-
-                    if response is None:
-                        self.finished_signal.emit(False, f"数据采集在第{i + 1}次时失败")
-                        return
-                    
-                    # 尝试读取刚刚存储的数据以用于实时显示
-                    try:
-                        # 读取CSV文件
-                        file_path = os.path.join(self.path, filename)
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            reader = csv.reader(f)
-                            # 跳过前7行标题和元数据
-                            for _ in range(7):
-                                next(reader)
-                            # 读取数据
-                            amp_data = []
-                            for row in reader:
-                                if len(row) >= 2 and row[0] != 'END':
-                                    try:
-                                        amp = float(row[1])
-                                        amp_data.append(amp)
-                                    except ValueError:
-                                        continue
-                            if amp_data:
-                                ascan_data = np.array(amp_data)
-                                self.ascan_data_available.emit(ascan_data)
-                    except Exception as e:
-                        # 读取失败不影响采集流程
-                        pass
-                else:  # 实时数据流方式
-                    # 使用新的read_ascan_data方法获取数据
-                    
-                    # 生成主文件名，格式为{prefix}_streaming.csv
-                    main_filename = f"{self.file_prefix}_streaming.csv"
-                    main_file_path = os.path.join(self.path, main_filename)
-                    
-                    # 读取A-Scan数据
-                    ascan_data = self.vna_controller.read_ascan_data()
-                    
-                    if ascan_data is None:
-                        self.finished_signal.emit(False, f"数据采集在第{i + 1}次时失败")
-                        return
-                    
-                    # 发送A-Scan数据信号用于实时显示
-                    self.ascan_data_available.emit(ascan_data)
-                    
-                    # 第一次采集时创建文件并写入表头
-                    if i == 0:
-                        with open(main_file_path, 'w', newline='', encoding='utf-8') as f:
-                            writer = csv.writer(f)
-                            # 写入表头，第一列为道数，后续为采样点
-                            header = ['Trace'] + [f'Sample_{j}' for j in range(len(ascan_data))]
-                            writer.writerow(header)
-                    
-                    # 追加数据到CSV文件
-                    with open(main_file_path, 'a', newline='', encoding='utf-8') as f:
-                        writer = csv.writer(f)
-                        # 第一列为道数，后续为采样点数据
-                        row_data = [i + 1] + ascan_data.tolist()
-                        writer.writerow(row_data)
+                # 分散存储方式的文件名格式为{prefix}_0000001.csv
+                filename = f"{self.file_prefix}_{i + 1:07d}.csv"
+                if not self.session.acquire(i + 1, filename):
+                    message = f"数据采集在第{i + 1}次时失败"
+                    return
 
                 # 发送进度更新信号
                 self.progress_updated.emit(i + 1, self.count)
@@ -116,9 +337,13 @@ class DataDumpWorker(QThread):
                 if self.interval > 0:
                     time.sleep(self.interval)
 
-            self.finished_signal.emit(True, f"成功采集{self.count}道数据")
+            ok, message = True, f"成功采集{self.count}道数据"
         except Exception as e:
-            self.finished_signal.emit(False, f"采集过程中发生错误: {str(e)}")
+            message = f"采集过程中发生错误: {str(e)}"
+        finally:
+            # 先关闭会话再通知界面，界面收到结束信号时文件已全部写完
+            self.session.close()
+            self.finished_signal.emit(ok, message)
 
 
 class ContinuousDumpWorker(QThread):
@@ -126,8 +351,11 @@ class ContinuousDumpWorker(QThread):
     progress_updated = pyqtSignal(int)  # 当前次数
     finished_signal = pyqtSignal(bool, str)  # 成功与否的信号
     ascan_data_available = pyqtSignal(object)  # A-Scan数据可用信号
+    status_message = pyqtSignal(str)  # 重连等状态消息
 
-    def __init__(self, vna_controller, file_prefix, path, data_type, scope, data_format, selector, interval, data_acquisition_mode="传统存储方式"):
+    def __init__(self, vna_controller, file_prefix, path, data_type, scope, data_format, selector, interval, data_acquisition_mode="传统存储方式",
+                 sensor_hub=None, measurements=None, transform_options=None, journal_options=None,
+                 position_source=None):
         super().__init__()
         self.vna_controller = vna_controller
         self.file_prefix = file_prefix
@@ -138,105 +366,33 @@ class ContinuousDumpWorker(QThread):
         self.selector = selector
         self.interval = interval
         self.data_acquisition_mode = data_acquisition_mode
+        # 多传感器协调器（可选），道数据同时投递到同步会话文件
+        self.sensor_hub = sensor_hub
+        if self.sensor_hub:
+            self.sensor_hub.add_external_sensor('vna')
         self.running = True
-        # 添加文件对象和写入器，用于优化实时数据流方式的文件I/O
-        self.csv_file = None
-        self.csv_writer = None
-        self.file_initialized = False
+        self.session = AcquisitionSession(
+            vna_controller, path, file_prefix, data_acquisition_mode, (data_type, scope, data_format, selector),
+            measurements=measurements, transform_options=transform_options, journal_options=journal_options,
+            position_source=position_source, sensor_hub=sensor_hub, should_continue=lambda: self.running,
+            on_event=self.status_message.emit, on_trace=self.ascan_data_available.emit)
 
     def stop(self):
         self.running = False
 
-    def cleanup(self):
-        """清理资源，关闭文件"""
-        if self.csv_file:
-            try:
-                self.csv_file.close()
-                self.csv_file = None
-                self.csv_writer = None
-                self.file_initialized = False
-            except Exception as e:
-                pass
-
     def run(self):
+        ok, message = False, ""
         try:
-            # 切换目录
-            self.vna_controller.cdir(self.path)
+            self.session.start()
 
             count = 0
             while self.running:
                 count += 1
-                # 根据数据获取方式执行不同的采集逻辑
-                if self.data_acquisition_mode == "A-Scan分散存储":
-                    # 生成文件名，格式为{prefix}_0000001.csv
-                    filename = f"{self.file_prefix}_{count:07d}.csv"
-                    response = self.vna_controller.data_dump(
-                        filename, self.data_type, self.scope, self.data_format, self.selector)
-
-                    if response is None:
-                        self.finished_signal.emit(False, f"数据采集在第{count}次时失败")
-                        self.cleanup()
-                        return
-                    
-                    # 尝试读取刚刚存储的数据以用于实时显示
-                    try:
-                        # 读取CSV文件
-                        file_path = os.path.join(self.path, filename)
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            reader = csv.reader(f)
-                            # 跳过前7行标题和元数据
-                            for _ in range(7):
-                                next(reader)
-                            # 读取数据
-                            amp_data = []
-                            for row in reader:
-                                if len(row) >= 2 and row[0] != 'END':
-                                    try:
-                                        amp = float(row[1])
-                                        amp_data.append(amp)
-                                    except ValueError:
-                                        continue
-                            if amp_data:
-                                ascan_data = np.array(amp_data)
-                                self.ascan_data_available.emit(ascan_data)
-                    except Exception as e:
-                        # 读取失败不影响采集流程
-                        pass
-                else:  # 实时数据流方式
-                    # 使用新的read_ascan_data方法获取数据
-                    
-                    # 生成主文件名，格式为{prefix}_streaming.csv
-                    main_filename = f"{self.file_prefix}_streaming.csv"
-                    main_file_path = os.path.join(self.path, main_filename)
-                    
-                    # 读取A-Scan数据
-                    ascan_data = self.vna_controller.read_ascan_data()
-                    
-                    if ascan_data is None:
-                        self.finished_signal.emit(False, f"数据采集在第{count}次时失败")
-                        self.cleanup()
-                        return
-                    
-                    # 发送A-Scan数据信号用于实时显示
-                    self.ascan_data_available.emit(ascan_data)
-                    
-                    # 初始化文件和写入器（仅第一次）
-                    if not self.file_initialized:
-                        self.csv_file = open(main_file_path, 'w', newline='', encoding='utf-8')
-                        self.csv_writer = csv.writer(self.csv_file)
-                        # 写入表头，第一列为道数，后续为采样点
-                        header = ['Trace'] + [f'Sample_{j}' for j in range(len(ascan_data))]
-                        self.csv_writer.writerow(header)
-                        self.file_initialized = True
-                    
-                    # 写入数据到CSV文件
-                    if self.csv_writer:
-                        # 第一列为道数，后续为采样点数据
-                        row_data = [count] + ascan_data.tolist()
-                        self.csv_writer.writerow(row_data)
-                        # 定期刷新缓冲区，确保数据及时写入
-                        if count % 10 == 0:  # 每10次采集刷新一次
-                            self.csv_file.flush()
+                # 分散存储方式的文件名格式为{prefix}_0000001.csv
+                filename = f"{self.file_prefix}_{count:07d}.csv"
+                if not self.session.acquire(count, filename):
+                    message = f"数据采集在第{count}次时失败"
+                    return
 
                 # 发送进度更新信号
                 self.progress_updated.emit(count)
@@ -245,13 +401,13 @@ class ContinuousDumpWorker(QThread):
                 if self.interval > 0 and self.running:
                     time.sleep(self.interval)
 
-            # 采集完成，清理资源
-            self.cleanup()
-            self.finished_signal.emit(True, f"成功采集{count}组数据")
+            ok, message = True, f"成功采集{count}组数据"
         except Exception as e:
-            # 发生异常，清理资源
-            self.cleanup()
-            self.finished_signal.emit(False, f"采集过程中发生错误: {str(e)}")
+            message = f"采集过程中发生错误: {str(e)}"
+        finally:
+            # 先关闭会话再通知界面，界面收到结束信号时文件已全部写完
+            self.session.close()
+            self.finished_signal.emit(ok, message)
 
 
 class PointDumpWorker(QThread):
@@ -259,8 +415,10 @@ class PointDumpWorker(QThread):
     progress_updated = pyqtSignal(int, int)  # 当前进度, 总数
     finished_signal = pyqtSignal(bool, str)  # 成功与否, 消息
     ascan_data_available = pyqtSignal(object)  # A-Scan数据可用信号
+    status_message = pyqtSignal(str)  # 重连等状态消息
 
-    def __init__(self, vna_controller, count, file_prefix, path, data_type, scope, data_format, selector, interval, data_acquisition_mode="传统存储方式"):
+    def __init__(self, vna_controller, count, file_prefix, path, data_type, scope, data_format, selector, interval, data_acquisition_mode="传统存储方式",
+                 measurements=None, transform_options=None, journal_options=None, position_source=None):
         super().__init__()
         self.vna_controller = vna_controller
         self.count = count
@@ -273,89 +431,33 @@ class PointDumpWorker(QThread):
         self.interval = interval
         self.data_acquisition_mode = data_acquisition_mode
         self.running = True  # 添加运行标志
+        self.session = AcquisitionSession(
+            vna_controller, path, file_prefix, data_acquisition_mode, (data_type, scope, data_format, selector),
+            measurements=measurements, transform_options=transform_options, journal_options=journal_options,
+            position_source=position_source, should_continue=lambda: self.running,
+            on_event=self.status_message.emit, on_trace=self.ascan_data_available.emit)
 
     def stop(self):
         """停止采集"""
         self.running = False
 
     def run(self):
+        ok, message = False, ""
         try:
-            # 切换目录
-            self.vna_controller.cdir(self.path)
+            self.session.start()
 
             # 执行数据采集循环
             for i in range(self.count):
                 # 检查是否需要停止
                 if not self.running:
-                    self.finished_signal.emit(False, "采集被用户中断")
+                    message = "采集被用户中断"
                     return
 
-                # 根据数据获取方式执行不同的采集逻辑
-                if self.data_acquisition_mode == "A-Scan分散存储":
-                    # 生成文件名，格式为{prefix}_0000001.csv
-                    filename = f"{self.file_prefix}_{i + 1:07d}.csv"
-                    response = self.vna_controller.data_dump(
-                        filename, self.data_type, self.scope, self.data_format, self.selector)
-
-                    if response is None:
-                        self.finished_signal.emit(False, f"数据采集在第{i + 1}次时失败")
-                        return
-                    
-                    # 尝试读取刚刚存储的数据以用于实时显示
-                    try:
-                        # 读取CSV文件
-                        file_path = os.path.join(self.path, filename)
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            reader = csv.reader(f)
-                            # 跳过前7行标题和元数据
-                            for _ in range(7):
-                                next(reader)
-                            # 读取数据
-                            amp_data = []
-                            for row in reader:
-                                if len(row) >= 2 and row[0] != 'END':
-                                    try:
-                                        amp = float(row[1])
-                                        amp_data.append(amp)
-                                    except ValueError:
-                                        continue
-                            if amp_data:
-                                ascan_data = np.array(amp_data)
-                                self.ascan_data_available.emit(ascan_data)
-                    except Exception as e:
-                        # 读取失败不影响采集流程
-                        pass
-                else:  # 实时数据流方式
-                    # 使用新的read_ascan_data方法获取数据
-                    
-                    # 生成主文件名，格式为{prefix}_streaming.csv
-                    main_filename = f"{self.file_prefix}_streaming.csv"
-                    main_file_path = os.path.join(self.path, main_filename)
-                    
-                    # 读取A-Scan数据
-                    ascan_data = self.vna_controller.read_ascan_data()
-                    
-                    if ascan_data is None:
-                        self.finished_signal.emit(False, f"数据采集在第{i + 1}次时失败")
-                        return
-                    
-                    # 发送A-Scan数据信号用于实时显示
-                    self.ascan_data_available.emit(ascan_data)
-                    
-                    # 第一次采集时创建文件并写入表头
-                    if i == 0:
-                        with open(main_file_path, 'w', newline='', encoding='utf-8') as f:
-                            writer = csv.writer(f)
-                            # 写入表头，第一列为道数，后续为采样点
-                            header = ['Trace'] + [f'Sample_{j}' for j in range(len(ascan_data))]
-                            writer.writerow(header)
-                    
-                    # 追加数据到CSV文件
-                    with open(main_file_path, 'a', newline='', encoding='utf-8') as f:
-                        writer = csv.writer(f)
-                        # 第一列为道数，后续为采样点数据
-                        row_data = [i + 1] + ascan_data.tolist()
-                        writer.writerow(row_data)
+                # 分散存储方式的文件名格式为{prefix}_0000001.csv
+                filename = f"{self.file_prefix}_{i + 1:07d}.csv"
+                if not self.session.acquire(i + 1, filename):
+                    message = f"数据采集在第{i + 1}次时失败"
+                    return
 
                 # 发送进度更新信号
                 self.progress_updated.emit(i + 1, self.count)
@@ -364,9 +466,13 @@ class PointDumpWorker(QThread):
                 if self.interval > 0 and self.running:
                     time.sleep(self.interval)
 
-            self.finished_signal.emit(True, f"成功采集{self.count}道数据")
+            ok, message = True, f"成功采集{self.count}道数据"
         except Exception as e:
-            self.finished_signal.emit(False, f"采集过程中发生错误: {str(e)}")
+            message = f"采集过程中发生错误: {str(e)}"
+        finally:
+            # 先关闭会话再通知界面，界面收到结束信号时文件已全部写完
+            self.session.close()
+            self.finished_signal.emit(ok, message)
 
 
 class SinglePointDumpWorker(QThread):
@@ -374,9 +480,11 @@ class SinglePointDumpWorker(QThread):
     progress_updated = pyqtSignal(int, int)  # 当前进度, 总数
     finished_signal = pyqtSignal(bool, str)  # 成功与否, 消息
     ascan_data_available = pyqtSignal(object)  # A-Scan数据可用信号
+    status_message = pyqtSignal(str)  # 重连等状态消息
 
     def __init__(self, vna_controller, count, file_prefix, path, data_type, scope, data_format, selector, interval,
-                 start_index, data_acquisition_mode="传统存储方式"):
+                 start_index, data_acquisition_mode="传统存储方式", measurements=None,
+                 transform_options=None, journal_options=None, position_source=None):
         super().__init__()
         self.vna_controller = vna_controller
         self.count = count
@@ -389,81 +497,30 @@ class SinglePointDumpWorker(QThread):
         self.interval = interval
         self.start_index = start_index
         self.data_acquisition_mode = data_acquisition_mode
+        self.session = AcquisitionSession(
+            vna_controller, path, file_prefix, data_acquisition_mode, (data_type, scope, data_format, selector),
+            measurements=measurements, transform_options=transform_options, journal_options=journal_options,
+            position_source=position_source, file_pattern=POINT_FOLDER_PATTERN,
+            on_event=self.status_message.emit, on_trace=self.ascan_data_available.emit)
 
     def run(self):
+        ok, message = False, ""
         try:
-            # 切换目录
-            self.vna_controller.cdir(self.path)
+            self.session.start()
 
             # 执行数据采集循环
             for i in range(self.count):
-                # 根据数据获取方式执行不同的采集逻辑
-                if self.data_acquisition_mode == "A-Scan分散存储":
-                    # 生成文件名，格式为{prefix}_{index:08d}.csv
-                    filename = f"{self.file_prefix}_{self.start_index + i:08d}.csv"
-
-                    response = self.vna_controller.data_dump(
-                        filename, self.data_type, self.scope, self.data_format, self.selector)
-
-                    if response is None:
-                        self.finished_signal.emit(False, f"数据采集在第{i + 1}次时失败")
-                        return
-                    
-                    # 尝试读取刚刚存储的数据以用于实时显示
-                    try:
-                        # 读取CSV文件
-                        file_path = os.path.join(self.path, filename)
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            reader = csv.reader(f)
-                            # 跳过前7行标题和元数据
-                            for _ in range(7):
-                                next(reader)
-                            # 读取数据
-                            amp_data = []
-                            for row in reader:
-                                if len(row) >= 2 and row[0] != 'END':
-                                    try:
-                                        amp = float(row[1])
-                                        amp_data.append(amp)
-                                    except ValueError:
-                                        continue
-                            if amp_data:
-                                ascan_data = np.array(amp_data)
-                                self.ascan_data_available.emit(ascan_data)
-                    except Exception as e:
-                        # 读取失败不影响采集流程
-                        pass
-                else:  # 实时数据流方式
-                    # 使用新的read_ascan_data方法获取数据
-                    
-                    # 生成主文件名，格式为{prefix}_streaming.csv
-                    main_filename = f"{self.file_prefix}_streaming.csv"
-                    main_file_path = os.path.join(self.path, main_filename)
-                    
-                    # 读取A-Scan数据
-                    ascan_data = self.vna_controller.read_ascan_data()
-                    
-                    if ascan_data is None:
-                        self.finished_signal.emit(False, f"数据采集在第{i + 1}次时失败")
-                        return
-                    
-                    # 发送A-Scan数据信号用于实时显示
-                    self.ascan_data_available.emit(ascan_data)
-                    
-                    # 第一次采集时创建文件并写入表头
-                    if i == 0:
-                        with open(main_file_path, 'w', newline='', encoding='utf-8') as f:
-                            writer = csv.writer(f)
-                            # 写入表头，第一列为道数，后续为采样点
-                            header = ['Trace'] + [f'Sample_{j}' for j in range(len(ascan_data))]
-                            writer.writerow(header)
-                    
-                    # 追加数据到CSV文件
-                    with open(main_file_path, 'a', newline='', encoding='utf-8') as f:
-                        writer = csv.writer(f)
-                        # 第一列为道数，后续为采样点数据
-                        row_data = [self.start_index + i + 1] + ascan_data.tolist()
-                        writer.writerow(row_data)
+                if self.data_acquisition_mode == FOLDER_MODE:
+                    # 文件名格式为{prefix}_{index:08d}.csv，与文件同号
+                    trace_index = self.start_index + i
+                    filename = f"{self.file_prefix}_{trace_index:08d}.csv"
+                else:
+                    # 实时数据流方式的道号从start_index + 1开始
+                    trace_index = self.start_index + i + 1
+                    filename = None
+                if not self.session.acquire(trace_index, filename):
+                    message = f"数据采集在第{i + 1}次时失败"
+                    return
 
                 # 发送进度更新信号
                 self.progress_updated.emit(i + 1, self.count)
@@ -472,6 +529,10 @@ class SinglePointDumpWorker(QThread):
                 if self.interval > 0:
                     time.sleep(self.interval)
 
-            self.finished_signal.emit(True, f"成功采集{self.count}组数据")
+            ok, message = True, f"成功采集{self.count}组数据"
         except Exception as e:
-            self.finished_signal.emit(False, f"采集过程中发生错误: {str(e)}")
+            message = f"采集过程中发生错误: {str(e)}"
+        finally:
+            # 先关闭会话再通知界面，界面收到结束信号时文件已全部写完
+            self.session.close()
+            self.finished_signal.emit(ok, message)
@@ -3,19 +3,28 @@
 Author       : Linn
 Date         : 2025-07-28 17:02:03
 LastEditors  : Linn
-LastEditTime : 2026-01-17 04:50:00
+LastEditTime : 2026-10-19 18:10:00
 FilePath     : \\usbvna\\src\\main_gui.py
 Description  : Main program to control the USB-VNA P9371B, GPR DATA Acquisition Software
 
 Copyright (c) 2026 by Linn email: universe_yuan@icloud.com, All Rights Reserved.
 """
 
+import os
 import sys
-# import os
 
 # 将src目录添加到Python路径中，以便可以导入lib模块
 # sys.path.append(os.path.join(os.path.dirname(__file__))) # 以下已作为包导入
 
+# 启动耗时剖析：--profile-startup或环境变量USBVNA_STARTUP_PROFILE=1，设为exit时输出报告后退出
+# 需在导入其它lib模块之前安装导入计时钩子
+from lib.startup_profile import PROFILE_ENV_VAR, get_startup_profiler
+if '--profile-startup' in sys.argv:
+    sys.argv.remove('--profile-startup')
+    os.environ.setdefault(PROFILE_ENV_VAR, '1')
+profiler = get_startup_profiler()
+profiler.install_import_hook()
+
 # 从lib模块导入VNAController类和日志配置函数
 from lib.logger_config import setup_logger
 from lib.main_window import VNAControllerGUI
@@ -26,14 +35,26 @@ logger = setup_logger("vna_gui", "logs/vna_gui.log", level=10)  # 10对应DEBUG
 from PyQt6.QtWidgets import (
     QApplication
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QFont
 
+profiler.mark('imports')
+
+
+def report_startup_profile(app):
+    """事件循环开始后输出启动耗时报告"""
+    profiler.mark('event_loop')
+    report = profiler.dump("startup_profile.json")
+    logger.info("Startup profile: %.1f ms, written to startup_profile.json", report['total_ms'])
+    if os.environ.get(PROFILE_ENV_VAR) == 'exit':
+        app.quit()
+
 def main():
     """主函数"""
     logger.debug("Starting VNA Controller GUI")
     
     app = QApplication(sys.argv)
+    profiler.mark('qapplication')
     
     # 设置默认字体，解决字体发虚问题
     font = QFont("Microsoft YaHei", 9)
@@ -46,6 +67,8 @@ def main():
     window = VNAControllerGUI()
     window.show()
     logger.info("GUI Windows opened")
+    if profiler.enabled:
+        QTimer.singleShot(0, lambda: report_startup_profile(app))
 
     sys.exit(app.exec())
 
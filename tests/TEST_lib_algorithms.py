@@ -0,0 +1,571 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# src/lib各模块的可运行检查
+# 功能：不依赖真实仪器和网络（VNA使用内置模拟器），逐项检查各模块的核心行为；任一项失败时退出码为1
+#
+# 用法：
+#   python TEST_lib_algorithms.py                 # 运行全部检查
+#   python TEST_lib_algorithms.py fec             # 只运行指定的检查
+
+import csv
+import itertools
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+import traceback
+
+import numpy as np
+
+# 将src目录添加到Python路径中
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from lib.acq_supervisor import AcquisitionSupervisor, GapLog
+from lib.clock_sync import ClockSync
+from lib.fec import FEC_RS, FEC_XOR, FecCodec, recover as fec_recover
+from lib.instrument_state import STATE_PARAMS, InstrumentStateManager, load_profile, save_profile
+from lib.rate_control import DEFAULT_LADDER, RateController, UplinkShaper
+from lib.raw_capture import RawCapture, load_raw
+from lib.rtk_module import RTKModule
+from lib.sensor_hub import ALTIMETER_ENV_VAR, AltimeterSource, SensorHub, altimeter_from_env, read_session
+from lib.session_index import SessionIndexWriter, SessionReader
+from lib.stream_journal import JournaledCSVWriter, journal_path, read_journal, recover as journal_recover
+from lib.telemetry import TelemetrySender, to_wire
+from lib.telemetry_receiver import TelemetryReceiver
+from lib.time_domain import TransformPlan, get_plan, transform
+from lib.trace_codec import CODECS, TraceDecoder, TraceEncoder
+from lib.trace_fields import (FDATA, SDATA, channel, channel_names, is_single, measurement_dtype, parse_measurements,
+                              trace_header, trace_row)
+from lib.visa_pool import SessionPool
+from lib.vna_controller import VNAController
+from lib.vna_simulator import SIM_RESOURCE, SimulatedResourceManager
+
+
+def make_traces(n_traces=8, n_samples=1001, seed=0):
+    """合成一组相邻道相关的A-Scan，量级与S21时域幅值相当"""
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0.0, 1.0, n_samples)
+    base = 0.02 * np.sin(2 * np.pi * 40 * t) * np.exp(-3 * t)
+    return [(base + 0.001 * rng.standard_normal(n_samples)).astype(np.float32) for _ in range(n_traces)]
+
+
+def check_fec():
+    """Reed-Solomon在不超过m个分片丢失的所有组合下都能恢复全部数据分片，XOR可恢复任一分片"""
+    rng = np.random.default_rng(1)
+    for scheme, cases in ((FEC_RS, [(1, 1), (3, 2), (5, 3), (8, 4)]), (FEC_XOR, [(1, 1), (4, 1), (7, 1)])):
+        for k, m in cases:
+            codec = FecCodec(scheme, parity=m)
+            assert codec.parity_count(k) == m
+            stripes = rng.integers(0, 256, size=(k, 37), dtype=np.uint8)
+            parity = codec.encode(stripes, m)
+            everything = {i: stripes[i] for i in range(k)}
+            everything.update({k + j: parity[j] for j in range(m)})
+            for n_lost in range(m + 1):
+                for lost in itertools.combinations(range(k + m), n_lost):
+                    received = {i: row for i, row in everything.items() if i not in lost}
+                    out = fec_recover(scheme, k, m, received)
+                    assert out is not None and np.array_equal(out, stripes), \
+                        f"scheme={scheme} k={k} m={m} lost={lost}"
+            # 丢失超过m个分片时无法恢复
+            received = {i: row for i, row in everything.items() if i > m}
+            assert fec_recover(scheme, k, m, received) is None
+    return "RS/XOR全部丢失组合恢复正确"
+
+
+def check_clock_sync():
+    """带漂移和偏差的时钟换算、往返一致，突发延迟的样本被剔除"""
+    sync = ClockSync(window_size=60, min_samples=5, max_residual=0.05)
+    drift = 40e-6
+    offset = 1.7e9
+    for i in range(40):
+        host = 100.0 + i
+        sync.add_sample(host, offset + host * (1 + drift))
+    assert sync.is_locked()
+    assert not sync.add_sample(141.0, offset + 141.0 * (1 + drift) + 0.5), "突发延迟样本应被剔除"
+    host = 150.0
+    expected = offset + host * (1 + drift)
+    assert abs(sync.to_gnss(host) - expected) < 1e-4, sync.to_gnss(host) - expected
+    assert abs(sync.to_host(expected) - host) < 1e-4
+    assert abs(sync.get_status()['drift_ppm'] - 40.0) < 0.5, sync.get_status()
+    return "漂移40ppm时换算误差<0.1ms"
+
+
+def check_trace_codec():
+    """各编解码器按道顺序往返：无损编码逐位一致，有损编码误差不超过量化步长"""
+    traces = make_traces()
+    for codec in CODECS.values():
+        encoder = TraceEncoder(codec.codec_id)
+        decoder = TraceDecoder()
+        for trace_id, samples in enumerate(traces):
+            codec_id, payload = encoder.encode(samples, trace_id)
+            decoded = decoder.decode(codec_id, payload, samples.size, trace_id)
+            assert decoded is not None, f"{codec.name} trace {trace_id} 无法解码"
+            decoded = np.asarray(decoded, dtype=np.float32)
+            if codec.lossless:
+                assert np.array_equal(decoded, samples), f"{codec.name} 无损往返不一致"
+            else:
+                # 最粗的quant12为12位量化，误差上限取幅值范围/2^11
+                tolerance = float(np.max(np.abs(samples))) / 2047 + 1e-9
+                error = float(np.max(np.abs(decoded - samples)))
+                assert error <= tolerance, f"{codec.name} 误差{error:.3g}超过{tolerance:.3g}"
+    return f"{len(CODECS)}种编解码器往返正确"
+
+
+def check_telemetry():
+    """带RS校验的遥测分片在丢片、乱序下按道序重组，整道丢失时报告缺道"""
+    traces = make_traces(n_traces=6, n_samples=1500)
+    sender = TelemetrySender('127.0.0.1', 9, session_id=0x1234, max_datagram=600, fec=FecCodec(FEC_RS, parity=2))
+    try:
+        bursts = [sender.fragments(to_wire(samples), trace_id, samples.size, timestamp=100.0 + trace_id)
+                  for trace_id, samples in enumerate(traces)]
+    finally:
+        sender.close()
+
+    received, gaps = [], []
+    receiver = TelemetryReceiver(on_trace=lambda header, samples, t: received.append((header.trace_id, samples)),
+                                 on_gap=lambda session, first, count: gaps.append((first, count)),
+                                 max_latency=0.3)
+    now = 1000.0
+    # 第2道先于第1道到达，各道分片倒序；每道丢两个分片（不超过校验分片数）；第4道整道丢失
+    for trace_id in (0, 2, 1, 3, 5):
+        frags = bursts[trace_id]
+        keep = [f for i, f in enumerate(frags) if i not in (0, len(frags) // 2)]
+        for header, payload in reversed(keep):
+            receiver.feed(header + bytes(payload), receive_time=now)
+        now += 0.01
+    receiver.poll(now + 1.0)
+    receiver.flush()
+
+    assert [trace_id for trace_id, _ in received] == [0, 1, 2, 3, 5], received
+    for trace_id, samples in received:
+        assert np.array_equal(samples, traces[trace_id]), f"trace {trace_id} 重组不一致"
+    assert gaps == [(4, 1)], gaps
+    # 道完整后才到达的校验分片不算迟到
+    stats = receiver.session(0x1234).stats
+    assert stats['late'] == 0 and stats['recovered'] == 5, stats
+    return "丢片恢复、乱序重排和缺道报告正确"
+
+
+def check_to_wire():
+    """整数传输类型拒绝浮点样本，避免截断为0；整数样本按类型转换"""
+    samples = make_traces(n_traces=1, n_samples=64)[0]
+    for dtype in (np.int16, np.int32):
+        try:
+            to_wire(samples, dtype)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{np.dtype(dtype).name}传输类型应拒绝浮点样本")
+    counts = np.arange(-32, 32, dtype=np.int32)
+    wire = to_wire(counts, np.int16)
+    assert wire.dtype.itemsize == 2 and np.array_equal(wire.astype(np.int32), counts)
+    return "整数传输类型拒绝浮点样本"
+
+
+def check_rate_control():
+    """丢道时降档、持续良好时升档，上行副本按档位叠加和抽取"""
+    controller = RateController(hold_down=0.0, recover_reports=3, clock=lambda: 0.0)
+    changes = []
+    controller.add_listener(changes.append)
+    now = 10.0
+    controller.on_feedback({"loss": 0.2}, now=now)
+    controller.on_feedback({"loss": 0.2}, now=now + 1)
+    assert controller.level == 2, controller.level
+    for i in range(3):
+        controller.on_feedback({"loss": 0.0}, now=now + 2 + i)
+    assert controller.level == 1, controller.level
+    assert changes == [DEFAULT_LADDER[1], DEFAULT_LADDER[2], DEFAULT_LADDER[1]], changes
+    # 反馈超时同样降档
+    assert controller.check_timeout(now=now + 100) == DEFAULT_LADDER[2]
+
+    shaper = UplinkShaper(controller)
+    samples = np.arange(1001, dtype=np.float32)
+    out = shaper.process(samples)
+    assert out.size == 500 and np.allclose(out[:2], [0.5, 2.5])
+    controller.level = 3
+    assert shaper.process(samples) is None
+    out = shaper.process(samples + 2)
+    assert out.size == 500 and np.allclose(out[0], 1.5)
+    return "档位调整和上行整形正确"
+
+
+def check_visa_pool():
+    """会话归还后复用，已借出时拒绝共享，失效会话重新打开，空闲超时后关闭"""
+    rm = SimulatedResourceManager(sweep_time=0.01, jitter=0.0)
+    pool = SessionPool(rm_getter=lambda: rm)
+    first = pool.acquire(SIM_RESOURCE)
+    try:
+        pool.acquire(SIM_RESOURCE)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("已借出的会话不应再次借出")
+    pool.release(SIM_RESOURCE, first)
+    assert pool.acquire(SIM_RESOURCE) is first
+    pool.release(SIM_RESOURCE, first)
+
+    # 会话在池外被关闭，*IDN?校验失败后重新打开
+    first.close()
+    second = pool.acquire(SIM_RESOURCE)
+    assert second is not first
+    pool.release(SIM_RESOURCE, second)
+
+    idle_pool = SessionPool(rm_getter=lambda: rm, idle_timeout=0.0)
+    session = idle_pool.acquire(SIM_RESOURCE)
+    idle_pool.release(SIM_RESOURCE, session)
+    time.sleep(0.01)
+    assert idle_pool.acquire(SIM_RESOURCE) is not session
+    idle_pool.close_all()
+    pool.close_all()
+    return "复用、独占、失效重开和空闲关闭正确"
+
+
+def check_stream_journal(work_dir):
+    """写入中途截断（断电）后恢复：已提交的道保留，完整的未提交行补记，残缺行截掉"""
+    csv_path = os.path.join(work_dir, "j_streaming.csv")
+    traces = make_traces(n_traces=20, n_samples=64)
+    writer = JournaledCSVWriter(csv_path, durability='group', sync_interval_ms=1e6, sync_traces=8)
+    writer.open(trace_header(traces[0]))
+    for i, samples in enumerate(traces[:18], start=1):
+        writer.write(i, trace_row(i, samples))
+    # 模拟中止：第17、18道已写入但未提交，再追加半行，不调用close()
+    writer.file.write(b"19,0.0123,-0.004")
+    writer.file.flush()
+    writer.journal.flush()
+    committed = len(read_journal(journal_path(csv_path))) - 1
+    assert committed == 16, committed
+
+    report = journal_recover(csv_path)
+    assert report.traces == 18 and report.committed == 16 and report.salvaged == 2, report
+    assert report.truncated_bytes > 0 and not report.rebuilt, report
+    records = read_journal(journal_path(csv_path))
+    assert [r.trace for r in records] == list(range(19))
+    assert os.path.getsize(csv_path) == records[-1].offset + records[-1].length
+    # 恢复后再次检查无需修改
+    again = journal_recover(csv_path, dry_run=True)
+    assert again.truncated_bytes == 0 and again.salvaged == 0 and again.traces == 18, again
+
+    # 日志丢失时按CSV内容重建
+    os.remove(journal_path(csv_path))
+    rebuilt = journal_recover(csv_path)
+    assert rebuilt.rebuilt and rebuilt.traces == 18, rebuilt
+    writer.file.close()
+    writer.journal.close()
+    return "截断写入后恢复18道（已提交16道，补记2道）"
+
+
+def check_session_index(work_dir):
+    """按道号、位置范围、时间和经纬度查询会话中的道"""
+    traces = make_traces(n_traces=30, n_samples=128)
+    fix = {}
+    writer = JournaledCSVWriter(os.path.join(work_dir, "s_streaming.csv"))
+    index = SessionIndexWriter(work_dir, "s", position_source=lambda: fix)
+    writer.open(trace_header(traces[0]))
+    for i, samples in enumerate(traces, start=1):
+        host_mono = 500.0 + 0.1 * i
+        fix.update(host_mono=host_mono, latitude=30.0 + 0.001 * i, longitude=104.0, altitude=500.0,
+                   hdop=0.8, quality=4 if i % 2 else 5)
+        record = writer.write(i, trace_row(i, samples))
+        index.add(i, host_mono, offset=record.offset, length=record.length)
+    writer.close()
+    index.close()
+
+    with SessionReader(work_dir, "s") as reader:
+        assert len(reader) == 30
+        position = reader.find(17)
+        assert position == 16 and np.allclose(reader.get_trace(position), traces[16], atol=1e-6)
+        assert np.allclose(reader.get_range(5, 9), np.array(traces[5:9]), atol=1e-6)
+        positions = reader.query_time(500.95, 501.25, clock='host')
+        assert list(reader.traces[positions]) == [10, 11, 12], reader.traces[positions]
+        positions = reader.query_bbox(30.0045, 103.0, 30.0085, 105.0, min_quality=5)
+        assert list(reader.traces[positions]) == [6, 8], reader.traces[positions]
+        assert reader.get_traces(positions).shape == (2, 128)
+
+    # 索引文件丢失时按CSV重建，按道号读取结果不变
+    os.remove(os.path.join(work_dir, "s_index.bin"))
+    with SessionReader(work_dir, "s") as reader:
+        assert len(reader) == 30 and np.allclose(reader.get_trace(reader.find(30)), traces[29], atol=1e-6)
+    return "道号、范围、时间、经纬度查询和索引重建正确"
+
+
+class SocketSerial:
+    """用socketpair模拟非阻塞串口，检查代码向peer写入传感器输出"""
+
+    def __init__(self):
+        self.sock, self.peer = socket.socketpair()
+        self.sock.setblocking(False)
+        self.is_open = True
+
+    @property
+    def in_waiting(self):
+        try:
+            return len(self.sock.recv(65536, socket.MSG_PEEK))
+        except BlockingIOError:
+            return 0
+
+    def read(self, size):
+        return self.sock.recv(size)
+
+    def write(self, data):
+        return len(data)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def close(self):
+        self.is_open = False
+        self.sock.close()
+        self.peer.close()
+
+
+def check_sensor_hub(work_dir):
+    """RTK串口和激光测距由协调器事件循环读取：RTK状态和CSV照常更新，定位、高度与VNA道写入同一会话文件"""
+    nmea = [
+        "$GNRMC,083559.00,A,3040.1234567,N,10405.7654321,E,0.012,45.6,191026,,,D*6C",
+        "$GNGGA,083559.00,3040.1234567,N,10405.7654321,E,4,24,0.6,512.345,M,-32.1,M,1.0,0000*4A",
+        "$GPGSA,A,3,01,03,06,09,17,19,22,28,,,,,1.2,0.6,1.0*3A",
+    ]
+    rtk_port, altimeter_port = SocketSerial(), SocketSerial()
+    rtk = RTKModule(port="fake", clock_sync=ClockSync())
+    rtk.ser = rtk_port
+    rtk.set_data_file(os.path.join(work_dir, "rtk.csv"))
+    hub = SensorHub(clock_sync=rtk.clock_sync)
+    hub.add_external_sensor('vna')
+    hub.start()
+    session_path = os.path.join(work_dir, "h_session.gss")
+    trace = make_traces(n_traces=1, n_samples=256)[0]
+    try:
+        # 接入协调器后RTK模块不再启动自己的读写线程
+        assert rtk.start(sensor_hub=hub) and rtk.read_thread is None and rtk.write_thread is None
+        assert hub.add_source(AltimeterSource('altimeter', "fake", scale=0.001, ser=altimeter_port))
+        hub.open_session(session_path)
+        rtk_port.peer.sendall(("\r\n".join(nmea) + "\r\n").encode())
+        altimeter_port.peer.sendall(b"D=12345\r\nnoise\r\n")
+        hub.submit('vna', trace)
+        deadline = time.monotonic() + 2.0
+        while hub.stats.get('rtk', 0) < 3 or hub.stats.get('altimeter', 0) < 1:
+            assert time.monotonic() < deadline, hub.stats
+            time.sleep(0.01)
+        fix = rtk.latest_fix()
+        assert fix and abs(float(fix['latitude']) - (30 + 40.1234567 / 60)) < 1e-7, fix
+        hub.close_session()
+        rtk.stop()
+        assert rtk.hub_source is None and rtk_port.is_open, "移除数据源不应关闭RTK模块的串口"
+        assert [s.name for s in hub.sources] == ['altimeter']
+    finally:
+        hub.stop()
+        rtk.close_data_file()
+        rtk_port.close()
+        altimeter_port.close()
+
+    meta, records = read_session(session_path)
+    records = list(records)
+    assert meta['sensors'] == ['rtk', 'altimeter', 'vna'], meta
+    by_sensor = {}
+    for record in records:
+        by_sensor.setdefault(record.sensor, []).append(record)
+    assert [r.payload['type'] for r in by_sensor['rtk']] == ['RMC', 'GGA', 'GSA']
+    assert all(r.kind == 'fix' for r in by_sensor['rtk'])
+    assert [r.payload for r in by_sensor['altimeter']] == [{'height_m': 12.345}]
+    assert np.array_equal(by_sensor['vna'][0].payload, trace)
+    with open(os.path.join(work_dir, "rtk.csv"), encoding='utf-8') as f:
+        rows = f.read().splitlines()
+    # 表头 + GGA/RMC各一行（GSA不存储）
+    assert len(rows) == 3, rows
+
+    os.environ[ALTIMETER_ENV_VAR] = "port=COM5, baudrate=9600, scale=0.001"
+    try:
+        source = altimeter_from_env()
+    finally:
+        del os.environ[ALTIMETER_ENV_VAR]
+    assert (source.port, source.baudrate, source.scale) == ("COM5", 9600, 0.001)
+    assert altimeter_from_env() is None
+    return "RTK/激光测距经事件循环读取，会话文件记录3条定位、1条高度和1道"
+
+
+def check_acq_supervisor(work_dir):
+    """仿真仪器会话中途断开：重连后恢复仪器设置、道号连续，重连成功和放弃都写入中断记录"""
+    controller = VNAController(resource_manager=SimulatedResourceManager(sweep_time=0.002, jitter=0.0, points=201))
+    assert controller.open_device(SIM_RESOURCE)
+    controller.write(":SENS1:BWID 1000")
+    events = []
+    supervisor = AcquisitionSupervisor(controller, GapLog(work_dir, "g"), max_attempts=3, base_delay=0.01,
+                                       on_event=events.append)
+    settings = supervisor.track_state(work_dir, "g")
+    assert settings and settings['if_bandwidth'] == 1000.0, settings
+    assert os.path.exists(os.path.join(work_dir, "g_state.json"))
+
+    for trace_index in range(1, 6):
+        if trace_index == 3:
+            # 模拟USB断开：会话失效，读取返回None
+            controller.P9371B_VISA.close()
+        data = supervisor.call(controller.read_ascan_data, trace_index=trace_index)
+        assert data is not None and data.size == 201, f"第{trace_index}道读取失败"
+    assert supervisor.reconnects == 1
+    # 重新打开的仿真会话为默认设置，恢复步骤需把带宽写回
+    assert float(controller.query(":SENS1:BWID?")) == 1000.0
+
+    # 读取持续失败时按次数放弃
+    assert supervisor.call(lambda: None, trace_index=6) is None
+    supervisor.close()
+    controller.close_device()
+
+    with open(os.path.join(work_dir, "g_gaps.csv"), newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == GapLog.HEADER
+    gaps = [dict(zip(rows[0], row)) for row in rows[1:]]
+    assert [(g['after_trace'], g['recovered']) for g in gaps] == [('2', '1'), ('5', '0')], gaps
+    assert gaps[1]['attempts'] == '3', gaps
+    assert any("重连成功" in e for e in events) and any("重连放弃" in e for e in events), events
+    return "断开后重连并恢复设置，中断记录2条（恢复1条、放弃1条）"
+
+
+def check_instrument_state(work_dir):
+    """在仿真仪器上读取配置、保存/加载配置文件，下发时只写入变化的设置"""
+    controller = VNAController(resource_manager=SimulatedResourceManager(sweep_time=0.002, jitter=0.0, points=201))
+    assert controller.open_device(SIM_RESOURCE)
+    state = InstrumentStateManager(controller)
+    settings = state.capture()
+    assert settings['points'] == 201 and settings['parameter'] == 'S21' and settings['transform'], settings
+    assert len(settings) == len(STATE_PARAMS), sorted(set(p.key for p in STATE_PARAMS) - set(settings))
+
+    profile_path = os.path.join(work_dir, "profile.json")
+    target = dict(settings, if_bandwidth=1000.0, average_count=4, transform_stop=6e-7)
+    save_profile(profile_path, target, idn="SIM")
+    loaded = load_profile(profile_path)
+    assert loaded == target
+    assert [p.key for p in state.diff(settings, loaded)] == ['if_bandwidth', 'average_count', 'transform_stop']
+
+    assert state.apply(loaded) == ['if_bandwidth', 'average_count', 'transform_stop']
+    assert float(controller.query(":CALC1:MEAS1:TRAN:TIME:STOP?")) == 6e-7
+    # 再次下发时仪器状态已一致，不写入任何设置
+    assert state.apply(loaded) == []
+    assert state.apply(loaded, use_cache=True) == []
+    assert state.capture() == loaded
+    controller.close_device()
+    return f"读取{len(settings)}项设置，下发只写入3项变化"
+
+
+def check_multi_measurement():
+    """测量编号解析；仿真仪器上一次往返读取多个测量，各字段取自同一次扫描，存储行与表头一一对应"""
+    assert parse_measurements("1") == [(1, FDATA)] and is_single(parse_measurements("1"))
+    specs = parse_measurements("1，2, 1:sdata")
+    assert specs == [(1, FDATA), (2, FDATA), (1, SDATA)] and not is_single(specs)
+    for text in ("", "0", "1,1", "1:XDATA"):
+        try:
+            parse_measurements(text)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{text!r}应被拒绝")
+
+    controller = VNAController(resource_manager=SimulatedResourceManager(sweep_time=0.002, jitter=0.0, points=201))
+    assert controller.open_device(SIM_RESOURCE)
+    data = controller.read_multi_data(specs)
+    controller.close_device()
+    assert data is not None and data.dtype == measurement_dtype(specs) and data.size == 201
+    assert channel_names(data) == ['M1', 'M2', 'M1_SDATA']
+    # 仿真仪器的测量2为测量1的-0.5倍，同一条消息内取自同一次扫描
+    assert np.allclose(data['M2'], -0.5 * data['M1'], rtol=1e-8, atol=1e-12)
+    assert np.iscomplexobj(data['M1_SDATA']) and np.any(data['M1_SDATA'].imag != 0)
+    assert np.array_equal(channel(data), data['M1'])
+    assert np.array_equal(channel(data, 'M1_SDATA'), np.abs(data['M1_SDATA']))
+
+    header = trace_header(data)
+    row = trace_row(7, data)
+    assert len(header) == len(row) == 1 + 201 * 4 and row[0] == 7
+    assert header[1 + 201 * 2] == 'M1_SDATA_Re_0' and row[1 + 201 * 3] == data['M1_SDATA'][0].imag
+    single = data['M1'].copy()
+    assert trace_header(single)[1] == 'Sample_0' and trace_row(1, single)[1:] == single.tolist()
+    return "3个测量一次读取，同次扫描一致，行与表头对应"
+
+
+def check_raw_capture(work_dir):
+    """主机端时域变换的归一化和批量一致性；仿真仪器上采集原始SDATA，保存的数据可重新变换得到相同的道"""
+    plan = get_plan(0.0, 1e9, 101, window='rect')
+    assert get_plan(0.0, 1e9, 101, window='rect') is plan
+    # 平坦频谱变换后在t=0处为1
+    assert abs(plan.apply(np.ones(101, dtype=np.complex64))[0] - 1.0) < 1e-6
+    for kwargs in ({'points': 1}, {'points': 101, 'window': 'gauss'}):
+        try:
+            TransformPlan(0.0, 1e9, **kwargs)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{kwargs}应被拒绝")
+
+    controller = VNAController(resource_manager=SimulatedResourceManager(sweep_time=0.002, jitter=0.0, points=201))
+    assert controller.open_device(SIM_RESOURCE)
+    capture = RawCapture(controller, work_dir, "r", options={'window': 'hann'})
+    assert capture.start()
+    # 采集期间仪器时域变换关闭，结束后恢复
+    assert controller.query(":CALC1:MEAS1:TRAN:TIME:STAT?").strip() == "0"
+    traces = []
+    for trace_index in range(1, 4):
+        sdata = capture.read()
+        assert sdata is not None and sdata.dtype == np.complex64 and sdata.size == 201
+        traces.append(capture.process(trace_index, sdata))
+    capture.close()
+    assert controller.query(":CALC1:MEAS1:TRAN:TIME:STAT?").strip() == "1"
+    controller.close_device()
+
+    # 场景的直达波在40ns处，变换后的道应在同一时刻取得最大幅值
+    peak = capture.plan.time[np.argmax(np.abs(traces[0]))] * 1e9
+    assert abs(peak - 40.0) < 4.5, peak
+
+    meta, numbers, sdata = load_raw(work_dir, "r")
+    assert list(numbers) == [1, 2, 3] and sdata.shape == (3, 201)
+    options = dict(meta['transform'])
+    _, again = transform(sdata, meta['freq_start'], meta['freq_stop'], batch_size=2, **options)
+    assert np.allclose(again, np.array(traces)), "按保存的参数重新变换结果不一致"
+    return f"原始数据3道保存并重新变换一致，直达波在{peak:.1f}ns"
+
+
+CHECKS = {
+    'fec': check_fec,
+    'clock': check_clock_sync,
+    'codec': check_trace_codec,
+    'telemetry': check_telemetry,
+    'wire': check_to_wire,
+    'rate': check_rate_control,
+    'visa': check_visa_pool,
+    'journal': check_stream_journal,
+    'index': check_session_index,
+    'hub': check_sensor_hub,
+    'supervisor': check_acq_supervisor,
+    'state': check_instrument_state,
+    'multi': check_multi_measurement,
+    'raw': check_raw_capture,
+}
+
+
+def main():
+    names = sys.argv[1:] or list(CHECKS)
+    unknown = [name for name in names if name not in CHECKS]
+    if unknown:
+        print(f"未知检查项: {', '.join(unknown)}，可选: {', '.join(CHECKS)}")
+        return 2
+
+    failed = 0
+    for name in names:
+        check = CHECKS[name]
+        work_dir = tempfile.mkdtemp(prefix=f"usbvna_{name}_")
+        start = time.perf_counter()
+        try:
+            needs_dir = check.__code__.co_argcount > 0
+            message = check(work_dir) if needs_dir else check()
+            print(f"[PASS] {name:<10} {message} ({(time.perf_counter() - start) * 1000.0:.0f} ms)")
+        except Exception:
+            failed += 1
+            print(f"[FAIL] {name}")
+            traceback.print_exc()
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"{len(names) - failed}/{len(names)} 项通过")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,397 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# 采集链路基准测试套件
+# 功能：基于仿真VNA后端测量道读取/解析、存储格式、B-Scan显示更新、RTK解析和上行编解码的时延分位数与吞吐，
+#       结果输出为JSON；--compare与保存的基线对比，超出阈值的项目判为性能回退（退出码1）
+#
+# 用法：
+#   python acq_benchmark.py --json result.json                 # 运行并保存结果
+#   python acq_benchmark.py --compare baseline.json            # 运行并与基线对比
+#   python acq_benchmark.py --only parse,uplink --traces 200   # 只运行部分项目
+
+import argparse
+import csv
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# 将src目录添加到Python路径中
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from lib.stream_journal import DURABILITIES, JournaledCSVWriter
+from lib.trace_codec import CODECS, TraceDecoder, TraceEncoder
+from lib.vna_controller import VNAController
+from lib.vna_simulator import SIM_RESOURCE, GPRScene, SimulatedResourceManager
+
+# 实时采集目标速率(道/秒)
+TARGET_RATE = 12.0
+
+
+def summarize(durations, items_per_call=1):
+    """
+    时延序列统计
+
+    Args:
+        durations (list): 每次调用耗时(秒)
+        items_per_call (int): 每次调用处理的道数/语句数
+
+    Returns:
+        dict: 分位数(毫秒)与吞吐(项/秒)
+    """
+    arr = np.asarray(durations, dtype=np.float64) * 1000.0
+    total = float(np.sum(arr)) / 1000.0
+    return {
+        "n": int(arr.size),
+        "mean_ms": round(float(np.mean(arr)), 4),
+        "p50_ms": round(float(np.percentile(arr, 50)), 4),
+        "p95_ms": round(float(np.percentile(arr, 95)), 4),
+        "p99_ms": round(float(np.percentile(arr, 99)), 4),
+        "max_ms": round(float(np.max(arr)), 4),
+        "throughput_per_s": round(arr.size * items_per_call / total, 2) if total > 0 else None,
+    }
+
+
+def measure(fn, iterations, warmup=5):
+    """重复调用fn并记录每次耗时，测量期间暂停GC以减少干扰"""
+    for _ in range(warmup):
+        fn()
+    durations = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            fn()
+            durations.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return durations
+
+
+def open_simulator(sweep_time, jitter, points):
+    """通过VNAController打开仿真仪器"""
+    rm = SimulatedResourceManager(sweep_time=sweep_time, jitter=jitter, points=points, command_latency=0.0)
+    vna = VNAController(resource_manager=rm)
+    if not vna.open_device(SIM_RESOURCE):
+        raise RuntimeError("打开仿真仪器失败")
+    return vna
+
+
+def bench_fetch(args):
+    """端到端读取：read_ascan_data()按仪器扫描周期取道，检验能否达到目标速率"""
+    results = {}
+    vna = open_simulator(args.sweep_time, args.jitter, args.points)
+    durations = measure(vna.read_ascan_data, args.traces, warmup=2)
+    stats = summarize(durations)
+    stats["target_rate"] = TARGET_RATE
+    stats["meets_target"] = bool(stats["throughput_per_s"] and stats["throughput_per_s"] >= TARGET_RATE)
+    results["fetch.ascii_fdata"] = stats
+
+    # 二进制块格式
+    session = vna.P9371B_VISA
+    session.write("FORM:DATA REAL,32")
+    session.write("FORM:BORD SWAP")
+    durations = measure(lambda: session.query_binary_values(
+        "CALC1:MEAS1:DATA:FDATA?", datatype='f', is_big_endian=False, container=np.ndarray), args.traces, warmup=2)
+    stats = summarize(durations)
+    stats["meets_target"] = bool(stats["throughput_per_s"] and stats["throughput_per_s"] >= TARGET_RATE)
+    results["fetch.real32_fdata"] = stats
+    vna.close_device()
+    return results
+
+
+def bench_parse(args):
+    """解析开销：与仪器无关，只测响应文本/二进制块转换为数组的耗时"""
+    scene = GPRScene(points=args.points)
+    trace = scene.trace(0)
+    ascii_payload = ",".join(f"{v:+.10E}" for v in trace)
+    body = trace.astype("<f4").tobytes()
+    size = str(len(body))
+    block = f"#{len(size)}{size}".encode("ascii") + body
+
+    def parse_ascii_list():
+        # 与VNAController.read_ascan_data()相同的解析方式
+        np.array([float(p) for p in ascii_payload.split(',') if p.strip()])
+
+    def parse_ascii_numpy():
+        np.array(ascii_payload.split(','), dtype=np.float64)
+
+    def parse_block():
+        n = int(block[1:2])
+        length = int(block[2:2 + n])
+        np.frombuffer(block, dtype="<f4", count=length // 4, offset=2 + n)
+
+    n = args.iterations
+    return {
+        "parse.ascii_list": summarize(measure(parse_ascii_list, n)),
+        "parse.ascii_numpy": summarize(measure(parse_ascii_numpy, n)),
+        "parse.real32_block": summarize(measure(parse_block, n)),
+    }
+
+
+def bench_storage(args):
+    """存储格式：逐道写入的耗时，包括原先每道重新打开CSV追加的方式和采集线程当前使用的日志式写入"""
+    scene = GPRScene(points=args.points)
+    traces = [scene.trace(i) for i in range(args.traces)]
+    tmp = tempfile.mkdtemp(prefix="acq_bench_")
+    results = {}
+    try:
+        # 每道打开-追加-关闭（原DataDumpWorker实时流方式）
+        path = os.path.join(tmp, "reopen.csv")
+        durations = []
+        for i, trace in enumerate(traces):
+            start = time.perf_counter()
+            with open(path, 'a', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerow([i + 1] + trace.tolist())
+            durations.append(time.perf_counter() - start)
+        results["storage.csv_reopen"] = summarize(durations)
+
+        # 保持文件打开的CSV
+        path = os.path.join(tmp, "open.csv")
+        durations = []
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            for i, trace in enumerate(traces):
+                start = time.perf_counter()
+                writer.writerow([i + 1] + trace.tolist())
+                durations.append(time.perf_counter() - start)
+        results["storage.csv_open"] = summarize(durations)
+
+        # 每道一个.npy文件
+        durations = []
+        for i, trace in enumerate(traces):
+            start = time.perf_counter()
+            np.save(os.path.join(tmp, f"ascan_{i:07d}.npy"), trace)
+            durations.append(time.perf_counter() - start)
+        results["storage.npy_per_trace"] = summarize(durations)
+
+        # float32二进制追加
+        path = os.path.join(tmp, "traces.f32")
+        durations = []
+        with open(path, 'wb') as f:
+            for trace in traces:
+                start = time.perf_counter()
+                f.write(trace.astype(np.float32).tobytes())
+                durations.append(time.perf_counter() - start)
+        results["storage.binary_append"] = summarize(durations)
+
+        # 日志式流式CSV写入（采集线程当前使用），各落盘策略的fsync开销
+        for durability in DURABILITIES:
+            path = os.path.join(tmp, f"journal_{durability}.csv")
+            writer = JournaledCSVWriter(path, durability=durability)
+            writer.open(['Trace'] + [f'Sample_{j}' for j in range(args.points)])
+            durations = []
+            for i, trace in enumerate(traces):
+                start = time.perf_counter()
+                writer.write(i + 1, [i + 1] + trace.tolist())
+                durations.append(time.perf_counter() - start)
+            writer.close()
+            results[f"storage.journal_{durability}"] = summarize(durations)
+            results[f"storage.journal_{durability}"]["fsync_count"] = writer.sync_count
+        results["storage.csv_reopen"]["bytes_total"] = os.path.getsize(os.path.join(tmp, "reopen.csv"))
+        results["storage.csv_open"]["bytes_total"] = os.path.getsize(os.path.join(tmp, "open.csv"))
+        results["storage.binary_append"]["bytes_total"] = os.path.getsize(path)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return results
+
+
+def bench_bscan(args):
+    """
+    B-Scan显示更新：复现update_bscan_display()每来一道就重建整幅数组并求色标范围的开销，
+    Qt可用时（offscreen平台）同时测量ImageItem.setImage()
+    """
+    scene = GPRScene(points=args.points)
+    traces = [scene.trace(i) for i in range(args.bscan_traces)]
+    results = {}
+
+    bscan_data = []
+    durations = []
+    for trace in traces:
+        start = time.perf_counter()
+        bscan_data.append(trace)
+        bscan_array = np.array(bscan_data).T
+        np.min(bscan_array)
+        np.max(bscan_array)
+        durations.append(time.perf_counter() - start)
+    stats = summarize(durations)
+    stats["last_ms"] = round(durations[-1] * 1000.0, 4)
+    results["bscan.rebuild_array"] = stats
+
+    try:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        import pyqtgraph as pg
+        from PyQt6.QtWidgets import QApplication
+    except ImportError as e:
+        print(f"跳过B-Scan绘制测试: {e}")
+        return results
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    img = pg.ImageItem()
+    bscan_data = []
+    durations = []
+    for trace in traces:
+        start = time.perf_counter()
+        bscan_data.append(trace)
+        bscan_array = np.array(bscan_data).T
+        img.setImage(bscan_array, axisOrder='row-major', levels=(np.min(bscan_array), np.max(bscan_array)))
+        durations.append(time.perf_counter() - start)
+    app.processEvents()
+    stats = summarize(durations)
+    stats["last_ms"] = round(durations[-1] * 1000.0, 4)
+    results["bscan.set_image"] = stats
+    return results
+
+
+def bench_rtk(args):
+    """RTK NMEA解析：GGA/RMC/GSA混合语句"""
+    from lib.clock_sync import ClockSync
+    from lib.rtk_module import RTKModule
+
+    rtk = RTKModule(clock_sync=ClockSync())
+    lines = [
+        "$GNRMC,083559.00,A,3040.1234567,N,10405.7654321,E,0.012,45.6,191026,,,D*6C",
+        "$GNGGA,083559.00,3040.1234567,N,10405.7654321,E,4,24,0.6,512.345,M,-32.1,M,1.0,0000*4A",
+        "$GPGSA,A,3,01,03,06,09,17,19,22,28,,,,,1.2,0.6,1.0*3A",
+    ]
+    iterations = args.iterations
+
+    def parse_batch():
+        for line in lines:
+            rtk.parse_nmea_line(line)
+
+    return {"rtk.parse_nmea": summarize(measure(parse_batch, iterations), items_per_call=len(lines))}
+
+
+def bench_uplink(args):
+    """上行编解码：各编解码器对单道的编码/解码耗时和压缩比"""
+    scene = GPRScene(points=args.points)
+    traces = [scene.trace(i).astype(np.float32) for i in range(64)]
+    results = {}
+    for name in sorted({codec.name for codec in CODECS.values()}):
+        encoder = TraceEncoder(name)
+        decoder = TraceDecoder()
+        state = {"i": 0}
+        payloads = []
+
+        def encode_one():
+            i = state["i"]
+            state["i"] += 1
+            payloads.append(encoder.encode(traces[i % len(traces)], i))
+
+        enc = summarize(measure(encode_one, args.iterations, warmup=0))
+        # 按发送顺序解码，参考帧编解码器依赖顺序
+        it = iter(enumerate(payloads))
+
+        def decode_one():
+            i, (codec_id, payload) = next(it)
+            decoder.decode(codec_id, payload, args.points, i)
+
+        dec = summarize(measure(decode_one, len(payloads), warmup=0))
+        raw_bytes = args.points * 4
+        ratio = raw_bytes * len(payloads) / max(1, sum(len(p) for _, p in payloads))
+        enc["compression_ratio"] = round(ratio, 3)
+        results[f"uplink.{name}.encode"] = enc
+        results[f"uplink.{name}.decode"] = dec
+    return results
+
+
+BENCHMARKS = {
+    "fetch": bench_fetch,
+    "parse": bench_parse,
+    "storage": bench_storage,
+    "bscan": bench_bscan,
+    "rtk": bench_rtk,
+    "uplink": bench_uplink,
+}
+
+
+def compare(current, baseline, threshold):
+    """
+    与基线对比
+
+    p50/p95时延增加或吞吐下降超过threshold（相对值）即判为回退。
+
+    Returns:
+        list: (项目, 指标, 基线值, 当前值, 变化率, 是否回退)
+    """
+    rows = []
+    for name, stats in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        for metric, higher_is_better in (("p50_ms", False), ("p95_ms", False), ("throughput_per_s", True)):
+            old, new = base.get(metric), stats.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = change < -threshold if higher_is_better else change > threshold
+            rows.append((name, metric, old, new, change, regressed))
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description="采集链路基准测试（仿真VNA后端）")
+    ap.add_argument("--only", default=",".join(BENCHMARKS), help="逗号分隔的项目: " + ",".join(BENCHMARKS))
+    ap.add_argument("--points", type=int, default=1001, help="每道采样点数")
+    ap.add_argument("--traces", type=int, default=100, help="读取/存储测试道数")
+    ap.add_argument("--bscan_traces", type=int, default=500, help="B-Scan测试累计道数")
+    ap.add_argument("--iterations", type=int, default=500, help="微基准重复次数")
+    ap.add_argument("--sweep_time", type=float, default=0.06, help="仿真仪器扫描时间(秒)")
+    ap.add_argument("--jitter", type=float, default=0.003, help="仿真扫描时间抖动(秒)")
+    ap.add_argument("--json", default=None, help="结果保存路径")
+    ap.add_argument("--compare", default=None, help="基线结果文件")
+    ap.add_argument("--threshold", type=float, default=0.15, help="回退判定阈值（相对变化）")
+    args = ap.parse_args()
+
+    selected = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in BENCHMARKS]
+    if unknown:
+        ap.error(f"未知项目: {unknown}")
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "config": vars(args),
+        "results": {},
+    }
+    for name in selected:
+        print(f"运行 {name} ...")
+        report["results"].update(BENCHMARKS[name](args))
+
+    print(f"\n{'项目':<28}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'吞吐(/s)':>12}")
+    for name, stats in report["results"].items():
+        print(f"{name:<30}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}"
+              f"{stats['throughput_per_s'] or 0:>12.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n结果已保存到: {args.json}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold)
+        regressions = [row for row in rows if row[5]]
+        print(f"\n与基线 {args.compare}（{baseline.get('timestamp', '?')}）对比，阈值 {args.threshold:.0%}")
+        for name, metric, old, new, change, regressed in rows:
+            flag = "回退" if regressed else ""
+            print(f"  {name:<30}{metric:<18}{old:>12.3f}{new:>12.3f}{change:>+9.1%}  {flag}")
+        if regressions:
+            print(f"\n发现 {len(regressions)} 项性能回退")
+            sys.exit(1)
+        print("\n未发现性能回退")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,22 @@
 # main_uav.py
 import csv
 import json
+import os
 import socket
 import struct
+import sys
 import threading
 import time
 from typing import List, Tuple, Iterable, Optional
 
 from frpc_helper import run_frpc
 
+# 将src目录添加到Python路径中，复用lib中的批量收发
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'src'))
+from lib.datagram_io import BatchSender
+from lib.rate_control import FEEDBACK_CMD, RateController, UplinkShaper
+from lib.telemetry import TelemetrySender
+
 SERVER_IP = "101.245.88.55"
 REMOTE_ASCAN_PORT = 9000          # UAV 发 A-Scan 到云端的 UDP 端口
 LOCAL_CTRL_PORT = 10001           # UAV 本地接收 CTRL 的端口（frpc 映射到这里）
@@ -17,6 +25,8 @@ CSV_PATH = r"C:\Users\17844\Desktop\all_ascan_data_20260121_143629.csv"
 DEFAULT_INTERVAL_MS = 50          # 默认发送间隔
 UDP_SAFE_PAYLOAD = 1000           # 单包数据部分大小（不含头），避免 MTU 问题
 LOOP_CSV = True                   # CSV 发完是否循环
+RATE_CONTROL = False              # 按地面端 FEEDBACK 自适应调整上行（改用 lib.telemetry 协议发送）；
+                                  # 开启时地面端需使用解析GPRT的接收程序（如 ground_recv_frp.py），frpc_ground.py 只接收ASCN
 
 
 # ========== A-Scan 分片头（与你之前一致） ==========
@@ -31,17 +41,20 @@ def pack_samples_float32(samples: List[float]) -> bytes:
 
 
 def send_fragmented(sock: socket.socket, addr: Tuple[str, int], msg_id: int, payload: bytes,
-                    chunk_size: int = UDP_SAFE_PAYLOAD) -> int:
-    """应用层分片：HDR + chunk，返回分片数"""
+                    chunk_size: int = UDP_SAFE_PAYLOAD, sender: Optional[BatchSender] = None) -> int:
+    """应用层分片：HDR + chunk，返回分片数；传入sender时一道的全部分片批量发送"""
     send_ts_ms = int(time.time() * 1000)
-    chunks = [payload[i:i + chunk_size] for i in range(0, len(payload), chunk_size)]
+    view = memoryview(payload)
+    chunks = [view[i:i + chunk_size] for i in range(0, len(payload), chunk_size)]
     if not chunks:
         chunks = [b""]
 
     part_cnt = len(chunks)
-    for part_idx, ch in enumerate(chunks):
-        hdr = struct.pack(HDR_FMT, MAGIC, msg_id & 0xFFFFFFFF, part_idx, part_cnt, send_ts_ms)
-        sock.sendto(hdr + ch, addr)
+    datagrams = [(struct.pack(HDR_FMT, MAGIC, msg_id & 0xFFFFFFFF, part_idx, part_cnt, send_ts_ms), ch)
+                 for part_idx, ch in enumerate(chunks)]
+    if sender is None:
+        sender = BatchSender(sock, addr, max_datagram=HDR_SIZE + chunk_size, sndbuf=None)
+    sender.send(datagrams)
     return part_cnt
 
 
@@ -49,11 +62,13 @@ def ctrl_recv_loop(stop_evt: threading.Event,
                    send_enable: threading.Event,
                    interval_ms_ref: dict,
                    bind_ip: str = "127.0.0.1",
-                   bind_port: int = LOCAL_CTRL_PORT):
+                   bind_port: int = LOCAL_CTRL_PORT,
+                   rate_ctrl: Optional[RateController] = None):
     """
     UAV 端接收 CTRL（通过 frpc 映射到本地 10001），解析 JSON 命令：
       - ASCAN_START：send_enable.set()，可选 interval_ms
       - ASCAN_STOP ：send_enable.clear()
+      - FEEDBACK   ：地面端链路反馈（丢道率/RTT回显/抖动），交给 rate_ctrl 调整上行档位
     """
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     sock.bind((bind_ip, bind_port))
@@ -72,16 +87,24 @@ def ctrl_recv_loop(stop_evt: threading.Event,
 
         text = data.decode("utf-8", errors="replace")
         ts = time.strftime("%H:%M:%S")
-        print(f"\n[{ts}] [UAV][CTRL] 来自 {addr} len={len(data)} TEXT={text}")
 
         try:
             obj = json.loads(text)
         except Exception:
+            print(f"\n[{ts}] [UAV][CTRL] 来自 {addr} len={len(data)} TEXT={text}")
             print("[UAV][CTRL] 非 JSON，忽略。")
             continue
 
         cmd = str(obj.get("cmd", "")).upper().strip()
 
+        # 反馈约每秒一次，不逐条打印
+        if cmd == FEEDBACK_CMD:
+            if rate_ctrl is not None:
+                rate_ctrl.on_feedback(obj)
+            continue
+
+        print(f"\n[{ts}] [UAV][CTRL] 来自 {addr} len={len(data)} TEXT={text}")
+
         if cmd == "ASCAN_START":
             # 可选：允许地面端传 interval_ms
             if "interval_ms" in obj:
@@ -112,15 +135,25 @@ def ascan_send_loop(stop_evt: threading.Event,
                     csv_path: str = CSV_PATH,
                     server_ip: str = SERVER_IP,
                     server_port: int = REMOTE_ASCAN_PORT,
-                    loop_csv: bool = LOOP_CSV):
+                    loop_csv: bool = LOOP_CSV,
+                    rate_ctrl: Optional[RateController] = None):
     """
     UAV 端“边采边发”线程：
     - 平时阻塞等待 send_enable
     - 被 START 打开后：持续读 CSV → 分片 → 发到云端 9000
     - 被 STOP 关闭后：立刻暂停（不继续读 CSV）
+    - 传入 rate_ctrl 时按当前档位叠加/抽取后用 lib.telemetry 协议发送，编解码器随档位切换
     """
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     addr = (server_ip, server_port)
+    # 一道的全部分片一次系统调用发出（Linux sendmmsg），发送缓冲区按突发量放大
+    sender = BatchSender(sock, addr, max_datagram=HDR_SIZE + UDP_SAFE_PAYLOAD)
+
+    telemetry = None
+    shaper = None
+    if rate_ctrl is not None:
+        telemetry = TelemetrySender(server_ip, server_port, sock=sock, codec=rate_ctrl.profile.codec)
+        shaper = UplinkShaper(rate_ctrl)
 
     print(f"[UAV][TX] 发送目标 -> {server_ip}:{server_port} | CSV={csv_path}")
     print("[UAV][TX] 初始状态：停止发送（等待地面端 ASCAN_START）")
@@ -169,17 +202,28 @@ def ascan_send_loop(stop_evt: threading.Event,
             except Exception:
                 samples.append(0.0)
 
-        payload = pack_samples_float32(samples)
+        if telemetry is not None:
+            # 档位只在发送线程里应用，避免与编码状态并发
+            profile = rate_ctrl.check_timeout()
+            telemetry.set_codec(profile.codec)
+            shaped = shaper.process(samples)
+            parts = telemetry.send_trace(shaped) if shaped is not None else 0
+            if msg_id % 20 == 0:
+                print(f"[UAV][TX] msg_id={msg_id} profile={profile} parts={parts} "
+                      f"report={rate_ctrl.last_report.get('loss')}")
+        else:
+            payload = pack_samples_float32(samples)
 
-        try:
-            parts = send_fragmented(sock, addr, msg_id=msg_id, payload=payload, chunk_size=UDP_SAFE_PAYLOAD)
-        except OSError as e:
-            print(f"[UAV][TX][错误] sendto 失败 msg_id={msg_id}: {e}")
-            time.sleep(0.2)
-            continue
+            try:
+                parts = send_fragmented(sock, addr, msg_id=msg_id, payload=payload, chunk_size=UDP_SAFE_PAYLOAD,
+                                        sender=sender)
+            except OSError as e:
+                print(f"[UAV][TX][错误] sendto 失败 msg_id={msg_id}: {e}")
+                time.sleep(0.2)
+                continue
 
-        if msg_id % 20 == 0:
-            print(f"[UAV][TX] msg_id={msg_id} samples={len(samples)} bytes={len(payload)} parts={parts}")
+            if msg_id % 20 == 0:
+                print(f"[UAV][TX] msg_id={msg_id} samples={len(samples)} bytes={len(payload)} parts={parts}")
 
         msg_id += 1
 
@@ -198,6 +242,7 @@ if __name__ == "__main__":
     stop_evt = threading.Event()
     send_enable = threading.Event()          # 是否允许发送 A-Scan（由 CTRL 控制）
     interval_ms_ref = {"value": DEFAULT_INTERVAL_MS}  # 可动态修改的发送间隔
+    rate_ctrl = RateController() if RATE_CONTROL else None  # 上行自适应档位
 
     # 1) UAV 启动 frpc：云端9100/udp -> 本地10001（CTRL）
     h = run_frpc(
@@ -216,7 +261,7 @@ if __name__ == "__main__":
     # 2) CTRL 接收线程（控制 START/STOP）
     t_ctrl = threading.Thread(
         target=ctrl_recv_loop,
-        args=(stop_evt, send_enable, interval_ms_ref, "127.0.0.1", LOCAL_CTRL_PORT),
+        args=(stop_evt, send_enable, interval_ms_ref, "127.0.0.1", LOCAL_CTRL_PORT, rate_ctrl),
         daemon=True
     )
     t_ctrl.start()
@@ -224,7 +269,8 @@ if __name__ == "__main__":
     # 3) A-Scan 发送线程（被 send_enable 控制）
     t_tx = threading.Thread(
         target=ascan_send_loop,
-        args=(stop_evt, send_enable, interval_ms_ref, CSV_PATH, SERVER_IP, REMOTE_ASCAN_PORT, LOOP_CSV),
+        args=(stop_evt, send_enable, interval_ms_ref, CSV_PATH, SERVER_IP, REMOTE_ASCAN_PORT, LOOP_CSV,
+              rate_ctrl),
         daemon=True
     )
     t_tx.start()
@@ -5,6 +5,7 @@
 # 功能：接收服务器端发送的VNA数据，通过FRP进行网络穿透，评估传输性能
 
 import os
+import sys
 import time
 import json
 import socket
@@ -13,6 +14,12 @@ import subprocess
 from pathlib import Path
 from typing import Dict, Any
 
+# 将src目录添加到Python路径中，复用lib中的遥测协议
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src'))
+from lib.datagram_io import BatchReceiver
+from lib.rate_control import FeedbackReporter
+from lib.telemetry_receiver import TelemetryReceiver
+
 # =========================
 # 配置参数
 # =========================
@@ -23,6 +30,11 @@ TOKEN = "61a594e10edb340fe8b33fda29899567"
 REMOTE_UDP_PORT = 9000          # 云端对外端口
 LOCAL_IP = "127.0.0.1"          # 地面端落地 IP
 LOCAL_PORT = 9999               # 地面端落地端口
+RCVBUF_BYTES = 8 << 20          # 接收缓冲区，吸收突发分片（受系统net.core.rmem_max限制）
+RECV_BATCH = 64                 # 单次系统调用最多接收的数据报数
+MAX_DATAGRAM = 2048             # 单个数据报上限（发送端默认1200字节）
+REMOTE_CTRL_PORT = 9100         # 云端CTRL端口（frpc映射到UAV），链路反馈经此回传
+FEEDBACK_INTERVAL = 1.0         # 反馈周期（秒），设为0关闭反馈
 
 # frpc.exe 的路径
 FRPC_EXE = r"F:\研一\CDUT-UavGPR-Controller\tests\online_transfer\frp_0.52.3\frpc.exe"
@@ -310,44 +322,62 @@ def start_frpc():
 # ==========================================
 RUN_TS = time.strftime("%Y%m%d_%H%M%S")
 SAVE_INDEX = 0
+# 旧JSON分片协议的重组缓冲区
 buffers: Dict[str, Dict[str, Any]] = {}
 analyzer = PerformanceAnalyzer()
 
-# 单文件保存相关变量
-SINGLE_CSV_FILE = None
-CSV_HEADER_WRITTEN = False
-
 # 数据保存路径
 MAIN_CSV_PATH = OUT_DIR / f"all_ascan_data_{RUN_TS}.csv"
 
+# 单文件保存：文件在首次写入时打开并保持打开，不再每道数据重新打开
+CSV_FILE = None
+CSV_PATH = MAIN_CSV_PATH
+CSV_SAMPLES = 0   # 当前文件表头的采样点数
+CSV_PART = 0
+CSV_FLUSH_INTERVAL = 1.0
+LAST_CSV_FLUSH = 0.0
+
+def open_csv(n_samples: int):
+    """打开新的CSV文件并写入表头；UAV端切换抽取档位后道长变化，改写到新的分段文件"""
+    global CSV_FILE, CSV_PATH, CSV_SAMPLES, CSV_PART
+    close_csv()
+    CSV_PART += 1
+    if CSV_PART == 1:
+        CSV_PATH = MAIN_CSV_PATH
+    else:
+        CSV_PATH = OUT_DIR / f"all_ascan_data_{RUN_TS}_part{CSV_PART}_{n_samples}pts.csv"
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    CSV_FILE = open(CSV_PATH, 'a', encoding='utf-8', newline='', buffering=1 << 20)
+    CSV_SAMPLES = n_samples
+    # 表头：Ascan编号, 消息ID, 然后是每个采样点的列名
+    header = ["Ascan_ID", "Message_ID"] + [f"Sample_{i+1}" for i in range(n_samples)]
+    CSV_FILE.write(",".join(header) + "\n")
+    if CSV_PART > 1:
+        print(f"[SAVE] 道长变为 {n_samples}，从第 {SAVE_INDEX} 道起写入 {CSV_PATH}", flush=True)
+
 def save_to_single_csv(msg_id: str, s21_list):
-    """将所有Ascan数据保存到单个CSV文件中，每行对应一个Ascan"""
-    global CSV_HEADER_WRITTEN, SAVE_INDEX
+    """将所有Ascan数据保存到单个CSV文件中，每行对应一个Ascan；道长变化时换新文件"""
+    global SAVE_INDEX, LAST_CSV_FLUSH
     SAVE_INDEX += 1
-    
-    # 确保输出目录存在
-    OUT_DIR.mkdir(parents=True, exist_ok=True)
-    
-    # 打开文件（追加模式）
-    with open(MAIN_CSV_PATH, 'a', encoding='utf-8', newline='') as f:
-        # 如果是第一次写入，添加表头
-        if not CSV_HEADER_WRITTEN:
-            # 表头：Ascan编号, 消息ID, 然后是每个采样点的列名
-            header = ["Ascan_ID", "Message_ID"]
-            # 为每个采样点创建列名
-            for i in range(len(s21_list)):
-                header.append(f"Sample_{i+1}")
-            # 写入表头
-            f.write(",".join(header) + "\n")
-            CSV_HEADER_WRITTEN = True
-        
-        # 数据行：Ascan编号, 消息ID, 然后是采样数据
-        row = [str(SAVE_INDEX), msg_id]
-        row.extend([str(v) for v in s21_list])
-        # 写入数据行
-        f.write(",".join(row) + "\n")
-    
-    print(f"[SAVE] 已将Ascan {SAVE_INDEX} 写入 {MAIN_CSV_PATH}  (count={len(s21_list)}, msg_id={msg_id})", flush=True)
+
+    if CSV_FILE is None or len(s21_list) != CSV_SAMPLES:
+        open_csv(len(s21_list))
+
+    # 数据行：Ascan编号, 消息ID, 然后是采样数据
+    CSV_FILE.write(f"{SAVE_INDEX},{msg_id}," + ",".join(map(str, s21_list)) + "\n")
+
+    # 按时间间隔刷新，避免每道一次系统调用
+    now = time.monotonic()
+    if now - LAST_CSV_FLUSH >= CSV_FLUSH_INTERVAL:
+        CSV_FILE.flush()
+        LAST_CSV_FLUSH = now
+        print(f"[SAVE] 已写入 {SAVE_INDEX} 道至 {CSV_PATH}  (count={len(s21_list)}, msg_id={msg_id})", flush=True)
+
+def close_csv():
+    global CSV_FILE
+    if CSV_FILE is not None:
+        CSV_FILE.close()
+        CSV_FILE = None
 
 def cleanup_expired(ttl_sec: int = 60):
     now = time.time()
@@ -359,95 +389,139 @@ def cleanup_expired(ttl_sec: int = 60):
         buffers.pop(mid, None)
         print(f"[CLEAN] drop expired msg_id={mid}", flush=True)
 
+def on_telemetry_trace(header, samples, receive_time):
+    """接收引擎按trace_id顺序放出的完整道"""
+    start_processing = time.time()
+    msg_id = f"{header.session_id:08x}-{header.trace_id}"
+    if header.n_samples and samples.size != header.n_samples:
+        print(f"[WARN] length mismatch: expect {header.n_samples}, got {samples.size}", flush=True)
+    save_to_single_csv(msg_id, samples.tolist())
+    analyzer.record_processing_time(time.time() - start_processing)
+
+def on_telemetry_gap(session_id, first_trace_id, count):
+    """抖动缓冲等待超时后跳过的道"""
+    print(f"[GAP] session={session_id:08x} trace_id={first_trace_id} missing={count}", flush=True)
+
+# 二进制遥测协议接收引擎（lib.telemetry_receiver）
+receiver = TelemetryReceiver(on_trace=on_telemetry_trace, on_gap=on_telemetry_gap,
+                             max_latency=0.3, fragment_timeout=2.0)
+# 链路反馈（丢道率/抖动/RTT回显），UAV据此自适应调整上行档位
+reporter = FeedbackReporter()
+
+
+def handle_legacy_json(data, addr, receive_time):
+    """兼容旧的JSON分片协议"""
+    text = data.decode("utf-8", errors="replace").strip()
+
+    try:
+        obj = json.loads(text)
+    except json.JSONDecodeError:
+        preview = text[:120].replace("\n", "\\n")
+        print(f"[SKIP] non-json from {addr}, len={len(data)} preview='{preview}'", flush=True)
+        return
+
+    msg_type = obj.get("type", "")
+
+    # 兼容你之前用过的两种 type 名字
+    if msg_type not in {"ascan_s21_json", "s21_real_u_csv"}:
+        return
+
+    msg_id = obj.get("msg_id", "")
+    part = int(obj.get("part", -1))
+    total = int(obj.get("total_parts", -1))
+    chunk = obj.get("data", [])
+
+    if not msg_id or part < 0 or total <= 0:
+        print(f"[WARN] bad packet fields from {addr}: {obj}", flush=True)
+        return
+
+    # 记录数据包；旧协议不带发送时间，传输时间无法测量
+    analyzer.record_packet(sent=True, received=True)
+    analyzer.record_data_transfer(len(data), 0.0)
+
+    start_processing = time.time()
+
+    info = buffers.setdefault(
+        msg_id,
+        {"total": total, "parts": {}, "meta": obj, "last_ts": receive_time},
+    )
+    info["total"] = total
+    info["last_ts"] = receive_time
+    info["parts"][part] = chunk
+
+    if len(info["parts"]) == total:
+        all_data = []
+        for p in range(total):
+            all_data.extend(info["parts"].get(p, []))
+
+        # 可选长度校验（如果发送端携带 n_samples）
+        n_samples = int(info["meta"].get("n_samples", 0))
+        if n_samples and len(all_data) != n_samples:
+            print(f"[WARN] length mismatch: expect {n_samples}, got {len(all_data)}", flush=True)
+
+        save_to_single_csv(msg_id, all_data)
+        buffers.pop(msg_id, None)
+        analyzer.record_processing_time(time.time() - start_processing)
+
+
 def run_receiver():
     OUT_DIR.mkdir(parents=True, exist_ok=True)
 
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    # 增加接收缓冲区大小，减少丢包
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65535)
     try:
         sock.bind((LOCAL_IP, LOCAL_PORT))
     except Exception as e:
         print(f"[ERROR] bind {LOCAL_IP}:{LOCAL_PORT} failed: {e}", flush=True)
         raise
+    # 批量收包写入预分配缓冲池，并增大接收缓冲区，减少丢包
+    batch = BatchReceiver(sock, batch_size=RECV_BATCH, max_datagram=MAX_DATAGRAM, rcvbuf=RCVBUF_BYTES)
 
     print(f"[OK] Listening on {LOCAL_IP}:{LOCAL_PORT}", flush=True)
     print(f"[OK] Saving to {OUT_DIR.resolve()}", flush=True)
     
     # 开始性能测量
     analyzer.start_measurement()
+    last_cleanup = time.monotonic()
+    last_feedback = last_cleanup
+    ctrl_addr = (SERVER_IP, REMOTE_CTRL_PORT)
 
-    while True:
-        data, addr = sock.recvfrom(65535)  # UDP 一个“数据报”
-        text = data.decode("utf-8", errors="replace").strip()
-
-        # 记录接收时间
-        receive_time = time.time()
-
-        try:
-            obj = json.loads(text)
-        except json.JSONDecodeError:
-            preview = text[:120].replace("\n", "\\n")
-            print(f"[SKIP] non-json from {addr}, len={len(data)} preview='{preview}'", flush=True)
-            continue
-
-        msg_type = obj.get("type", "")
-
-        # 兼容你之前用过的两种 type 名字
-        if msg_type not in {"ascan_s21_json", "s21_real_u_csv"}:
-            continue
-
-        msg_id = obj.get("msg_id", "")
-        part = int(obj.get("part", -1))
-        total = int(obj.get("total_parts", -1))
-        chunk = obj.get("data", [])
-
-        if not msg_id or part < 0 or total <= 0:
-            print(f"[WARN] bad packet fields from {addr}: {obj}", flush=True)
-            continue
-
-        # 记录数据包
-        analyzer.record_packet(sent=True, received=True)
-        
-        # 计算数据大小和传输时间
-        data_size = len(json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
-        # 假设发送时间为当前时间减去一个小值（实际应该从数据包中获取）
-        send_time = receive_time - 0.01
-        transfer_time = receive_time - send_time
-        analyzer.record_data_transfer(data_size, transfer_time)
-        
-        # 记录处理时间
-        start_processing = time.time()
-
-        info = buffers.setdefault(
-            msg_id,
-            {"total": total, "parts": {}, "meta": obj, "last_ts": time.time()},
-        )
-        info["total"] = total
-        info["last_ts"] = time.time()
-        info["parts"][part] = chunk
-
-        got = len(info["parts"])
-        print(f"[RX] msg_id={msg_id[:8]} part={part+1}/{total} (got={got}/{total})", flush=True)
-
-        if got == total:
-            all_data = []
-            for p in range(total):
-                all_data.extend(info["parts"].get(p, []))
-
-            # 可选长度校验（如果发送端携带 n_samples）
-            n_samples = int(info["meta"].get("n_samples", 0))
-            if n_samples and len(all_data) != n_samples:
-                print(f"[WARN] length mismatch: expect {n_samples}, got {len(all_data)}", flush=True)
-
-            save_to_single_csv(msg_id, all_data)
-            buffers.pop(msg_id, None)
-            
-            # 记录处理完成时间
-            end_processing = time.time()
-            analyzer.record_processing_time(end_processing - start_processing)
-
-        cleanup_expired(ttl_sec=120)
+    try:
+        while True:
+            # 短超时，保证无数据时也能推进时间轮和抖动缓冲
+            datagrams = batch.recv_batch(timeout=receiver.wheel.tick)
+
+            # 记录接收时间（同一批数据报共用）
+            receive_time = time.time()
+            now = time.monotonic()
+
+            for data, addr in datagrams:
+                # 二进制遥测协议（lib.telemetry）
+                header = receiver.feed(data, now)
+                if header is not None:
+                    reporter.on_datagram(header, now, receive_time, len(data))
+                    analyzer.record_packet(sent=True, received=True)
+                    # 包头携带发送端时间戳，传输时间为真实单程时延（依赖两端时钟同步）
+                    analyzer.record_data_transfer(len(data), max(0.0, receive_time - header.timestamp_us / 1e6))
+                else:
+                    handle_legacy_json(bytes(data), addr, receive_time)
+
+            receiver.poll(now)
+            if FEEDBACK_INTERVAL and now - last_feedback >= FEEDBACK_INTERVAL:
+                last_feedback = now
+                report = reporter.make_report(receiver.get_stats(), now)
+                if report is not None:
+                    try:
+                        sock.sendto(json.dumps(report).encode("utf-8"), ctrl_addr)
+                    except OSError as e:
+                        print(f"[WARN] feedback send failed: {e}", flush=True)
+            # 旧协议缓冲区数量很少，每秒清理一次即可
+            if now - last_cleanup >= 1.0:
+                cleanup_expired(ttl_sec=120)
+                last_cleanup = now
+    finally:
+        receiver.flush()
+        close_csv()
+        sock.close()
 
 def main():
     try:
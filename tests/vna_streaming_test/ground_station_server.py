@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# VNA实时数据流传输与处理系统 - 多UAV地面站
+# 功能：单个UDP端口同时接收多架无人机的遥测流，按会话分别保存，并向本地查看端推送实时数据
+
+import argparse
+import asyncio
+import os
+import sys
+
+# 将src目录添加到Python路径中，复用lib中的地面站服务
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src'))
+from lib.ground_station import GroundStationServer
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--listen_ip", default="127.0.0.1")
+    ap.add_argument("--listen_port", type=int, default=9999)      # frpc：云端9000 -> 本地9999
+    ap.add_argument("--out_dir", default="out_sessions")
+    ap.add_argument("--api_ip", default="127.0.0.1")
+    ap.add_argument("--api_port", type=int, default=8765)          # 查看端TCP接口（按行JSON）
+    ap.add_argument("--api_unix", default=None)                    # 可选Unix socket路径
+    ap.add_argument("--feedback_port", type=int, default=None)     # 直连时向UAV回传链路反馈的端口
+    args = ap.parse_args()
+
+    server = GroundStationServer(host=args.listen_ip, port=args.listen_port, out_dir=args.out_dir,
+                                 api_host=args.api_ip, api_port=args.api_port, api_unix_path=args.api_unix,
+                                 feedback_port=args.feedback_port)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("\n[INFO] 用户中断，退出地面站", flush=True)
+
+
+if __name__ == "__main__":
+    main()
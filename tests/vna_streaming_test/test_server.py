@@ -8,13 +8,16 @@ import pyvisa as visa
 import numpy as np
 import time
 import csv
-import json
-import socket
 import threading
-import uuid
 from queue import Queue
 from datetime import datetime
 import os
+import sys
+
+# 将src目录添加到Python路径中，复用lib中的遥测协议
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src'))
+from lib.fec import FEC_RS, FecCodec
+from lib.telemetry import TelemetrySender
 
 class SimpleVNAController:
     """
@@ -300,105 +303,29 @@ class DataWriter:
 class DataTransmitter:
     """
     数据传输类，用于将实时数据流传输至地面端
+    使用lib.telemetry二进制协议：定长包头 + float32负载，分片大小直接计算，不再反复JSON序列化
+    codec可选lib.trace_codec中的编解码器名称，如'delta_zlib'（无损）或'quant16'、'refdiff16'（有损）
+    fec_ratio为每道Reed-Solomon校验分片占数据分片的比例，0表示不加校验分片
     """
-    def __init__(self, server_ip, server_port, max_udp_bytes=1100):
+    def __init__(self, server_ip, server_port, max_udp_bytes=1100, codec="raw", fec_ratio=0.0):
         """
         初始化数据传输器
         """
         self.server_ip = server_ip
         self.server_port = server_port
         self.max_udp_bytes = max_udp_bytes
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        fec = FecCodec(FEC_RS, parity_ratio=fec_ratio) if fec_ratio > 0 else None
+        self.sender = TelemetrySender(server_ip, server_port, max_datagram=max_udp_bytes, dtype=np.float32,
+                                      codec=codec, fec=fec)
         self.lock = threading.Lock()
     
-    def chunk_by_max_bytes(self, base_obj, data_list):
-        """
-        把数据切成多片，使得每个JSON包尽量不超过max_bytes
-        """
-        chunks = []
-        part = 0
-        i = 0
-        n = len(data_list)
-        
-        while i < n:
-            # 先猜一个窗口大小，然后根据JSON长度缩放
-            step = min(80, n - i)  # 初始猜测
-            while True:
-                candidate = data_list[i : i + step]
-                obj = dict(base_obj)
-                obj["part"] = part
-                obj["data"] = candidate
-                b = json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
-                
-                if len(b) <= self.max_udp_bytes:
-                    # 尝试再多塞一点
-                    if i + step >= n:
-                        break
-                    step2 = min(step + 20, n - i)
-                    candidate2 = data_list[i : i + step2]
-                    obj2 = dict(base_obj)
-                    obj2["part"] = part
-                    obj2["data"] = candidate2
-                    b2 = json.dumps(obj2, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
-                    if len(b2) <= self.max_udp_bytes:
-                        step = step2
-                        continue
-                    break
-                else:
-                    # 太大就减小
-                    if step <= 1:
-                        break
-                    step = max(1, step // 2)
-            
-            final_candidate = data_list[i : i + step]
-            chunks.append(final_candidate)
-            i += step
-            part += 1
-        
-        # 组装成最终包对象列表
-        total = len(chunks)
-        out_packets = []
-        for p, arr in enumerate(chunks):
-            obj = dict(base_obj)
-            obj["part"] = p
-            obj["total_parts"] = total
-            obj["data"] = arr
-            out_packets.append(obj)
-        return out_packets
-    
     def send_data(self, data, timestamp=None):
         """
         发送数据到地面端
         """
-        if timestamp is None:
-            timestamp = time.time()
-        
         with self.lock:
             try:
-                # 构建基础对象
-                msg_id = uuid.uuid4().hex
-                ts = time.strftime("%Y-%m-%dT%H:%M:%S")
-                
-                base_obj = {
-                    "type": "ascan_s21_json",
-                    "ts": ts,
-                    "msg_id": msg_id,
-                    "n_samples": len(data),
-                    "timestamp": timestamp
-                }
-                
-                # 分片数据
-                packets = self.chunk_by_max_bytes(base_obj, data.tolist())
-                
-                # 增加发送缓冲区大小
-                self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 65535)
-                
-                # 发送数据包
-                for packet in packets:
-                    payload = json.dumps(packet, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
-                    self.socket.sendto(payload, (self.server_ip, self.server_port))
-                
-                return True
+                return self.sender.send_trace(data, timestamp) > 0
             except Exception as e:
                 print(f"发送数据失败: {e}")
                 return False
@@ -407,17 +334,15 @@ class DataTransmitter:
         """
         关闭socket
         """
-        try:
-            self.socket.close()
-            print("数据传输socket已关闭")
-        except Exception as e:
-            print(f"关闭socket失败: {e}")
+        self.sender.close()
+        print("数据传输socket已关闭")
 
 class VNAServer:
     """
     VNA服务器类，整合VNA数据读取、缓存、CSV写入和远程传输功能
     """
-    def __init__(self, device_name, server_ip, server_port, acquisition_period_ms=80, max_cache_size=1000):
+    def __init__(self, device_name, server_ip, server_port, acquisition_period_ms=80, max_cache_size=1000,
+                 codec="raw", fec_ratio=0.0):
         """
         初始化VNA服务器
         """
@@ -431,7 +356,7 @@ class VNAServer:
         self.vna_controller = SimpleVNAController()
         self.data_cache = DataCache(max_size=max_cache_size)
         self.data_writer = DataWriter()
-        self.data_transmitter = DataTransmitter(server_ip, server_port)
+        self.data_transmitter = DataTransmitter(server_ip, server_port, codec=codec, fec_ratio=fec_ratio)
         
         # 线程控制
         self.is_running = False
@@ -549,9 +474,12 @@ def main():
     SERVER_IP = "101.245.88.55"  # FRP服务器IP地址
     SERVER_PORT = 9000  # FRP服务器UDP端口
     ACQUISITION_PERIOD_MS = 80  # 采集周期（毫秒）
+    CODEC = "raw"  # 上行编解码器：raw / delta_zlib / delta_lzma / quant16 / quant12 / refdiff16
+    FEC_RATIO = 0.25  # 校验分片比例，1~3%丢包率下每道4片数据加1片校验即可基本消除整道丢失
     
     # 创建并启动VNA服务器
-    server = VNAServer(DEVICE_NAME, SERVER_IP, SERVER_PORT, ACQUISITION_PERIOD_MS)
+    server = VNAServer(DEVICE_NAME, SERVER_IP, SERVER_PORT, ACQUISITION_PERIOD_MS, codec=CODEC,
+                       fec_ratio=FEC_RATIO)
     
     try:
         if server.start():
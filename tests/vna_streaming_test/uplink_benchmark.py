@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# VNA实时数据流传输与处理系统 - 上行链路离线基准测试
+# 功能：本机回环 + 链路仿真（丢包/乱序/重复/时延/抖动/带宽），评估编解码器、FEC和码率设置下的
+#       单程时延、有效吞吐、道完整率和每道CPU开销，不依赖FRP服务器
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+import numpy as np
+
+# 将src目录添加到Python路径中，复用lib中的遥测协议
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src'))
+from lib.datagram_io import BatchReceiver
+from lib.fec import FEC_RS, FEC_XOR, FecCodec
+from lib.link_emulator import PROFILES, LinkEmulator, LinkProfile
+from lib.telemetry import TelemetrySender
+from lib.telemetry_receiver import TelemetryReceiver
+
+
+def synthetic_traces(n_traces, n_samples, seed=0):
+    """生成带直达波、层位反射和噪声的模拟A-Scan序列"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_samples, dtype=np.float32)
+
+    def ricker(center, width):
+        a = ((t - center) / width) ** 2
+        return (1.0 - 2.0 * a) * np.exp(-a)
+
+    base = ricker(n_samples * 0.05, 3.0) + 0.3 * ricker(n_samples * 0.3, 4.0)
+    for i in range(n_traces):
+        # 缓慢起伏的层位
+        depth = n_samples * (0.5 + 0.1 * np.sin(i / 50.0))
+        trace = base + 0.15 * ricker(depth, 5.0) + 0.01 * rng.standard_normal(n_samples)
+        yield trace.astype(np.float32)
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+
+def run_benchmark(args):
+    profile = PROFILES[args.profile] if args.profile else LinkProfile()
+    profile = profile._replace(**{k: v for k, v in {
+        'loss': args.loss, 'burst': args.burst, 'reorder': args.reorder, 'duplicate': args.duplicate,
+        'delay': args.delay, 'jitter': args.jitter, 'bandwidth_kbps': args.bandwidth_kbps,
+    }.items() if v is not None})
+
+    # 地面接收端
+    rx_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    rx_sock.bind(("127.0.0.1", 0))
+    batch = BatchReceiver(rx_sock)
+    latencies = []
+    released = {"traces": 0, "bytes": 0, "gaps": 0}
+
+    def on_trace(header, samples, receive_time):
+        latencies.append(time.time() - header.timestamp_us / 1e6)
+        released["traces"] += 1
+        released["bytes"] += samples.size * 4
+
+    def on_gap(session_id, first_trace_id, count):
+        released["gaps"] += count
+
+    receiver = TelemetryReceiver(on_trace=on_trace, on_gap=on_gap, max_latency=args.max_latency)
+    stop_rx = threading.Event()
+    cpu = {}
+
+    def rx_loop():
+        start = time.thread_time()
+        while not stop_rx.is_set():
+            for data, _ in batch.recv_batch(timeout=receiver.wheel.tick):
+                receiver.feed(data)
+            receiver.poll()
+        receiver.flush()
+        cpu["rx"] = time.thread_time() - start
+
+    emulator = LinkEmulator(rx_sock.getsockname(), profile, seed=args.seed).start()
+    rx_thread = threading.Thread(target=rx_loop, daemon=True)
+    rx_thread.start()
+
+    fec = None
+    if args.fec == "xor":
+        fec = FecCodec(FEC_XOR)
+    elif args.fec == "rs":
+        fec = FecCodec(FEC_RS, parity_ratio=args.fec_ratio)
+    sender = TelemetrySender(*emulator.listen_addr, max_datagram=args.max_datagram, codec=args.codec, fec=fec)
+
+    # UAV发送端：按固定道率发送
+    n_traces = int(args.rate * args.duration)
+    period = 1.0 / args.rate
+    tx_cpu_start = time.thread_time()
+    t0 = time.monotonic()
+    for i, trace in enumerate(synthetic_traces(n_traces, args.samples, args.seed)):
+        sender.send_trace(trace)
+        sleep = t0 + (i + 1) * period - time.monotonic()
+        if sleep > 0:
+            time.sleep(sleep)
+    cpu["tx"] = time.thread_time() - tx_cpu_start
+    elapsed = time.monotonic() - t0
+
+    # 等待链路中的数据排空
+    time.sleep(profile.delay + 4 * profile.jitter + profile.reorder_delay + args.max_latency + 0.5)
+    stop_rx.set()
+    rx_thread.join(timeout=5.0)
+    emulator.stop()
+    sender.close()
+    rx_sock.close()
+
+    stats = next(iter(receiver.get_stats().values()), {})
+    result = {
+        "profile": profile._asdict(),
+        "codec": args.codec,
+        "fec": args.fec,
+        "rate": args.rate,
+        "samples": args.samples,
+        "sent_traces": n_traces,
+        "received_traces": released["traces"],
+        "completeness": round(released["traces"] / n_traces, 4) if n_traces else None,
+        "missing_traces": released["gaps"],
+        "fec_recovered": stats.get("recovered", 0),
+        "latency_ms": {
+            "p50": percentile([v * 1000 for v in latencies], 50),
+            "p95": percentile([v * 1000 for v in latencies], 95),
+            "p99": percentile([v * 1000 for v in latencies], 99),
+            "max": max(latencies) * 1000 if latencies else None,
+        },
+        "goodput_kbps": round(released["bytes"] * 8 / elapsed / 1000.0, 1),
+        "wire_kbps": round(sender.bytes_sent * 8 / elapsed / 1000.0, 1),
+        "datagrams_sent": sender.datagrams_sent,
+        "link": dict(emulator.stats),
+        "cpu_us_per_trace": {
+            "tx": round(cpu["tx"] / n_traces * 1e6, 1) if n_traces else None,
+            "rx": round(cpu.get("rx", 0.0) / max(1, released["traces"]) * 1e6, 1),
+        },
+    }
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--profile", choices=sorted(PROFILES), default=None, help="预设链路条件")
+    ap.add_argument("--loss", type=float, default=None)
+    ap.add_argument("--burst", type=float, default=None)
+    ap.add_argument("--reorder", type=float, default=None)
+    ap.add_argument("--duplicate", type=float, default=None)
+    ap.add_argument("--delay", type=float, default=None, help="单程时延(秒)")
+    ap.add_argument("--jitter", type=float, default=None, help="抖动标准差(秒)")
+    ap.add_argument("--bandwidth_kbps", type=int, default=None)
+    ap.add_argument("--codec", default="raw")
+    ap.add_argument("--fec", choices=["none", "xor", "rs"], default="none")
+    ap.add_argument("--fec_ratio", type=float, default=0.25)
+    ap.add_argument("--rate", type=float, default=20.0, help="道/秒")
+    ap.add_argument("--duration", type=float, default=10.0, help="秒")
+    ap.add_argument("--samples", type=int, default=1001)
+    ap.add_argument("--max_datagram", type=int, default=1200)
+    ap.add_argument("--max_latency", type=float, default=0.3)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", default=None, help="结果保存路径")
+    args = ap.parse_args()
+
+    result = run_benchmark(args)
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    print(text)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()